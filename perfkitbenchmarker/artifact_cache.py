@@ -0,0 +1,205 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runner-side cache of files that packages download to VMs.
+
+Without the cache, every VM downloads archives such as the Hadoop or YCSB
+tarballs from upstream in every run. With --artifact_cache, each file is
+downloaded to this machine at most once, and is pushed to the VMs from here.
+
+The cache is content-addressed: files are stored under their SHA-256 digest,
+and an index maps each URL to the digest of the file downloaded from it. The
+cache persists across runs, and --artifact_mirror can point it at a local
+directory or HTTP mirror instead of upstream.
+"""
+
+import collections
+import hashlib
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+import urllib
+import urllib2
+import urlparse
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import temp_dir
+
+flags.DEFINE_boolean('artifact_cache', False,
+                     'Whether files that packages download to VMs are '
+                     'downloaded once to this machine, and pushed to the VMs '
+                     'from there.')
+flags.DEFINE_string('artifact_cache_dir', None,
+                    'Directory in which downloaded files are cached. Defaults '
+                    'to a directory under the PKB temporary directory.')
+flags.DEFINE_string('artifact_mirror', None,
+                    'Local directory, or HTTP(S) URL of a directory, that '
+                    'is searched for files by name before their upstream '
+                    'URLs. Only used with --artifact_cache.')
+
+FLAGS = flags.FLAGS
+
+# Files are downloaded and hashed in blocks of this many bytes.
+_BLOCK_SIZE = 1 << 20
+
+_BLOBS_DIR = 'sha256'
+_URLS_DIR = 'urls'
+
+# Serializes downloads of the same URL, so that each is downloaded once even
+# when many VMs install the same package at the same time.
+_url_locks = collections.defaultdict(threading.Lock)
+_url_locks_lock = threading.Lock()
+
+
+def _GetCacheDir():
+  return FLAGS.artifact_cache_dir or temp_dir.GetArtifactDirPath()
+
+
+def _GetFileName(url):
+  return posixpath.basename(urlparse.urlparse(url).path)
+
+
+def _GetBlobPath(digest, file_name):
+  return os.path.join(_GetCacheDir(), _BLOBS_DIR, digest, file_name)
+
+
+def _GetIndexPath(url):
+  return os.path.join(_GetCacheDir(), _URLS_DIR,
+                      hashlib.sha256(url).hexdigest())
+
+
+def _MakeDirs(path):
+  try:
+    os.makedirs(path)
+  except OSError:
+    if not os.path.isdir(path):
+      raise
+
+
+def _GetSourceUrls(url):
+  """Returns the URLs that a file is downloaded from, in order of preference."""
+  mirror = FLAGS.artifact_mirror
+  if not mirror:
+    return [url]
+  file_name = _GetFileName(url)
+  if '://' in mirror:
+    mirror_url = mirror.rstrip('/') + '/' + urllib.quote(file_name)
+  else:
+    mirror_url = urlparse.urljoin('file:', urllib.pathname2url(
+        os.path.abspath(os.path.join(mirror, file_name))))
+  return [mirror_url, url]
+
+
+def _Download(source_url, path):
+  """Downloads a URL to a local file.
+
+  Returns:
+    The hex SHA-256 digest of the file.
+  """
+  sha256 = hashlib.sha256()
+  response = urllib2.urlopen(source_url)
+  try:
+    with open(path, 'wb') as fp:
+      for block in iter(lambda: response.read(_BLOCK_SIZE), ''):
+        sha256.update(block)
+        fp.write(block)
+  finally:
+    response.close()
+  return sha256.hexdigest()
+
+
+def _GetCachedDigest(url, sha256):
+  """Returns the digest of the cached file for a URL, or None if not cached."""
+  digest = sha256
+  if digest is None:
+    try:
+      with open(_GetIndexPath(url)) as fp:
+        digest = fp.read().strip()
+    except IOError:
+      return None
+  if os.path.exists(_GetBlobPath(digest, _GetFileName(url))):
+    return digest
+  return None
+
+
+def GetArtifact(url, sha256=None):
+  """Returns the path of a cached copy of a file, downloading it if needed.
+
+  Args:
+    url: string. The upstream URL of the file.
+    sha256: string. The expected hex SHA-256 digest of the file, or None to
+        accept whatever the URL serves.
+
+  Returns:
+    The local path of the file. The file must not be modified.
+
+  Raises:
+    errors.Setup.ArtifactDownloadError: If the file could not be downloaded
+        from any source, or did not match sha256.
+  """
+  with _url_locks_lock:
+    url_lock = _url_locks[url]
+  with url_lock:
+    digest = _GetCachedDigest(url, sha256)
+    if digest:
+      return _GetBlobPath(digest, _GetFileName(url))
+
+    download_dir = os.path.join(_GetCacheDir(), _BLOBS_DIR)
+    _MakeDirs(download_dir)
+    failures = []
+    for source_url in _GetSourceUrls(url):
+      fd, download_path = tempfile.mkstemp(dir=download_dir)
+      os.close(fd)
+      try:
+        logging.info('Downloading %s to the artifact cache.', source_url)
+        digest = _Download(source_url, download_path)
+        if sha256 is not None and digest != sha256:
+          failures.append('%s: SHA-256 is %s, expected %s.' %
+                          (source_url, digest, sha256))
+          continue
+        path = _GetBlobPath(digest, _GetFileName(url))
+        _MakeDirs(os.path.dirname(path))
+        os.rename(download_path, path)
+        _MakeDirs(os.path.dirname(_GetIndexPath(url)))
+        with open(_GetIndexPath(url), 'w') as fp:
+          fp.write(digest)
+        return path
+      except (IOError, OSError) as e:
+        failures.append('%s: %s' % (source_url, e))
+      finally:
+        if os.path.exists(download_path):
+          os.remove(download_path)
+    raise errors.Setup.ArtifactDownloadError(
+        'Could not download %s. %s' % (url, ' '.join(failures)))
+
+
+def DownloadToVm(vm, url, remote_path, sha256=None):
+  """Downloads a file to a VM.
+
+  With --artifact_cache, the file is pushed from the cache on this machine.
+  Otherwise, the VM downloads it with curl, which must be installed.
+
+  Args:
+    vm: The BaseVirtualMachine to download the file to.
+    url: string. The upstream URL of the file.
+    remote_path: string. The destination path of the file on the VM.
+    sha256: string. The expected hex SHA-256 digest of the file, or None.
+  """
+  if not FLAGS.artifact_cache:
+    vm.RemoteCommand('curl -fsSL -o {0} {1}'.format(remote_path, url))
+    return
+  vm.PushFile(GetArtifact(url, sha256), remote_path)
@@ -56,16 +56,22 @@ from collections import deque
 from concurrent import futures
 import ctypes
 import functools
+import inspect
+import itertools
 import logging
 import os
 import Queue
+import sys
 import threading
 import time
 import traceback
 
 from perfkitbenchmarker import context
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import event_loop
+from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import log_util
+from perfkitbenchmarker import task_timing
 
 
 # For situations where an interruptable wait is necessary, a loop of waits with
@@ -77,13 +83,18 @@ _LONG_TIMEOUT = 1000.
 _WAIT_MIN_RECHECK_DELAY = 0.001  # 1 ms
 _WAIT_MAX_RECHECK_DELAY = 0.050  # 50 ms
 
-# Values sent to child threads that have special meanings.
-_THREAD_STOP_PROCESSING = 0
+# Default limits on the number of concurrent calls of RunThreaded and
+# RunThreadedInDependencyOrder. Coroutines do not hold a thread while they
+# wait, so many more of them can run at once.
+_MAX_CONCURRENT_THREADS = 200
+_MAX_CONCURRENT_COROUTINES = 5000
+
+# Value sent to child threads to make them wait for a KeyboardInterrupt.
 _THREAD_WAIT_FOR_KEYBOARD_INTERRUPT = 1
 
 
-def _GetCallString(target_arg_tuple):
-  """Returns the string representation of a function call."""
+def _UnwrapCall(target_arg_tuple):
+  """Returns the (target, args, kwargs) tuple of a call with partials applied."""
   target, args, kwargs = target_arg_tuple
   while isinstance(target, functools.partial):
     args = target.args + args
@@ -91,6 +102,12 @@ def _GetCallString(target_arg_tuple):
     inner_kwargs.update(kwargs)
     kwargs = inner_kwargs
     target = target.func
+  return target, args, kwargs
+
+
+def _GetCallString(target_arg_tuple):
+  """Returns the string representation of a function call."""
+  target, args, kwargs = _UnwrapCall(target_arg_tuple)
   arg_strings = [str(a) for a in args]
   arg_strings.extend(['{0}={1}'.format(k, v) for k, v in kwargs.iteritems()])
   return '{0}({1})'.format(getattr(target, '__name__', target),
@@ -191,17 +208,28 @@ class _BackgroundTaskThreadContext(object):
 
   Attributes:
     benchmark_spec: BenchmarkSpec of the benchmark currently being executed.
+    flag_dict_substitutions: list of flag_util.FlagDictSubstitution objects
+        that apply to the parent thread.
     log_context: ThreadLogContext of the parent thread.
   """
 
   def __init__(self):
     self.benchmark_spec = context.GetThreadBenchmarkSpec()
+    self.flag_dict_substitutions = flag_util.GetThreadFlagDictSubstitutions()
     self.log_context = log_util.GetThreadLogContext()
 
+  def __getstate__(self):
+    # Flag substitutions wrap arbitrary callables and only have meaning within
+    # the current process, so they are not sent to child processes.
+    state = self.__dict__.copy()
+    state['flag_dict_substitutions'] = []
+    return state
+
   def CopyToCurrentThread(self):
     """Sets the thread context of the current thread."""
     log_util.SetThreadLogContext(log_util.ThreadLogContext(self.log_context))
     context.SetThreadBenchmarkSpec(self.benchmark_spec)
+    flag_util.SetThreadFlagDictSubstitutions(self.flag_dict_substitutions)
 
 
 class _BackgroundTask(object):
@@ -217,6 +245,8 @@ class _BackgroundTask(object):
         otherwise.
     traceback: The traceback string if the call raised an exception, or None
         otherwise.
+    times: task_timing.TaskTimes. When the task was enqueued, started and
+        ended, and what it called.
   """
 
   def __init__(self, target, args, kwargs, thread_context):
@@ -226,14 +256,22 @@ class _BackgroundTask(object):
     self.context = thread_context
     self.return_value = None
     self.traceback = None
+    unwrapped_target, unwrapped_args, unwrapped_kwargs = _UnwrapCall(
+        (target, args, kwargs))
+    self.times = task_timing.TaskTimes(
+        unwrapped_target, unwrapped_args, unwrapped_kwargs,
+        thread_context.log_context.label, time.time())
 
   def Run(self):
     """Sets the current thread context and executes the target."""
     self.context.CopyToCurrentThread()
+    self.times.start_time = time.time()
     try:
       self.return_value = self.target(*self.args, **self.kwargs)
     except Exception:
       self.traceback = traceback.format_exc()
+    finally:
+      self.times.end_time = time.time()
 
 
 class _BackgroundTaskManager(object):
@@ -290,104 +328,181 @@ class _BackgroundTaskManager(object):
     raise NotImplemented()
 
 
-def _ExecuteBackgroundThreadTasks(worker_id, task_queue, response_queue):
-  """Executes tasks received on a task queue.
+def _ExecuteBackgroundThreadTasks(worker, bootstrap_queue):
+  """Executes tasks received on a worker's task queue.
 
-  Executed in a child Thread by _BackgroundThreadTaskManager.
+  Executed in a child Thread of the _WorkerPool.
 
   Args:
-    worker_id: int. Identifier for the child thread relative to other child
-        threads.
-    task_queue: _NonPollingSingleReaderQueue. Queue from which input is read.
-        Each value in the queue can be one of three types of values. If it is a
-        (task_id, _BackgroundTask) pair, the task is executed on this thread.
-        If it is _THREAD_STOP_PROCESSING, the thread stops executing. If it is
-        _THREAD_WAIT_FOR_KEYBOARD_INTERRUPT, the thread waits for a
-        KeyboardInterrupt.
-    response_queue: _SingleReaderQueue. Queue to which output is written. It
-        receives worker_id when this thread's bootstrap code has completed and
-        receives a (worker_id, task_id) pair for each task completed on this
-        thread.
+    worker: _Worker. The worker that this thread runs.
+    bootstrap_queue: _SingleReaderQueue. Receives worker.worker_id when this
+        thread's bootstrap code has completed.
   """
   try:
-    response_queue.Put(worker_id)
+    bootstrap_queue.Put(worker.worker_id)
     while True:
-      task_tuple = task_queue.Get()
-      if task_tuple == _THREAD_STOP_PROCESSING:
-        break
-      elif task_tuple == _THREAD_WAIT_FOR_KEYBOARD_INTERRUPT:
+      task_tuple = worker.task_queue.Get()
+      if task_tuple == _THREAD_WAIT_FOR_KEYBOARD_INTERRUPT:
         while True:
           time.sleep(_WAIT_MAX_RECHECK_DELAY)
-      task_id, task = task_tuple
+      task_id, task, response_queue = task_tuple
       task.Run()
-      response_queue.Put((worker_id, task_id))
+      # The parent thread returns the worker to the pool once it has received
+      # the response, so that a KeyboardInterrupt that it sends to the worker
+      # cannot reach a task of another call.
+      response_queue.Put(task_id)
   except KeyboardInterrupt:
     # TODO(skschneider): Detect when the log would be unhelpful (e.g. if the
     # current thread was spinning in the _THREAD_WAIT_FOR_KEYBOARD_INTERRUPT
     # sub-loop). Only log in helpful cases, like when the task is interrupted.
     logging.debug('Child thread %s received a KeyboardInterrupt from its '
-                  'parent.', worker_id, exc_info=True)
+                  'parent.', worker.worker_id, exc_info=True)
+
+
+class _Worker(object):
+  """A child thread of the _WorkerPool.
+
+  Attributes:
+    worker_id: int. Identifier for the child thread relative to other child
+        threads.
+    pool: _WorkerPool. The pool that the worker belongs to.
+    task_queue: _NonPollingSingleReaderQueue. Queue from which the thread reads
+        its input. Each value in the queue is either a (task_id,
+        _BackgroundTask, response_queue) tuple, in which case the task is
+        executed on the thread and task_id is put on the _SingleReaderQueue
+        response_queue, or
+        _THREAD_WAIT_FOR_KEYBOARD_INTERRUPT, in which case the thread waits
+        for a KeyboardInterrupt.
+    thread: threading.Thread. The child thread.
+    stopping: boolean. Whether the thread has been sent a KeyboardInterrupt.
+  """
+
+  def __init__(self, worker_id, pool):
+    self.worker_id = worker_id
+    self.pool = pool
+    self.task_queue = _NonPollingSingleReaderQueue()
+    self.thread = None
+    self.stopping = False
+
+
+class _WorkerPool(object):
+  """Child threads shared by all the _BackgroundThreadTaskManagers of a process.
+
+  Threads are started when more of them are needed at once than ever before,
+  and are reused by later calls instead of being stopped. A call always gets
+  threads of its own, even when it is nested in another parallel call, so
+  nested calls cannot deadlock waiting for each other's threads.
+
+  Attributes:
+    pid: int. The process that owns the threads. A child process created by
+        fork inherits the pool's state but not its threads.
+  """
+
+  def __init__(self):
+    self.pid = os.getpid()
+    self._idle_workers = deque()
+    self._worker_ids = itertools.count()
+
+  def Reserve(self, count):
+    """Starts threads until at least count of them are idle.
+
+    Starting the threads that a call needs before its first task, and waiting
+    for their bootstrap code, minimizes the risk of a KeyboardInterrupt
+    interfering with any of the Lock interactions in Thread.start.
+    """
+    self._idle_workers.extend(
+        self._StartWorkers(count - len(self._idle_workers)))
+
+  def AcquireWorker(self):
+    """Returns an idle _Worker, starting a new thread if there is none."""
+    while True:
+      try:
+        worker = self._idle_workers.pop()
+      except IndexError:
+        return self._StartWorkers(1)[0]
+      if worker.thread.is_alive() and not worker.stopping:
+        return worker
+
+  def ReleaseWorker(self, worker):
+    """Makes a worker available to later tasks."""
+    self._idle_workers.append(worker)
+
+  def _StartWorkers(self, count):
+    """Starts count threads, and returns their _Workers once they are ready."""
+    bootstrap_queue = _SingleReaderQueue()
+    workers = []
+    for _ in xrange(count):
+      worker = _Worker(next(self._worker_ids), self)
+      worker.thread = threading.Thread(target=_ExecuteBackgroundThreadTasks,
+                                       args=(worker, bootstrap_queue))
+      worker.thread.daemon = True
+      workers.append(worker)
+      worker.thread.start()
+    uninitialized_worker_ids = {worker.worker_id for worker in workers}
+    for _ in workers:
+      uninitialized_worker_ids.remove(bootstrap_queue.Get())
+    assert not uninitialized_worker_ids, uninitialized_worker_ids
+    return workers
+
+
+_worker_pool = _WorkerPool()
+
+
+def _GetWorkerPool():
+  """Returns the _WorkerPool of the current process."""
+  global _worker_pool
+  if _worker_pool.pid != os.getpid():
+    _worker_pool = _WorkerPool()
+  return _worker_pool
 
 
 class _BackgroundThreadTaskManager(_BackgroundTaskManager):
-  """Manages state for background tasks started in child threads."""
+  """Manages state for background tasks started in child threads.
+
+  The threads come from the process-wide _WorkerPool, and are returned to it
+  as their tasks are awaited.
+  """
 
   def __init__(self, *args, **kwargs):
     super(_BackgroundThreadTaskManager, self).__init__(*args, **kwargs)
     self._response_queue = _SingleReaderQueue()
-    self._task_queues = []
-    self._threads = []
-    self._available_worker_ids = range(self._max_concurrency)
-    uninitialized_worker_ids = set(self._available_worker_ids)
-    for worker_id in self._available_worker_ids:
-      task_queue = _NonPollingSingleReaderQueue()
-      self._task_queues.append(task_queue)
-      thread = threading.Thread(
-          target=_ExecuteBackgroundThreadTasks,
-          args=(worker_id, task_queue, self._response_queue))
-      thread.daemon = True
-      self._threads.append(thread)
-      thread.start()
-    # Wait for each Thread to finish its bootstrap code. Starting all the
-    # threads upfront like this and reusing them for later calls minimizes the
-    # risk of a KeyboardInterrupt interfering with any of the Lock interactions.
-    for _ in self._threads:
-      worker_id = self._response_queue.Get()
-      uninitialized_worker_ids.remove(worker_id)
-    assert not uninitialized_worker_ids, uninitialized_worker_ids
-
-  def __exit__(self, *unused_args, **unused_kwargs):
-    # Shut down worker threads.
-    for task_queue in self._task_queues:
-      task_queue.Put(_THREAD_STOP_PROCESSING)
-    for thread in self._threads:
-      _WaitForCondition(lambda: not thread.is_alive())
+    # Maps the ids of the tasks that have not been awaited to their _Workers.
+    # Workers are only returned to the pool when their task is awaited, so
+    # none of them runs a task of another manager.
+    self._task_workers = {}
+    _GetWorkerPool().Reserve(self._max_concurrency)
 
   def StartTask(self, target, args, kwargs, thread_context):
-    assert self._available_worker_ids, ('StartTask called when no threads were '
-                                        'available')
+    assert len(self._task_workers) < self._max_concurrency, (
+        'StartTask called when no threads were available')
     task = _BackgroundTask(target, args, kwargs, thread_context)
     task_id = len(self.tasks)
     self.tasks.append(task)
-    worker_id = self._available_worker_ids.pop()
-    self._task_queues[worker_id].Put((task_id, task))
+    worker = _GetWorkerPool().AcquireWorker()
+    self._task_workers[task_id] = worker
+    worker.task_queue.Put((task_id, task, self._response_queue))
 
   def AwaitAnyTask(self):
-    worker_id, task_id = self._response_queue.Get()
-    self._available_worker_ids.append(worker_id)
+    task_id = self._response_queue.Get()
+    _GetWorkerPool().ReleaseWorker(self._task_workers.pop(task_id))
     return task_id
 
   def HandleKeyboardInterrupt(self):
-    # Raise a KeyboardInterrupt in each child thread.
-    for thread in self._threads:
+    # Raise a KeyboardInterrupt in each child thread that is running one of
+    # this manager's tasks. The interrupted threads exit, and are replaced by
+    # new ones if the pool needs them later.
+    workers = self._task_workers.values()
+    for worker in workers:
+      worker.stopping = True
       ctypes.pythonapi.PyThreadState_SetAsyncExc(
-          ctypes.c_long(thread.ident), ctypes.py_object(KeyboardInterrupt))
+          ctypes.c_long(worker.thread.ident),
+          ctypes.py_object(KeyboardInterrupt))
     # Wake threads up from possible non-interruptable wait states so they can
     # actually see the KeyboardInterrupt.
-    for task_queue, thread in zip(self._task_queues, self._threads):
-      task_queue.Put(_THREAD_WAIT_FOR_KEYBOARD_INTERRUPT)
-    for thread in self._threads:
-      _WaitForCondition(lambda: not thread.is_alive())
+    for worker in workers:
+      worker.task_queue.Put(_THREAD_WAIT_FOR_KEYBOARD_INTERRUPT)
+    for worker in workers:
+      _WaitForCondition(lambda: not worker.thread.is_alive())
 
 
 def _ExecuteProcessTask(task):
@@ -404,13 +519,13 @@ def _ExecuteProcessTask(task):
     task: _BackgroundTask to execute.
 
   Returns:
-    (result, traceback) tuple. The first element is the return value from the
-    task function, or None if the function raised an exception. The second
-    element is the exception traceback string, or None if the function
-    succeeded.
+    (result, traceback, times) tuple. The first element is the return value
+    from the task function, or None if the function raised an exception. The
+    second element is the exception traceback string, or None if the function
+    succeeded. The third element is the task_timing.TaskTimes of the task.
   """
   task.Run()
-  return task.return_value, task.traceback
+  return task.return_value, task.traceback, task.times
 
 
 class _BackgroundProcessTaskManager(_BackgroundTaskManager):
@@ -452,7 +567,7 @@ class _BackgroundProcessTaskManager(_BackgroundTaskManager):
     future = completed_tasks.pop()
     task_id = self._active_futures.pop(future)
     task = self.tasks[task_id]
-    task.return_value, task.traceback = future.result()
+    task.return_value, task.traceback, task.times = future.result()
     return task_id
 
   def HandleKeyboardInterrupt(self):
@@ -463,8 +578,90 @@ class _BackgroundProcessTaskManager(_BackgroundTaskManager):
     self._executor.shutdown(wait=True)
 
 
+class _BackgroundLoopTaskManager(_BackgroundTaskManager):
+  """Manages state for background tasks run as coroutines on the event loop.
+
+  The targets of the tasks are generator functions. See event_loop.
+  """
+
+  def __init__(self, *args, **kwargs):
+    super(_BackgroundLoopTaskManager, self).__init__(*args, **kwargs)
+    self._response_queue = _SingleReaderQueue()
+    self._active_loop_tasks = {}
+
+  def StartTask(self, target, args, kwargs, thread_context):
+    task = _BackgroundTask(target, args, kwargs, thread_context)
+    task_id = len(self.tasks)
+    self.tasks.append(task)
+
+    def _OnCompletion(return_value, exc_info):
+      task.times.end_time = time.time()
+      if exc_info:
+        task.traceback = ''.join(traceback.format_exception(*exc_info))
+      else:
+        task.return_value = return_value
+      self._response_queue.Put(task_id)
+
+    task.times.start_time = time.time()
+    try:
+      coroutine = target(*args, **kwargs)
+    except Exception:
+      # E.g. the arguments do not match the target's signature.
+      _OnCompletion(None, sys.exc_info())
+      return
+    self._active_loop_tasks[task_id] = event_loop.GetEventLoop().Start(
+        coroutine, thread_context, _OnCompletion)
+
+  def AwaitAnyTask(self):
+    task_id = self._response_queue.Get()
+    self._active_loop_tasks.pop(task_id, None)
+    return task_id
+
+  def HandleKeyboardInterrupt(self):
+    # Cancelling a task kills its commands and closes its coroutines, but
+    # calls that it is making on the loop's thread pool, such as a resource's
+    # Create, cannot be interrupted. They are waited for, so that nothing is
+    # left running once the KeyboardInterrupt has been handled.
+    loop_tasks = self._active_loop_tasks.values()
+    for loop_task in loop_tasks:
+      loop_task.Cancel()
+    if not _WaitForCondition(lambda: all(t.done for t in loop_tasks),
+                             timeout=1):
+      logging.info('Waiting for cancelled tasks to return from calls that '
+                   'cannot be interrupted.')
+      _WaitForCondition(lambda: all(t.done for t in loop_tasks))
+
+
+def _RunThreadedTasks(target, target_arg_tuples, max_concurrent_threads,
+                      dependencies=None):
+  """Runs calls of one target for RunThreaded and RunThreadedInDependencyOrder.
+
+  Generator functions are run as coroutines on the event loop where it is
+  supported. Elsewhere, each of their calls is run to completion in a thread.
+  """
+  get_task_manager = _BackgroundThreadTaskManager
+  if not inspect.isgeneratorfunction(target):
+    default_max_concurrency = _MAX_CONCURRENT_THREADS
+  elif event_loop.IsSupported():
+    default_max_concurrency = _MAX_CONCURRENT_COROUTINES
+    get_task_manager = _BackgroundLoopTaskManager
+  else:
+    default_max_concurrency = _MAX_CONCURRENT_THREADS
+    target_arg_tuples = [
+        (functools.partial(_RunCoroutine, target), args, kwargs)
+        for _, args, kwargs in target_arg_tuples]
+  return _RunParallelTasks(
+      target_arg_tuples, max_concurrent_threads or default_max_concurrency,
+      get_task_manager, errors.VmUtil.ThreadException,
+      dependencies=dependencies)
+
+
+def _RunCoroutine(target, *args, **kwargs):
+  return event_loop.RunSynchronously(target(*args, **kwargs))
+
+
 def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
-                      parallel_exception_class):
+                      parallel_exception_class, dependencies=None):
   """Executes function calls concurrently in separate threads or processes.
 
   Args:
@@ -476,10 +673,16 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
         returns a _TaskManager.
     parallel_exception_class: Type of exception to raise upon an exception in
         one of the called functions.
+    dependencies: None or list of the same length as target_arg_tuples. Each
+        element is a collection of indices into target_arg_tuples of the calls
+        that must complete successfully before the corresponding call starts.
+        The dependencies must not contain cycles. If a call fails, the calls
+        that depend on it, directly or indirectly, are not made. If None,
+        calls are started in the order of target_arg_tuples.
 
   Returns:
     list of function return values in the order corresponding to the order of
-    target_arg_tuples.
+    target_arg_tuples. Calls that were not made have a return value of None.
 
   Raises:
     parallel_exception_class: When an exception occurred in any of the called
@@ -487,34 +690,56 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
   """
   thread_context = _BackgroundTaskThreadContext()
   max_concurrency = min(max_concurrency, len(target_arg_tuples))
+  if dependencies is None:
+    dependencies = [()] * len(target_arg_tuples)
+  remaining_dependency_counts = [len(set(d)) for d in dependencies]
+  dependents = [[] for _ in target_arg_tuples]
+  for index, task_dependencies in enumerate(dependencies):
+    for dependency in set(task_dependencies):
+      dependents[dependency].append(index)
+  ready_indices = deque(index for index, count
+                        in enumerate(remaining_dependency_counts) if not count)
+  # When each call became ready to start, so that the time that it spends
+  # waiting for a free thread or process counts as queueing time.
+  ready_times = [time.time()] * len(target_arg_tuples)
+  task_indices = []
+  results = [None] * len(target_arg_tuples)
   error_strings = []
-  started_task_count = 0
   active_task_count = 0
   with get_task_manager(max_concurrency) as task_manager:
     try:
-      while started_task_count < len(target_arg_tuples) or active_task_count:
-        if (started_task_count < len(target_arg_tuples) and
-            active_task_count < max_concurrency):
+      while ready_indices or active_task_count:
+        if ready_indices and active_task_count < max_concurrency:
           # Start a new task.
-          target, args, kwargs = target_arg_tuples[started_task_count]
+          index = ready_indices.popleft()
+          target, args, kwargs = target_arg_tuples[index]
           task_manager.StartTask(target, args, kwargs, thread_context)
-          started_task_count += 1
+          task_manager.tasks[-1].times.enqueue_time = ready_times[index]
+          task_indices.append(index)
           active_task_count += 1
           continue
 
         # Wait for a task to complete.
         task_id = task_manager.AwaitAnyTask()
         active_task_count -= 1
+        index = task_indices[task_id]
         # If the task failed, it may still be a long time until all remaining
         # tasks complete. Log the failure immediately before continuing to wait
         # for other tasks.
         stacktrace = task_manager.tasks[task_id].traceback
         if stacktrace:
           msg = ('Exception occurred while calling {0}:{1}{2}'.format(
-              _GetCallString(target_arg_tuples[task_id]), os.linesep,
+              _GetCallString(target_arg_tuples[index]), os.linesep,
               stacktrace))
           logging.error(msg)
           error_strings.append(msg)
+          continue
+        results[index] = task_manager.tasks[task_id].return_value
+        for dependent in dependents[index]:
+          remaining_dependency_counts[dependent] -= 1
+          if not remaining_dependency_counts[dependent]:
+            ready_indices.append(dependent)
+            ready_times[dependent] = time.time()
 
     except KeyboardInterrupt:
       logging.error(
@@ -523,15 +748,28 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
       task_manager.HandleKeyboardInterrupt()
       raise
 
+  try:
+    task_timing.Report([task.times for task in task_manager.tasks],
+                       max_concurrency)
+  except Exception:
+    # Reporting must not affect the outcome of the call.
+    logging.exception('Could not report the task times of a parallel call.')
   if error_strings:
+    skipped_indices = set(xrange(len(target_arg_tuples))) - set(task_indices)
+    if skipped_indices:
+      error_strings.append(
+          'The following calls were not made because a call they depend on '
+          'failed:{0}{1}'.format(os.linesep, os.linesep.join(
+              _GetCallString(target_arg_tuples[index])
+              for index in sorted(skipped_indices))))
     # TODO(skschneider): Combine errors.VmUtil.ThreadException and
     # errors.VmUtil.CalledProcessException so this can be a single exception
     # type.
     raise parallel_exception_class(
         'The following exceptions occurred during parallel execution:'
         '{0}{1}'.format(os.linesep, os.linesep.join(error_strings)))
-  results = [task.return_value for task in task_manager.tasks]
-  assert len(target_arg_tuples) == len(results), (target_arg_tuples, results)
+  assert len(task_indices) == len(target_arg_tuples), (
+      'Not all tasks were started. The task dependencies contain a cycle.')
   return results
 
 
@@ -557,10 +795,13 @@ def RunParallelThreads(target_arg_tuples, max_concurrency):
       errors.VmUtil.ThreadException)
 
 
-def RunThreaded(target, thread_params, max_concurrent_threads=200):
+def RunThreaded(target, thread_params, max_concurrent_threads=None):
   """Runs the target method in parallel threads.
 
   The method starts up threads with one arg from thread_params as the first arg.
+  If target is a generator function, each call instead runs as a coroutine on
+  the event loop (see event_loop), so that calls that mostly wait for
+  subprocesses do not each hold a thread.
 
   Args:
     target: The method to invoke in the thread.
@@ -568,6 +809,7 @@ def RunThreaded(target, thread_params, max_concurrent_threads=200):
         in the list can either be a singleton or a (args, kwargs) tuple/list.
         Usually this is a list of VMs.
     max_concurrent_threads: The maximum number of concurrent threads to allow.
+        Defaults to 200 for threads, and 5000 for coroutines.
 
   Returns:
     List of the same length as thread_params. Contains the return value from
@@ -609,8 +851,86 @@ def RunThreaded(target, thread_params, max_concurrent_threads=200):
     target_arg_tuples = [(target, args, kwargs)
                          for args, kwargs in thread_params]
 
-  return RunParallelThreads(target_arg_tuples,
-                            max_concurrency=max_concurrent_threads)
+  return _RunThreadedTasks(target, target_arg_tuples, max_concurrent_threads)
+
+
+def RunThreadedInDependencyOrder(target, items, get_dependencies,
+                                 reverse=False, max_concurrent_threads=None):
+  """Runs the target method on each item once the items it depends on are done.
+
+  Each call starts as soon as the calls for all of the item's dependencies
+  have completed, so independent chains of items make progress in parallel
+  instead of waiting for each other.
+
+  Args:
+    target: The method to invoke in the thread. It is passed a single item.
+        As with RunThreaded, generator functions run on the event loop.
+    items: list of items. Each item must appear at most once.
+    get_dependencies: Callable that accepts an item and returns an iterable of
+        the items it depends on. Returned objects that are not in items are
+        ignored.
+    reverse: boolean. If True, the dependency order is reversed, so that an
+        item is processed only after all of the items that depend on it. This
+        is useful for tearing down resources that were set up in dependency
+        order.
+    max_concurrent_threads: The maximum number of concurrent threads to allow.
+        Defaults as for RunThreaded.
+
+  Returns:
+    List of the same length as items. Contains the return value from each
+    threaded function call in the corresponding order as items.
+
+  Raises:
+    ValueError: when the dependencies contain a cycle.
+    errors.VmUtil.ThreadException: When an exception occurred in any of the
+        called functions. Calls for items that depend on an item whose call
+        raised an exception are not made.
+  """
+  indices = {id(item): index for index, item in enumerate(items)}
+  dependencies = [set() for _ in items]
+  for index, item in enumerate(items):
+    for dependency in get_dependencies(item):
+      dependency_index = indices.get(id(dependency))
+      if dependency_index is None or dependency_index == index:
+        continue
+      if reverse:
+        dependencies[dependency_index].add(index)
+      else:
+        dependencies[index].add(dependency_index)
+  _CheckForDependencyCycle(items, dependencies)
+  if not items:
+    return []
+  return _RunThreadedTasks(target, [(target, (item,), {}) for item in items],
+                           max_concurrent_threads, dependencies=dependencies)
+
+
+def _CheckForDependencyCycle(items, dependencies):
+  """Raises ValueError if the dependencies between items contain a cycle.
+
+  Args:
+    items: list of items.
+    dependencies: list of sets of indices, as passed to _RunParallelTasks.
+  """
+  remaining_dependency_counts = [len(d) for d in dependencies]
+  dependents = [[] for _ in items]
+  for index, task_dependencies in enumerate(dependencies):
+    for dependency in task_dependencies:
+      dependents[dependency].append(index)
+  ready_indices = [index for index, count
+                   in enumerate(remaining_dependency_counts) if not count]
+  visited_count = 0
+  while ready_indices:
+    index = ready_indices.pop()
+    visited_count += 1
+    for dependent in dependents[index]:
+      remaining_dependency_counts[dependent] -= 1
+      if not remaining_dependency_counts[dependent]:
+        ready_indices.append(dependent)
+  if visited_count != len(items):
+    raise ValueError('The dependencies of the following items contain a '
+                     'cycle: {0}'.format(', '.join(
+                         repr(items[index]) for index, count
+                         in enumerate(remaining_dependency_counts) if count)))
 
 
 def RunParallelProcesses(target_arg_tuples, max_concurrency):
@@ -17,23 +17,29 @@
 import contextlib
 import copy
 import copy_reg
+import hashlib
 import logging
 import os
 import pickle
+import pipes
 import thread
 import threading
 import uuid
 
+from perfkitbenchmarker import background_tasks
 from perfkitbenchmarker import context
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import event_loop
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import network
 from perfkitbenchmarker import os_types
 from perfkitbenchmarker import provider_info
 from perfkitbenchmarker import providers
 from perfkitbenchmarker import spark_service
 from perfkitbenchmarker import static_virtual_machine as static_vm
 from perfkitbenchmarker import virtual_machine
+from perfkitbenchmarker import vm_pool
 from perfkitbenchmarker import vm_util
 
 
@@ -73,6 +79,22 @@ flags.DEFINE_enum('benchmark_compatibility_checking', SUPPORTED,
                   ' declared not supported by the could provider. ' +
                   SKIP_CHECK + ' does not do the compatibility'
                   ' check. The default is ' + SUPPORTED)
+flags.DEFINE_integer('broadcast_seed_vms', 1,
+                     'Number of VMs that files broadcast to many VMs are '
+                     'copied to directly from this machine. The remaining '
+                     'VMs receive the file from other VMs.', lower_bound=1)
+
+# Files are read in blocks of this many bytes when computing their checksums.
+_CHECKSUM_BLOCK_SIZE = 1 << 20
+
+
+def _GetFileChecksum(path):
+  """Returns the hex MD5 digest of a local file."""
+  md5 = hashlib.md5()
+  with open(path, 'rb') as fp:
+    for block in iter(lambda: fp.read(_CHECKSUM_BLOCK_SIZE), ''):
+      md5.update(block)
+  return md5.hexdigest()
 
 
 class BenchmarkSpec(object):
@@ -160,7 +182,15 @@ class BenchmarkSpec(object):
         group_spec.vm_spec.zone = FLAGS.zones[zone_index]
         zone_index = (zone_index + 1 if zone_index < len(FLAGS.zones) - 1
                       else 0)
+      pool_key = vm_pool.GetPoolKey(cloud, os_type, group_spec.vm_spec,
+                                    disk_spec, disk_count)
+      vm = vm_pool.GetVmPool().LeaseVm(pool_key)
+      if vm:
+        vms.append(vm)
+        continue
       vm = self._CreateVirtualMachine(group_spec.vm_spec, os_type, cloud)
+      if not vm.is_static:
+        vm.pool_key = pool_key
       if disk_spec:
         vm.disk_specs = [copy.copy(disk_spec) for _ in xrange(disk_count)]
         # In the event that we need to create multiple disks from the same
@@ -246,58 +276,91 @@ class BenchmarkSpec(object):
     targets = [(vm.PrepareBackgroundWorkload, (), {}) for vm in self.vms]
     vm_util.RunParallelThreads(targets, len(targets))
 
+  def _GetResourceDependencies(self, resource):
+    """Returns the resources that must exist while the given one does.
+
+    Args:
+      resource: A network, firewall, VM or spark service of this spec.
+
+    Returns:
+      list of the resources that must be created before, and deleted after,
+      the given one.
+    """
+    if isinstance(resource, network.BaseFirewall):
+      # Firewall rules may refer to any of the networks.
+      return self.networks.values()
+    dependencies = list(resource.GetResourceDependencies())
+    if isinstance(resource, virtual_machine.BaseVirtualMachine):
+      if resource.network is None:
+        # The VM may still use networks that it does not keep a reference to.
+        dependencies.extend(self.networks.itervalues())
+      dependencies.extend(self.firewalls.itervalues())
+    return dependencies
+
+  def _CreateResource(self, resource):
+    """Creates a network, VM or spark service of this spec.
+
+    This is a coroutine (see event_loop), so that VMs do not each hold a
+    thread while they boot.
+    """
+    if isinstance(resource, virtual_machine.BaseVirtualMachine):
+      yield self.PrepareVmAsync(resource)
+    else:
+      yield event_loop.CallInThread(resource.Create)
+
+  def _DeleteResource(self, resource):
+    """Deletes a network, firewall, VM or spark service of this spec."""
+    try:
+      if isinstance(resource, virtual_machine.BaseVirtualMachine):
+        self.DeleteVm(resource)
+      elif isinstance(resource, network.BaseFirewall):
+        resource.DisallowAllPorts()
+      else:
+        resource.Delete()
+    except Exception:
+      logging.exception('Got an exception deleting %s. '
+                        'Attempting to continue tearing down.',
+                        type(resource).__name__)
+
   def Provision(self):
     """Prepares the VMs and networks necessary for the benchmark to run."""
-    # Sort networks into a guaranteed order of creation based on dict key.
-    # There is a finite limit on the number of threads that are created to
-    # provision networks. Until support is added to provision resources in an
-    # order based on dependencies, this key ordering can be used to avoid
-    # deadlock by placing dependent networks later and their dependencies
-    # earlier. As an example, AWS stores both per-region and per-zone objects
-    # in this dict, and each per-zone object depends on a corresponding
-    # per-region object, so the per-region objects are given keys that come
-    # first when sorted.
-    networks = [self.networks[key] for key in sorted(self.networks.iterkeys())]
-    vm_util.RunThreaded(lambda net: net.Create(), networks)
+    # Each resource is created as soon as the resources it depends on exist.
+    # For example, AWS stores both per-region and per-zone networks in
+    # self.networks, and each per-zone network waits only for its region's
+    # network, while VMs wait only for the network they are placed in.
+    resources = self.networks.values() + self.vms
+    if self.spark_service:
+      resources.append(self.spark_service)
+    background_tasks.RunThreadedInDependencyOrder(
+        self._CreateResource, resources, self._GetResourceDependencies)
 
     if self.vms:
-      vm_util.RunThreaded(self.PrepareVm, self.vms)
       sshable_vms = [vm for vm in self.vms if vm.OS_TYPE != os_types.WINDOWS]
       sshable_vm_groups = {}
       for group_name, group_vms in self.vm_groups.iteritems():
         sshable_vm_groups[group_name] = [vm for vm in group_vms
                                          if vm.OS_TYPE != os_types.WINDOWS]
       vm_util.GenerateSSHConfig(sshable_vms, sshable_vm_groups)
-    if self.spark_service:
-      self.spark_service.Create()
 
   def Delete(self):
     if self.deleted:
       return
 
+    # Resources are deleted in the reverse of their creation order: each one
+    # is deleted as soon as every resource that depends on it is gone.
+    resources = list(self.vms)
     if self.spark_service:
-      self.spark_service.Delete()
-
-    if self.vms:
-      try:
-        vm_util.RunThreaded(self.DeleteVm, self.vms)
-      except Exception:
-        logging.exception('Got an exception deleting VMs. '
-                          'Attempting to continue tearing down.')
-
-    for firewall in self.firewalls.itervalues():
-      try:
-        firewall.DisallowAllPorts()
-      except Exception:
-        logging.exception('Got an exception disabling firewalls. '
-                          'Attempting to continue tearing down.')
-
-    for net in self.networks.itervalues():
-      try:
-        net.Delete()
-      except Exception:
-        logging.exception('Got an exception deleting networks. '
-                          'Attempting to continue tearing down.')
+      resources.append(self.spark_service)
+    if FLAGS.reuse_vms:
+      # Pooled VMs may still depend on these networks and firewalls. The pool
+      # deletes them at the end of the run.
+      vm_pool.GetVmPool().AddNetworkResources(self.networks, self.firewalls)
+    else:
+      resources.extend(self.firewalls.itervalues())
+      resources.extend(self.networks.itervalues())
+    background_tasks.RunThreadedInDependencyOrder(
+        self._DeleteResource, resources, self._GetResourceDependencies,
+        reverse=True)
     self.deleted = True
 
   def StartBackgroundWorkload(self):
@@ -338,12 +401,34 @@ class BenchmarkSpec(object):
     Args:
         vm: The BaseVirtualMachine object representing the VM.
     """
+    event_loop.RunSynchronously(self.PrepareVmAsync(vm))
+
+  def PrepareVmAsync(self, vm):
+    """Coroutine version of PrepareVm. See event_loop.
+
+    The VM is created and set up in threads, and waits on the event loop
+    while it boots.
+
+    Args:
+        vm: The BaseVirtualMachine object representing the VM.
+    """
+    if vm.reused_from_pool:
+      yield event_loop.CallInThread(self._PrepareReusedVm, vm)
+      return
+    yield event_loop.CallInThread(self._CreateVm, vm)
+    yield vm.WaitForBootCompletionAsync()
+    yield event_loop.CallInThread(self._SetUpBootedVm, vm)
+
+  def _CreateVm(self, vm):
+    """Creates a VM and allows remote access to it."""
     vm.Create()
 
     logging.info('VM: %s', vm.ip_address)
     logging.info('Waiting for boot completion.')
     vm.AllowRemoteAccessPorts()
-    vm.WaitForBootCompletion()
+
+  def _SetUpBootedVm(self, vm):
+    """Prepares a VM that has booted, including its scratch disks."""
     vm.AddMetadata(benchmark=self.name, perfkit_uuid=self.uuid,
                    benchmark_uid=self.uid)
     vm.OnStartup()
@@ -356,17 +441,109 @@ class BenchmarkSpec(object):
     # Containerized VM case
     vm.PrepareVMEnvironment()
 
+  def _PrepareReusedVm(self, vm):
+    """Prepares a VM leased from the VM pool for use by this benchmark.
+
+    The VM and its scratch disks already exist, so only the per-benchmark
+    setup is repeated.
+
+    Args:
+        vm: The BaseVirtualMachine object representing the VM.
+    """
+    logging.info('VM: %s (reused)', vm.ip_address)
+    vm.AddMetadata(benchmark=self.name, perfkit_uuid=self.uuid,
+                   benchmark_uid=self.uid)
+    vm.OnStartup()
+    vm.PrepareVMEnvironment()
+
   def DeleteVm(self, vm):
     """Deletes a single vm and scratch disk if required.
 
+    If the VM can be reused by a later benchmark, it is returned to the VM
+    pool instead.
+
     Args:
         vm: The BaseVirtualMachine object representing the VM.
     """
     if vm.is_static and vm.install_packages:
       vm.PackageCleanup()
+    elif vm.pool_key is not None and vm_pool.GetVmPool().ReleaseVm(vm):
+      return
+    vm.CloseRemoteConnections()
     vm.Delete()
     vm.DeleteScratchDisks()
 
+  def BroadcastFile(self, source_path, remote_path, vms=None):
+    """Copies a local file to many VMs.
+
+    The file is pushed from this machine to only FLAGS.broadcast_seed_vms
+    VMs. In each following round, every VM that has the file copies it to a
+    VM that does not, which doubles the number of copies per round. A file
+    thus reaches N VMs in O(log N) rounds, without the uplink of this machine
+    becoming a bottleneck. Once every VM has the file, its checksum is
+    verified on each of them.
+
+    Args:
+      source_path: string. The location of the file on the LOCAL machine.
+      remote_path: string. The destination path of the file on each VM.
+      vms: list of BaseVirtualMachine objects to copy the file to. Defaults to
+          all of the VMs of the spec.
+
+    Raises:
+      errors.VirtualMachine.RemoteCommandError: If the file on a VM does not
+          match the local file, even after pushing it to that VM again.
+    """
+    vms = self.vms if vms is None else vms
+    # VM-to-VM copies and checksums rely on scp and md5sum on the VMs.
+    linux_vms = [vm for vm in vms if vm.OS_TYPE in os_types.LINUX_OS_TYPES]
+    other_vms = [vm for vm in vms if vm.OS_TYPE not in os_types.LINUX_OS_TYPES]
+
+    def _PushFile(vm):
+      vm.PushFile(source_path, remote_path)
+
+    holders = linux_vms[:FLAGS.broadcast_seed_vms]
+    pending = linux_vms[FLAGS.broadcast_seed_vms:]
+    background_tasks.RunThreaded(_PushFile, holders + other_vms)
+
+    def _CopyFile(source_vm, target_vm):
+      try:
+        source_vm.MoveFile(target_vm, remote_path, remote_path)
+      except errors.VirtualMachine.RemoteCommandError:
+        # The checksum verification pushes the file to the target directly.
+        logging.exception('Could not copy %s from %s to %s.', remote_path,
+                          source_vm.name, target_vm.name)
+
+    while pending:
+      copies = zip(holders, pending)
+      pending = pending[len(copies):]
+      background_tasks.RunThreaded(
+          _CopyFile, [(copy, {}) for copy in copies])
+      holders.extend(target_vm for _, target_vm in copies)
+
+    checksum = _GetFileChecksum(source_path)
+
+    def _HasFile(vm):
+      stdout, _ = vm.RemoteCommand('md5sum %s' % pipes.quote(remote_path),
+                                   ignore_failure=True, suppress_warning=True)
+      return stdout.split(' ', 1)[0] == checksum
+
+    def _GetVmsWithoutFile(vms):
+      has_file = background_tasks.RunThreaded(_HasFile, vms)
+      return [vm for vm, ok in zip(vms, has_file) if not ok]
+
+    missing_vms = _GetVmsWithoutFile(linux_vms)
+    if missing_vms:
+      logging.warning('%s does not match %s on %s. Pushing it again.',
+                      remote_path, source_path,
+                      ', '.join(vm.name for vm in missing_vms))
+      background_tasks.RunThreaded(_PushFile, missing_vms)
+      missing_vms = _GetVmsWithoutFile(missing_vms)
+      if missing_vms:
+        raise errors.VirtualMachine.RemoteCommandError(
+            '%s does not match %s on %s.' % (
+                remote_path, source_path,
+                ', '.join(vm.name for vm in missing_vms)))
+
   def PickleSpec(self):
     """Pickles the spec so that it can be unpickled on a subsequent run."""
     # Remove the config. It cannot be pickled because of an issue with how
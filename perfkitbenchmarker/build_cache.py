@@ -0,0 +1,167 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runner-side cache of packages that are compiled from source on VMs.
+
+Packages opt in by decorating the function that builds them with CachedBuild.
+With --build_cache, the first VM to install a package builds it as usual and
+publishes the build outputs to a cache on this machine. Every other VM with
+the same OS release, architecture and CPU unpacks the cached outputs instead of
+compiling the package again. The CPU is part of the key because builds may
+detect it and use its instruction set extensions, as OpenBLAS does for hpcc.
+The cache persists across runs.
+"""
+
+import collections
+import functools
+import hashlib
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import temp_dir
+from perfkitbenchmarker import vm_util
+
+flags.DEFINE_boolean('build_cache', False,
+                     'Whether packages that are compiled from source are '
+                     'built on one VM only, and copied from there to other '
+                     'VMs with the same OS release, architecture and CPU.')
+flags.DEFINE_string('build_cache_dir', None,
+                    'Directory in which build outputs are cached. Defaults to '
+                    'a directory under the PKB temporary directory.')
+
+FLAGS = flags.FLAGS
+
+_BUILDS_DIR = 'builds'
+
+# Prints the fields of the build key that depend on the VM: the OS release,
+# the architecture, and the model and instruction set extensions of the first
+# CPU. x86 CPUs report "model name" and "flags", ARM CPUs report "CPU part" and
+# "Features".
+_PLATFORM_COMMAND = (
+    '(. /etc/os-release && echo "$ID $VERSION_ID"); uname -m; '
+    'sed "/^$/q" /proc/cpuinfo | '
+    'grep -E "^(model name|flags|CPU implementer|CPU part|Features)\\s*:"')
+
+# Serializes builds with the same key, so that VMs that install a package at
+# the same time wait for the first one's build instead of compiling it too.
+_key_locks = collections.defaultdict(threading.Lock)
+_key_locks_lock = threading.Lock()
+
+
+def _GetCacheDir():
+  return (FLAGS.build_cache_dir or
+          os.path.join(temp_dir.GetArtifactDirPath(), _BUILDS_DIR))
+
+
+def _GetBuildKey(vm, package_name, version):
+  """Returns the key of a package build on a VM."""
+  platform, _ = vm.RemoteCommand(_PLATFORM_COMMAND)
+  key_fields = [package_name, version, vm.OS_TYPE] + platform.splitlines()
+  return hashlib.sha256('\n'.join(key_fields)).hexdigest()
+
+
+def _MakeDirs(path):
+  try:
+    os.makedirs(path)
+  except OSError:
+    if not os.path.isdir(path):
+      raise
+
+
+def _UnpackBuild(vm, local_path):
+  remote_path = posixpath.join(vm_util.VM_TMP_DIR,
+                               os.path.basename(local_path))
+  vm.PushFile(local_path, remote_path)
+  vm.RemoteCommand('tar -C / -xzf {0} && rm {0}'.format(remote_path))
+
+
+def _PublishBuild(vm, paths, local_path):
+  """Copies the build outputs at paths on a VM to local_path."""
+  remote_path = posixpath.join(vm_util.VM_TMP_DIR,
+                               os.path.basename(local_path))
+  relative_paths = ' '.join(path.lstrip('/') for path in paths)
+  vm.RemoteCommand('tar -C / -czf {0} {1}'.format(remote_path, relative_paths))
+  fd, download_path = tempfile.mkstemp(dir=os.path.dirname(local_path))
+  os.close(fd)
+  try:
+    vm.PullFile(download_path, remote_path)
+    os.rename(download_path, local_path)
+  finally:
+    if os.path.exists(download_path):
+      os.remove(download_path)
+    vm.RemoteCommand('rm -f %s' % remote_path)
+
+
+def CachedBuild(package_name, version, paths):
+  """Decorator for functions that build a package from source on a VM.
+
+  The decorated function accepts a VM, and must leave everything it builds
+  under paths. It must not install anything outside paths, such as packages
+  from the OS package manager; those must be installed separately.
+
+  Args:
+    package_name: string. Name of the package.
+    version: string. Identifies the sources and build configuration of the
+        package. Cached builds are only reused for the same version.
+    paths: list of strings. Absolute paths of the files and directories on
+        the VM that contain the build outputs.
+
+  Returns:
+    A decorator.
+  """
+  def Decorator(build_function):
+
+    def BuildAndPublish(vm, local_path):
+      build_function(vm)
+      try:
+        _MakeDirs(os.path.dirname(local_path))
+        _PublishBuild(vm, paths, local_path)
+      except (errors.VirtualMachine.RemoteCommandError, OSError):
+        logging.exception('Could not publish the build of %s to the build '
+                          'cache.', package_name)
+
+    @functools.wraps(build_function)
+    def Build(vm):
+      if not FLAGS.build_cache:
+        return build_function(vm)
+      key = _GetBuildKey(vm, package_name, version)
+      local_path = os.path.join(_GetCacheDir(), package_name,
+                                key + '.tar.gz')
+      with _key_locks_lock:
+        key_lock = _key_locks[key]
+      # The lock is only held to check for, build and publish the cached
+      # build, so that the VMs that find it unpack it concurrently.
+      with key_lock:
+        if not os.path.exists(local_path):
+          BuildAndPublish(vm, local_path)
+          return
+      try:
+        logging.info('Installing cached build of %s on %s.', package_name,
+                     vm.name)
+        _UnpackBuild(vm, local_path)
+        return
+      except errors.VirtualMachine.RemoteCommandError:
+        logging.exception('Could not install the cached build of %s. '
+                          'Building it instead.', package_name)
+      with key_lock:
+        BuildAndPublish(vm, local_path)
+
+    return Build
+
+  return Decorator
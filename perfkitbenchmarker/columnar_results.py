@@ -0,0 +1,280 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Columnar, compressed binary format for samples.
+
+Newline delimited JSON repeats the field names and metadata of every sample,
+and a reader has to parse all of it even to look at a single field. This
+format stores the samples column by column instead, so that a reader can skip
+the columns that it does not need.
+
+A file starts with MAGIC, followed by any number of row groups. Each row group
+holds a batch of samples and consists of:
+  * the length of its header, as a little-endian uint32.
+  * the header, a JSON object with keys "rows", the number of samples, and
+    "columns", a list of objects with keys "name", "encoding" and "length".
+  * for each column of the header, in order, "length" bytes of zlib
+    compressed data in the column's encoding.
+
+The encodings are:
+  * "float64": one little-endian double per row.
+  * "int64": one little-endian signed 64-bit integer per row.
+  * "dictionary": a little-endian uint32 length, then a JSON list of that many
+    bytes holding each distinct value of the column, then one little-endian
+    uint32 index into the list per row. Index 0xffffffff marks a row that does
+    not have the field.
+Fields such as the metric, unit and metadata take few distinct values, so
+dictionary encoding stores each distinct metadata dict once per row group.
+"""
+
+import json
+import struct
+import zlib
+
+MAGIC = b'PKBCOL\x01\n'
+
+_FLOAT64 = 'float64'
+_INT64 = 'int64'
+_DICTIONARY = 'dictionary'
+
+_HEADER_LENGTH = struct.Struct('<I')
+_DICTIONARY_LENGTH = struct.Struct('<I')
+_MISSING_CODE = 0xffffffff
+_INT64_RANGE = -(1 << 63), (1 << 63) - 1
+
+# Prefix of the names of virtual columns that hold a single metadata key,
+# e.g. "metadata.machine_type".
+_METADATA_PREFIX = 'metadata.'
+
+
+class _Missing(object):
+  """Marks a field that a sample does not have."""
+
+
+_MISSING = _Missing()
+
+
+def _GetEncoding(values):
+  """Returns the most compact encoding that can store a column's values."""
+  if all(type(value) is float for value in values):
+    return _FLOAT64
+  if all(type(value) in (int, long) and
+         _INT64_RANGE[0] <= value <= _INT64_RANGE[1] for value in values):
+    return _INT64
+  return _DICTIONARY
+
+
+def _EncodeDictionary(values):
+  distinct_values = []
+  codes = []
+  codes_by_key = {}
+  for value in values:
+    if value is _MISSING:
+      codes.append(_MISSING_CODE)
+      continue
+    # Values that serialize equally, such as equal metadata dicts, share an
+    # entry.
+    key = json.dumps(value, sort_keys=True)
+    code = codes_by_key.get(key)
+    if code is None:
+      code = codes_by_key[key] = len(distinct_values)
+      distinct_values.append(value)
+    codes.append(code)
+  encoded_values = json.dumps(distinct_values).encode('utf-8')
+  return b''.join((_DICTIONARY_LENGTH.pack(len(encoded_values)),
+                   encoded_values,
+                   struct.pack('<%dI' % len(codes), *codes)))
+
+
+def _EncodeColumn(values):
+  """Encodes the values of a column.
+
+  Args:
+    values: list. The value of the column for each row, or _MISSING.
+
+  Returns:
+    (encoding, data) tuple. The name of the encoding and the compressed data.
+  """
+  encoding = _GetEncoding(values)
+  if encoding == _FLOAT64:
+    data = struct.pack('<%dd' % len(values), *values)
+  elif encoding == _INT64:
+    data = struct.pack('<%dq' % len(values), *values)
+  else:
+    data = _EncodeDictionary(values)
+  return encoding, zlib.compress(data)
+
+
+def _DecodeColumn(encoding, data, row_count):
+  """Decodes the compressed data of a column.
+
+  Returns:
+    (values, codes) tuple. For dictionary encoded columns, values is the list
+    of distinct values and codes is the index of each row's value. Otherwise,
+    values is the list of the rows' values and codes is None.
+  """
+  data = zlib.decompress(data)
+  if encoding == _FLOAT64:
+    return list(struct.unpack('<%dd' % row_count, data)), None
+  elif encoding == _INT64:
+    return list(struct.unpack('<%dq' % row_count, data)), None
+  elif encoding == _DICTIONARY:
+    length, = _DICTIONARY_LENGTH.unpack_from(data)
+    start = _DICTIONARY_LENGTH.size
+    values = json.loads(data[start:start + length].decode('utf-8'))
+    codes = struct.unpack_from('<%dI' % row_count, data, start + length)
+    return values, codes
+  raise ValueError('Unknown column encoding: {0}'.format(encoding))
+
+
+def WriteRowGroup(fp, samples):
+  """Writes samples to a file as one row group.
+
+  The file's MAGIC is written first if the file is empty.
+
+  Args:
+    fp: File object opened in binary mode for writing or appending.
+    samples: Sequence of sample dicts.
+
+  Returns:
+    The number of samples written.
+  """
+  samples = list(samples)
+  if not samples:
+    return 0
+  # Appending does not move the position to the end until the first write.
+  fp.seek(0, 2)
+  if not fp.tell():
+    fp.write(MAGIC)
+  names = sorted(set().union(*samples))
+  columns = []
+  data = []
+  for name in names:
+    encoding, column_data = _EncodeColumn(
+        [sample.get(name, _MISSING) for sample in samples])
+    columns.append({'name': name, 'encoding': encoding,
+                    'length': len(column_data)})
+    data.append(column_data)
+  header = json.dumps({'rows': len(samples), 'columns': columns})
+  header = header.encode('utf-8')
+  fp.write(_HEADER_LENGTH.pack(len(header)))
+  fp.write(header)
+  for column_data in data:
+    fp.write(column_data)
+  return len(samples)
+
+
+def _ReadExactly(fp, size):
+  data = fp.read(size)
+  if len(data) != size:
+    raise ValueError('Truncated columnar results file: {0}'.format(fp.name))
+  return data
+
+
+def _ProjectMetadata(metadata_values, key):
+  return [_MISSING if metadata is _MISSING else metadata.get(key, _MISSING)
+          for metadata in metadata_values]
+
+
+def _ReadRowGroups(fp, names):
+  """Yields (row count, {name: values}) for each row group of a file.
+
+  Only the columns needed for names are decompressed. Rows without a field
+  have the value _MISSING.
+  """
+  if _ReadExactly(fp, len(MAGIC)) != MAGIC:
+    raise ValueError('Not a columnar results file: {0}'.format(fp.name))
+  while True:
+    header_length = fp.read(_HEADER_LENGTH.size)
+    if not header_length:
+      return
+    if len(header_length) != _HEADER_LENGTH.size:
+      raise ValueError('Truncated columnar results file: {0}'.format(fp.name))
+    header_length, = _HEADER_LENGTH.unpack(header_length)
+    header = json.loads(_ReadExactly(fp, header_length).decode('utf-8'))
+    row_count = header['rows']
+    stored_columns = {}
+    for column in header['columns']:
+      if names is None or column['name'] in names or (
+          column['name'] == 'metadata' and
+          any(name.startswith(_METADATA_PREFIX) for name in names)):
+        stored_columns[column['name']] = _DecodeColumn(
+            column['encoding'], _ReadExactly(fp, column['length']), row_count)
+      else:
+        fp.seek(column['length'], 1)
+    columns = {}
+    for name in stored_columns if names is None else names:
+      if name in stored_columns:
+        values, codes = stored_columns[name]
+      elif (name.startswith(_METADATA_PREFIX) and
+            'metadata' in stored_columns):
+        values, codes = stored_columns['metadata']
+        if codes is not None:
+          # Each distinct metadata dict is only looked at once.
+          values = _ProjectMetadata(values, name[len(_METADATA_PREFIX):])
+      else:
+        values, codes = [_MISSING] * row_count, None
+      if codes is not None:
+        values = [_MISSING if code == _MISSING_CODE else values[code]
+                  for code in codes]
+      columns[name] = values
+    yield row_count, columns
+
+
+def ReadColumns(path, names=None):
+  """Reads columns of a columnar results file.
+
+  Args:
+    path: string. Path of the file.
+    names: Optional sequence of strings. Names of the columns to read, such as
+        'metric' and 'value'. A name of the form 'metadata.<key>' reads the
+        value of that key of each sample's metadata. Defaults to all columns
+        stored in the file.
+
+  Returns:
+    A dict mapping each column name to a list with one value per sample in the
+    file. Samples that do not have a field have the value None.
+  """
+  names = None if names is None else list(names)
+  result = {} if names is None else {name: [] for name in names}
+  total_rows = 0
+  with open(path, 'rb') as fp:
+    for row_count, columns in _ReadRowGroups(fp, names):
+      for name in set(result).union(columns):
+        values = columns.get(name, [_MISSING] * row_count)
+        column = result.setdefault(name, [None] * total_rows)
+        column.extend(None if value is _MISSING else value
+                      for value in values)
+      total_rows += row_count
+  return result
+
+
+def ReadSamples(path, names=None):
+  """Reads the samples of a columnar results file.
+
+  Args:
+    path: string. Path of the file.
+    names: Optional sequence of strings. Names of the fields to read, as for
+        ReadColumns. Defaults to all fields.
+
+  Yields:
+    A dict for each sample, holding the sample's fields among names.
+  """
+  names = None if names is None else list(names)
+  with open(path, 'rb') as fp:
+    for row_count, columns in _ReadRowGroups(fp, names):
+      items = columns.items()
+      for index in xrange(row_count):
+        yield {name: values[index] for name, values in items
+               if values[index] is not _MISSING}
@@ -0,0 +1,192 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Client for the command agent that runs on VMs.
+
+The agent (perfkitbenchmarker/scripts/command_agent.py) is a long-running
+process on the VM that executes the commands it receives on stdin. Because
+every command is sent over the same connection, running a command costs a
+single round trip rather than starting a new ssh process and connection.
+"""
+
+import itertools
+import json
+import logging
+import subprocess
+import tempfile
+import threading
+
+from perfkitbenchmarker import errors
+
+# Threads waiting for a command to complete wake up at this interval. Waiting
+# with a timeout allows the wait to be interrupted by a KeyboardInterrupt.
+_WAIT_TIMEOUT = 1000.
+
+_STDOUT = 'stdout'
+_STDERR = 'stderr'
+
+
+class _PendingCommand(object):
+  """A command that has been sent to the agent and has not completed."""
+
+  def __init__(self):
+    self.output = {_STDOUT: [], _STDERR: []}
+    self.status = None
+    self.done = threading.Event()
+
+
+class _Connection(object):
+  """A running agent process and the commands sent to it."""
+
+  def __init__(self, process, stderr_file):
+    self.process = process
+    self.stderr_file = stderr_file
+    self.pending_commands = {}
+    self.closed = False
+
+
+class CommandAgentClient(object):
+  """Runs commands through a command agent.
+
+  The agent is started on first use, and is restarted if its connection is
+  lost. All methods may be called concurrently from multiple threads.
+  """
+
+  def __init__(self, agent_cmd):
+    """Initializes the CommandAgentClient.
+
+    Args:
+      agent_cmd: list of strings. Command that starts the agent, such as an
+          ssh command that runs the agent script on a VM. The agent must read
+          requests from the command's stdin and write responses to its stdout.
+    """
+    self._agent_cmd = agent_cmd
+    self._lock = threading.Lock()
+    self._connection = None
+    self._request_ids = itertools.count()
+
+  def __getstate__(self):
+    # The connection cannot be pickled. An unpickled client reconnects when it
+    # is first used.
+    return {'agent_cmd': self._agent_cmd}
+
+  def __setstate__(self, state):
+    self.__init__(state['agent_cmd'])
+
+  def _Connect(self):
+    """Starts the agent. Must be called while holding self._lock."""
+    logging.info('Starting command agent: %s', ' '.join(self._agent_cmd))
+    stderr_file = tempfile.TemporaryFile()
+    process = subprocess.Popen(self._agent_cmd, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=stderr_file,
+                               close_fds=True)
+    connection = _Connection(process, stderr_file)
+    reader = threading.Thread(target=self._ReadResponses, args=(connection,))
+    reader.daemon = True
+    reader.start()
+    return connection
+
+  def _ReadResponses(self, connection):
+    """Dispatches the agent's responses until its connection is closed."""
+    try:
+      for line in iter(connection.process.stdout.readline, ''):
+        response = json.loads(line)
+        with self._lock:
+          pending = connection.pending_commands.get(response['id'])
+          if pending and 'exit' in response:
+            del connection.pending_commands[response['id']]
+        if pending is None:
+          continue
+        if 'exit' in response:
+          pending.status = response['exit']
+          pending.done.set()
+        else:
+          pending.output[response['stream']].append(response['data'])
+    except Exception:
+      logging.exception('Could not read the response of the command agent.')
+    finally:
+      with self._lock:
+        connection.closed = True
+        if self._connection is connection:
+          self._connection = None
+        pending_commands = connection.pending_commands.values()
+        connection.pending_commands = {}
+      returncode = connection.process.wait()
+      if pending_commands:
+        connection.stderr_file.seek(0)
+        logging.warning('The command agent exited with status %s while '
+                        'running %d commands. STDERR: %s', returncode,
+                        len(pending_commands), connection.stderr_file.read())
+      connection.stderr_file.close()
+      for pending in pending_commands:
+        pending.done.set()
+
+  def RunCommand(self, command, timeout=None):
+    """Runs a command through the agent and waits for it to complete.
+
+    Args:
+      command: string. The command to run.
+      timeout: Timeout for the command in seconds, or None to let the command
+          run indefinitely. The command is killed when the timeout is reached.
+
+    Returns:
+      A tuple of stdout, stderr, and the exit status of the command. stdout
+      and stderr are UTF-8 encoded strs, like the output of ssh commands.
+
+    Raises:
+      errors.VirtualMachine.CommandAgentSendError: If the command could not be
+          sent to the agent.
+      errors.VirtualMachine.CommandAgentError: If the connection to the agent
+          is lost after the command was sent, but before it completed.
+    """
+    pending = _PendingCommand()
+    request = {'command': command, 'timeout': timeout}
+    with self._lock:
+      try:
+        if self._connection is None:
+          self._connection = self._Connect()
+      except OSError as e:
+        raise errors.VirtualMachine.CommandAgentSendError(
+            'Could not start the command agent: %s' % e)
+      connection = self._connection
+      request['id'] = next(self._request_ids)
+      connection.pending_commands[request['id']] = pending
+      try:
+        connection.process.stdin.write(json.dumps(request) + '\n')
+        connection.process.stdin.flush()
+      except IOError as e:
+        del connection.pending_commands[request['id']]
+        raise errors.VirtualMachine.CommandAgentSendError(
+            'Could not send command to the command agent: %s' % e)
+    while not pending.done.wait(_WAIT_TIMEOUT):
+      pass
+    if pending.status is None:
+      raise errors.VirtualMachine.CommandAgentError(
+          'The connection to the command agent was lost while running '
+          '"%s".' % command)
+    return (u''.join(pending.output[_STDOUT]).encode('utf-8'),
+            u''.join(pending.output[_STDERR]).encode('utf-8'), pending.status)
+
+  def Close(self):
+    """Stops the agent, if it is running.
+
+    Commands that are still running are abandoned.
+    """
+    with self._lock:
+      connection, self._connection = self._connection, None
+      if connection and not connection.closed:
+        try:
+          connection.process.stdin.close()
+        except IOError:
+          pass
@@ -40,6 +40,14 @@ class Setup(object):
     """Error raised when the given run_uri is invalid."""
     pass
 
+  class InvalidFlagConfigurationError(Error):
+    """Error raised when the set of command-line flags is invalid."""
+    pass
+
+  class ArtifactDownloadError(Error):
+    """Error raised when a file cannot be downloaded to the artifact cache."""
+    pass
+
 
 class VirtualMachine(object):
   """Errors raised by virtual_machine.py."""
@@ -51,6 +59,18 @@ class VirtualMachine(object):
   class RemoteExceptionError(Error):
     pass
 
+  class CommandAgentError(Error):
+    """Error raised when the connection to a VM's command agent fails."""
+    pass
+
+  class CommandAgentSendError(CommandAgentError):
+    """Error raised when a command could not be sent to a VM's command agent.
+
+    The agent never received the command, so it is safe to run it again by
+    other means.
+    """
+    pass
+
   class AuthError(Error):
     """Error raised when one VM cannot access another VM."""
     pass
@@ -149,6 +169,10 @@ class Benchmarks(object):
 class Resource(object):
   """Errors related to resource creation and deletion."""
 
+  class CreationError(Error):
+    """The resource failed to be created, and waiting for it is futile."""
+    pass
+
   class RetryableCreationError(Error):
     pass
 
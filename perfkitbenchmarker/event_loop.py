@@ -0,0 +1,625 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs many subprocess-bound tasks concurrently on a single thread.
+
+Provisioning steps such as waiting for a VM to boot spend nearly all of their
+time waiting for CLI or ssh subprocesses. Run with RunThreaded, each of them
+holds a thread for as long as it waits, which caps the number of VMs that one
+runner can handle. The event loop instead runs such steps as coroutines, and
+waits for all of their subprocesses and timers on one thread.
+
+A coroutine is a generator function that yields the operations it waits for,
+and is resumed with their results:
+
+  def WaitForFile(vm, path):
+    while True:
+      _, _, retcode = yield event_loop.Command(vm.GetSshCommand(path))
+      if not retcode:
+        raise event_loop.Return(path)
+      yield event_loop.Sleep(1)
+
+The operations are Command, Sleep and CallInThread. The latter runs blocking
+Python code on a bounded pool of threads. A coroutine may also yield another
+coroutine's generator to run it to completion and receive its result. Python 2
+generators cannot return values, so coroutines raise Return instead.
+
+background_tasks.RunThreaded and RunThreadedInDependencyOrder run generator
+functions on the event loop, and propagate the thread context of the caller to
+each coroutine as they do to threads. Changes that a coroutine makes to its
+thread context, such as extending the log context, do not persist across
+yields.
+"""
+
+import collections
+import errno
+import heapq
+import itertools
+import logging
+import os
+import Queue
+import select
+import subprocess
+import sys
+import threading
+import time
+import types
+
+from perfkitbenchmarker import rate_limiter
+
+DEFAULT_TIMEOUT = 300
+
+# The maximum number of threads that run blocking code for CallInThread.
+MAX_BLOCKING_THREADS = 200
+
+# Commands' output is read in blocks of up to this many bytes.
+_READ_SIZE = 1 << 16
+# A command whose output has been read is checked for exit at this interval.
+_EXIT_POLL_INTERVAL = 0.01
+_WAKEUP_BYTE = 'x'
+
+
+class Return(Exception):
+  """Raised by a coroutine to return a value."""
+
+  def __init__(self, value=None):
+    super(Return, self).__init__(value)
+    self.value = value
+
+
+def IsSupported():
+  """Returns whether the event loop can run on this platform.
+
+  The loop waits for subprocesses with select.poll, which Windows lacks.
+  """
+  return hasattr(select, 'poll')
+
+
+class _Operation(object):
+  """Base class for the operations that coroutines yield."""
+
+  def Start(self, task):
+    """Starts the operation on the event loop.
+
+    Called on the loop thread. When the operation completes, it must call
+    task.Resume exactly once, from any thread, unless it is cancelled first.
+
+    Args:
+      task: _Task. The task of the coroutine that yielded the operation.
+    """
+    raise NotImplementedError()
+
+  def Cancel(self):
+    """Stops the operation early. Called on the loop thread."""
+    pass
+
+  def RunBlocking(self):
+    """Runs the operation on the current thread and returns its result."""
+    raise NotImplementedError()
+
+
+class Sleep(_Operation):
+  """Waits for a number of seconds."""
+
+  def __init__(self, seconds):
+    self._seconds = seconds
+    self._timer = None
+    self._loop = None
+
+  def Start(self, task):
+    self._loop = task.loop
+    self._timer = task.loop.CallLater(self._seconds, task.Resume, None, None)
+
+  def Cancel(self):
+    self._loop.CancelTimer(self._timer)
+
+  def RunBlocking(self):
+    time.sleep(self._seconds)
+
+
+class CallInThread(_Operation):
+  """Calls a function on the event loop's thread pool.
+
+  The result is the function's return value. The function runs with the
+  thread context of the coroutine, and may block. It cannot be cancelled, so a
+  task that is cancelled during the call is not done until the function has
+  returned.
+  """
+
+  def __init__(self, function, *args, **kwargs):
+    self._function = function
+    self._args = args
+    self._kwargs = kwargs
+
+  def Start(self, task):
+    task.RunInThread(self._Call)
+
+  def _Call(self):
+    return self._function(*self._args, **self._kwargs)
+
+  def RunBlocking(self):
+    return self._Call()
+
+
+class Command(_Operation):
+  """Runs a command without blocking a thread.
+
+  The result is a (stdout, stderr, retcode) tuple, and the command is rate
+  limited and logged, as with vm_util.IssueCommand.
+  """
+
+  def __init__(self, cmd, env=None, timeout=DEFAULT_TIMEOUT,
+               force_info_log=False, suppress_warning=False):
+    """Initializes the Command.
+
+    Args:
+      cmd: A list of strings such as is given to the subprocess.Popen()
+          constructor.
+      env: A dict of environment variables for the command, or None to inherit
+          them.
+      timeout: Timeout for the command in seconds, or None for no timeout. A
+          command that has not finished before the timeout is killed.
+      force_info_log: A boolean indicating whether the command result should
+          always be logged at the info level.
+      suppress_warning: A boolean indicating whether the results should not be
+          logged at the info level in the event of a non-zero return code.
+    """
+    self._cmd = cmd
+    self._full_cmd = ' '.join(cmd)
+    self._env = env
+    self._timeout = timeout
+    self._force_info_log = force_info_log
+    self._suppress_warning = suppress_warning
+    self._rate_limit = None
+    self._process = None
+    self._task = None
+    self._timers = []
+    self._outputs = {}
+
+  def _Popen(self, **kwargs):
+    logging.info('Running: %s', self._full_cmd)
+    return subprocess.Popen(self._cmd, env=self._env, shell=os.name == 'nt',
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, **kwargs)
+
+  def _Kill(self):
+    logging.error('Command timed out after %d seconds. Killing command "%s".',
+                  self._timeout, self._full_cmd)
+    self._process.kill()
+
+  def _Finish(self, stdout, stderr):
+    """Reports and logs the result of the command, and returns it."""
+    stdout = stdout.decode('ascii', 'ignore')
+    stderr = stderr.decode('ascii', 'ignore')
+    retcode = self._process.returncode
+    if self._rate_limit:
+      rate_limiter.ReportResult(self._rate_limit, retcode, stderr)
+    debug_text = ('Ran %s. Got return code (%s).\nSTDOUT: %s\nSTDERR: %s' %
+                  (self._full_cmd, retcode, stdout, stderr))
+    if self._force_info_log or (retcode and not self._suppress_warning):
+      logging.info(debug_text)
+    else:
+      logging.debug(debug_text)
+    return stdout, stderr, retcode
+
+  def RunBlocking(self):
+    self._rate_limit, wait_time = rate_limiter.Reserve(self._cmd)
+    if wait_time:
+      time.sleep(wait_time)
+    self._process = self._Popen()
+    timer = None
+    if self._timeout is not None:
+      timer = threading.Timer(self._timeout, self._Kill)
+      timer.start()
+    try:
+      stdout, stderr = self._process.communicate()
+    finally:
+      if timer:
+        timer.cancel()
+    return self._Finish(stdout, stderr)
+
+  def Start(self, task):
+    self._task = task
+    self._rate_limit, wait_time = rate_limiter.Reserve(self._cmd)
+    if wait_time:
+      self._timers.append(task.loop.CallLater(wait_time, self._Spawn))
+    else:
+      self._Spawn()
+
+  def _Spawn(self):
+    loop = self._task.loop
+    try:
+      self._process = self._Popen(close_fds=True)
+    except OSError:
+      self._task.Resume(None, sys.exc_info())
+      return
+    # Closing stdin gives the command an immediate EOF instead of a pipe that
+    # nothing ever writes to.
+    self._process.stdin.close()
+    for stream in (self._process.stdout, self._process.stderr):
+      self._outputs[stream] = []
+      loop.AddReader(stream.fileno(), self._MakeReader(stream))
+    if self._timeout is not None:
+      self._timers.append(loop.CallLater(self._timeout, self._Kill))
+
+  def _MakeReader(self, stream):
+    def _Read(unused_events):
+      if stream.closed:
+        # The command was cancelled by an earlier callback.
+        return
+      data = os.read(stream.fileno(), _READ_SIZE)
+      if data:
+        self._outputs[stream].append(data)
+        return
+      self._task.loop.RemoveReader(stream.fileno())
+      stream.close()
+      if self._process.stdout.closed and self._process.stderr.closed:
+        self._AwaitExit()
+    return _Read
+
+  def _AwaitExit(self):
+    if self._process.poll() is None:
+      self._timers.append(
+          self._task.loop.CallLater(_EXIT_POLL_INTERVAL, self._AwaitExit))
+      return
+    for timer in self._timers:
+      self._task.loop.CancelTimer(timer)
+    # Other tasks may have run on the loop thread since this one yielded.
+    self._task.thread_context.CopyToCurrentThread()
+    try:
+      result = self._Finish(''.join(self._outputs[self._process.stdout]),
+                            ''.join(self._outputs[self._process.stderr]))
+    except Exception:
+      self._task.Resume(None, sys.exc_info())
+    else:
+      self._task.Resume(result, None)
+
+  def Cancel(self):
+    loop = self._task.loop
+    for timer in self._timers:
+      loop.CancelTimer(timer)
+    if self._process is None:
+      return
+    for stream in (self._process.stdout, self._process.stderr):
+      if not stream.closed:
+        loop.RemoveReader(stream.fileno())
+        stream.close()
+    if self._process.poll() is None:
+      self._process.kill()
+
+
+def _CheckOperation(yielded):
+  if not isinstance(yielded, _Operation):
+    raise TypeError('Coroutines must yield operations or generators, not %r.'
+                    % (yielded,))
+  return yielded
+
+
+def RunSynchronously(coroutine):
+  """Runs a coroutine to completion on the current thread.
+
+  Each operation that the coroutine yields blocks the thread until it
+  completes, so this does not require the event loop.
+
+  Args:
+    coroutine: generator. The coroutine to run.
+
+  Returns:
+    The value that the coroutine returned with Return, or None.
+  """
+  value, exc_info = None, None
+  while True:
+    try:
+      if exc_info:
+        yielded = coroutine.throw(*exc_info)
+      else:
+        yielded = coroutine.send(value)
+    except StopIteration:
+      return None
+    except Return as e:
+      return e.value
+    try:
+      if isinstance(yielded, types.GeneratorType):
+        value = RunSynchronously(yielded)
+      else:
+        value = _CheckOperation(yielded).RunBlocking()
+      exc_info = None
+    except Exception:
+      value, exc_info = None, sys.exc_info()
+
+
+class _Task(object):
+  """A coroutine running on the event loop.
+
+  Attributes:
+    loop: EventLoop. The loop that runs the task.
+    thread_context: The thread context of the task, as passed to
+        EventLoop.Start.
+    done: boolean. Whether the task has completed or was cancelled, and no
+        function that it called on the loop's thread pool is still running.
+  """
+
+  def __init__(self, loop, coroutine, thread_context, callback):
+    self.loop = loop
+    self.thread_context = thread_context
+    self._completed = False
+    self._calling_in_thread = False
+    self._callback = callback
+    # The coroutine, followed by the coroutines that it is waiting for.
+    self._stack = [coroutine]
+    self._operation = None
+
+  @property
+  def done(self):
+    return self._completed and not self._calling_in_thread
+
+  def Resume(self, value, exc_info):
+    """Resumes the task with the result of its operation. Thread-safe."""
+    self.loop.CallSoon(self._Step, value, exc_info)
+
+  def RunInThread(self, function):
+    """Calls a function on the loop's thread pool, resuming with its result."""
+    self._calling_in_thread = True
+
+    def _Callback(value, exc_info):
+      self._calling_in_thread = False
+      self.Resume(value, exc_info)
+
+    self.loop.RunInThread(self.thread_context, function, _Callback)
+
+  def Cancel(self):
+    """Stops the task. Thread-safe.
+
+    The task's pending operation is cancelled, its coroutines are closed, and
+    its callback receives a KeyboardInterrupt. A function that the task is
+    calling on the loop's thread pool keeps running until it returns.
+    """
+    self.loop.CallSoon(self._Cancel)
+
+  def _Cancel(self):
+    if self._completed:
+      return
+    if self._operation:
+      self._operation.Cancel()
+    while self._stack:
+      try:
+        self._stack.pop().close()
+      except Exception:
+        logging.exception('Got an exception closing a cancelled coroutine.')
+    self._Complete(None, (KeyboardInterrupt, KeyboardInterrupt(), None))
+
+  def _Complete(self, value, exc_info):
+    self._completed = True
+    self._callback(value, exc_info)
+
+  def _Step(self, value=None, exc_info=None):
+    """Runs the coroutine until it waits for an operation or completes."""
+    if self._completed:
+      return
+    self._operation = None
+    self.thread_context.CopyToCurrentThread()
+    while True:
+      try:
+        if exc_info:
+          yielded = self._stack[-1].throw(*exc_info)
+        else:
+          yielded = self._stack[-1].send(value)
+      except StopIteration:
+        value, exc_info = None, None
+      except Return as e:
+        value, exc_info = e.value, None
+      except Exception:
+        value, exc_info = None, sys.exc_info()
+      else:
+        value, exc_info = None, None
+        if isinstance(yielded, types.GeneratorType):
+          self._stack.append(yielded)
+          continue
+        try:
+          self._operation = _CheckOperation(yielded)
+          self._operation.Start(self)
+          return
+        except Exception:
+          self._operation = None
+          exc_info = sys.exc_info()
+          continue
+      # The innermost coroutine has completed, so its result is passed to the
+      # coroutine that was waiting for it.
+      self._stack.pop()
+      if not self._stack:
+        self._Complete(value, exc_info)
+        return
+
+
+class _ThreadPool(object):
+  """Threads that run the blocking calls of CallInThread."""
+
+  def __init__(self, max_threads):
+    self._max_threads = max_threads
+    self._queue = Queue.Queue()
+    self._lock = threading.Lock()
+    self._thread_count = 0
+    self._idle_count = 0
+
+  def Submit(self, function, *args):
+    with self._lock:
+      if not self._idle_count and self._thread_count < self._max_threads:
+        self._thread_count += 1
+        self._idle_count += 1
+        thread = threading.Thread(target=self._Work)
+        thread.daemon = True
+        thread.start()
+    self._queue.put((function, args))
+
+  def _Work(self):
+    while True:
+      function, args = self._queue.get()
+      with self._lock:
+        self._idle_count -= 1
+      try:
+        function(*args)
+      finally:
+        with self._lock:
+          self._idle_count += 1
+
+
+class EventLoop(object):
+  """Runs coroutines on a dedicated daemon thread.
+
+  Only Start, CallSoon and the methods of the returned tasks may be called
+  from other threads. The other methods are for operations, which run on the
+  loop thread.
+  """
+
+  def __init__(self, max_blocking_threads=MAX_BLOCKING_THREADS):
+    self._lock = threading.Lock()
+    self._callbacks = collections.deque()
+    # Heap of [deadline, sequence number, callback, args] lists. Cancelled
+    # timers stay in the heap with a callback of None.
+    self._timers = []
+    self._timer_sequence = itertools.count()
+    self._readers = {}
+    self._poller = select.poll()
+    self._wakeup_read_fd, self._wakeup_write_fd = os.pipe()
+    self._wakeup_pending = False
+    self._poller.register(self._wakeup_read_fd, select.POLLIN)
+    self._thread_pool = _ThreadPool(max_blocking_threads)
+    self._thread = threading.Thread(target=self._Run, name='EventLoop')
+    self._thread.daemon = True
+    self._thread.start()
+
+  def Start(self, coroutine, thread_context, callback):
+    """Starts running a coroutine.
+
+    Args:
+      coroutine: generator. The coroutine to run.
+      thread_context: An object whose CopyToCurrentThread method sets up the
+          thread context in which the coroutine and its CallInThread calls
+          run, such as a background_tasks._BackgroundTaskThreadContext.
+      callback: Function called on the loop thread when the coroutine
+          completes. It is passed the value that the coroutine returned, and
+          the sys.exc_info() tuple of the exception that it raised, or None.
+          It must not block.
+
+    Returns:
+      _Task. Its Cancel method stops the coroutine.
+    """
+    task = _Task(self, coroutine, thread_context, callback)
+    self.CallSoon(task._Step)
+    return task
+
+  def CallSoon(self, callback, *args):
+    """Calls a function on the loop thread. Thread-safe."""
+    with self._lock:
+      self._callbacks.append((callback, args))
+      wake = (not self._wakeup_pending and
+              threading.current_thread() is not self._thread)
+      self._wakeup_pending = self._wakeup_pending or wake
+    if wake:
+      os.write(self._wakeup_write_fd, _WAKEUP_BYTE)
+
+  def CallLater(self, delay, callback, *args):
+    """Calls a function on the loop thread after a delay.
+
+    Returns:
+      A timer that can be passed to CancelTimer.
+    """
+    timer = [time.time() + delay, next(self._timer_sequence), callback, args]
+    heapq.heappush(self._timers, timer)
+    return timer
+
+  def CancelTimer(self, timer):
+    timer[2] = None
+
+  def AddReader(self, fd, callback):
+    """Calls a function with the poll events when fd is readable or closed."""
+    self._readers[fd] = callback
+    self._poller.register(fd, select.POLLIN)
+
+  def RemoveReader(self, fd):
+    del self._readers[fd]
+    self._poller.unregister(fd)
+
+  def RunInThread(self, thread_context, function, callback):
+    """Calls a function on the thread pool.
+
+    Args:
+      thread_context: The thread context to run the function in. See Start.
+      function: The function to call without arguments.
+      callback: Function called with the function's return value and the
+          sys.exc_info() tuple of the exception that it raised, or None. It is
+          called on the pool thread.
+    """
+    def _Call():
+      thread_context.CopyToCurrentThread()
+      try:
+        value = function()
+      except Exception:
+        callback(None, sys.exc_info())
+      else:
+        callback(value, None)
+    self._thread_pool.Submit(_Call)
+
+  def _GetPollTimeout(self):
+    """Returns the number of milliseconds until the next timer, or None."""
+    while self._timers and self._timers[0][2] is None:
+      heapq.heappop(self._timers)
+    if not self._timers:
+      return None
+    return max(0, int((self._timers[0][0] - time.time()) * 1000) + 1)
+
+  def _Run(self):
+    while True:
+      with self._lock:
+        timeout = 0 if self._callbacks else self._GetPollTimeout()
+      try:
+        events = self._poller.poll(timeout)
+      except select.error as e:
+        if e.args[0] == errno.EINTR:
+          continue
+        raise
+      callbacks = []
+      for fd, fd_events in events:
+        if fd == self._wakeup_read_fd:
+          with self._lock:
+            self._wakeup_pending = False
+            os.read(self._wakeup_read_fd, 1)
+        elif fd in self._readers:
+          callbacks.append((self._readers[fd], (fd_events,)))
+      now = time.time()
+      while self._timers and self._timers[0][0] <= now:
+        _, _, callback, args = heapq.heappop(self._timers)
+        if callback is not None:
+          callbacks.append((callback, args))
+      with self._lock:
+        callbacks.extend(self._callbacks)
+        self._callbacks.clear()
+      for callback, args in callbacks:
+        try:
+          callback(*args)
+        except Exception:
+          logging.exception('Got an exception in an event loop callback.')
+
+
+_event_loop = None
+_event_loop_lock = threading.Lock()
+
+
+def GetEventLoop():
+  """Returns the process-wide EventLoop, starting it if needed."""
+  global _event_loop
+  with _event_loop_lock:
+    if _event_loop is None:
+      _event_loop = EventLoop()
+    return _event_loop
@@ -62,3 +62,14 @@ The sample's metadata is mutable, and may be updated by the subscriber.
 
 Sender: None
 Payload: benchmark_spec (BenchmarkSpec), sample (dict).""")
+
+samples_created = _events.signal('samples-created', doc="""
+Called with the samples added to a publisher together and benchmark spec.
+
+Signal sent after sample_created has been sent for each sample of a batch,
+such as the samples of a benchmark's run phase, and before the samples are
+stored. The samples' metadata is mutable, and may be updated by the
+subscriber.
+
+Sender: None
+Payload: benchmark_spec (BenchmarkSpec), samples (list of dicts).""")
@@ -14,8 +14,10 @@
 
 """Utility functions for working with user-supplied flags."""
 
+import copy
 import logging
 import re
+import threading
 
 import yaml
 
@@ -198,8 +200,81 @@ def DEFINE_integerlist(name, default, help, on_nonincreasing=None,
   flags.DEFINE(parser, name, default, help, flag_values, serializer, **kwargs)
 
 
+class _FlagDictSubstitutionThreadData(threading.local):
+  def __init__(self):
+    self.substitutions = []
+
+
+_thread_local = _FlagDictSubstitutionThreadData()
+
+# Maps the id of each FlagValues object with at least one active
+# FlagDictSubstitution to an (original_flagdict, active_substitutions) pair.
+# original_flagdict is the FlagDict instance attribute that was present before
+# the first substitution began, or None if there was no instance attribute.
+_substituted_flag_values = {}
+_substitution_lock = threading.Lock()
+
+
+def GetThreadFlagDictSubstitutions():
+  """Gets the FlagDictSubstitutions that apply to the current thread.
+
+  Returns:
+    list of FlagDictSubstitution objects, from outermost to innermost.
+  """
+  return _thread_local.substitutions
+
+
+def SetThreadFlagDictSubstitutions(substitutions):
+  """Sets the FlagDictSubstitutions that apply to the current thread.
+
+  Used to propagate flag redirection from a parent thread to a child thread.
+
+  Args:
+    substitutions: list of FlagDictSubstitution objects, from outermost to
+        innermost.
+  """
+  _thread_local.substitutions = substitutions
+
+
+class _SubstitutedFlagDict(object):
+  """Replaces the FlagDict method of a FlagValues with active substitutions.
+
+  The innermost substitution that applies to the current thread takes
+  precedence. Threads without a substitution of their own fall back to the most
+  recently entered substitution of any thread.
+  """
+
+  def __init__(self, flag_values):
+    self._flag_values = flag_values
+
+  def _GetSubstitute(self):
+    for substitution in reversed(_thread_local.substitutions):
+      if substitution._flags is self._flag_values:
+        return substitution._substitute
+    state = _substituted_flag_values.get(id(self._flag_values))
+    if state:
+      active_substitutions = state[1][:]
+      if active_substitutions:
+        return active_substitutions[-1]._substitute
+    return type(self._flag_values).FlagDict.__get__(self._flag_values)
+
+  def __call__(self):
+    return self._GetSubstitute()()
+
+  def __deepcopy__(self, memo):
+    # A copy of the FlagValues is bound to the flag dict that the copying
+    # thread currently uses.
+    return copy.deepcopy(self._GetSubstitute(), memo)
+
+
 class FlagDictSubstitution(object):
-  """Context manager that redirects flag reads and writes."""
+  """Context manager that redirects flag reads and writes.
+
+  Substitutions are tracked per thread, so several threads (e.g. benchmarks
+  running in parallel) can each redirect the same FlagValues object to a
+  different flag dict. Threads started via background_tasks inherit the
+  substitutions of their parent thread.
+  """
 
   def __init__(self, flag_values, substitute):
     """Initializes a FlagDictSubstitution.
@@ -216,12 +291,30 @@ class FlagDictSubstitution(object):
 
   def __enter__(self):
     """Begins the flag substitution."""
-    self._original_flagdict = self._flags.FlagDict
-    self._flags.__dict__['FlagDict'] = self._substitute
+    flag_values = self._flags
+    with _substitution_lock:
+      state = _substituted_flag_values.get(id(flag_values))
+      if state is None:
+        state = (flag_values.__dict__.get('FlagDict'), [])
+        _substituted_flag_values[id(flag_values)] = state
+        flag_values.__dict__['FlagDict'] = _SubstitutedFlagDict(flag_values)
+      state[1].append(self)
+    _thread_local.substitutions = _thread_local.substitutions + [self]
 
   def __exit__(self, *unused_args, **unused_kwargs):
     """Stops the flag substitution."""
-    self._flags.__dict__['FlagDict'] = self._original_flagdict
+    _thread_local.substitutions = [s for s in _thread_local.substitutions
+                                   if s is not self]
+    with _substitution_lock:
+      original_flagdict, active_substitutions = _substituted_flag_values[
+          id(self._flags)]
+      active_substitutions.remove(self)
+      if not active_substitutions:
+        del _substituted_flag_values[id(self._flags)]
+        if original_flagdict is None:
+          del self._flags.__dict__['FlagDict']
+        else:
+          self._flags.__dict__['FlagDict'] = original_flagdict
 
 
 class UnitsParser(flags.ArgumentParser):
@@ -31,6 +31,13 @@ All functions in each package module should be prefixed with the type of package
 manager, and all functions should accept a BaseVirtualMachine object as their
 only arguments.
 
+Packages may also declare, as module attributes, the OS packages that their
+install functions install (APT_PACKAGES and YUM_PACKAGES, each a string as
+given to vm.InstallPackages), and the names of the PerfKit packages that they
+install (DEPENDENCIES). vm.InstallAll uses them to install all of the declared
+OS packages in one transaction, and to install independent PerfKit packages in
+parallel.
+
 See perfkitbenchmarker/package_managers.py for more information on how to use
 packages in benchmarks.
 """
@@ -15,12 +15,15 @@
 
 """Module containing Autoconf installation and cleanup functions."""
 
+YUM_PACKAGES = 'autoconf'
+APT_PACKAGES = 'autoconf'
+
 
 def YumInstall(vm):
   """Installs the Autoconf package on the VM."""
-  vm.InstallPackages('autoconf')
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs the Autoconf package on the VM."""
-  vm.InstallPackages('autoconf')
+  vm.InstallPackages(APT_PACKAGES)
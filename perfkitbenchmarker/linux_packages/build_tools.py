@@ -15,6 +15,8 @@
 
 """Module containing build tools installation and cleanup functions."""
 
+APT_PACKAGES = 'build-essential git libtool autoconf automake'
+
 
 def YumInstall(vm):
   """Installs build tools on the VM."""
@@ -23,4 +25,4 @@ def YumInstall(vm):
 
 def AptInstall(vm):
   """Installs build tools on the VM."""
-  vm.InstallPackages('build-essential git libtool autoconf automake')
+  vm.InstallPackages(APT_PACKAGES)
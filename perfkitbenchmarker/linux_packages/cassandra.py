@@ -24,6 +24,7 @@ import os
 import posixpath
 import time
 
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
@@ -79,9 +80,9 @@ def _Install(vm):
           CASSANDRA_VERSION,
           ANT_HOME_DIR))
   # Add JNA
-  vm.RemoteCommand('cd {0} && curl -LJO {1}'.format(
-      posixpath.join(CASSANDRA_DIR, 'lib'),
-      JNA_JAR_URL))
+  artifact_cache.DownloadToVm(
+      vm, JNA_JAR_URL, posixpath.join(CASSANDRA_DIR, 'lib',
+                                      posixpath.basename(JNA_JAR_URL)))
 
 
 def YumInstall(vm):
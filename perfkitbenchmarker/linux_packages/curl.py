@@ -15,17 +15,15 @@
 
 """Module containing curl installation and cleanup functions."""
 
-
-def _Install(vm):
-  """Installs the curl package on the VM."""
-  vm.InstallPackages('curl')
+YUM_PACKAGES = 'curl'
+APT_PACKAGES = 'curl'
 
 
 def YumInstall(vm):
   """Installs the curl package on the VM."""
-  _Install(vm)
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs the curl package on the VM."""
-  _Install(vm)
+  vm.InstallPackages(APT_PACKAGES)
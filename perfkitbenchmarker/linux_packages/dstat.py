@@ -15,17 +15,15 @@
 
 """Module containing dstat installation and cleanup functions."""
 
-
-def _Install(vm):
-  """Installs the dstat package on the VM."""
-  vm.InstallPackages('dstat')
+YUM_PACKAGES = 'dstat'
+APT_PACKAGES = 'dstat'
 
 
 def YumInstall(vm):
   """Installs the dstat package on the VM."""
-  _Install(vm)
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs the dstat package on the VM."""
-  _Install(vm)
+  vm.InstallPackages(APT_PACKAGES)
@@ -23,6 +23,7 @@ import posixpath
 import re
 import time
 
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import data
 from perfkitbenchmarker import regex_util
 from perfkitbenchmarker import vm_util
@@ -56,9 +57,10 @@ def CheckPrerequisites():
 def _Install(vm):
   vm.Install('openjdk7')
   vm.Install('curl')
-  vm.RemoteCommand(('mkdir {0} && curl -L {1} | '
-                    'tar -C {0} --strip-components=1 -xzf -').format(
-                        HADOOP_DIR, HADOOP_URL))
+  tar_path = posixpath.join(vm_util.VM_TMP_DIR, 'hadoop.tar.gz')
+  artifact_cache.DownloadToVm(vm, HADOOP_URL, tar_path)
+  vm.RemoteCommand(('mkdir {0} && tar -C {0} --strip-components=1 -xzf {1} '
+                    '&& rm {1}').format(HADOOP_DIR, tar_path))
 
 
 def YumInstall(vm):
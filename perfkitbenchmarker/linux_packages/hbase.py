@@ -21,6 +21,7 @@ import functools
 import os
 import posixpath
 
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import data
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import hadoop
@@ -51,9 +52,10 @@ def CheckPrerequisites():
 def _Install(vm):
   vm.Install('hadoop')
   vm.Install('curl')
-  vm.RemoteCommand(('mkdir {0} && curl -L {1} | '
-                    'tar -C {0} --strip-components=1 -xzf -').format(
-                        HBASE_DIR, HBASE_URL))
+  tar_path = posixpath.join(vm_util.VM_TMP_DIR, 'hbase.tar.gz')
+  artifact_cache.DownloadToVm(vm, HBASE_URL, tar_path)
+  vm.RemoteCommand(('mkdir {0} && tar -C {0} --strip-components=1 -xzf {1} '
+                    '&& rm {1}').format(HBASE_DIR, tar_path))
 
 
 def YumInstall(vm):
@@ -20,8 +20,11 @@ including High Performance Linpack (HPL). More information can be found here:
 http://icl.cs.utk.edu/hpcc/
 """
 
+import posixpath
 import re
 
+from perfkitbenchmarker import artifact_cache
+from perfkitbenchmarker import build_cache
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import openblas
 
@@ -35,10 +38,16 @@ HPCC_MAKEFILE_PATH = HPCC_DIR + '/hpl/' + HPCC_MAKEFILE
 
 def _Install(vm):
   """Installs the HPCC package on the VM."""
-  vm.Install('wget')
+  vm.Install('curl')
   vm.Install('openmpi')
   vm.Install('openblas')
-  vm.RemoteCommand('wget %s -P %s' % (HPCC_URL, vm_util.VM_TMP_DIR))
+  _Build(vm)
+
+
+@build_cache.CachedBuild('hpcc', HPCC_TAR, [HPCC_DIR])
+def _Build(vm):
+  artifact_cache.DownloadToVm(
+      vm, HPCC_URL, posixpath.join(vm_util.VM_TMP_DIR, HPCC_TAR))
   vm.RemoteCommand('cd %s && tar xvfz %s' % (vm_util.VM_TMP_DIR, HPCC_TAR))
   vm.RemoteCommand(
       'cp %s/hpl/setup/%s %s' % (HPCC_DIR, HPCC_MAKEFILE, HPCC_MAKEFILE_PATH))
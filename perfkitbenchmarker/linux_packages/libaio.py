@@ -15,12 +15,15 @@
 
 """Module containing libaio installation and cleanup functions."""
 
+YUM_PACKAGES = 'libaio'
+APT_PACKAGES = 'libaio1'
+
 
 def YumInstall(vm):
   """Installs the libaio package on the VM."""
-  vm.InstallPackages('libaio')
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs the libaio package on the VM."""
-  vm.InstallPackages('libaio1')
+  vm.InstallPackages(APT_PACKAGES)
@@ -15,12 +15,15 @@
 
 """Module containing lua installation and cleanup functions."""
 
+YUM_PACKAGES = 'lua lua-devel lua-static'
+APT_PACKAGES = 'lua5.1 liblua5.1-dev'
+
 
 def YumInstall(vm):
   """Installs lua on the VM."""
-  vm.InstallPackages('lua lua-devel lua-static')
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs lua on the VM."""
-  vm.InstallPackages('lua5.1 liblua5.1-dev')
+  vm.InstallPackages(APT_PACKAGES)
@@ -15,6 +15,9 @@
 
 """Module containing maven installation and cleanup functions."""
 
+import posixpath
+
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import vm_util
 
 MVN_TAR = 'apache-maven-3.3.3-bin.tar.gz'
@@ -26,8 +29,9 @@ MVN_DIR = '%s/apache-maven-3.3.3' % vm_util.VM_TMP_DIR
 def _Install(vm):
   """Installs the maven package on the VM."""
   vm.Install('openjdk7')
-  vm.Install('wget')
-  vm.RemoteCommand('wget %s -P %s' % (MVN_URL, vm_util.VM_TMP_DIR))
+  vm.Install('curl')
+  artifact_cache.DownloadToVm(
+      vm, MVN_URL, posixpath.join(vm_util.VM_TMP_DIR, MVN_TAR))
   vm.RemoteCommand('cd %s && tar xvzf %s' % (vm_util.VM_TMP_DIR, MVN_TAR))
 
 
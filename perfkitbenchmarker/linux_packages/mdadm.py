@@ -15,17 +15,15 @@
 
 """Module containing mdadm installation and cleanup functions."""
 
-
-def _Install(vm):
-  """Installs the mdadm package on the VM."""
-  vm.InstallPackages('mdadm')
+YUM_PACKAGES = 'mdadm'
+APT_PACKAGES = 'mdadm'
 
 
 def YumInstall(vm):
   """Installs the mdadm package on the VM."""
-  _Install(vm)
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs the mdadm package on the VM."""
-  _Install(vm)
+  vm.InstallPackages(APT_PACKAGES)
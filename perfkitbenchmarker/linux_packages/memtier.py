@@ -15,6 +15,9 @@
 
 """Module containing memtier installation and cleanup functions."""
 
+import posixpath
+
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import vm_util
 
 GIT_REPO = 'https://github.com/RedisLabs/memtier_benchmark'
@@ -26,14 +29,16 @@ MEMTIER_DIR = '%s/memtier_benchmark' % vm_util.VM_TMP_DIR
 APT_PACKAGES = ('autoconf automake libpcre3-dev '
                 'libevent-dev pkg-config zlib1g-dev')
 YUM_PACKAGES = 'zlib-devel pcre-devel libmemcached-devel'
+DEPENDENCIES = ('build_tools', 'curl')
 
 
 def YumInstall(vm):
   """Installs the memtier package on the VM."""
   vm.Install('build_tools')
   vm.InstallPackages(YUM_PACKAGES)
-  vm.Install('wget')
-  vm.RemoteCommand('wget {0} -P {1}'.format(LIBEVENT_URL, vm_util.VM_TMP_DIR))
+  vm.Install('curl')
+  artifact_cache.DownloadToVm(
+      vm, LIBEVENT_URL, posixpath.join(vm_util.VM_TMP_DIR, LIBEVENT_TAR))
   vm.RemoteCommand('cd {0} && tar xvzf {1}'.format(vm_util.VM_TMP_DIR,
                                                    LIBEVENT_TAR))
   vm.RemoteCommand('cd {0} && ./configure && sudo make install'.format(
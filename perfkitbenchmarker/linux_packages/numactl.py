@@ -14,17 +14,15 @@
 
 """Module containing numactl installation and cleanup functions."""
 
-
-def _Install(vm):
-  """Installs the numactl package on the VM."""
-  vm.InstallPackages('numactl')
+YUM_PACKAGES = 'numactl'
+APT_PACKAGES = 'numactl'
 
 
 def YumInstall(vm):
   """Installs the numactl package on the VM."""
-  _Install(vm)
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs the numactl package on the VM."""
-  _Install(vm)
+  vm.InstallPackages(APT_PACKAGES)
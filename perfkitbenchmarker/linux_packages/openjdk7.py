@@ -15,14 +15,17 @@
 
 """Module containing OpenJDK7 installation and cleanup functions."""
 
+YUM_PACKAGES = 'java-1.7.0-openjdk-devel'
+APT_PACKAGES = 'openjdk-7-jdk'
+
 JAVA_HOME = '/usr'
 
 
 def YumInstall(vm):
   """Installs the OpenJDK7 package on the VM."""
-  vm.InstallPackages('java-1.7.0-openjdk-devel')
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs the OpenJDK7 package on the VM."""
-  vm.InstallPackages('openjdk-7-jdk')
+  vm.InstallPackages(APT_PACKAGES)
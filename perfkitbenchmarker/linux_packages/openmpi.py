@@ -15,6 +15,9 @@
 
 """Module containing OpenMPI installation and cleanup functions."""
 
+import posixpath
+
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import vm_util
 
 MPI_DIR = '%s/openmpi-1.6.5' % vm_util.VM_TMP_DIR
@@ -25,8 +28,9 @@ MPI_URL = 'http://www.open-mpi.org/software/ompi/v1.6/downloads/' + MPI_TAR
 def _Install(vm):
   """Installs the OpenMPI package on the VM."""
   vm.Install('build_tools')
-  vm.Install('wget')
-  vm.RemoteCommand('wget %s -P %s' % (MPI_URL, vm_util.VM_TMP_DIR))
+  vm.Install('curl')
+  artifact_cache.DownloadToVm(
+      vm, MPI_URL, posixpath.join(vm_util.VM_TMP_DIR, MPI_TAR))
   vm.RemoteCommand('cd %s && tar xvfz %s' % (vm_util.VM_TMP_DIR, MPI_TAR))
   make_jobs = vm.num_cpus
   config_cmd = ('./configure --enable-static --disable-shared --disable-dlopen '
@@ -15,12 +15,15 @@
 
 """Module containing OpenSSL installation and cleanup functions."""
 
+YUM_PACKAGES = 'openssl openssl-devel openssl-static'
+APT_PACKAGES = 'openssl libssl-dev'
+
 
 def YumInstall(vm):
   """Installs OpenSSL on the VM."""
-  vm.InstallPackages('openssl openssl-devel openssl-static')
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs OpenSSL on the VM."""
-  vm.InstallPackages('openssl libssl-dev')
+  vm.InstallPackages(APT_PACKAGES)
@@ -15,12 +15,15 @@
 
 """Module containing pcre installation and cleanup functions."""
 
+YUM_PACKAGES = 'pcre pcre-devel'
+APT_PACKAGES = 'libpcre3 libpcre3-dev libpcrecpp0'
+
 
 def YumInstall(vm):
   """Installs the pcre package on the VM."""
-  vm.InstallPackages('pcre pcre-devel')
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs the pcre package on the VM."""
-  vm.InstallPackages('libpcre3 libpcre3-dev libpcrecpp0')
+  vm.InstallPackages(APT_PACKAGES)
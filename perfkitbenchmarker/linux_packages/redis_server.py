@@ -15,19 +15,30 @@
 
 """Module containing redis installation and cleanup functions."""
 
+import posixpath
+
+from perfkitbenchmarker import artifact_cache
+from perfkitbenchmarker import build_cache
 from perfkitbenchmarker import vm_util
 
 REDIS_TAR = 'redis-2.8.9.tar.gz'
 REDIS_DIR = '%s/redis-2.8.9' % vm_util.VM_TMP_DIR
 REDIS_URL = 'http://download.redis.io/releases/' + REDIS_TAR
+DEPENDENCIES = ('build_tools', 'curl')
 
 
 def _Install(vm):
   """Installs the redis package on the VM."""
   vm.Install('build_tools')
-  vm.Install('wget')
-  vm.RemoteCommand('wget %s -P %s' % (REDIS_URL, vm_util.VM_TMP_DIR))
+  vm.Install('curl')
+  artifact_cache.DownloadToVm(
+      vm, REDIS_URL, posixpath.join(vm_util.VM_TMP_DIR, REDIS_TAR))
   vm.RemoteCommand('cd %s && tar xvfz %s' % (vm_util.VM_TMP_DIR, REDIS_TAR))
+  _Build(vm)
+
+
+@build_cache.CachedBuild('redis_server', REDIS_TAR, [REDIS_DIR])
+def _Build(vm):
   vm.RemoteCommand('cd %s && make' % REDIS_DIR)
 
 
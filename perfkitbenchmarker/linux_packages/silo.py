@@ -15,6 +15,7 @@
 
 """Module containing Silo installation and cleanup functions."""
 
+from perfkitbenchmarker import build_cache
 from perfkitbenchmarker import vm_util
 
 GIT_REPO = 'https://github.com/stephentu/silo.git'
@@ -24,18 +25,26 @@ APT_PACKAGES = ('libjemalloc-dev libnuma-dev libdb++-dev '
                 'libmysqld-dev libaio-dev libssl-dev')
 YUM_PACKAGES = ('jemalloc-devel numactl-devel libdb-cxx-devel mysql-devel '
                 'libaio-devel openssl-devel')
+DEPENDENCIES = ('build_tools',)
 
 
 def _Install(vm):
   """Installs the Silo package on the VM."""
-  nthreads = vm.num_cpus * 2
   vm.Install('build_tools')
+  # This is due to a failing clone command when executing behind a proxy.
+  # Replacing the protocol to https instead of git fixes the issue. The git
+  # configuration is outside the build outputs, so it is set on every VM
+  # rather than in _Build, which is skipped when the build is cached.
+  vm.RemoteCommand('git config --global url."https://".insteadOf git://')
+  _Build(vm)
+
+
+@build_cache.CachedBuild('silo', GIT_TAG, [SILO_DIR])
+def _Build(vm):
+  nthreads = vm.num_cpus * 2
   vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, SILO_DIR))
   vm.RemoteCommand('cd {0} && git checkout {1}'.format(SILO_DIR,
                                                        GIT_TAG))
-  # This is due to a failing clone command when executing behind a proxy.
-  # Replacing the protocol to https instead of git fixes the issue.
-  vm.RemoteCommand('git config --global url."https://".insteadOf git://')
   vm.RemoteCommand('cd {0} && MODE=perf DEBUG=0 CHECK_INVARIANTS=0 make\
           -j{1} dbtest'.format(SILO_DIR, nthreads))
 
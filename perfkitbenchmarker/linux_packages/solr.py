@@ -18,19 +18,22 @@
 import posixpath
 import time
 
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import vm_util
 
 SOLR_HOME_DIR = posixpath.join(vm_util.VM_TMP_DIR, 'solr-5.2.1')
-SOLR_TAR_URL = ('archive.apache.org/dist/lucene/solr/5.2.1/solr-5.2.1.tgz')
+SOLR_TAR_URL = ('https://archive.apache.org/dist/lucene/solr/5.2.1/'
+                'solr-5.2.1.tgz')
 
 
 def _Install(vm):
   """Installs the Apache Solr on the VM."""
   vm.Install('openjdk7')
-  vm.RobustRemoteCommand('cd {0} && '
-                         'wget -O solr.tar.gz {2} && '
-                         'tar -zxf solr.tar.gz'.format(
-                             vm_util.VM_TMP_DIR, SOLR_HOME_DIR, SOLR_TAR_URL))
+  vm.Install('curl')
+  tar_path = posixpath.join(vm_util.VM_TMP_DIR, 'solr.tar.gz')
+  artifact_cache.DownloadToVm(vm, SOLR_TAR_URL, tar_path)
+  vm.RemoteCommand('tar -C {0} -zxf {1} && rm {1}'.format(
+      vm_util.VM_TMP_DIR, tar_path))
 
 
 def YumInstall(vm):
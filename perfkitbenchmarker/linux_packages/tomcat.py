@@ -23,6 +23,7 @@ Installing Tomcat via this module makes some changes to the default settings:
 https://tomcat.apache.org/
 """
 import posixpath
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import vm_util
 
@@ -49,10 +50,11 @@ _TOMCAT_PROTOCOL = 'org.apache.coyote.http11.Http11Nio2Protocol'
 def _Install(vm):
   vm.Install('openjdk7')
   vm.Install('curl')
+  tar_path = posixpath.join(vm_util.VM_TMP_DIR, 'tomcat.tar.gz')
+  artifact_cache.DownloadToVm(vm, FLAGS.tomcat_url, tar_path)
   vm.RemoteCommand(
-      ('mkdir -p {0} && curl -L {1} | '
-       'tar -C {0} --strip-components 1 -xzf -').format(TOMCAT_DIR,
-                                                        FLAGS.tomcat_url))
+      ('mkdir -p {0} && tar -C {0} --strip-components 1 -xzf {1} '
+       '&& rm {1}').format(TOMCAT_DIR, tar_path))
 
   # Use a non-blocking protocool, and disable access logging (which isn't very
   # helpful during load tests).
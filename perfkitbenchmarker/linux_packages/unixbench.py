@@ -15,6 +15,9 @@
 
 """Module containing UnixBench installation and cleanup functions."""
 
+import posixpath
+
+from perfkitbenchmarker import artifact_cache
 from perfkitbenchmarker import vm_util
 
 UNIXBENCH_TAR = 'v5.1.3.tar.gz'
@@ -26,8 +29,9 @@ UNIXBENCH_DIR = '%s/byte-unixbench-5.1.3/UnixBench' % vm_util.VM_TMP_DIR
 def _Install(vm):
   """Installs the UnixBench package on the VM."""
   vm.Install('build_tools')
-  vm.Install('wget')
-  vm.RemoteCommand('wget {0} -P {1}'.format(UNIXBENCH_URL, vm_util.VM_TMP_DIR))
+  vm.Install('curl')
+  artifact_cache.DownloadToVm(
+      vm, UNIXBENCH_URL, posixpath.join(vm_util.VM_TMP_DIR, UNIXBENCH_TAR))
   vm.RemoteCommand('cd {0} && tar xvzf {1}'.format(vm_util.VM_TMP_DIR,
                                                    UNIXBENCH_TAR))
 
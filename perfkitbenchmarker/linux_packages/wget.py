@@ -15,17 +15,15 @@
 
 """Module containing wget installation and cleanup functions."""
 
-
-def _Install(vm):
-  """Installs the wget package on the VM."""
-  vm.InstallPackages('wget')
+YUM_PACKAGES = 'wget'
+APT_PACKAGES = 'wget'
 
 
 def YumInstall(vm):
   """Installs the wget package on the VM."""
-  _Install(vm)
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs the wget package on the VM."""
-  _Install(vm)
+  vm.InstallPackages(APT_PACKAGES)
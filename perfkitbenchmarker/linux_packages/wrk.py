@@ -23,6 +23,8 @@ import csv
 import io
 import posixpath
 
+from perfkitbenchmarker import artifact_cache
+from perfkitbenchmarker import build_cache
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 
@@ -30,6 +32,7 @@ from perfkitbenchmarker import vm_util
 WRK_URL = 'https://github.com/wg/wrk/archive/4.0.1.tar.gz'
 WRK_DIR = posixpath.join(vm_util.VM_TMP_DIR, 'wrk')
 WRK_PATH = posixpath.join(WRK_DIR, 'wrk')
+DEPENDENCIES = ('build_tools', 'curl', 'openssl')
 
 # Rather than parse WRK's free text output, this script is used to generate a
 # CSV report
@@ -48,14 +51,19 @@ def _Install(vm):
   vm.Install('curl')
   vm.Install('openssl')
 
-  vm.RemoteCommand(('mkdir -p {0} && curl -L {1} '
-                    '| tar --strip-components=1 -C {0} -xzf -').format(
-                        WRK_DIR,
-                        WRK_URL))
-  vm.RemoteCommand('cd {} && make'.format(WRK_DIR))
+  tar_path = posixpath.join(vm_util.VM_TMP_DIR, 'wrk.tar.gz')
+  artifact_cache.DownloadToVm(vm, WRK_URL, tar_path)
+  vm.RemoteCommand(('mkdir -p {0} && tar --strip-components=1 -C {0} -xzf {1} '
+                    '&& rm {1}').format(WRK_DIR, tar_path))
+  _Build(vm)
   vm.PushDataFile(_LUA_SCRIPT_NAME, _LUA_SCRIPT_PATH)
 
 
+@build_cache.CachedBuild('wrk', WRK_URL, [WRK_DIR])
+def _Build(vm):
+  vm.RemoteCommand('cd {} && make'.format(WRK_DIR))
+
+
 def YumInstall(vm):
   """Installs wrk on the VM."""
   _Install(vm)
@@ -48,6 +48,8 @@ import operator
 import os
 import posixpath
 
+from perfkitbenchmarker import artifact_cache
+from perfkitbenchmarker import context
 from perfkitbenchmarker import data
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import sample
@@ -146,9 +148,10 @@ def _Install(vm):
   """Installs the YCSB package on the VM."""
   vm.Install('openjdk7')
   vm.Install('curl')
-  vm.RemoteCommand(('mkdir -p {0} && curl -L {1} | '
-                    'tar -C {0} --strip-components=1 -xzf -').format(
-                        YCSB_DIR, YCSB_TAR_URL))
+  tar_path = posixpath.join(vm_util.VM_TMP_DIR, 'ycsb.tar.gz')
+  artifact_cache.DownloadToVm(vm, YCSB_TAR_URL, tar_path)
+  vm.RemoteCommand(('mkdir -p {0} && tar -C {0} --strip-components=1 -xzf {1} '
+                    '&& rm {1}').format(YCSB_DIR, tar_path))
 
 
 def YumInstall(vm):
@@ -183,7 +186,9 @@ def ParseResults(ycsb_result_string, data_type='histogram'):
     ...
 
   Args:
-    ycsb_result_string: str. Text output from YCSB.
+    ycsb_result_string: str or iterable of str. Text output from YCSB, or an
+        iterator over its lines, such as the output of
+        vm_util.IssueStreamingCommand.
     data_type: Either 'histogram' or 'timeseries'.
 
   Returns:
@@ -204,7 +209,10 @@ def ParseResults(ycsb_result_string, data_type='histogram'):
   lines = []
   client_string = 'YCSB'
   command_line = 'unknown'
-  fp = io.BytesIO(ycsb_result_string)
+  if isinstance(ycsb_result_string, basestring):
+    fp = io.BytesIO(ycsb_result_string)
+  else:
+    fp = iter(ycsb_result_string)
   result_string = next(fp).strip()
 
   def IsHeadOfResults(line):
@@ -585,9 +593,8 @@ class YCSBExecutor(object):
                      (1 if i < (record_count % len(vms)) else 0)
                      for i in xrange(len(vms))]
 
-    def PushWorkload(vm):
-      vm.PushFile(workload_file, remote_path)
-    vm_util.RunThreaded(PushWorkload, vms)
+    context.GetThreadBenchmarkSpec().BroadcastFile(workload_file, remote_path,
+                                                   vms)
 
     kwargs['parameter_files'] = [remote_path]
 
@@ -687,9 +694,8 @@ class YCSBExecutor(object):
                              workload_index=workload_index,
                              stage='run')
 
-      def PushWorkload(vm):
-        vm.PushFile(workload_file, remote_path)
-      vm_util.RunThreaded(PushWorkload, vms)
+      context.GetThreadBenchmarkSpec().BroadcastFile(workload_file,
+                                                     remote_path, vms)
 
       parameters['parameter_files'] = [remote_path]
       for client_count in _GetThreadsPerLoaderList():
@@ -15,12 +15,15 @@
 
 """Module containing zlib installation and cleanup functions."""
 
+YUM_PACKAGES = 'zlib zlib-devel'
+APT_PACKAGES = 'zlib1g zlib1g-dev'
+
 
 def YumInstall(vm):
   """Installs the zlib package on the VM."""
-  vm.InstallPackages('zlib zlib-devel')
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs the zlib package on the VM."""
-  vm.InstallPackages('zlib1g zlib1g-dev')
+  vm.InstallPackages(APT_PACKAGES)
@@ -26,6 +26,9 @@ file name minus .py). The framework will take care of all cleanup
 for you.
 """
 
+import hashlib
+import inspect
+import json
 import logging
 import os
 import pipes
@@ -36,8 +39,11 @@ import time
 import uuid
 import yaml
 
+from perfkitbenchmarker import background_tasks
+from perfkitbenchmarker import command_agent
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import event_loop
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import linux_packages
 from perfkitbenchmarker import os_types
@@ -53,7 +59,14 @@ EPEL7_RPM = ('http://dl.fedoraproject.org/pub/epel/'
 
 UPDATE_RETRIES = 5
 SSH_RETRIES = 10
+# Seconds between the checks of whether a VM has booted.
+BOOT_POLL_INTERVAL = 1
 DEFAULT_SSH_PORT = 22
+# How long an idle master SSH connection is kept open.
+SSH_CONTROL_PERSIST = '30m'
+# Unix socket paths are limited to 108 bytes. ssh appends a random suffix of up
+# to 17 characters to the ControlPath while setting up the master connection.
+MAX_SSH_CONTROL_PATH_LENGTH = 90
 REMOTE_KEY_PATH = '.ssh/id_rsa'
 CONTAINER_MOUNT_DIR = '/mnt'
 CONTAINER_WORK_DIR = '/root'
@@ -68,10 +81,93 @@ EXECUTE_COMMAND = 'execute_command.py'
 # then copies the stdout and stderr, exiting with the status of the command run
 # by EXECUTE_COMMAND.
 WAIT_FOR_COMMAND = 'wait_for_command.py'
+# Maximum time, in seconds, that each invocation of WAIT_FOR_COMMAND waits for
+# the command to complete before returning the output produced so far.
+ROBUST_COMMAND_POLL_SECONDS = 15
+# COMMAND_AGENT runs the commands it receives over a single ssh session. See
+# the --remote_command_transport flag.
+COMMAND_AGENT = 'command_agent.py'
+# Records the PerfKit packages installed on the VM, one "<name> <fingerprint>"
+# line per package. It lives in the temp directory with the packages' files, so
+# it is lost together with them.
+INSTALL_MANIFEST = posixpath.join(vm_util.VM_TMP_DIR, 'installed_packages')
+
+# Script run for each command of a RemoteCommandBatch. It runs the command in
+# its own subshell and prints its exit status, stdout and stderr, separated by
+# a marker that is unique to the batch.
+_BATCH_COMMAND_TEMPLATE = """(
+{command}
+) >"$pkb_batch_dir/out" 2>"$pkb_batch_dir/err" </dev/null
+pkb_batch_status=$?
+printf '%s {index} %s\\n' '{marker}' "$pkb_batch_status"
+cat "$pkb_batch_dir/out"
+printf '\\n%s\\n' '{marker}-stderr'
+cat "$pkb_batch_dir/err"
+printf '\\n'
+"""
+_BATCH_STOP_ON_FAILURE = """if [ "$pkb_batch_status" -ne 0 ]; then
+  rm -rf "$pkb_batch_dir"
+  exit 1
+fi
+"""
+
+SSH_TRANSPORT = 'ssh'
+AGENT_TRANSPORT = 'agent'
 
 flags.DEFINE_bool('setup_remote_firewall', False,
                   'Whether PKB should configure the firewall of each remote'
                   'VM to make sure it accepts all internal connections.')
+flags.DEFINE_bool('ssh_reuse_connections', True,
+                  'Whether to keep a master SSH connection open to each VM '
+                  'and share it between remote commands and file copies, '
+                  'rather than establishing a new connection for each one.')
+flags.DEFINE_enum('remote_command_transport', SSH_TRANSPORT,
+                  [SSH_TRANSPORT, AGENT_TRANSPORT],
+                  'How remote commands are run on Linux VMs. "%s" starts a '
+                  'new ssh process for each command. "%s" starts an agent on '
+                  'each VM during preparation and sends all commands to it '
+                  'over a single ssh session, falling back to ssh if the '
+                  'agent becomes unavailable. Commands that require a login '
+                  'shell always use ssh.' % (SSH_TRANSPORT, AGENT_TRANSPORT))
+flags.DEFINE_bool('reuse_installed_packages', False,
+                  'Whether PerfKit packages installed on a VM are recorded in '
+                  'a manifest on the VM, and stay installed on static VMs '
+                  'after a run. Later runs on the same VM, including VMs kept '
+                  'with --run_stage, skip installing a package again unless '
+                  'its version or configuration has changed.')
+
+
+def _GetPackageDependencies(package_name):
+  """Returns the names of the PerfKit packages that a package declares."""
+  return getattr(linux_packages.PACKAGES[package_name], 'DEPENDENCIES', ())
+
+
+def _GetPackageFingerprint(package_name):
+  """Returns a digest of the version and configuration of a PerfKit package.
+
+  The digest covers the source of the package module, which pins the versions
+  it installs, and the values of the flags that the module defines.
+  """
+  package = linux_packages.PACKAGES[package_name]
+  sha256 = hashlib.sha256()
+  with open(inspect.getsourcefile(package)) as fp:
+    sha256.update(fp.read())
+  package_flags = FLAGS.FlagsByModuleDict().get(package.__name__, [])
+  for flag in sorted(package_flags, key=lambda flag: flag.name):
+    sha256.update('%s=%r\n' % (flag.name, flag.value))
+  return sha256.hexdigest()
+
+
+def _GetPackageClosure(package_names):
+  """Returns the named PerfKit packages and their declared dependencies."""
+  closure = []
+  pending = list(package_names)
+  while pending:
+    package_name = pending.pop()
+    if package_name not in closure:
+      closure.append(package_name)
+      pending.extend(_GetPackageDependencies(package_name))
+  return closure
 
 
 class BaseLinuxMixin(virtual_machine.BaseOsMixin):
@@ -90,6 +186,115 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
 
     self._remote_command_script_upload_lock = threading.Lock()
     self._has_remote_command_script = False
+    self._ssh_control_master_lock = threading.Lock()
+    self._ssh_control_path = None
+    self._command_agent = None
+
+    # OS packages installed by InstallPackages, which skips them thereafter.
+    self._installed_os_packages = set()
+    self._package_manager_lock = threading.Lock()
+    self._install_locks = {}
+    self._install_locks_lock = threading.Lock()
+    # Maps the names of the packages in INSTALL_MANIFEST to their fingerprints.
+    # None until the manifest is read.
+    self._install_manifest = None
+    self._install_manifest_lock = threading.Lock()
+
+  def _GetSshOptions(self):
+    """Returns the SSH and SCP options for connecting to this VM."""
+    control_path = self._ssh_control_path
+    if control_path and not os.path.exists(control_path):
+      # The master connection has exited, e.g. after being idle for longer
+      # than SSH_CONTROL_PERSIST.
+      control_path = None
+    return vm_util.GetSshOptions(self.ssh_private_key,
+                                 control_path=control_path)
+
+  def _StartSshControlMaster(self):
+    """Opens a master SSH connection shared by later ssh and scp calls.
+
+    This is a noop if the master connection is already open, or if connection
+    sharing is disabled or unsupported. Failures are not fatal: ssh and scp
+    connect directly to the VM when there is no master connection.
+    """
+    if not FLAGS.ssh_reuse_connections or vm_util.RunningOnWindows():
+      return
+    with self._ssh_control_master_lock:
+      if self._ssh_control_path and os.path.exists(self._ssh_control_path):
+        return
+      control_path = vm_util.PrependTempDir('ssh-%s' % self.name)
+      if len(control_path) > MAX_SSH_CONTROL_PATH_LENGTH:
+        logging.info('Not sharing SSH connections to %s because the control '
+                     'socket path %s is too long.', self.name, control_path)
+        return
+      user_host = '%s@%s' % (self.user_name, self.ip_address)
+      ssh_cmd = ['ssh', '-A', '-M', '-N', '-f',
+                 '-o', 'ControlPersist=%s' % SSH_CONTROL_PERSIST,
+                 '-p', str(self.ssh_port), user_host]
+      ssh_cmd.extend(vm_util.GetSshOptions(self.ssh_private_key,
+                                           control_path=control_path))
+      _, _, retcode = vm_util.IssueCommand(ssh_cmd, suppress_warning=True)
+      if not retcode:
+        self._ssh_control_path = control_path
+
+  def _StartCommandAgent(self):
+    """Pushes the command agent to the VM and uses it for later commands.
+
+    The agent itself is started when the first command is sent to it.
+    """
+    if vm_util.RunningOnWindows():
+      return
+    agent_path = os.path.join(vm_util.VM_TMP_DIR,
+                              os.path.basename(COMMAND_AGENT))
+    self.PushDataFile(COMMAND_AGENT, agent_path)
+    if self._command_agent is None:
+      user_host = '%s@%s' % (self.user_name, self.ip_address)
+      agent_cmd = ['ssh', '-A', '-p', str(self.ssh_port), user_host]
+      agent_cmd.extend(self._GetSshOptions())
+      agent_cmd.extend(['python', agent_path])
+      self._command_agent = command_agent.CommandAgentClient(agent_cmd)
+
+  def _RemoteHostCommandViaAgent(self, agent, command, should_log,
+                                 ignore_failure, suppress_warning, timeout):
+    """Runs a command on the VM through the command agent.
+
+    Args:
+      agent: command_agent.CommandAgentClient. The client of the VM's agent.
+
+    See RemoteHostCommand for a description of the other arguments and the
+    return value.
+
+    Raises:
+      CommandAgentSendError: If the command could not be sent to the agent.
+      CommandAgentError: If the connection to the agent was lost while the
+          command was running.
+      RemoteCommandError: If the command failed.
+    """
+    logging.info('Running via command agent on %s: %s', self.name, command)
+    stdout, stderr, retcode = agent.RunCommand(command, timeout=timeout)
+    debug_text = ('Ran %s via command agent. Got return code (%s).\n'
+                  'STDOUT: %s\nSTDERR: %s' % (command, retcode, stdout, stderr))
+    if should_log or (retcode and not suppress_warning):
+      logging.info(debug_text)
+    else:
+      logging.debug(debug_text)
+    if retcode and not ignore_failure:
+      raise errors.VirtualMachine.RemoteCommandError(
+          'Got non-zero return code (%s) executing %s via command agent\n'
+          'STDOUT: %sSTDERR: %s' % (retcode, command, stdout, stderr))
+    return stdout, stderr
+
+  def CloseRemoteConnections(self):
+    """Closes the command agent and master SSH connection to the VM."""
+    if self._command_agent:
+      self._command_agent.Close()
+    with self._ssh_control_master_lock:
+      control_path, self._ssh_control_path = self._ssh_control_path, None
+      if control_path and os.path.exists(control_path):
+        user_host = '%s@%s' % (self.user_name, self.ip_address)
+        vm_util.IssueCommand(['ssh', '-O', 'exit',
+                              '-o', 'ControlPath=%s' % control_path,
+                              user_host], suppress_warning=True)
 
   def _PushRobustCommandScripts(self):
     """Pushes the scripts required by RobustRemoteCommand to this VM.
@@ -103,21 +308,38 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
                                             os.path.basename(f)))
         self._has_remote_command_script = True
 
-  def RobustRemoteCommand(self, command, should_log=False):
+  def RobustRemoteCommand(self, command, should_log=False,
+                          stdout_callback=None, stderr_callback=None):
     """Runs a command on the VM in a more robust way than RemoteCommand.
 
     Executes a command via a pair of scripts on the VM:
 
     * EXECUTE_COMMAND, which runs 'command' in a nohupped background process.
-    * WAIT_FOR_COMMAND, which waits on a file lock held by EXECUTE_COMMAND until
-      'command' completes, then returns with the stdout, stderr, and exit status
-      of 'command'.
+    * WAIT_FOR_COMMAND, which is invoked repeatedly. Each invocation waits up
+      to ROBUST_COMMAND_POLL_SECONDS on a file lock held by EXECUTE_COMMAND,
+      then returns the output 'command' has produced since the previous
+      invocation, and its exit status if it has completed.
 
     Temporary SSH failures (where ssh returns a 255) while waiting for the
-    command to complete will be tolerated and safely retried.
+    command to complete will be tolerated and safely retried, resuming from the
+    output that has already been received.
+
+    Args:
+      command: A valid bash command, or a list of its arguments.
+      should_log: If True, log the command's output at the info level. If
+          False, log the command's output at the debug level.
+      stdout_callback: Optional callable. Called with each line of the
+          command's stdout, including its trailing newline, as soon as the
+          line has been received.
+      stderr_callback: Optional callable. Called with each line of the
+          command's stderr, as for stdout_callback.
+
+    Returns:
+      A tuple of stdout and stderr from running the command.
 
-    If should_log is True, log the command's output at the info
-    level. If False, log the command's output at the debug level.
+    Raises:
+      RemoteCommandError: If there was a problem running the command, or if
+          it returned a non-zero exit status.
     """
     self._PushRobustCommandScripts()
 
@@ -146,12 +368,49 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
                                          wrapper_log)
     self.RemoteCommand(start_command)
 
-    wait_command = ['python', wait_path, '--stdout', stdout_file,
-                    '--stderr', stderr_file,
-                    '--status', status_file,
-                    '--delete']
+    output = {'stdout': [], 'stderr': []}
+    callbacks = {'stdout': stdout_callback, 'stderr': stderr_callback}
+    offsets = {'stdout': 0, 'stderr': 0}
+    status = None
     try:
-      return self.RemoteCommand(' '.join(wait_command), should_log=should_log)
+      while status is None:
+        wait_command = ['python', wait_path, '--stdout', stdout_file,
+                        '--stderr', stderr_file,
+                        '--status', status_file,
+                        '--stdout_offset', str(offsets['stdout']),
+                        '--stderr_offset', str(offsets['stderr']),
+                        '--timeout', str(ROBUST_COMMAND_POLL_SECONDS)]
+        wait_stdout, _ = self.RemoteCommand(' '.join(wait_command))
+        for line in wait_stdout.splitlines():
+          message = json.loads(line)
+          if 'stream' in message:
+            output[message['stream']].append(message['data'])
+            callback = callbacks[message['stream']]
+            if callback:
+              for data_line in message['data'].splitlines(True):
+                callback(data_line)
+          else:
+            offsets['stdout'] = message['stdout_offset']
+            offsets['stderr'] = message['stderr_offset']
+            status = message['status']
+      # The files are only deleted once all of the output has been received,
+      # so that a poll that is retried after a connection failure can still
+      # find them.
+      self.RemoteCommand('rm -f %s %s %s' % (stdout_file, stderr_file,
+                                             status_file))
+      stdout = ''.join(output['stdout'])
+      stderr = ''.join(output['stderr'])
+      debug_text = ('Ran %s. Got return code (%s).\nSTDOUT: %s\nSTDERR: %s' %
+                    (command, status, stdout, stderr))
+      if should_log or status:
+        logging.info(debug_text)
+      else:
+        logging.debug(debug_text)
+      if status:
+        raise errors.VirtualMachine.RemoteCommandError(
+            'Got non-zero return code (%s) executing %s\n'
+            'STDOUT: %sSTDERR: %s' % (status, command, stdout, stderr))
+      return stdout, stderr
     except errors.VirtualMachine.RemoteCommandError:
       # In case the error was with the wrapper script itself, print the log.
       stdout, _ = self.RemoteCommand('cat %s' % wrapper_log, should_log=False)
@@ -182,8 +441,7 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
       commands.append("echo 'ftp_proxy=%s' | sudo tee -a %s" % (
           FLAGS.ftp_proxy, env_file))
 
-    if commands:
-      self.RemoteCommand(";".join(commands))
+    self.RemoteCommandBatch(commands)
 
   def SetupPackageManager(self):
     """Specific Linux flavors should override this."""
@@ -192,15 +450,17 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
   def PrepareVMEnvironment(self):
     self.SetupProxy()
     self.RemoteCommand('mkdir -p %s' % vm_util.VM_TMP_DIR)
+    if FLAGS.remote_command_transport == AGENT_TRANSPORT:
+      self._StartCommandAgent()
     if FLAGS.setup_remote_firewall:
       self.SetupRemoteFirewall()
     if self.install_packages:
-      if self.is_static:
+      if self.is_static or self.pool_key is not None:
         self.SnapshotPackages()
       self.SetupPackageManager()
     self.BurnCpu()
 
-  @vm_util.Retry(log_errors=False, poll_interval=1)
+  @vm_util.Retry(log_errors=False, poll_interval=BOOT_POLL_INTERVAL)
   def WaitForBootCompletion(self):
     """Waits until VM is has booted."""
     resp, _ = self.RemoteHostCommand('hostname', retries=1,
@@ -210,6 +470,39 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     if self.hostname is None:
       self.hostname = resp[:-1]
 
+  def WaitForBootCompletionAsync(self):
+    """Waits on the event loop until the VM has booted.
+
+    Like WaitForBootCompletion, but the ssh probes are run by the event loop,
+    so the VM does not hold a thread while it boots.
+    """
+    if (self.WaitForBootCompletion.__func__ is not
+        BaseLinuxMixin.WaitForBootCompletion.__func__):
+      # The VM waits for boot completion in its own way.
+      yield super(BaseLinuxMixin, self).WaitForBootCompletionAsync()
+      return
+    user_host = '%s@%s' % (self.user_name, self.ip_address)
+    ssh_cmd = ['ssh', '-A', '-p', str(self.ssh_port), user_host]
+    ssh_cmd.extend(self._GetSshOptions())
+    ssh_cmd.append('hostname')
+    deadline = time.time() + FLAGS.default_timeout
+    while True:
+      stdout, stderr, retcode = yield event_loop.Command(
+          ssh_cmd, suppress_warning=True)
+      if not retcode:
+        break
+      if time.time() + BOOT_POLL_INTERVAL >= deadline:
+        raise errors.VirtualMachine.RemoteCommandError(
+            'Got non-zero return code (%s) executing hostname\n'
+            'Full command: %s\nSTDOUT: %sSTDERR: %s' %
+            (retcode, ' '.join(ssh_cmd), stdout, stderr))
+      yield event_loop.Sleep(BOOT_POLL_INTERVAL)
+    if self.bootable_time is None:
+      self.bootable_time = time.time()
+    if self.hostname is None:
+      self.hostname = stdout[:-1]
+    yield event_loop.CallInThread(self._StartSshControlMaster)
+
   def SnapshotPackages(self):
     """Grabs a snapshot of the currently installed packages."""
     pass
@@ -222,12 +515,148 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     """Cleans up all installed packages.
 
     Deletes the temp directory, restores packages, and uninstalls all
-    PerfKit packages.
+    PerfKit packages. With --reuse_installed_packages, the packages and the
+    temp directory of static VMs are kept for later runs instead.
     """
-    for package_name in self._installed_packages:
+    if FLAGS.reuse_installed_packages and self.is_static:
+      logging.info('Keeping the packages installed on %s: %s', self,
+                   ', '.join(sorted(self._installed_packages)))
+      return
+    for package_name in sorted(self._installed_packages):
       self.Uninstall(package_name)
+      self._RecordUninstalledPackage(package_name)
     self.RestorePackages()
+    self._installed_os_packages.clear()
     self.RemoteCommand('rm -rf %s' % vm_util.VM_TMP_DIR)
+    self._install_manifest = None
+    self._has_remote_command_script = False
+
+  def _GetInstallLock(self, package_name):
+    """Returns the lock that is held while a PerfKit package is installed."""
+    with self._install_locks_lock:
+      return self._install_locks.setdefault(package_name, threading.Lock())
+
+  def _GetInstallManifest(self):
+    """Returns the packages in INSTALL_MANIFEST, reading it on first use.
+
+    Must be called while holding self._install_manifest_lock.
+    """
+    if self._install_manifest is None:
+      stdout, _ = self.RemoteCommand('cat %s' % INSTALL_MANIFEST,
+                                     ignore_failure=True,
+                                     suppress_warning=True)
+      self._install_manifest = dict(
+          line.split() for line in stdout.splitlines()
+          if len(line.split()) == 2)
+    return self._install_manifest
+
+  def _IsPackageInstalled(self, package_name):
+    """Returns whether a PerfKit package is installed on the VM.
+
+    With --reuse_installed_packages, a package that an earlier run installed
+    counts as installed if its fingerprint has not changed since.
+    """
+    if package_name in self._installed_packages:
+      return True
+    if not FLAGS.reuse_installed_packages:
+      return False
+    with self._install_manifest_lock:
+      fingerprint = self._GetInstallManifest().get(package_name)
+    if fingerprint is None:
+      return False
+    if fingerprint != _GetPackageFingerprint(package_name):
+      logging.info('Package %s has changed since it was installed on %s. '
+                   'Installing it again.', package_name, self)
+      return False
+    logging.info('Package %s is already installed on %s.', package_name, self)
+    self._installed_packages.add(package_name)
+    return True
+
+  def _RecordInstalledPackage(self, package_name):
+    """Records that a PerfKit package has been installed on the VM."""
+    self._installed_packages.add(package_name)
+    if not FLAGS.reuse_installed_packages:
+      return
+    with self._install_manifest_lock:
+      manifest = self._GetInstallManifest()
+      manifest[package_name] = _GetPackageFingerprint(package_name)
+      self._WriteInstallManifest()
+
+  def _RecordUninstalledPackage(self, package_name):
+    """Records that a PerfKit package has been uninstalled from the VM."""
+    self._installed_packages.discard(package_name)
+    if not FLAGS.reuse_installed_packages:
+      return
+    with self._install_manifest_lock:
+      if self._GetInstallManifest().pop(package_name, None) is not None:
+        self._WriteInstallManifest()
+
+  def _WriteInstallManifest(self):
+    """Writes INSTALL_MANIFEST.
+
+    Must be called while holding self._install_manifest_lock.
+    """
+    contents = ''.join('%s %s\n' % item
+                       for item in sorted(self._install_manifest.items()))
+    self.RemoteCommand('printf %%s %s > %s.tmp && mv %s.tmp %s' % (
+        pipes.quote(contents), INSTALL_MANIFEST, INSTALL_MANIFEST,
+        INSTALL_MANIFEST))
+
+  def _GetOsPackagesToInstall(self, packages):
+    """Returns the OS packages that InstallPackages has not installed yet.
+
+    Args:
+      packages: string. Space-separated arguments to the package manager.
+
+    Returns:
+      string. The arguments, without the packages that are already installed.
+      Arguments that include options are returned unchanged.
+    """
+    package_list = packages.split()
+    if any(package.startswith('-') for package in package_list):
+      return packages
+    return ' '.join(package for package in package_list
+                    if package not in self._installed_os_packages)
+
+  def _RecordInstalledOsPackages(self, packages):
+    if not any(package.startswith('-') for package in packages.split()):
+      self._installed_os_packages.update(packages.split())
+
+  def _GetDeclaredOsPackages(self, package):
+    """Returns the OS packages that a PerfKit package module declares."""
+    return ''
+
+  def _UpdatePackageListsOnce(self):
+    """Prepares the package manager before the first package is installed."""
+    pass
+
+  def InstallAll(self, package_names):
+    """Installs several PerfKit packages on the VM.
+
+    The OS packages that the PerfKit packages and their dependencies declare
+    are installed in a single package manager transaction first. The PerfKit
+    packages are then installed in parallel, each one as soon as the packages
+    it declares as DEPENDENCIES are installed.
+
+    Args:
+      package_names: list of strings. Names of the packages to install.
+    """
+    if not self.install_packages:
+      return
+    package_names = [package_name
+                     for package_name in _GetPackageClosure(package_names)
+                     if not self._IsPackageInstalled(package_name)]
+    if not package_names:
+      return
+    self._UpdatePackageListsOnce()
+    os_packages = set()
+    for package_name in package_names:
+      os_packages.update(self._GetDeclaredOsPackages(
+          linux_packages.PACKAGES[package_name]).split())
+    if os_packages:
+      self.InstallPackages(' '.join(sorted(os_packages)))
+    background_tasks.RunThreadedInDependencyOrder(
+        self.Install, package_names, _GetPackageDependencies)
 
   def GetPathToConfig(self, package_name):
     """Returns the path to the config file for PerfKit packages.
@@ -287,7 +716,7 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     remote_location = '%s@%s:%s' % (
         self.user_name, self.ip_address, remote_path)
     scp_cmd = ['scp', '-P', str(self.ssh_port), '-pr']
-    scp_cmd.extend(vm_util.GetSshOptions(self.ssh_private_key))
+    scp_cmd.extend(self._GetSshOptions())
     if copy_to:
       scp_cmd.extend([file_path, remote_location])
     else:
@@ -317,7 +746,9 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     """Runs a command on the VM.
 
     This is guaranteed to run on the host VM, whereas RemoteCommand might run
-    within i.e. a container in the host VM.
+    within i.e. a container in the host VM. If the VM's command agent is in use
+    (see --remote_command_transport), the command is sent to the agent unless
+    it requires a login shell.
 
     Args:
       command: A valid bash command.
@@ -337,6 +768,28 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     Raises:
       RemoteCommandError: If there was a problem establishing the connection.
     """
+    agent = self._command_agent
+    if agent and not login_shell:
+      try:
+        return self._RemoteHostCommandViaAgent(
+            agent, command, should_log, ignore_failure, suppress_warning,
+            timeout)
+      except errors.VirtualMachine.CommandAgentSendError:
+        # The agent never received the command, so it is safe to run it again
+        # over ssh.
+        logging.warning('The command agent on %s is unavailable. Falling back '
+                        'to ssh.', self.name, exc_info=True)
+        self._command_agent = None
+        agent.Close()
+      except errors.VirtualMachine.CommandAgentError as e:
+        # The command may have run, so running it again is not safe. Later
+        # commands use ssh.
+        self._command_agent = None
+        agent.Close()
+        raise errors.VirtualMachine.RemoteCommandError(
+            'Lost the connection to the command agent on %s while running '
+            '%s: %s' % (self.name, command, e))
+
     if vm_util.RunningOnWindows():
       # Multi-line commands passed to ssh won't work on Windows unless the
       # newlines are escaped.
@@ -344,7 +797,7 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
 
     user_host = '%s@%s' % (self.user_name, self.ip_address)
     ssh_cmd = ['ssh', '-A', '-p', str(self.ssh_port), user_host]
-    ssh_cmd.extend(vm_util.GetSshOptions(self.ssh_private_key))
+    ssh_cmd.extend(self._GetSshOptions())
     try:
       if login_shell:
         ssh_cmd.extend(['-t', '-t', 'bash -l -c "%s"' % command])
@@ -363,6 +816,10 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
       if login_shell:
         self._pseudo_tty_lock.release()
 
+    if retcode != 255:
+      # The VM is reachable, so later commands can share a single connection.
+      self._StartSshControlMaster()
+
     if retcode:
       full_cmd = ' '.join(ssh_cmd)
       error_text = ('Got non-zero return code (%s) executing %s\n'
@@ -373,6 +830,59 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
 
     return stdout, stderr
 
+  def RemoteCommandBatch(self, commands, should_log=False,
+                         ignore_failure=False, suppress_warning=False,
+                         timeout=None):
+    """Runs a sequence of independent commands on the VM in one round trip.
+
+    The commands are sent to the VM as a single script. See
+    BaseOsMixin.RemoteCommandBatch for a description of the arguments, return
+    value and exceptions.
+    """
+    if len(commands) < 2:
+      return super(BaseLinuxMixin, self).RemoteCommandBatch(
+          commands, should_log=should_log, ignore_failure=ignore_failure,
+          suppress_warning=suppress_warning, timeout=timeout)
+
+    marker = 'pkb-batch-%s' % uuid.uuid4().hex
+    script = ['pkb_batch_dir=$(mktemp -d)']
+    for index, command in enumerate(commands):
+      script.append(_BATCH_COMMAND_TEMPLATE.format(
+          command=command, index=index, marker=marker))
+      if not ignore_failure:
+        script.append(_BATCH_STOP_ON_FAILURE)
+    script.append('rm -rf "$pkb_batch_dir"')
+    stdout, stderr = self.RemoteCommand('\n'.join(script), ignore_failure=True,
+                                        suppress_warning=True, timeout=timeout)
+
+    results = []
+    for part in stdout.split(marker + ' ')[1:]:
+      header, _, output = part.partition('\n')
+      command_stdout, _, command_stderr = output.partition(
+          '\n%s-stderr\n' % marker)
+      index, retcode = (int(value) for value in header.split())
+      command_stderr = command_stderr[:-1]
+      command = commands[index]
+      debug_text = ('Ran %s in batch. Got return code (%s).\n'
+                    'STDOUT: %s\nSTDERR: %s' %
+                    (command, retcode, command_stdout, command_stderr))
+      if should_log or (retcode and not suppress_warning):
+        logging.info(debug_text)
+      else:
+        logging.debug(debug_text)
+      if retcode and not ignore_failure:
+        raise errors.VirtualMachine.RemoteCommandError(
+            'Got non-zero return code (%s) executing %s in batch\n'
+            'STDOUT: %sSTDERR: %s' %
+            (retcode, command, command_stdout, command_stderr))
+      results.append((command_stdout, command_stderr))
+
+    if len(results) != len(commands):
+      raise errors.VirtualMachine.RemoteCommandError(
+          'Only %d of %d batched commands completed.\nSTDOUT: %sSTDERR: %s' %
+          (len(results), len(commands), stdout, stderr))
+    return results
+
   def MoveFile(self, target, source_path, remote_path=''):
     self.MoveHostFile(target, source_path, remote_path)
 
@@ -613,20 +1123,31 @@ class RhelMixin(BaseLinuxMixin):
 
   def InstallPackages(self, packages):
     """Installs packages using the yum package manager."""
-    self.RemoteCommand('sudo yum install -y %s' % packages)
+    with self._package_manager_lock:
+      packages = self._GetOsPackagesToInstall(packages)
+      if not packages:
+        return
+      self.RemoteCommand('sudo yum install -y %s' % packages)
+      self._RecordInstalledOsPackages(packages)
 
   def InstallPackageGroup(self, package_group):
     """Installs a 'package group' using the yum package manager."""
-    self.RemoteCommand('sudo yum groupinstall -y "%s"' % package_group)
+    with self._package_manager_lock:
+      self.RemoteCommand('sudo yum groupinstall -y "%s"' % package_group)
 
   def Install(self, package_name):
     """Installs a PerfKit package on the VM."""
     if not self.install_packages:
       return
-    if package_name not in self._installed_packages:
-      package = linux_packages.PACKAGES[package_name]
-      package.YumInstall(self)
-      self._installed_packages.add(package_name)
+    with self._GetInstallLock(package_name):
+      if not self._IsPackageInstalled(package_name):
+        package = linux_packages.PACKAGES[package_name]
+        package.YumInstall(self)
+        self._RecordInstalledPackage(package_name)
+
+  def _GetDeclaredOsPackages(self, package):
+    """Returns the OS packages that a PerfKit package module declares."""
+    return getattr(package, 'YUM_PACKAGES', '')
 
   def Uninstall(self, package_name):
     """Uninstalls a PerfKit package on the VM."""
@@ -708,34 +1229,48 @@ class DebianMixin(BaseLinuxMixin):
   @vm_util.Retry()
   def InstallPackages(self, packages):
     """Installs packages using the apt package manager."""
-    try:
-      install_command = ('sudo DEBIAN_FRONTEND=\'noninteractive\' '
-                         '/usr/bin/apt-get -y install %s' % (packages))
-      self.RemoteCommand(install_command)
-    except errors.VirtualMachine.RemoteCommandError as e:
-      # TODO(user): Remove code below after Azure fix their package repository,
-      # or add code to recover the sources.list
-      self.RemoteCommand(
-          'sudo sed -i.bk "s/azure.archive.ubuntu.com/archive.ubuntu.com/g" '
-          '/etc/apt/sources.list')
-      logging.info('Installing "%s" failed on %s. This may be transient. '
-                   'Updating package list.', packages, self)
+    with self._package_manager_lock:
+      packages = self._GetOsPackagesToInstall(packages)
+      if not packages:
+        return
+      try:
+        install_command = ('sudo DEBIAN_FRONTEND=\'noninteractive\' '
+                           '/usr/bin/apt-get -y install %s' % (packages))
+        self.RemoteCommand(install_command)
+      except errors.VirtualMachine.RemoteCommandError as e:
+        # TODO(user): Remove code below after Azure fix their package
+        # repository, or add code to recover the sources.list
+        self.RemoteCommand(
+            'sudo sed -i.bk "s/azure.archive.ubuntu.com/archive.ubuntu.com/g" '
+            '/etc/apt/sources.list')
+        logging.info('Installing "%s" failed on %s. This may be transient. '
+                     'Updating package list.', packages, self)
+        self.AptUpdate()
+        raise e
+      self._RecordInstalledOsPackages(packages)
+
+  def _UpdatePackageListsOnce(self):
+    """Runs apt-get update before the first package is installed."""
+    if not self._apt_updated:
       self.AptUpdate()
-      raise e
+      self._apt_updated = True
 
   def Install(self, package_name):
     """Installs a PerfKit package on the VM."""
-    if not self.install_packages:
+    if not self.install_packages or self._IsPackageInstalled(package_name):
       return
 
-    if not self._apt_updated:
-      self.AptUpdate()
-      self._apt_updated = True
+    self._UpdatePackageListsOnce()
+
+    with self._GetInstallLock(package_name):
+      if not self._IsPackageInstalled(package_name):
+        package = linux_packages.PACKAGES[package_name]
+        package.AptInstall(self)
+        self._RecordInstalledPackage(package_name)
 
-    if package_name not in self._installed_packages:
-      package = linux_packages.PACKAGES[package_name]
-      package.AptInstall(self)
-      self._installed_packages.add(package_name)
+  def _GetDeclaredOsPackages(self, package):
+    """Returns the OS packages that a PerfKit package module declares."""
+    return getattr(package, 'APT_PACKAGES', '')
 
   def Uninstall(self, package_name):
     """Uninstalls a PerfKit package on the VM."""
@@ -777,8 +1312,7 @@ class DebianMixin(BaseLinuxMixin):
       commands.append("echo -e 'Acquire::https::proxy \"%s\";' |"
                       'sudo tee -a %s' % (FLAGS.https_proxy, apt_proxy_file))
 
-    if commands:
-      self.RemoteCommand(";".join(commands))
+    self.RemoteCommandBatch(commands)
 
 
 class ContainerizedDebianMixin(DebianMixin):
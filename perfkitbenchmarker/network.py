@@ -121,6 +121,13 @@ class BaseNetwork(object):
         benchmark_spec.networks[key] = cls(spec)
       return benchmark_spec.networks[key]
 
+  def GetResourceDependencies(self):
+    """Returns the networks that must be created before this one.
+
+    See resource.BaseResource.GetResourceDependencies.
+    """
+    return []
+
   def Create(self):
     """Creates the actual network."""
     pass
@@ -56,14 +56,17 @@ all: PerfKitBenchmarker will run all of the above stages (provision,
 """
 
 import collections
+import contextlib
 import getpass
 import itertools
 import logging
 import sys
+import threading
 import time
 import uuid
 
 from perfkitbenchmarker import archive
+from perfkitbenchmarker import background_tasks
 from perfkitbenchmarker import benchmark_sets
 from perfkitbenchmarker import benchmark_spec
 from perfkitbenchmarker import benchmark_status
@@ -75,13 +78,17 @@ from perfkitbenchmarker import flags
 from perfkitbenchmarker import linux_benchmarks
 from perfkitbenchmarker import log_util
 from perfkitbenchmarker import os_types
+from perfkitbenchmarker import rate_limiter
+from perfkitbenchmarker import regression_detection
 from perfkitbenchmarker import requirements
 from perfkitbenchmarker import spark_service
 from perfkitbenchmarker import stages
 from perfkitbenchmarker import static_virtual_machine
+from perfkitbenchmarker import task_timing
 from perfkitbenchmarker import timing_util
 from perfkitbenchmarker import traces
 from perfkitbenchmarker import version
+from perfkitbenchmarker import vm_pool
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker import windows_benchmarks
 from perfkitbenchmarker.configs import benchmark_config_spec
@@ -175,6 +182,20 @@ flags.DEFINE_bool(
     'execution ends. When False, benchmarks continue to be scheduled. Does not '
     'apply to keyboard interrupts, which will always prevent further '
     'benchmarks from being scheduled.')
+flags.DEFINE_integer(
+    'parallel_benchmarks', 1,
+    'The maximum number of benchmarks from the run list to execute '
+    'concurrently. Each benchmark still provisions and tears down its own '
+    'resources. The default of 1 runs benchmarks serially.',
+    lower_bound=1)
+flags.DEFINE_integer(
+    'provision_ahead', 0,
+    'The number of benchmarks from the run list to provision and prepare '
+    'while the current benchmark is in its run phase. Run phases still '
+    'execute one at a time and in run list order, but the provisioning of '
+    'later benchmarks and the teardown of earlier ones overlap with them. '
+    'Cannot be combined with --parallel_benchmarks.',
+    lower_bound=0)
 flags.DEFINE_boolean(
     'ignore_package_requirements', False,
     'Disables Python package requirement runtime checks.')
@@ -206,6 +227,10 @@ flags.DEFINE_string('ftp_proxy', '',
 
 MAX_RUN_URI_LENGTH = 8
 
+# Timeout of each wait of a benchmark for its turn to execute its run phase.
+# Waits without a timeout cannot be interrupted by KeyboardInterrupt.
+_RUN_PHASE_TURN_WAIT_TIMEOUT = 1000.
+
 
 events.initialization_complete.connect(traces.RegisterAll)
 
@@ -399,7 +424,8 @@ def DoCleanupPhase(benchmark, name, spec, timer):
   """
   logging.info('Cleaning up benchmark %s', name)
 
-  if spec.always_call_cleanup or any([vm.is_static for vm in spec.vms]):
+  if spec.always_call_cleanup or any([vm.is_static or vm.pool_key is not None
+                                      for vm in spec.vms]):
     with timer.Measure('Benchmark Cleanup'):
       benchmark.Cleanup(spec)
 
@@ -452,8 +478,58 @@ def _GetBenchmarkSpec(benchmark_config, benchmark_name, benchmark_uid):
       raise
 
 
+class _RunPhaseTurns(object):
+  """Lets benchmarks execute their run phases one at a time, in order.
+
+  Benchmarks whose run phases would otherwise overlap wait for the
+  benchmarks with lower sequence numbers to finish their run phase, or to
+  finish entirely if they never reach it.
+  """
+
+  def __init__(self, sequence_numbers):
+    """Initializes a _RunPhaseTurns.
+
+    Args:
+      sequence_numbers: Iterable of ints. The sequence numbers of all
+          benchmarks that take turns.
+    """
+    self._condition = threading.Condition()
+    self._pending = collections.deque(sorted(sequence_numbers))
+    self._finished = set()
+
+  @contextlib.contextmanager
+  def Take(self, sequence_number):
+    """Waits for a benchmark's turn and holds it within the enclosed block.
+
+    Args:
+      sequence_number: int. The sequence number of the benchmark.
+    """
+    with self._condition:
+      if self._pending and self._pending[0] != sequence_number:
+        logging.info(
+            'Waiting for earlier benchmarks to finish their run phase.')
+        while self._pending and self._pending[0] != sequence_number:
+          self._condition.wait(_RUN_PHASE_TURN_WAIT_TIMEOUT)
+    try:
+      yield
+    finally:
+      self.Finish(sequence_number)
+
+  def Finish(self, sequence_number):
+    """Ends a benchmark's turn, or gives it up if it has not been taken.
+
+    Args:
+      sequence_number: int. The sequence number of the benchmark.
+    """
+    with self._condition:
+      self._finished.add(sequence_number)
+      while self._pending and self._pending[0] in self._finished:
+        self._pending.popleft()
+      self._condition.notify_all()
+
+
 def RunBenchmark(benchmark, sequence_number, total_benchmarks, benchmark_config,
-                 benchmark_uid, collector):
+                 benchmark_uid, collector, run_phase_turns=None):
   """Runs a single benchmark and adds the results to the collector.
 
   Args:
@@ -465,6 +541,8 @@ def RunBenchmark(benchmark, sequence_number, total_benchmarks, benchmark_config,
     benchmark_uid: An identifier unique to this run of the benchmark even
         if the same benchmark is run multiple times with different configs.
     collector: The SampleCollector object to add samples to.
+    run_phase_turns: Optional _RunPhaseTurns. If provided, the run phase waits
+        for the benchmark's turn.
   """
   benchmark_name = benchmark.BENCHMARK_NAME
 
@@ -486,12 +564,14 @@ def RunBenchmark(benchmark, sequence_number, total_benchmarks, benchmark_config,
             DoPreparePhase(benchmark, benchmark_name, spec, detailed_timer)
 
           if stages.RUN in FLAGS.run_stage:
-            deadline = time.time() + FLAGS.run_stage_time
-            while True:
-              DoRunPhase(benchmark, benchmark_name, spec, collector,
-                         detailed_timer)
-              if time.time() > deadline:
-                break
+            turns = run_phase_turns or _RunPhaseTurns([sequence_number])
+            with turns.Take(sequence_number):
+              deadline = time.time() + FLAGS.run_stage_time
+              while True:
+                DoRunPhase(benchmark, benchmark_name, spec, collector,
+                           detailed_timer)
+                if time.time() > deadline:
+                  break
 
           if stages.CLEANUP in FLAGS.run_stage:
             DoCleanupPhase(benchmark, benchmark_name, spec, detailed_timer)
@@ -513,6 +593,10 @@ def RunBenchmark(benchmark, sequence_number, total_benchmarks, benchmark_config,
         collector.AddSamples(detailed_timer.GenerateSamples(include_runtimes,
                                                             include_timestamps),
                              benchmark_name, spec)
+        collector.AddSamples(rate_limiter.PopSamples(spec.uid),
+                             benchmark_name, spec)
+        collector.AddSamples(task_timing.PopSamples(spec.uid),
+                             benchmark_name, spec)
 
       except:
         # Resource cleanup (below) can take a long time. Log the error to give
@@ -566,6 +650,13 @@ def SetUpPKB():
   disk.WarnAndTranslateDiskFlags()
   _LogCommandLineFlags()
 
+  if FLAGS.parallel_benchmarks > 1 and FLAGS.provision_ahead:
+    raise errors.Setup.InvalidFlagConfigurationError(
+        '--provision_ahead cannot be combined with --parallel_benchmarks.')
+  if FLAGS.detect_regressions and not FLAGS.warehouse_path:
+    raise errors.Setup.InvalidFlagConfigurationError(
+        '--detect_regressions requires --warehouse_path.')
+
   # Check environment.
   if not FLAGS.ignore_package_requirements:
     requirements.CheckBasicRequirements()
@@ -590,6 +681,109 @@ def SetUpPKB():
   events.initialization_complete.send(parsed_flags=FLAGS)
 
 
+def _RunBenchmarkAndUpdateStatus(run_args, run_status_list, total_runs,
+                                 collector, run_phase_turns=None):
+  """Runs a single benchmark and records its outcome in run_status_list.
+
+  Args:
+    run_args: tuple. The first five arguments to pass to RunBenchmark.
+    run_status_list: list of [benchmark_name, benchmark_uid, benchmark_status].
+        The status element is updated to reflect the outcome of the run.
+    total_runs: int. Number of benchmark runs in the run list.
+    collector: The SampleCollector object to add samples to.
+    run_phase_turns: Optional _RunPhaseTurns to pass to RunBenchmark.
+
+  Returns:
+    True if further benchmarks should be scheduled, or False otherwise.
+
+  Raises:
+    KeyboardInterrupt: If the benchmark was interrupted.
+  """
+  benchmark_module, sequence_number, _, _, benchmark_uid = run_args
+  benchmark_name = benchmark_module.BENCHMARK_NAME
+  try:
+    run_status_list[2] = benchmark_status.FAILED
+    RunBenchmark(*run_args, collector=collector,
+                 run_phase_turns=run_phase_turns)
+    run_status_list[2] = benchmark_status.SUCCEEDED
+  except BaseException as e:
+    msg = 'Benchmark {0}/{1} {2} (UID: {3}) failed.'.format(
+        sequence_number, total_runs, benchmark_name, benchmark_uid)
+    if isinstance(e, KeyboardInterrupt):
+      logging.error('%s Execution will not continue.', msg)
+      raise
+    if FLAGS.stop_after_benchmark_failure:
+      logging.error('%s Execution will not continue.', msg)
+      return False
+    logging.error('%s Execution will continue.', msg)
+  finally:
+    if run_phase_turns:
+      # Give up the turn if the benchmark failed before its run phase.
+      run_phase_turns.Finish(sequence_number)
+  return True
+
+
+def _RunBenchmarksSerially(benchmark_run_list, collector):
+  """Runs each benchmark in the run list, one at a time.
+
+  Args:
+    benchmark_run_list: list of (args, run_status_list) pairs, as returned by
+        _CreateBenchmarkRunList.
+    collector: The SampleCollector object to add samples to.
+  """
+  for run_args, run_status_list in benchmark_run_list:
+    try:
+      should_continue = _RunBenchmarkAndUpdateStatus(
+          run_args, run_status_list, len(benchmark_run_list), collector)
+      if not should_continue:
+        break
+    except KeyboardInterrupt:
+      break
+
+
+def _RunBenchmarksInParallel(benchmark_run_list, collector, max_concurrency,
+                             run_phase_turns=None):
+  """Runs the benchmarks in the run list, up to max_concurrency at once.
+
+  Each benchmark runs in its own thread with its own BenchmarkSpec and log
+  label. After a failure with --stop_after_benchmark_failure, or after a
+  KeyboardInterrupt, benchmarks that have not started yet are skipped.
+
+  Args:
+    benchmark_run_list: list of (args, run_status_list) pairs, as returned by
+        _CreateBenchmarkRunList.
+    collector: The SampleCollector object to add samples to.
+    max_concurrency: int. Maximum number of benchmarks to run at once.
+    run_phase_turns: Optional _RunPhaseTurns. If provided, the run phases of
+        the benchmarks execute one at a time, in run list order.
+  """
+  stop_scheduling = threading.Event()
+
+  def _RunBenchmarkUnlessStopped(run_args, run_status_list):
+    if stop_scheduling.is_set():
+      if run_phase_turns:
+        run_phase_turns.Finish(run_args[1])
+      return
+    try:
+      should_continue = _RunBenchmarkAndUpdateStatus(
+          run_args, run_status_list, len(benchmark_run_list), collector,
+          run_phase_turns=run_phase_turns)
+      if not should_continue:
+        stop_scheduling.set()
+    except KeyboardInterrupt:
+      stop_scheduling.set()
+      raise
+
+  try:
+    background_tasks.RunThreaded(
+        _RunBenchmarkUnlessStopped,
+        [((run_args, run_status_list), {})
+         for run_args, run_status_list in benchmark_run_list],
+        max_concurrent_threads=max_concurrency)
+  except KeyboardInterrupt:
+    pass
+
+
 def RunBenchmarks():
   """Runs all benchmarks in PerfKitBenchmarker.
 
@@ -598,27 +792,31 @@ def RunBenchmarks():
   """
   benchmark_run_list = _CreateBenchmarkRunList()
   collector = SampleCollector()
+  regression_detector = regression_detection.CreateDetector()
+  if regression_detector:
+    events.samples_created.connect(regression_detector.AnnotateSamples,
+                                   weak=False)
   try:
-    for run_args, run_status_list in benchmark_run_list:
-      benchmark_module, sequence_number, _, _, benchmark_uid = run_args
-      benchmark_name = benchmark_module.BENCHMARK_NAME
-      try:
-        run_status_list[2] = benchmark_status.FAILED
-        RunBenchmark(*run_args, collector=collector)
-        run_status_list[2] = benchmark_status.SUCCEEDED
-      except BaseException as e:
-        msg = 'Benchmark {0}/{1} {2} (UID: {3}) failed.'.format(
-            sequence_number, len(benchmark_run_list), benchmark_name,
-            benchmark_uid)
-        if (isinstance(e, KeyboardInterrupt) or
-            FLAGS.stop_after_benchmark_failure):
-          logging.error('%s Execution will not continue.', msg)
-          break
-        else:
-          logging.error('%s Execution will continue.', msg)
+    if FLAGS.parallel_benchmarks > 1:
+      _RunBenchmarksInParallel(benchmark_run_list, collector,
+                               FLAGS.parallel_benchmarks)
+    elif FLAGS.provision_ahead:
+      # Benchmarks are provisioned and prepared ahead of time, but their run
+      # phases execute serially so that their measurements do not interfere.
+      run_phase_turns = _RunPhaseTurns(
+          run_args[1] for run_args, _ in benchmark_run_list)
+      _RunBenchmarksInParallel(benchmark_run_list, collector,
+                               FLAGS.provision_ahead + 1, run_phase_turns)
+    else:
+      _RunBenchmarksSerially(benchmark_run_list, collector)
   finally:
-    if collector.samples:
-      collector.PublishSamples()
+    if regression_detector:
+      events.samples_created.disconnect(regression_detector.AnnotateSamples)
+      regression_detector.Close()
+
+    vm_pool.GetVmPool().DeleteAll()
+
+    collector.Close()
 
     if benchmark_run_list:
       run_status_lists = tuple(r for _, r in benchmark_run_list)
@@ -636,6 +834,10 @@ def RunBenchmarks():
                        prefix=FLAGS.run_uri + '_')
   all_benchmarks_succeeded = all(r[2] == benchmark_status.SUCCEEDED
                                  for _, r in benchmark_run_list)
+  if regression_detector and (regression_detector.regressions or
+                              regression_detector.failed_batch_count):
+    logging.error(regression_detector.CreateSummary())
+    return 1
   return 0 if all_benchmarks_succeeded else 1
 
 
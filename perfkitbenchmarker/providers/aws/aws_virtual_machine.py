@@ -27,6 +27,7 @@ from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import linux_virtual_machine
+from perfkitbenchmarker import resource_poller
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker import windows_virtual_machine
@@ -71,6 +72,23 @@ INSTANCE_DELETED_STATUSES = frozenset(['shutting-down', 'terminated'])
 INSTANCE_KNOWN_STATUSES = INSTANCE_EXISTS_STATUSES | INSTANCE_DELETED_STATUSES
 
 
+def _DescribeInstanceStates(region, instance_ids):
+  """Returns the states of instances in a region, keyed by instance ID."""
+  describe_cmd = util.AWS_PREFIX + [
+      'ec2',
+      'describe-instances',
+      '--region=%s' % region,
+      '--filter=Name=instance-id,Values=%s' % ','.join(instance_ids)]
+  stdout, _ = util.IssueRetryableCommand(describe_cmd)
+  response = json.loads(stdout)
+  return {instance['InstanceId']: instance['State']['Name']
+          for reservation in response['Reservations']
+          for instance in reservation['Instances']}
+
+
+_INSTANCE_STATE_POLLER = resource_poller.BatchPoller(_DescribeInstanceStates)
+
+
 def GetBlockDeviceMap(machine_type):
   """Returns the block device map to expose all devices for a given machine.
 
@@ -267,23 +285,25 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
 
   def _Exists(self):
     """Returns true if the VM exists."""
-    describe_cmd = util.AWS_PREFIX + [
-        'ec2',
-        'describe-instances',
-        '--region=%s' % self.region,
-        '--filter=Name=instance-id,Values=%s' % self.id]
-    stdout, _ = util.IssueRetryableCommand(describe_cmd)
-    response = json.loads(stdout)
-    reservations = response['Reservations']
-    assert len(reservations) < 2, 'Too many reservations.'
-    if not reservations:
+    status = _INSTANCE_STATE_POLLER.GetState(self.region, self.id)
+    if status is None:
       return False
-    instances = reservations[0]['Instances']
-    assert len(instances) == 1, 'Wrong number of instances.'
-    status = instances[0]['State']['Name']
     assert status in INSTANCE_KNOWN_STATUSES, status
     return status in INSTANCE_EXISTS_STATUSES
 
+  def _IsReady(self):
+    """Returns true if the VM is running.
+
+    Raises:
+      errors.Resource.CreationError: If the VM is terminating instead, for
+          example because capacity ran out.
+    """
+    status = _INSTANCE_STATE_POLLER.GetState(self.region, self.id)
+    if status in INSTANCE_DELETED_STATUSES:
+      raise errors.Resource.CreationError(
+          'Instance %s is %s instead of starting.' % (self.id, status))
+    return status == 'running'
+
   def CreateScratchDisk(self, disk_spec):
     """Create a VM's scratch disk.
 
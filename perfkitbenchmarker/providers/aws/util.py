@@ -78,7 +78,8 @@ def AddDefaultTags(resource_id, region):
   AddTags(resource_id, region, **tags)
 
 
-@vm_util.Retry()
+@vm_util.Retry(poll_interval=vm_util.COMMAND_RETRY_INTERVAL, fuzz=1,
+               backoff_factor=2, max_poll_interval=vm_util.POLL_INTERVAL)
 def IssueRetryableCommand(cmd, env=None):
   """Tries running the provided command until it succeeds or times out.
 
@@ -17,10 +17,11 @@ Disks can be created, deleted, attached to VMs, and detached from VMs.
 Use 'gcloud compute disk-types list' to determine valid disk types.
 """
 
-import json
+import functools
 
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import resource_poller
 from perfkitbenchmarker.providers.gcp import util
 from perfkitbenchmarker.providers import GCP
 
@@ -51,6 +52,9 @@ DISK_METADATA = {
 
 disk.RegisterDiskTypeMap(GCP, DISK_TYPE)
 
+_DISK_POLLER = resource_poller.BatchPoller(
+    functools.partial(util.ListZonalResources, 'disks'))
+
 
 class GceDisk(disk.BaseDisk):
   """Object representing an GCE Disk."""
@@ -82,13 +86,8 @@ class GceDisk(disk.BaseDisk):
 
   def _Exists(self):
     """Returns true if the disk exists."""
-    cmd = util.GcloudCommand(self, 'compute', 'disks', 'describe', self.name)
-    stdout, _, _ = cmd.Issue(suppress_warning=True)
-    try:
-      json.loads(stdout)
-    except ValueError:
-      return False
-    return True
+    return _DISK_POLLER.GetState(util.ZoneScope(self.project, self.zone),
+                                 self.name) is not None
 
   def Attach(self, vm):
     """Attaches the disk to a VM.
@@ -24,6 +24,7 @@ All VM specifics are self-contained and the class provides methods to
 operate on the VM: boot, shutdown, etc.
 """
 
+import functools
 import json
 import logging
 import re
@@ -36,6 +37,7 @@ from perfkitbenchmarker import flags
 from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import linux_virtual_machine as linux_vm
 from perfkitbenchmarker import providers
+from perfkitbenchmarker import resource_poller
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker import windows_virtual_machine
@@ -53,6 +55,9 @@ UBUNTU_IMAGE = 'ubuntu-14-04'
 RHEL_IMAGE = 'rhel-7'
 WINDOWS_IMAGE = 'windows-2012-r2'
 
+_INSTANCE_POLLER = resource_poller.BatchPoller(
+    functools.partial(util.ListZonalResources, 'instances'))
+
 
 class MemoryDecoder(option_decoders.StringDecoder):
   """Verifies and decodes a config option value specifying a memory size."""
@@ -359,14 +364,8 @@ class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
 
   def _Exists(self):
     """Returns true if the VM exists."""
-    getinstance_cmd = util.GcloudCommand(self, 'compute', 'instances',
-                                         'describe', self.name)
-    stdout, _, _ = getinstance_cmd.Issue(suppress_warning=True)
-    try:
-      json.loads(stdout)
-    except ValueError:
-      return False
-    return True
+    return _INSTANCE_POLLER.GetState(util.ZoneScope(self.project, self.zone),
+                                     self.name) is not None
 
   def CreateScratchDisk(self, disk_spec):
     """Create a VM's scratch disk.
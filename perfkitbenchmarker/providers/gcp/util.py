@@ -13,7 +13,9 @@
 # limitations under the License.
 """Utilities for working with Google Cloud Platform resources."""
 
+from collections import namedtuple
 from collections import OrderedDict
+import json
 
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import vm_util
@@ -21,6 +23,32 @@ from perfkitbenchmarker import vm_util
 FLAGS = flags.FLAGS
 
 
+class ZoneScope(namedtuple('ZoneScope', ['project', 'zone'])):
+  """The project and zone of zonal GCE resources.
+
+  May be passed to GcloudCommand in place of a resource.
+  """
+
+
+def ListZonalResources(collection, zone_scope, names):
+  """Describes named resources of a zonal collection with one gcloud call.
+
+  Args:
+    collection: string. The collection of the resources, such as 'instances'.
+    zone_scope: ZoneScope. The project and zone of the resources.
+    names: list of strings. The names of the resources.
+
+  Returns:
+    dict mapping the name of each resource that exists to its description.
+  """
+  cmd = GcloudCommand(zone_scope, 'compute', collection, 'list')
+  del cmd.flags['zone']
+  cmd.flags['zones'] = zone_scope.zone
+  cmd.flags['filter'] = 'name ~ ^(%s)$' % '|'.join(names)
+  stdout, _ = cmd.IssueRetryable()
+  return {resource['name']: resource for resource in json.loads(stdout)}
+
+
 class GcloudCommand(object):
   """A gcloud command.
 
@@ -15,21 +15,32 @@
 """Classes to collect and publish performance samples to various sinks."""
 
 import abc
+import cPickle
 import csv
 import io
 import itertools
 import json
 import logging
 import operator
+import os
 import pprint
+import Queue
 import sys
+import tempfile
+import threading
 import time
+import traceback
 import uuid
 
+from perfkitbenchmarker import background_tasks
+from perfkitbenchmarker import columnar_results
 from perfkitbenchmarker import disk
+from perfkitbenchmarker import errors
 from perfkitbenchmarker import events
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import flag_util
+from perfkitbenchmarker import results_warehouse
+from perfkitbenchmarker import sample_store
 from perfkitbenchmarker import version
 from perfkitbenchmarker import vm_util
 
@@ -66,6 +77,18 @@ flags.DEFINE_string(
     'csv_path',
     None,
     'A path to write CSV-format results')
+flags.DEFINE_string(
+    'columnar_path',
+    None,
+    'A path to write results in the compressed columnar format of '
+    'perfkitbenchmarker.columnar_results, which can be read one column at a '
+    'time.')
+flags.DEFINE_string(
+    'warehouse_path',
+    None,
+    'A path to a SQLite database to add results to, which collects the '
+    'results of many runs for historical queries. See '
+    'perfkitbenchmarker.results_warehouse.')
 
 flags.DEFINE_string(
     'bigquery_table',
@@ -89,6 +112,27 @@ flags.DEFINE_string(
     None,
     'GCS bucket to upload records to. Bucket must exist.')
 
+flags.DEFINE_integer(
+    'upload_chunk_size_mb', 64,
+    'Approximate size in MB of each file that the BigQuery and Cloud Storage '
+    'publishers upload. Larger sets of samples are split into several files, '
+    'which are uploaded concurrently and retried independently.',
+    lower_bound=1)
+
+flags.DEFINE_boolean(
+    'stream_samples', False,
+    'Whether to publish samples in a background thread as they are created, '
+    'rather than all at once at the end of the run, or of each benchmark with '
+    '--publish_after_run. The JSON, CSV, BigQuery and Cloud Storage '
+    'publishers then write samples as they arrive, so that they are not lost '
+    'if the run is interrupted and do not accumulate in memory. The results '
+    'summary and log are then written for each batch of samples.')
+flags.DEFINE_integer(
+    'stream_samples_queue_size', 10,
+    'With --stream_samples, the maximum number of batches of samples waiting '
+    'to be published. When the queue is full, benchmarks that add samples '
+    'wait for the publishers to catch up.', lower_bound=1)
+
 flags.DEFINE_multistring(
     'metadata',
     [],
@@ -101,6 +145,20 @@ DEFAULT_JSON_OUTPUT_NAME = 'perfkitbenchmarker_results.json'
 DEFAULT_CREDENTIALS_JSON = 'credentials.json'
 GCS_OBJECT_NAME_LENGTH = 20
 
+# Maximum number of samples that a ColumnarPublisher writes in one row group.
+_COLUMNAR_ROW_GROUP_SIZE = 100000
+# Maximum number of samples sent to the publishers at once by --stream_samples.
+_STREAM_BATCH_SIZE = 1000
+# Default size of the files uploaded by the BigQuery and Cloud Storage
+# publishers. See --upload_chunk_size_mb.
+DEFAULT_MAX_UPLOAD_CHUNK_BYTES = 64 << 20
+# Number of full upload chunks after which an _UploadingPublisher uploads them
+# without waiting for a Flush.
+_MAX_PENDING_UPLOAD_CHUNKS = 4
+# For situations where an interruptable wait is necessary, a loop of waits with
+# long timeouts is used instead.
+_LONG_TIMEOUT = 1000.
+
 
 def GetLabelsFromDict(metadata):
   """Converts a metadata dictionary to a string of labels.
@@ -198,7 +256,14 @@ DEFAULT_METADATA_PROVIDERS = [DefaultMetadataProvider()]
 
 
 class SamplePublisher(object):
-  """An object that can publish performance samples."""
+  """An object that can publish performance samples.
+
+  Samples are either published all at once with PublishSamples, or
+  incrementally: Open is called once, then AppendSamples for each batch of
+  samples, Flush whenever the samples appended so far should be published, and
+  finally Close. By default, appended samples are kept in memory until the
+  next Flush, which passes them to PublishSamples.
+  """
 
   __metaclass__ = abc.ABCMeta
 
@@ -211,17 +276,93 @@ class SamplePublisher(object):
     overwritten.
 
     Args:
-      samples: list of dicts to publish.
+      samples: Sequence of dicts to publish, such as a list or a
+          sample_store.SampleStore. It may be iterated more than once.
     """
     raise NotImplementedError()
 
+  def Open(self):
+    """Starts publishing samples incrementally."""
+    self._pending_samples = sample_store.SampleStore()
+
+  def AppendSamples(self, samples):
+    """Publishes a batch of samples, or prepares to publish them.
+
+    Args:
+      samples: Sequence of dicts to publish.
+    """
+    self._pending_samples.Extend(samples)
+
+  def Flush(self):
+    """Publishes the samples appended so far that have not been published."""
+    if self._pending_samples:
+      samples = self._pending_samples
+      self._pending_samples = sample_store.SampleStore()
+      self.PublishSamples(samples)
 
+  def Close(self):
+    """Publishes the remaining samples and stops publishing incrementally."""
+    self.Flush()
+    self._pending_samples = None
 
-class CSVPublisher(SamplePublisher):
+
+class IncrementalSamplePublisher(SamplePublisher):
+  """A publisher that writes samples out as they are appended.
+
+  Subclasses implement Open, AppendSamples and Close, and PublishSamples
+  publishes all of its samples in one incremental publication.
+  """
+
+  def PublishSamples(self, samples):
+    self.Open()
+    self.AppendSamples(samples)
+    self.Close()
+
+  @abc.abstractmethod
+  def Open(self):
+    raise NotImplementedError()
+
+  @abc.abstractmethod
+  def AppendSamples(self, samples):
+    raise NotImplementedError()
+
+  def Flush(self):
+    pass
+
+  @abc.abstractmethod
+  def Close(self):
+    raise NotImplementedError()
+
+
+def _WriteJsonLines(fp, samples, collapse_labels):
+  """Writes samples to a file as newline delimited JSON.
+
+  Args:
+    fp: File object to write to.
+    samples: Sequence of sample dicts.
+    collapse_labels: boolean. If true, the metadata of each sample is
+        converted to a flat string with key 'labels' via GetLabelsFromDict.
+
+  Returns:
+    The number of samples written.
+  """
+  count = 0
+  for sample in samples:
+    sample = sample.copy()
+    if collapse_labels:
+      sample['labels'] = GetLabelsFromDict(sample.pop('metadata', {}))
+    fp.write(json.dumps(sample) + '\n')
+    count += 1
+  return count
+
+
+class CSVPublisher(IncrementalSamplePublisher):
   """Publisher which writes results in CSV format to a specified path.
 
   The default field names are written first, followed by all unique metadata
-  keys found in the data.
+  keys found in the data. Since the header depends on all the samples, the
+  rows of appended samples are spooled to a temporary file, and the CSV file
+  is rewritten from the spool upon each Flush.
   """
 
   _DEFAULT_FIELDS = ('timestamp', 'test', 'metric', 'value', 'unit',
@@ -230,23 +371,39 @@ class CSVPublisher(SamplePublisher):
 
   def __init__(self, path):
     self._path = path
+    self._spool = None
+    self._meta_keys = None
 
-  def PublishSamples(self, samples):
-    samples = list(samples)
-    # Union of all metadata keys.
-    meta_keys = sorted(
-        set(key for sample in samples for key in sample['metadata']))
+  def Open(self):
+    self._spool = tempfile.TemporaryFile(prefix='perfkit-csv-pub')
+    self._meta_keys = set()
 
+  def AppendSamples(self, samples):
+    for sample in samples:
+      d = {}
+      d.update(sample)
+      d.update(d.pop('metadata'))
+      self._meta_keys.update(sample['metadata'])
+      cPickle.dump(d, self._spool, cPickle.HIGHEST_PROTOCOL)
+
+  def Flush(self):
     logging.info('Writing CSV results to %s', self._path)
+    self._spool.seek(0)
     with open(self._path, 'w') as fp:
-      writer = csv.DictWriter(fp, list(self._DEFAULT_FIELDS) + meta_keys)
+      writer = csv.DictWriter(
+          fp, list(self._DEFAULT_FIELDS) + sorted(self._meta_keys))
       writer.writeheader()
+      while True:
+        try:
+          writer.writerow(cPickle.load(self._spool))
+        except EOFError:
+          break
+    self._spool.seek(0, os.SEEK_END)
 
-      for sample in samples:
-        d = {}
-        d.update(sample)
-        d.update(d.pop('metadata'))
-        writer.writerow(d)
+  def Close(self):
+    self.Flush()
+    self._spool.close()
+    self._spool = None
 
 
 class PrettyPrintStreamPublisher(SamplePublisher):
@@ -274,6 +431,10 @@ class PrettyPrintStreamPublisher(SamplePublisher):
     -------------------------
     For all tests: cloud="GCP" image="ubuntu-14-04" machine_type="n1-standa ...
 
+  When samples are published incrementally, each appended batch is printed
+  with its own summary, rather than keeping all the samples in memory for a
+  single summary.
+
   Attributes:
     stream: File-like object. Output stream to print samples.
   """
@@ -284,6 +445,9 @@ class PrettyPrintStreamPublisher(SamplePublisher):
   def __repr__(self):
     return '<{0} stream={1}>'.format(type(self).__name__, self.stream)
 
+  def AppendSamples(self, samples):
+    self.PublishSamples(samples)
+
   def _FindConstantMetadataKeys(self, samples):
     """Finds metadata keys which are constant across a collection of samples.
 
@@ -373,6 +537,9 @@ class PrettyPrintStreamPublisher(SamplePublisher):
 class LogPublisher(SamplePublisher):
   """Writes samples to a Python Logger.
 
+  When samples are published incrementally, each appended batch is logged as
+  it arrives.
+
   Attributes:
     level: Logging level. Defaults to logging.INFO.
     logger: Logger to publish to. Defaults to the root logger.
@@ -387,6 +554,9 @@ class LogPublisher(SamplePublisher):
     return '<{0} logger={1} level={2}>'.format(type(self).__name__, self.logger,
                                                self.level)
 
+  def AppendSamples(self, samples):
+    self.PublishSamples(samples)
+
   def PublishSamples(self, samples):
     data = [
         '\n' + '-' * 25 + 'PerfKitBenchmarker Complete Results' + '-' * 25 +
@@ -396,8 +566,7 @@ class LogPublisher(SamplePublisher):
     self.logger.log(self.level, ''.join(data))
 
 
-# TODO: Extract a function to write delimited JSON to a stream.
-class NewlineDelimitedJSONPublisher(SamplePublisher):
+class NewlineDelimitedJSONPublisher(IncrementalSamplePublisher):
   """Publishes samples to a file as newline delimited JSON.
 
   The resulting output file is compatible with 'bq load' using
@@ -416,23 +585,193 @@ class NewlineDelimitedJSONPublisher(SamplePublisher):
     self.file_path = file_path
     self.mode = mode
     self.collapse_labels = collapse_labels
+    self._fp = None
+    self._sample_count = 0
 
   def __repr__(self):
     return '<{0} file_path="{1}" mode="{2}">'.format(
         type(self).__name__, self.file_path, self.mode)
 
-  def PublishSamples(self, samples):
-    logging.info('Publishing %d samples to %s', len(samples),
+  def Open(self):
+    self._fp = open(self.file_path, self.mode)
+    self._sample_count = 0
+
+  def AppendSamples(self, samples):
+    self._sample_count += _WriteJsonLines(self._fp, samples,
+                                          self.collapse_labels)
+    # Each batch reaches the file right away, so that it survives a crash.
+    self._fp.flush()
+
+  def Close(self):
+    self._fp.close()
+    self._fp = None
+    logging.info('Published %d samples to %s', self._sample_count,
+                 self.file_path)
+
+
+class ColumnarPublisher(IncrementalSamplePublisher):
+  """Publishes samples to a file in the format of columnar_results.
+
+  Appended samples are kept until the next Flush, or until
+  _COLUMNAR_ROW_GROUP_SIZE of them are pending, and then written as one row
+  group.
+
+  Attributes:
+    file_path: string. Destination path to write samples.
+    mode: Open mode for 'file_path'. Set to 'ab' to append.
+  """
+
+  def __init__(self, file_path, mode='wb'):
+    self.file_path = file_path
+    self.mode = mode
+    self._fp = None
+    self._pending_samples = None
+    self._sample_count = 0
+
+  def __repr__(self):
+    return '<{0} file_path="{1}" mode="{2}">'.format(
+        type(self).__name__, self.file_path, self.mode)
+
+  def Open(self):
+    self._fp = open(self.file_path, self.mode)
+    self._pending_samples = sample_store.SampleStore()
+    self._sample_count = 0
+
+  def AppendSamples(self, samples):
+    self._pending_samples.Extend(samples)
+    if len(self._pending_samples) >= _COLUMNAR_ROW_GROUP_SIZE:
+      self.Flush()
+
+  def Flush(self):
+    if self._pending_samples:
+      self._sample_count += columnar_results.WriteRowGroup(
+          self._fp, self._pending_samples)
+      self._pending_samples = sample_store.SampleStore()
+      self._fp.flush()
+
+  def Close(self):
+    self.Flush()
+    self._fp.close()
+    self._fp = None
+    self._pending_samples = None
+    logging.info('Published %d samples to %s', self._sample_count,
                  self.file_path)
-    with open(self.file_path, self.mode) as fp:
-      for sample in samples:
-        sample = sample.copy()
-        if self.collapse_labels:
-          sample['labels'] = GetLabelsFromDict(sample.pop('metadata', {}))
-        fp.write(json.dumps(sample) + '\n')
 
 
-class BigQueryPublisher(SamplePublisher):
+class WarehousePublisher(IncrementalSamplePublisher):
+  """Adds samples to a results_warehouse.Warehouse.
+
+  Each batch of appended samples is stored in one transaction.
+
+  Attributes:
+    database_path: string. Path of the warehouse's SQLite database.
+  """
+
+  def __init__(self, database_path):
+    self.database_path = database_path
+    self._warehouse = None
+    self._sample_count = 0
+
+  def __repr__(self):
+    return '<{0} database_path="{1}">'.format(
+        type(self).__name__, self.database_path)
+
+  def Open(self):
+    self._warehouse = results_warehouse.Warehouse(self.database_path)
+    self._sample_count = 0
+
+  def AppendSamples(self, samples):
+    self._sample_count += self._warehouse.AddSamples(samples)
+
+  def Close(self):
+    self._warehouse.Close()
+    self._warehouse = None
+    logging.info('Published %d samples to %s', self._sample_count,
+                 self.database_path)
+
+
+class _UploadingPublisher(IncrementalSamplePublisher):
+  """A publisher that uploads samples as newline delimited JSON files.
+
+  Appended samples are spooled to temporary files of about max_chunk_bytes
+  each. The chunks are uploaded concurrently upon each Flush, or once
+  _MAX_PENDING_UPLOAD_CHUNKS of them are full, and each upload is retried
+  independently of the others. A chunk that cannot be uploaded is kept.
+
+  Attributes:
+    max_chunk_bytes: int. Size after which a chunk is not appended to anymore.
+  """
+
+  def __init__(self, max_chunk_bytes=DEFAULT_MAX_UPLOAD_CHUNK_BYTES):
+    self.max_chunk_bytes = max_chunk_bytes
+    self._spool = None
+    self._spool_count = 0
+    # (path, sample count) pairs of the full chunks waiting to be uploaded.
+    self._chunks = []
+
+  @abc.abstractmethod
+  def _Upload(self, path, sample_count):
+    """Uploads a newline delimited JSON file of samples.
+
+    Called concurrently for different files. Implementations retry failed
+    uploads, e.g. with vm_util.IssueRetryableCommand.
+
+    Args:
+      path: string. Path of the file.
+      sample_count: int. Number of samples in the file.
+    """
+    raise NotImplementedError()
+
+  def Open(self):
+    self._spool = None
+    self._spool_count = 0
+    self._chunks = []
+
+  def AppendSamples(self, samples):
+    for sample in samples:
+      if self._spool is None:
+        self._spool = tempfile.NamedTemporaryFile(
+            prefix='perfkit-upload-pub', dir=vm_util.GetTempDir(),
+            suffix='.json', delete=False)
+      self._spool_count += _WriteJsonLines(self._spool, (sample,), True)
+      if self._spool.tell() >= self.max_chunk_bytes:
+        self._CloseChunk()
+        if len(self._chunks) >= _MAX_PENDING_UPLOAD_CHUNKS:
+          self._UploadChunks()
+
+  def _CloseChunk(self):
+    if self._spool is not None:
+      self._spool.close()
+      self._chunks.append((self._spool.name, self._spool_count))
+      self._spool = None
+      self._spool_count = 0
+
+  def _UploadChunk(self, path, sample_count):
+    try:
+      self._Upload(path, sample_count)
+    except Exception:
+      logging.error('%d samples that could not be published by %s remain in '
+                    '%s.', sample_count, self, path)
+      raise
+    os.unlink(path)
+
+  def _UploadChunks(self):
+    chunks = self._chunks
+    self._chunks = []
+    if chunks:
+      background_tasks.RunParallelThreads(
+          [(self._UploadChunk, chunk, {}) for chunk in chunks],
+          max_concurrency=len(chunks))
+
+  def Flush(self):
+    self._CloseChunk()
+    self._UploadChunks()
+
+  def Close(self):
+    self.Flush()
+
+
+class BigQueryPublisher(_UploadingPublisher):
   """Publishes samples to BigQuery.
 
   Attributes:
@@ -444,10 +783,13 @@ class BigQueryPublisher(SamplePublisher):
       authorization. For example, 1234567890@developer.gserviceaccount.com
     service_account_private_key: Filename that contains the service account
       private key. Must be specified if service_account is specified.
+    max_chunk_bytes: int. Approximate size of each file loaded by 'bq load'.
   """
 
   def __init__(self, bigquery_table, project_id=None, bq_path='bq',
-               service_account=None, service_account_private_key_file=None):
+               service_account=None, service_account_private_key_file=None,
+               max_chunk_bytes=DEFAULT_MAX_UPLOAD_CHUNK_BYTES):
+    super(BigQueryPublisher, self).__init__(max_chunk_bytes)
     self.bigquery_table = bigquery_table
     self.project_id = project_id
     self.bq_path = bq_path
@@ -467,50 +809,48 @@ class BigQueryPublisher(SamplePublisher):
     if not samples:
       logging.warn('No samples: not publishing to BigQuery')
       return
-
-    with vm_util.NamedTemporaryFile(prefix='perfkit-bq-pub',
-                                    dir=vm_util.GetTempDir(),
-                                    suffix='.json') as tf:
-      json_publisher = NewlineDelimitedJSONPublisher(tf.name,
-                                                     collapse_labels=True)
-      json_publisher.PublishSamples(samples)
-      tf.close()
-      logging.info('Publishing %d samples to %s', len(samples),
-                   self.bigquery_table)
-      load_cmd = [self.bq_path]
-      if self.project_id:
-        load_cmd.append('--project_id=' + self.project_id)
-      if self.service_account:
-        assert self.service_account_private_key_file is not None
-        load_cmd.extend(['--service_account=' + self.service_account,
-                         '--service_account_credential_file=' +
-                         self._credentials_file,
-                         '--service_account_private_key_file=' +
-                         self.service_account_private_key_file])
-      load_cmd.extend(['load',
-                       '--source_format=NEWLINE_DELIMITED_JSON',
-                       self.bigquery_table,
-                       tf.name])
-      vm_util.IssueRetryableCommand(load_cmd)
-
-
-class CloudStoragePublisher(SamplePublisher):
+    super(BigQueryPublisher, self).PublishSamples(samples)
+
+  def _Upload(self, path, sample_count):
+    logging.info('Publishing %d samples to %s', sample_count,
+                 self.bigquery_table)
+    load_cmd = [self.bq_path]
+    if self.project_id:
+      load_cmd.append('--project_id=' + self.project_id)
+    if self.service_account:
+      assert self.service_account_private_key_file is not None
+      load_cmd.extend(['--service_account=' + self.service_account,
+                       '--service_account_credential_file=' +
+                       self._credentials_file,
+                       '--service_account_private_key_file=' +
+                       self.service_account_private_key_file])
+    load_cmd.extend(['load',
+                     '--source_format=NEWLINE_DELIMITED_JSON',
+                     self.bigquery_table,
+                     path])
+    vm_util.IssueRetryableCommand(load_cmd)
+
+
+class CloudStoragePublisher(_UploadingPublisher):
   """Publishes samples to a Google Cloud Storage bucket using gsutil.
 
-  Samples are formatted using a NewlineDelimitedJSONPublisher, and written to a
+  Samples are formatted as newline delimited JSON, and written to a
   the destination file within the specified bucket named:
 
     <time>_<uri>
 
   where <time> is the number of milliseconds since the Epoch, and <uri> is a
-  random UUID.
+  random UUID. Each upload chunk is written to a file of its own.
 
   Attributes:
     bucket: string. The GCS bucket name to publish to.
     gsutil_path: string. The path to the 'gsutil' tool.
+    max_chunk_bytes: int. Approximate size of each uploaded file.
   """
 
-  def __init__(self, bucket, gsutil_path='gsutil'):
+  def __init__(self, bucket, gsutil_path='gsutil',
+               max_chunk_bytes=DEFAULT_MAX_UPLOAD_CHUNK_BYTES):
+    super(CloudStoragePublisher, self).__init__(max_chunk_bytes)
     self.bucket = bucket
     self.gsutil_path = gsutil_path
 
@@ -521,28 +861,129 @@ class CloudStoragePublisher(SamplePublisher):
       object_name = str(int(time.time() * 100)) + '_' + str(uuid.uuid4())
       return object_name[:GCS_OBJECT_NAME_LENGTH]
 
-  def PublishSamples(self, samples):
-    with vm_util.NamedTemporaryFile(prefix='perfkit-gcs-pub',
-                                    dir=vm_util.GetTempDir(),
-                                    suffix='.json') as tf:
-      json_publisher = NewlineDelimitedJSONPublisher(tf.name)
-      json_publisher.PublishSamples(samples)
-      tf.close()
-      object_name = self._GenerateObjectName()
-      storage_uri = 'gs://{0}/{1}'.format(self.bucket, object_name)
-      logging.info('Publishing %d samples to %s', len(samples), storage_uri)
-      copy_cmd = [self.gsutil_path, 'cp', tf.name, storage_uri]
-      vm_util.IssueRetryableCommand(copy_cmd)
+  def _Upload(self, path, sample_count):
+    object_name = self._GenerateObjectName()
+    storage_uri = 'gs://{0}/{1}'.format(self.bucket, object_name)
+    logging.info('Publishing %d samples to %s', sample_count, storage_uri)
+    copy_cmd = [self.gsutil_path, 'cp', path, storage_uri]
+    vm_util.IssueRetryableCommand(copy_cmd)
+
+
+def _PublishSamples(publisher, samples):
+  publisher.PublishSamples(samples)
+
+
+class _PublishingThread(object):
+  """Publishes samples incrementally on a background thread.
+
+  Batches of samples wait in a bounded queue, so that when the publishers fall
+  behind, the threads that add samples wait for them instead of buffering an
+  unbounded number of samples. Exceptions raised by the publishers are raised
+  by the next Flush or Close.
+  """
+
+  _APPEND = 'append'
+  _FLUSH = 'flush'
+  _CLOSE = 'close'
+
+  def __init__(self, publishers, max_queued_batches):
+    self._publishers = publishers
+    self._queue = Queue.Queue(max_queued_batches)
+    # Descriptions of the publisher calls that failed since the last Flush.
+    self._error_strings = []
+    self._thread = threading.Thread(target=self._Run)
+    self._thread.daemon = True
+    self._thread.start()
+
+  def _Put(self, command, payload):
+    while True:
+      try:
+        self._queue.put((command, payload), timeout=_LONG_TIMEOUT)
+        return
+      except Queue.Full:
+        pass
+
+  def _Await(self, command):
+    done = threading.Event()
+    self._Put(command, done)
+    while not done.wait(_LONG_TIMEOUT):
+      pass
+
+  def _CallPublisher(self, publisher, method_name, args):
+    try:
+      getattr(publisher, method_name)(*args)
+    except Exception:
+      logging.exception('Error in %s.%s.', publisher, method_name)
+      self._error_strings.append('Exception in {0}.{1}:{2}{3}'.format(
+          publisher, method_name, os.linesep, traceback.format_exc()))
+
+  def _CallPublishers(self, method_name, *args):
+    """Calls a method of all the publishers concurrently."""
+    background_tasks.RunThreaded(
+        self._CallPublisher,
+        [((publisher, method_name, args), {})
+         for publisher in self._publishers])
+
+  def _RaiseErrors(self):
+    """Raises the exceptions of the publisher calls since the last Flush."""
+    error_strings, self._error_strings = self._error_strings, []
+    if error_strings:
+      raise errors.VmUtil.ThreadException(
+          'The following exceptions occurred while publishing samples:'
+          '{0}{1}'.format(os.linesep, os.linesep.join(error_strings)))
+
+  def _Run(self):
+    self._CallPublishers('Open')
+    while True:
+      command, payload = self._queue.get()
+      if command == self._APPEND:
+        self._CallPublishers('AppendSamples', payload)
+        continue
+      self._CallPublishers('Flush' if command == self._FLUSH else 'Close')
+      payload.set()
+      if command == self._CLOSE:
+        return
+
+  def AppendSamples(self, samples):
+    """Queues a batch of samples, waiting while the queue is full."""
+    self._Put(self._APPEND, samples)
+
+  def Flush(self):
+    """Waits until the queued samples have been published.
+
+    Raises:
+      errors.VmUtil.ThreadException: If a publisher raised an exception since
+          the last Flush.
+    """
+    self._Await(self._FLUSH)
+    self._RaiseErrors()
+
+  def Close(self):
+    """Waits until the queued samples have been published, then closes.
+
+    Raises:
+      errors.VmUtil.ThreadException: If a publisher raised an exception since
+          the last Flush.
+    """
+    self._Await(self._CLOSE)
+    self._thread.join()
+    self._RaiseErrors()
 
 
 class SampleCollector(object):
   """A performance sample collector.
 
   Supports incorporating additional metadata into samples, and publishing
-  results via any number of SamplePublishers.
+  results via any number of SamplePublishers. A single SampleCollector may be
+  shared by benchmarks running in parallel threads.
+
+  With --stream_samples, samples are handed to a background thread that
+  publishes them incrementally as soon as they are added, and Close must be
+  called once all samples have been added.
 
   Attributes:
-    samples: A list of Sample objects.
+    samples: sample_store.SampleStore. The annotated samples, as dicts, that
+      have not been published yet.
     metadata_providers: A list of MetadataProvider objects. Metadata providers
       to use.  Defaults to DEFAULT_METADATA_PROVIDERS.
     publishers: A list of SamplePublisher objects. If not specified, defaults to
@@ -553,7 +994,9 @@ class SampleCollector(object):
     run_uri: A unique tag for the run.
   """
   def __init__(self, metadata_providers=None, publishers=None):
-    self.samples = []
+    self.samples = sample_store.SampleStore()
+    self._lock = threading.Lock()
+    self._publishing_thread = None
 
     if metadata_providers is not None:
       self.metadata_providers = metadata_providers
@@ -581,16 +1024,40 @@ class SampleCollector(object):
           project_id=FLAGS.bq_project,
           bq_path=FLAGS.bq_path,
           service_account=FLAGS.service_account,
-          service_account_private_key_file=FLAGS.service_account_private_key))
+          service_account_private_key_file=FLAGS.service_account_private_key,
+          max_chunk_bytes=FLAGS.upload_chunk_size_mb << 20))
 
     if FLAGS.cloud_storage_bucket:
-      publishers.append(CloudStoragePublisher(FLAGS.cloud_storage_bucket,
-                                              gsutil_path=FLAGS.gsutil_path))
+      publishers.append(CloudStoragePublisher(
+          FLAGS.cloud_storage_bucket, gsutil_path=FLAGS.gsutil_path,
+          max_chunk_bytes=FLAGS.upload_chunk_size_mb << 20))
     if FLAGS.csv_path:
       publishers.append(CSVPublisher(FLAGS.csv_path))
+    if FLAGS.columnar_path:
+      publishers.append(ColumnarPublisher(FLAGS.columnar_path))
+    if FLAGS.warehouse_path:
+      publishers.append(WarehousePublisher(FLAGS.warehouse_path))
 
     return publishers
 
+  def _AnnotateSample(self, s, benchmark, benchmark_spec):
+    """Returns the dict of a Sample with the metadata of the run."""
+    sample = dict(s.asdict())
+    sample['test'] = benchmark
+
+    for meta_provider in self.metadata_providers:
+      sample['metadata'] = meta_provider.AddMetadata(
+          sample['metadata'], benchmark_spec)
+
+    sample['product_name'] = FLAGS.product_name
+    sample['official'] = FLAGS.official
+    sample['owner'] = FLAGS.owner
+    sample['run_uri'] = benchmark_spec.uuid
+    sample['sample_uri'] = str(uuid.uuid4())
+    events.sample_created.send(benchmark_spec=benchmark_spec,
+                               sample=sample)
+    return sample
+
   def AddSamples(self, samples, benchmark, benchmark_spec):
     """Adds data samples to the publisher.
 
@@ -599,26 +1066,56 @@ class SampleCollector(object):
       benchmark: string. The name of the benchmark.
       benchmark_spec: BenchmarkSpec. Benchmark specification.
     """
-    for s in samples:
-      # Annotate the sample.
-      sample = dict(s.asdict())
-      sample['test'] = benchmark
-
-      for meta_provider in self.metadata_providers:
-        sample['metadata'] = meta_provider.AddMetadata(
-            sample['metadata'], benchmark_spec)
-
-      sample['product_name'] = FLAGS.product_name
-      sample['official'] = FLAGS.official
-      sample['owner'] = FLAGS.owner
-      sample['run_uri'] = benchmark_spec.uuid
-      sample['sample_uri'] = str(uuid.uuid4())
-      events.sample_created.send(benchmark_spec=benchmark_spec,
-                                 sample=sample)
-      self.samples.append(sample)
+    annotated_samples = (self._AnnotateSample(s, benchmark, benchmark_spec)
+                         for s in samples)
+    # The dicts of the whole batch are only held at once for the subscribers
+    # of samples_created, since they take more memory than the store.
+    if events.samples_created.receivers:
+      annotated_samples = list(annotated_samples)
+      events.samples_created.send(benchmark_spec=benchmark_spec,
+                                  samples=annotated_samples)
+    for sample in annotated_samples:
+      with self._lock:
+        self.samples.Append(sample)
+        stream_batch = (FLAGS.stream_samples and
+                        len(self.samples) >= _STREAM_BATCH_SIZE)
+      if stream_batch:
+        self._StreamSamples()
+    if FLAGS.stream_samples:
+      self._StreamSamples()
+
+  def _StreamSamples(self):
+    """Hands the samples added so far to the publishing thread."""
+    with self._lock:
+      samples = self.samples
+      self.samples = sample_store.SampleStore()
+      if self._publishing_thread is None:
+        self._publishing_thread = _PublishingThread(
+            self.publishers, FLAGS.stream_samples_queue_size)
+      publishing_thread = self._publishing_thread
+    if samples:
+      publishing_thread.AppendSamples(samples)
 
   def PublishSamples(self):
     """Publish samples via all registered publishers."""
-    for publisher in self.publishers:
-      publisher.PublishSamples(self.samples)
-    self.samples = []
+    if FLAGS.stream_samples:
+      self._StreamSamples()
+      self._publishing_thread.Flush()
+      return
+    with self._lock:
+      # The publishers run concurrently, so publishing takes as long as the
+      # slowest of them.
+      background_tasks.RunThreaded(
+          _PublishSamples,
+          [((publisher, self.samples), {}) for publisher in self.publishers])
+      self.samples = sample_store.SampleStore()
+
+  def Close(self):
+    """Publishes the remaining samples after the last ones have been added."""
+    if FLAGS.stream_samples:
+      self._StreamSamples()
+      publishing_thread, self._publishing_thread = (
+          self._publishing_thread, None)
+      publishing_thread.Close()
+    elif self.samples:
+      self.PublishSamples()
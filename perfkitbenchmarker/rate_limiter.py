@@ -0,0 +1,312 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Limits the rate at which PKB calls cloud provider APIs.
+
+Provisioning many VMs at once issues a burst of CLI commands (gcloud, aws,
+azure, ...), which providers answer by throttling the caller. With
+--cloud_api_rate_limits, every command that vm_util.IssueCommand runs first
+takes a token from a bucket shared by all threads of the run. Each bucket
+covers the commands of one CLI, or of some of its subcommands.
+
+When a provider reports that it is throttling the calls anyway, the rate of
+the bucket is halved, then recovers gradually as calls succeed again. The
+numbers of calls that were delayed, throttled, and retried are reported as
+samples of the benchmark that made them.
+"""
+
+import collections
+import os
+import re
+import threading
+import time
+
+from perfkitbenchmarker import context
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import flags_validators
+from perfkitbenchmarker import sample
+
+RATE_LIMITS_FLAG_NAME = 'cloud_api_rate_limits'
+
+# Fraction of its configured rate that a bucket recovers after each call that
+# is not throttled.
+_RECOVERY_FRACTION = .1
+# A bucket's rate is never reduced below this fraction of its configured rate.
+_MIN_RATE_FRACTION = .05
+
+# Matches the errors that CLIs report when the provider throttles their calls.
+_THROTTLING_PATTERN = re.compile(
+    r'rate ?limit|throttl|too many requests|RequestLimitExceeded', re.I)
+
+
+class TokenBucket(object):
+  """Allows calls at a sustained rate, with bursts of a limited size.
+
+  Attributes:
+    rate: float. The number of calls allowed per second.
+  """
+
+  def __init__(self, rate, burst=1):
+    self.rate = float(rate)
+    self._max_rate = self.rate
+    self._burst = burst
+    self._tokens = float(burst)
+    self._last_refill = time.time()
+    self._lock = threading.Lock()
+
+  def Acquire(self):
+    """Takes a token, waiting until one is available.
+
+    Tokens are handed out in the order in which they were requested.
+
+    Returns:
+      The number of seconds spent waiting for the token.
+    """
+    wait_time = self.Reserve()
+    if wait_time:
+      time.sleep(wait_time)
+    return wait_time
+
+  def Reserve(self):
+    """Takes a token without waiting for it.
+
+    Returns:
+      The number of seconds that the caller must wait before using the token.
+    """
+    with self._lock:
+      now = time.time()
+      self._tokens = min(self._burst, self._tokens +
+                         (now - self._last_refill) * self.rate)
+      self._last_refill = now
+      # A negative balance reserves tokens for the callers that are waiting.
+      self._tokens -= 1
+      return -self._tokens / self.rate if self._tokens < 0 else 0
+
+  def ReportThrottled(self):
+    """Halves the rate after the provider has throttled a call."""
+    with self._lock:
+      self.rate = max(self.rate / 2, self._max_rate * _MIN_RATE_FRACTION)
+
+  def ReportSuccess(self):
+    """Recovers part of the configured rate after a call succeeded."""
+    with self._lock:
+      self.rate = min(self.rate + self._max_rate * _RECOVERY_FRACTION,
+                      self._max_rate)
+
+
+def _ParseRateLimit(rate_limit):
+  """Parses an entry of --cloud_api_rate_limits.
+
+  Returns:
+    A (command words, rate, burst) tuple.
+
+  Raises:
+    ValueError: If the entry is malformed.
+  """
+  command, _, limit = rate_limit.partition('=')
+  rate, _, burst = limit.partition('/')
+  words = tuple(command.split())
+  rate = float(rate)
+  burst = int(burst) if burst else 1
+  if not words or rate <= 0 or burst < 1:
+    raise ValueError(rate_limit)
+  return words, rate, burst
+
+
+def ValidateRateLimitsFlag(rate_limits):
+  """Verifies the entries of --cloud_api_rate_limits.
+
+  Raises:
+    flags_validators.Error: If an entry is malformed.
+  """
+  for rate_limit in rate_limits:
+    try:
+      _ParseRateLimit(rate_limit)
+    except ValueError:
+      raise flags_validators.Error(
+          '%s: Invalid value for --%s' % (rate_limit, RATE_LIMITS_FLAG_NAME))
+  return True
+
+
+flags.DEFINE_list(
+    RATE_LIMITS_FLAG_NAME, [],
+    'Limits on the rate of cloud API calls, shared by all threads of the run. '
+    'Each entry has the form COMMAND=RATE or COMMAND=RATE/BURST. COMMAND is '
+    'the name of a CLI, optionally followed by subcommands, such as "gcloud" '
+    'or "aws ec2". It covers the commands that run that CLI with those words '
+    'among their arguments, in order. RATE is the number of calls per second '
+    'and BURST the number of calls that may be made at once, 1 by default. '
+    'The entry with the most words applies.')
+flags.RegisterValidator(RATE_LIMITS_FLAG_NAME, ValidateRateLimitsFlag)
+
+FLAGS = flags.FLAGS
+
+
+class _ApiCounts(object):
+  """Counts of the calls covered by one rate limit."""
+
+  def __init__(self):
+    self.calls = 0
+    self.delayed_calls = 0
+    self.delay = 0.
+    self.throttled_calls = 0
+
+
+class _BenchmarkStats(object):
+  """Counts of the calls made on behalf of one benchmark."""
+
+  def __init__(self):
+    self.api_counts = collections.defaultdict(_ApiCounts)
+    self.retries = collections.Counter()
+
+
+_lock = threading.Lock()
+# Maps the entries of --cloud_api_rate_limits to their TokenBuckets.
+_buckets = {}
+# Maps the uid of each benchmark, or None for calls made outside of any
+# benchmark, to its _BenchmarkStats.
+_stats = collections.defaultdict(_BenchmarkStats)
+
+
+def _IsSubsequence(words, args):
+  remaining_args = iter(args)
+  return all(word in remaining_args for word in words)
+
+
+def _GetRateLimit(cmd):
+  """Returns the entry of --cloud_api_rate_limits that covers a command."""
+  if not cmd:
+    return None
+  executable = os.path.basename(cmd[0])
+  best_match, best_length = None, 0
+  for rate_limit in FLAGS.cloud_api_rate_limits or ():
+    words, _, _ = _ParseRateLimit(rate_limit)
+    if (words[0] == executable and len(words) > best_length and
+        _IsSubsequence(words[1:], cmd[1:])):
+      best_match, best_length = rate_limit, len(words)
+  return best_match
+
+
+def _GetBucket(rate_limit):
+  with _lock:
+    if rate_limit not in _buckets:
+      _, rate, burst = _ParseRateLimit(rate_limit)
+      _buckets[rate_limit] = TokenBucket(rate, burst)
+    return _buckets[rate_limit]
+
+
+def _GetStats():
+  """Returns the _BenchmarkStats of the benchmark of the current thread."""
+  benchmark_spec = context.GetThreadBenchmarkSpec()
+  with _lock:
+    return _stats[benchmark_spec.uid if benchmark_spec else None]
+
+
+def Acquire(cmd):
+  """Waits until the rate limit that covers a command allows it to run.
+
+  Args:
+    cmd: list of strings. The command, as given to vm_util.IssueCommand.
+
+  Returns:
+    The entry of --cloud_api_rate_limits that covers the command, to be passed
+    to ReportResult, or None if no limit applies.
+  """
+  rate_limit, wait_time = Reserve(cmd)
+  if wait_time:
+    time.sleep(wait_time)
+  return rate_limit
+
+
+def Reserve(cmd):
+  """Reserves a call under the rate limit that covers a command.
+
+  Unlike Acquire, this does not wait, so that callers that must not block,
+  such as the event loop, can schedule the command themselves.
+
+  Args:
+    cmd: list of strings. The command to be run.
+
+  Returns:
+    A (rate limit, wait time) tuple. The rate limit is as returned by Acquire,
+    and the command may run after waiting for wait time seconds.
+  """
+  rate_limit = _GetRateLimit(cmd)
+  if rate_limit is None:
+    return None, 0
+  wait_time = _GetBucket(rate_limit).Reserve()
+  stats = _GetStats()
+  with _lock:
+    counts = stats.api_counts[rate_limit]
+    counts.calls += 1
+    if wait_time:
+      counts.delayed_calls += 1
+      counts.delay += wait_time
+  return rate_limit, wait_time
+
+
+def ReportResult(rate_limit, retcode, stderr):
+  """Adapts a rate limit to the result of a command that it covers.
+
+  Args:
+    rate_limit: string. The value returned by Acquire for the command.
+    retcode: int. The return code of the command.
+    stderr: string. The stderr of the command.
+  """
+  bucket = _GetBucket(rate_limit)
+  if retcode and _THROTTLING_PATTERN.search(stderr):
+    bucket.ReportThrottled()
+    stats = _GetStats()
+    with _lock:
+      stats.api_counts[rate_limit].throttled_calls += 1
+  else:
+    bucket.ReportSuccess()
+
+
+def RecordRetry(function_name):
+  """Records that vm_util.Retry is about to call a function again."""
+  stats = _GetStats()
+  with _lock:
+    stats.retries[function_name] += 1
+
+
+def PopSamples(benchmark_uid):
+  """Returns samples of the calls made on behalf of a benchmark.
+
+  The counts of the benchmark are reset.
+
+  Args:
+    benchmark_uid: string. The uid of the benchmark's BenchmarkSpec.
+
+  Returns:
+    A list of Samples.
+  """
+  with _lock:
+    stats = _stats.pop(benchmark_uid, None)
+  if stats is None:
+    return []
+  samples = []
+  for rate_limit, counts in sorted(stats.api_counts.iteritems()):
+    metadata = {'cloud_api_rate_limit': rate_limit}
+    samples.extend([
+        sample.Sample('Cloud API Calls', counts.calls, 'calls', metadata),
+        sample.Sample('Cloud API Delayed Calls', counts.delayed_calls,
+                      'calls', metadata),
+        sample.Sample('Cloud API Delay', counts.delay, 'seconds', metadata),
+        sample.Sample('Cloud API Throttled Calls', counts.throttled_calls,
+                      'calls', metadata)])
+  for function_name, retries in sorted(stats.retries.iteritems()):
+    samples.append(sample.Sample('Retries', retries, 'retries',
+                                 {'function': function_name}))
+  return samples
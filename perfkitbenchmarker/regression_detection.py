@@ -0,0 +1,577 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Detects performance regressions against the history of past runs.
+
+With --detect_regressions, the samples of a run are compared to a baseline of
+the values of the same test, metric and unit in earlier runs, read from the
+results warehouse of --warehouse_path. Samples of a batch, such as those of a
+benchmark's run phase, that share their test, metric, unit and metadata, for
+example the values of repeated iterations, are compared together. The baseline
+is limited to runs whose --regression_metadata_keys metadata, such as the
+machine type, match the samples', and to the current regime of the metric: if
+the history shows a lasting shift, only the values since the most recent change
+point are used.
+
+The values are a regression when they are worse than the baseline by a
+statistically significant margin:
+  * the probability of values at least as bad under the baseline
+    distribution is below --regression_alpha, after the Benjamini-Hochberg
+    adjustment for the number of groups compared in the batch. For one or two
+    values, it is estimated from the distance of their median to the
+    baseline median, in units of the baseline's median absolute deviation,
+    under Student's t distribution. For more values, it is estimated by the
+    one-sided Mann-Whitney U test.
+  * the bootstrap confidence interval of the difference between the medians
+    of the values and the baseline excludes zero.
+  * the medians differ by at least --regression_min_change_percent.
+Whether higher or lower values are worse is inferred from the metric and unit.
+Significant changes of metrics for which this is not known are reported as
+changes.
+
+Each compared sample is annotated with 'regression_status' metadata, and the
+run exits with a non-zero status if any regression is found. The details of
+regressions, such as their p-values, are logged.
+"""
+
+import collections
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import results_warehouse
+
+flags.DEFINE_boolean(
+    'detect_regressions', False,
+    'Whether to compare the samples of the run against the history of past '
+    'runs in the results warehouse of --warehouse_path, annotate them with '
+    'the outcome, and exit with a non-zero status if any regressed.')
+flags.DEFINE_list(
+    'regression_metadata_keys', ['cloud', 'machine_type', 'vm_count'],
+    'Metadata keys whose values the past samples must share with a sample to '
+    'be part of its baseline.')
+flags.DEFINE_float(
+    'regression_baseline_days', 30.,
+    'Number of days of past runs that baselines are built from.',
+    lower_bound=0.)
+flags.DEFINE_integer(
+    'regression_min_baseline_samples', 10,
+    'Minimum number of past values needed to compare a sample to its '
+    'baseline.', lower_bound=2)
+flags.DEFINE_float(
+    'regression_alpha', .01,
+    'Significance level below which a difference from the baseline is not '
+    'attributed to noise.', lower_bound=0., upper_bound=1.)
+flags.DEFINE_float(
+    'regression_min_change_percent', 5.,
+    'Minimum difference, in percent of the baseline median, of a regression.',
+    lower_bound=0.)
+
+FLAGS = flags.FLAGS
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Statuses of a comparison.
+REGRESSION = 'regression'
+IMPROVEMENT = 'improvement'
+CHANGE = 'change'
+NO_CHANGE = 'no_change'
+INSUFFICIENT_BASELINE = 'insufficient_baseline'
+
+# Directions of metrics.
+HIGHER_IS_BETTER = 'higher_is_better'
+LOWER_IS_BETTER = 'lower_is_better'
+
+_TIME_UNITS = frozenset(['ns', 'us', 'usec', 'microseconds', 'ms', 'msec',
+                         'milliseconds', 's', 'sec', 'seconds', 'min',
+                         'minutes'])
+_LOWER_IS_BETTER_WORDS = frozenset(['latency', 'time', 'runtime', 'duration',
+                                    'delay'])
+_HIGHER_IS_BETTER_WORDS = frozenset(['throughput', 'bandwidth', 'iops', 'ops',
+                                     'qps', 'tps', 'operations', 'requests',
+                                     'transactions'])
+
+# Head samples with fewer values are compared to the baseline by a robust t
+# score, since the Mann-Whitney U test has little power for them.
+_MIN_RANK_TEST_VALUES = 3
+# Ratio of the standard deviation of a normal distribution to its median
+# absolute deviation.
+_MAD_TO_STDDEV = 1.4826
+_BOOTSTRAP_ITERATIONS = 1000
+_BOOTSTRAP_CONFIDENCE = .95
+
+# The outcome of comparing values to a baseline. p_value is adjusted for the
+# number of comparisons made together. confidence_interval is the bootstrap
+# interval of the difference of the medians, or None if it was not needed.
+Comparison = collections.namedtuple(
+    'Comparison', ['status', 'p_value', 'baseline_median', 'head_median',
+                   'change_percent', 'confidence_interval', 'baseline_size'])
+
+
+def GetDirection(metric, unit):
+  """Infers whether higher or lower values of a metric are better.
+
+  Args:
+    metric: string. Name of the metric.
+    unit: string. Unit of the metric.
+
+  Returns:
+    HIGHER_IS_BETTER, LOWER_IS_BETTER or None if unknown.
+  """
+  unit = (unit or '').lower()
+  words = frozenset(re.findall(r'[a-z]+', (metric or '').lower()))
+  # Units such as 'ms' and 'ms/op' are times, while 'MB/s' and 'Mbps' are
+  # rates.
+  if unit.split('/')[0] in _TIME_UNITS:
+    return LOWER_IS_BETTER
+  if '/' in unit or unit.endswith('ps'):
+    return HIGHER_IS_BETTER
+  if words & _LOWER_IS_BETTER_WORDS:
+    return LOWER_IS_BETTER
+  if words & _HIGHER_IS_BETTER_WORDS:
+    return HIGHER_IS_BETTER
+  return None
+
+
+def Median(values):
+  values = sorted(values)
+  middle = len(values) // 2
+  if len(values) % 2:
+    return values[middle]
+  return (values[middle - 1] + values[middle]) / 2.
+
+
+def _Ranks(values):
+  """Returns the ranks of values, averaged over ties, and the tie sizes."""
+  order = sorted(range(len(values)), key=values.__getitem__)
+  ranks = [0.] * len(values)
+  tie_sizes = []
+  start = 0
+  while start < len(order):
+    end = start
+    while end + 1 < len(order) and values[order[end + 1]] == values[
+        order[start]]:
+      end += 1
+    for i in range(start, end + 1):
+      ranks[order[i]] = (start + end) / 2. + 1
+    tie_sizes.append(end - start + 1)
+    start = end + 1
+  return ranks, tie_sizes
+
+
+def _NormalTail(z):
+  """Returns the probability that a standard normal variable exceeds z."""
+  return .5 * math.erfc(z / math.sqrt(2))
+
+
+def _StudentTTail(t, df):
+  """Returns the probability that a Student's t variable exceeds t.
+
+  Uses the finite series of Abramowitz and Stegun 26.7.3 and 26.7.4.
+
+  Args:
+    t: float.
+    df: int. Positive number of degrees of freedom.
+  """
+  if t < 0:
+    return 1. - _StudentTTail(-t, df)
+  theta = math.atan(t / math.sqrt(df))
+  cos_squared = math.cos(theta) ** 2
+  term = total = 1.
+  if df % 2:
+    for i in xrange(3, df - 1, 2):
+      term *= (i - 1.) / i * cos_squared
+      total += term
+    if df == 1:
+      total = 0.
+    probability = 2 / math.pi * (
+        theta + math.sin(theta) * math.cos(theta) * total)
+  else:
+    for i in xrange(2, df, 2):
+      term *= (i - 1.) / i * cos_squared
+      total += term
+    probability = math.sin(theta) * total
+  # probability is that of a variable between -t and t.
+  return (1. - probability) / 2.
+
+
+def MannWhitneyU(x, y):
+  """Tests whether the values of x tend to be greater than those of y.
+
+  Uses the normal approximation of the U statistic, with corrections for ties
+  and continuity.
+
+  Args:
+    x: Non-empty sequence of numbers.
+    y: Non-empty sequence of numbers.
+
+  Returns:
+    The one-sided p-value of the hypothesis that x is not stochastically
+    greater than y.
+  """
+  n1, n2 = len(x), len(y)
+  n = n1 + n2
+  ranks, tie_sizes = _Ranks(list(x) + list(y))
+  u = sum(ranks[:n1]) - n1 * (n1 + 1) / 2.
+  tie_term = sum(t ** 3 - t for t in tie_sizes) / float(n * (n - 1))
+  variance = n1 * n2 / 12. * ((n + 1) - tie_term)
+  if variance <= 0:
+    return 1.
+  return _NormalTail((u - n1 * n2 / 2. - .5) / math.sqrt(variance))
+
+
+def _TwoSidedMannWhitneyU(x, y):
+  return min(1., 2 * min(MannWhitneyU(x, y), MannWhitneyU(y, x)))
+
+
+def _FindMeanShift(values, start, min_segment_length):
+  """Returns the split of values[start:] that best separates their means.
+
+  Maximizes the likelihood ratio statistic of a shift in mean,
+  n1 * n2 / n * (mean1 - mean2) ** 2, over the splits that leave at least
+  min_segment_length values on each side. Returns None if there are none.
+  """
+  n = len(values) - start
+  total = float(sum(values[start:]))
+  best_statistic, best_split = -1., None
+  left_sum = sum(values[start:start + min_segment_length - 1])
+  for i in xrange(start + min_segment_length,
+                  len(values) - min_segment_length + 1):
+    left_sum += values[i - 1]
+    n1 = i - start
+    n2 = n - n1
+    shift = left_sum / n1 - (total - left_sum) / n2
+    statistic = n1 * n2 / float(n) * shift ** 2
+    if statistic > best_statistic:
+      best_statistic, best_split = statistic, i
+  return best_split
+
+
+def FindLastChangePoint(values, alpha, min_segment_length):
+  """Finds where the current regime of a time series starts.
+
+  The series is split where the means before and after differ the most. If
+  the Mann-Whitney U test finds the values on both sides of the split to
+  differ significantly, after a Bonferroni correction for the number of
+  candidate splits, the search is repeated on the values after it.
+
+  Args:
+    values: list of numbers, in time order.
+    alpha: float. Significance level of each split.
+    min_segment_length: int. Minimum number of values on each side of a split.
+
+  Returns:
+    The index of the first value of the current regime.
+  """
+  start = 0
+  while True:
+    split = _FindMeanShift(values, start, min_segment_length)
+    if split is None:
+      return start
+    candidate_count = len(values) - start - 2 * min_segment_length + 1
+    p_value = _TwoSidedMannWhitneyU(values[start:split], values[split:])
+    if p_value * candidate_count >= alpha:
+      return start
+    start = split
+
+
+def BootstrapMedianDifference(baseline, head, rng=None,
+                              iterations=_BOOTSTRAP_ITERATIONS,
+                              confidence=_BOOTSTRAP_CONFIDENCE):
+  """Computes a bootstrap confidence interval of median(head) - median(base).
+
+  Args:
+    baseline: Non-empty sequence of numbers.
+    head: Non-empty sequence of numbers.
+    rng: Optional random.Random used for resampling.
+    iterations: int. Number of resamples.
+    confidence: float. Confidence level of the interval.
+
+  Returns:
+    (low, high) tuple. The percentile interval of the difference.
+  """
+  rng = rng or random.Random(0)
+  differences = sorted(
+      Median([rng.choice(head) for _ in head]) -
+      Median([rng.choice(baseline) for _ in baseline])
+      for _ in xrange(iterations))
+  tail = (1. - confidence) / 2.
+  return (differences[int(tail * (iterations - 1))],
+          differences[int(math.ceil((1. - tail) * (iterations - 1)))])
+
+
+def _GetPValue(baseline, head, higher):
+  """Returns the probability of values at least as high, or low, as head's.
+
+  Args:
+    baseline: Non-empty sequence of numbers.
+    head: Non-empty sequence of numbers.
+    higher: boolean. Whether to test for values at least as high as head's,
+        rather than at least as low.
+  """
+  if len(head) >= _MIN_RANK_TEST_VALUES:
+    return MannWhitneyU(head, baseline) if higher else MannWhitneyU(
+        baseline, head)
+  # A rank among a few dozen baseline values cannot be significant at small
+  # alphas, so fewer values are scored by their distance from the baseline
+  # median, in units of the baseline's median absolute deviation.
+  baseline_median = Median(baseline)
+  difference = Median(head) - baseline_median
+  if not higher:
+    difference = -difference
+  scale = _MAD_TO_STDDEV * Median([abs(b - baseline_median) for b in baseline])
+  if not scale:
+    return 1. if difference <= 0 else 0.
+  # The scale is itself estimated from the baseline, which makes large scores
+  # likelier than under the normal distribution for small baselines.
+  standard_error = scale * math.sqrt(1. / len(head) + 1. / len(baseline))
+  return _StudentTTail(difference / standard_error, len(baseline) - 1)
+
+
+def AdjustPValues(p_values):
+  """Adjusts p-values for multiple comparisons.
+
+  Uses the Benjamini-Hochberg procedure: rejecting the hypotheses whose
+  adjusted p-values are below alpha keeps the expected proportion of false
+  rejections among all rejections below alpha.
+
+  Args:
+    p_values: list of floats.
+
+  Returns:
+    list of floats. The adjusted p-value of each of p_values.
+  """
+  count = len(p_values)
+  order = sorted(range(count), key=p_values.__getitem__)
+  adjusted = [1.] * count
+  smallest = 1.
+  for rank in xrange(count, 0, -1):
+    index = order[rank - 1]
+    smallest = min(smallest, p_values[index] * count / float(rank))
+    adjusted[index] = smallest
+  return adjusted
+
+
+def _TestDifference(baseline, head, direction):
+  """Returns the p-value of the difference of head from the baseline."""
+  if direction is None:
+    return min(1., 2 * min(_GetPValue(baseline, head, True),
+                           _GetPValue(baseline, head, False)))
+  return _GetPValue(baseline, head, Median(head) > Median(baseline))
+
+
+def _Classify(baseline, head, direction, p_value, alpha, min_change_percent):
+  """Returns the Comparison of head to the current regime of its baseline."""
+  baseline_median = Median(baseline)
+  head_median = Median(head)
+  difference = head_median - baseline_median
+  if baseline_median:
+    change_percent = 100. * difference / abs(baseline_median)
+  else:
+    change_percent = 0. if not difference else math.copysign(
+        float('inf'), difference)
+  confidence_interval = None
+  significant = (p_value < alpha and
+                 abs(change_percent) >= min_change_percent)
+  if significant:
+    # Bootstrapping is the costliest step, so it only confirms differences
+    # that are otherwise significant.
+    confidence_interval = BootstrapMedianDifference(baseline, head)
+    low, high = confidence_interval
+    significant = low > 0 or high < 0
+  if not significant:
+    status = NO_CHANGE
+  elif direction is None:
+    status = CHANGE
+  elif (difference > 0) == (direction == LOWER_IS_BETTER):
+    status = REGRESSION
+  else:
+    status = IMPROVEMENT
+  return Comparison(status, p_value, baseline_median, head_median,
+                    change_percent, confidence_interval, len(baseline))
+
+
+def CompareAll(groups, alpha, min_change_percent, min_baseline_size):
+  """Compares the values of several metrics to their baselines.
+
+  The p-values are adjusted for the number of comparisons, so that the
+  chance of mistaking noise for a change does not grow with the number of
+  metrics.
+
+  Args:
+    groups: list of (baseline, head, direction) tuples, as the arguments of
+        Compare.
+    alpha: float. Significance level of the adjusted p-values.
+    min_change_percent: float. Minimum difference of the medians, in percent
+        of the baseline median, to report.
+    min_baseline_size: int. Minimum number of baseline values in the current
+        regime of a metric.
+
+  Returns:
+    list of Comparisons, one per group.
+  """
+  baselines = []
+  for baseline, _, _ in groups:
+    start = FindLastChangePoint(baseline, alpha, min_baseline_size)
+    baselines.append(baseline[start:])
+  compared = [i for i, baseline in enumerate(baselines)
+              if len(baseline) >= min_baseline_size]
+  p_values = dict(zip(compared, AdjustPValues(
+      [_TestDifference(baselines[i], groups[i][1], groups[i][2])
+       for i in compared])))
+  comparisons = []
+  for i, (baseline, (_, head, direction)) in enumerate(zip(baselines,
+                                                           groups)):
+    if i in p_values:
+      comparisons.append(_Classify(baseline, head, direction, p_values[i],
+                                   alpha, min_change_percent))
+    else:
+      comparisons.append(Comparison(INSUFFICIENT_BASELINE, None, None, None,
+                                    None, None, len(baseline)))
+  return comparisons
+
+
+def Compare(baseline, head, direction, alpha, min_change_percent,
+            min_baseline_size):
+  """Compares the values of a metric to its baseline.
+
+  Args:
+    baseline: list of numbers. Past values of the metric, in time order.
+    head: Non-empty list of numbers. Values of the metric in the current run.
+    direction: HIGHER_IS_BETTER, LOWER_IS_BETTER or None if unknown.
+    alpha: float. Significance level.
+    min_change_percent: float. Minimum difference of the medians, in percent
+        of the baseline median, to report.
+    min_baseline_size: int. Minimum number of baseline values in the current
+        regime of the metric.
+
+  Returns:
+    A Comparison.
+  """
+  return CompareAll([(baseline, head, direction)], alpha, min_change_percent,
+                    min_baseline_size)[0]
+
+
+class RegressionDetector(object):
+  """Compares samples to baselines from a results warehouse as they are made.
+
+  AnnotateSamples is connected to events.samples_created.
+
+  Attributes:
+    regressions: list of (samples, Comparison) pairs. Each list of sample
+        dicts that regressed, with their comparison to the baseline.
+    failed_batch_count: int. Number of batches of samples that could not be
+        compared to their baselines.
+  """
+
+  def __init__(self, warehouse):
+    self._warehouse = warehouse
+    self._lock = threading.Lock()
+    self.regressions = []
+    self.failed_batch_count = 0
+
+  def Close(self):
+    """Closes the connection to the results warehouse."""
+    self._warehouse.Close()
+
+  def _GetBaseline(self, sample, start_time):
+    """Returns the past values of a sample's metric, in time order."""
+    metadata = sample['metadata']
+    return [
+        v for v in self._warehouse.GetValues(
+            test=sample['test'], metric=sample['metric'],
+            unit=sample.get('unit'), exclude_run_uri=sample.get('run_uri'),
+            metadata={k: metadata[k] for k in FLAGS.regression_metadata_keys
+                      if k in metadata},
+            start_time=start_time)
+        if isinstance(v, (int, long, float))]
+
+  def AnnotateSamples(self, unused_sender, benchmark_spec, samples):
+    """Compares samples to their baselines and adds the statuses to metadata.
+
+    Samples that share their test, metric, unit and metadata are compared to
+    their baseline together. Failures are logged and counted rather than
+    raised, since they would fail the benchmark and lose its samples.
+
+    Args:
+      unused_sender: Unused sender of the samples_created event.
+      benchmark_spec: BenchmarkSpec. Unused.
+      samples: list of dicts. The samples, as built by
+          SampleCollector.AddSamples.
+    """
+    try:
+      self._AnnotateSamples(samples)
+    except Exception:
+      logging.exception('Could not compare samples to their baselines.')
+      with self._lock:
+        self.failed_batch_count += 1
+
+  def _AnnotateSamples(self, samples):
+    groups = collections.OrderedDict()
+    for sample in samples:
+      if type(sample.get('value')) in (int, long, float):
+        key = (sample['test'], sample['metric'], sample.get('unit'),
+               json.dumps(sample['metadata'], sort_keys=True))
+        groups.setdefault(key, []).append(sample)
+    groups = groups.values()
+    start_time = time.time() - FLAGS.regression_baseline_days * SECONDS_PER_DAY
+    comparisons = CompareAll(
+        [(self._GetBaseline(group[0], start_time),
+          [sample['value'] for sample in group],
+          GetDirection(group[0]['metric'], group[0].get('unit')))
+         for group in groups],
+        FLAGS.regression_alpha, FLAGS.regression_min_change_percent,
+        FLAGS.regression_min_baseline_samples)
+    for group, comparison in zip(groups, comparisons):
+      # Like the rest of their metadata, the status is the same for all the
+      # samples of a group, so stores can still encode their metadata once.
+      for sample in group:
+        sample['metadata']['regression_status'] = comparison.status
+      if comparison.status == REGRESSION:
+        sample = group[0]
+        logging.warning(
+            'Regression of %s %s: median of %s %s over %d samples, %+.1f%% '
+            'from the baseline median of %s over %d samples (p=%.3g).',
+            sample['test'], sample['metric'], comparison.head_median,
+            sample.get('unit'), len(group), comparison.change_percent,
+            comparison.baseline_median, comparison.baseline_size,
+            comparison.p_value)
+        with self._lock:
+          self.regressions.append((group, comparison))
+
+  def CreateSummary(self):
+    """Returns a summary of the regressions and failures found, for the log."""
+    summary = []
+    if self.regressions:
+      lines = ['{0} {1}: {2:+.1f}% (p={3:.3g})'.format(
+          samples[0]['test'], samples[0]['metric'], c.change_percent,
+          c.p_value) for samples, c in self.regressions]
+      summary.append('Regressions found:\n  ' + '\n  '.join(lines))
+    if self.failed_batch_count:
+      summary.append('Could not compare {0} batches of samples to their '
+                     'baselines.'.format(self.failed_batch_count))
+    return '\n'.join(summary)
+
+
+def CreateDetector():
+  """Returns a RegressionDetector for the flags, or None if not enabled."""
+  if not FLAGS.detect_regressions:
+    return None
+  return RegressionDetector(
+      results_warehouse.Warehouse(FLAGS.warehouse_path))
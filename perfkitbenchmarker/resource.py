@@ -20,11 +20,42 @@ reliably.
 """
 
 import abc
+import collections
+import threading
 import time
 
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import vm_util
 
+# Bounds of the interval, in seconds, at which resources are polled until they
+# are ready. Within them, the interval is a fraction of the time that earlier
+# resources of the same class took to become ready.
+MIN_READY_POLL_INTERVAL = 1
+MAX_READY_POLL_INTERVAL = 15
+DEFAULT_READY_POLL_INTERVAL = 5
+_READY_POLLS_PER_WAIT = 10
+
+# Maps each resource class to the times, in seconds, that its resources took
+# to become ready after they were created.
+_ready_times = collections.defaultdict(list)
+_ready_times_lock = threading.Lock()
+
+
+def _GetReadyPollInterval(resource_class):
+  """Returns the interval at which to poll a new resource until it is ready."""
+  with _ready_times_lock:
+    ready_times = sorted(_ready_times.get(resource_class, ()))
+  if not ready_times:
+    return DEFAULT_READY_POLL_INTERVAL
+  median_ready_time = ready_times[len(ready_times) // 2]
+  return min(max(median_ready_time / _READY_POLLS_PER_WAIT,
+                 MIN_READY_POLL_INTERVAL), MAX_READY_POLL_INTERVAL)
+
+
+def _RecordReadyTime(resource_class, ready_time):
+  with _ready_times_lock:
+    _ready_times[resource_class].append(ready_time)
+
 
 class BaseResource(object):
   """An object representing a cloud resource.
@@ -94,6 +125,20 @@ class BaseResource(object):
     """
     pass
 
+  def GetResourceDependencies(self):
+    """Returns the resources that this resource depends on.
+
+    The returned resources must be created before this resource is created,
+    and deleted only after this resource is deleted. They may be
+    BaseResources or other objects with Create and Delete methods, such as
+    networks. Unlike the resources handled by _CreateDependencies, they are
+    not created by this resource.
+
+    Returns:
+      list of the objects that this resource depends on.
+    """
+    return []
+
   def _CreateDependencies(self):
     """Method that will be called once before _CreateResource() is called.
 
@@ -146,9 +191,7 @@ class BaseResource(object):
   def Create(self):
     """Creates a resource and its dependencies."""
 
-    # A more general solution would allow the retry interval to be set as a
-    # property of the class.  We don't currently need that.
-    @vm_util.Retry(poll_interval=5, fuzz=0,
+    @vm_util.Retry(poll_interval=_GetReadyPollInterval(type(self)), fuzz=0,
                    retryable_exceptions=(
                        errors.Resource.RetryableCreationError,))
     def WaitUntilReady():
@@ -162,6 +205,9 @@ class BaseResource(object):
     WaitUntilReady()
     if not self.resource_ready_time:
       self.resource_ready_time = time.time()
+      if self.create_end_time:
+        _RecordReadyTime(type(self),
+                         self.resource_ready_time - self.create_end_time)
     self._PostCreate()
 
   def Delete(self):
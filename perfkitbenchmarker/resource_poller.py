@@ -0,0 +1,114 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Answers many resources' state checks with one list call.
+
+When many resources are created or deleted at once, each of them checks
+whether it exists or is ready with its own describe call. A BatchPoller
+instead collects the checks that arrive within a short window for resources
+of the same type and location, lists the state of all of them with a single
+call, and hands each resource its own state.
+"""
+
+import threading
+import time
+
+from perfkitbenchmarker import flags
+
+flags.DEFINE_float('resource_polling_window', 1,
+                   'Seconds that a check of the state of a cloud resource '
+                   'waits for checks of other resources of the same type and '
+                   'location, so that they are all answered by one list '
+                   'call. 0 disables batching.')
+
+FLAGS = flags.FLAGS
+
+# Threads waiting for a batch to complete wake up at this interval. Waiting
+# with a timeout allows the wait to be interrupted by a KeyboardInterrupt.
+_WAIT_TIMEOUT = 1000.
+
+
+class _Batch(object):
+  """The keys whose states are listed by one call."""
+
+  def __init__(self):
+    self.keys = set()
+    self.states = None
+    self.error = None
+    self.done = threading.Event()
+
+
+class BatchPoller(object):
+  """Lists the states of resources of one type in batches.
+
+  A BatchPoller is shared by all resources of its type, and its methods may be
+  called concurrently from multiple threads.
+  """
+
+  def __init__(self, list_states):
+    """Initializes the BatchPoller.
+
+    Args:
+      list_states: function. Called with a scope and a sorted list of keys, and
+          returns a dict that maps each of the keys that was found to its
+          state. The scope identifies where the resources are, such as a
+          zone; it is passed to GetState and must be hashable. Keys identify
+          resources within their scope, such as by name.
+    """
+    self._list_states = list_states
+    self._lock = threading.Lock()
+    # Maps each scope to the batch that is collecting keys for it.
+    self._pending_batches = {}
+
+  def GetState(self, scope, key):
+    """Returns the state of a resource.
+
+    Args:
+      scope: The scope of the resource.
+      key: The key of the resource within its scope.
+
+    Returns:
+      The state of the resource, or None if it was not found.
+    """
+    window = FLAGS.resource_polling_window
+    if not window:
+      return self._list_states(scope, [key]).get(key)
+    with self._lock:
+      batch = self._pending_batches.get(scope)
+      is_leader = batch is None
+      if is_leader:
+        batch = self._pending_batches[scope] = _Batch()
+      batch.keys.add(key)
+    if is_leader:
+      try:
+        time.sleep(window)
+        with self._lock:
+          del self._pending_batches[scope]
+        batch.states = self._list_states(scope, sorted(batch.keys))
+      except BaseException as e:
+        # Includes a KeyboardInterrupt during the window, which the threads
+        # waiting for the batch also raise.
+        batch.error = e
+        raise
+      finally:
+        with self._lock:
+          if self._pending_batches.get(scope) is batch:
+            del self._pending_batches[scope]
+        batch.done.set()
+    else:
+      while not batch.done.wait(_WAIT_TIMEOUT):
+        pass
+      if batch.error is not None:
+        raise batch.error
+    return batch.states.get(key)
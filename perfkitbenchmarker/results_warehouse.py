@@ -0,0 +1,354 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Local SQLite warehouse of samples from many runs.
+
+A Warehouse keeps the samples of past runs in an indexed SQLite database, so
+that historical questions such as "the p99 of a metric on a machine type over
+the last 30 days" only read the matching samples. Samples are added by the
+WarehousePublisher of --warehouse_path, or imported from the newline delimited
+JSON and columnar results files of earlier runs:
+
+  python -m perfkitbenchmarker.results_warehouse DB import FILE [FILE ...]
+  python -m perfkitbenchmarker.results_warehouse DB query --metric METRIC \\
+      [--test TEST] [--metadata KEY=VALUE ...] [--days DAYS] \\
+      [--percentile PERCENTILE ...]
+
+Like the samples, the metadata dicts are dictionary encoded: each distinct
+dict is stored once, and each of its keys is indexed, so filtering on any
+metadata key only reads the matching samples.
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+
+from perfkitbenchmarker import columnar_results
+from perfkitbenchmarker import sample
+
+_SECONDS_PER_DAY = 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    id INTEGER PRIMARY KEY,
+    json TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS metadata_values (
+    metadata_id INTEGER NOT NULL REFERENCES metadata (id),
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (metadata_id, key));
+CREATE INDEX IF NOT EXISTS metadata_values_by_key
+    ON metadata_values (key, value, metadata_id);
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    test TEXT,
+    metric TEXT,
+    value REAL,
+    unit TEXT,
+    timestamp REAL,
+    run_uri TEXT,
+    sample_uri TEXT,
+    product_name TEXT,
+    official INTEGER,
+    owner TEXT,
+    metadata_id INTEGER REFERENCES metadata (id));
+CREATE INDEX IF NOT EXISTS samples_by_test
+    ON samples (test, metric, timestamp);
+CREATE INDEX IF NOT EXISTS samples_by_metric ON samples (metric, timestamp);
+CREATE INDEX IF NOT EXISTS samples_by_run_uri ON samples (run_uri);
+CREATE INDEX IF NOT EXISTS samples_by_timestamp ON samples (timestamp);
+CREATE INDEX IF NOT EXISTS samples_by_metadata ON samples (metadata_id);
+"""
+
+# Sample fields stored in columns of the samples table, in column order.
+_SAMPLE_FIELDS = ('test', 'metric', 'value', 'unit', 'timestamp', 'run_uri',
+                  'sample_uri', 'product_name', 'official', 'owner')
+
+
+def _GetMetadataValueText(value):
+  """Returns the text that a metadata value is stored and filtered as.
+
+  Strings are stored as they are and other values as JSON, so that a value
+  given on the command line, such as 4 or true, matches the value stored.
+  """
+  if isinstance(value, basestring):
+    return value
+  return json.dumps(value, sort_keys=True)
+
+
+def _SplitLabels(labels):
+  """Parses the '|key:value|,|key:value|' labels of collapsed JSON samples."""
+  result = {}
+  if labels:
+    for item in labels.strip('|').split('|,|'):
+      k, v = item.split(':', 1)
+      result[k] = v
+  return result
+
+
+def _ReadResultsFile(path):
+  """Yields the sample dicts of a newline delimited JSON or columnar file."""
+  magic = columnar_results.MAGIC
+  with open(path, 'rb') as fp:
+    is_columnar = fp.read(len(magic)) == magic
+  if is_columnar:
+    for s in columnar_results.ReadSamples(path):
+      yield s
+    return
+  with open(path) as fp:
+    for line in fp:
+      if line.strip():
+        s = json.loads(line)
+        if 'labels' in s and 'metadata' not in s:
+          s['metadata'] = _SplitLabels(s.pop('labels'))
+        yield s
+
+
+class Warehouse(object):
+  """Indexed SQLite store of samples.
+
+  Methods may be called from any thread, one at a time.
+
+  Attributes:
+    path: string. Path of the SQLite database file.
+  """
+
+  def __init__(self, path):
+    self.path = path
+    self._lock = threading.Lock()
+    self._connection = sqlite3.connect(path, check_same_thread=False)
+    self._connection.executescript(_SCHEMA)
+    # Maps the JSON of each metadata dict stored to its id.
+    self._metadata_ids = {}
+
+  def __repr__(self):
+    return '<{0} path="{1}">'.format(type(self).__name__, self.path)
+
+  def Close(self):
+    with self._lock:
+      self._connection.close()
+
+  def _GetMetadataId(self, cursor, metadata):
+    metadata_json = json.dumps(metadata, sort_keys=True)
+    metadata_id = self._metadata_ids.get(metadata_json)
+    if metadata_id is None:
+      row = cursor.execute('SELECT id FROM metadata WHERE json = ?',
+                           (metadata_json,)).fetchone()
+      if row:
+        metadata_id = row[0]
+      else:
+        cursor.execute('INSERT INTO metadata (json) VALUES (?)',
+                       (metadata_json,))
+        metadata_id = cursor.lastrowid
+        cursor.executemany(
+            'INSERT INTO metadata_values (metadata_id, key, value) '
+            'VALUES (?, ?, ?)',
+            [(metadata_id, k, _GetMetadataValueText(v))
+             for k, v in metadata.iteritems()])
+      self._metadata_ids[metadata_json] = metadata_id
+    return metadata_id
+
+  def AddSamples(self, samples):
+    """Stores samples in one transaction.
+
+    Args:
+      samples: Iterable of sample dicts, as published by a SampleCollector.
+
+    Returns:
+      The number of samples stored.
+    """
+    insert = 'INSERT INTO samples ({0}, metadata_id) VALUES ({1})'.format(
+        ', '.join(_SAMPLE_FIELDS), ', '.join('?' * (len(_SAMPLE_FIELDS) + 1)))
+    count = 0
+    with self._lock:
+      try:
+        with self._connection:
+          cursor = self._connection.cursor()
+          for s in samples:
+            row = [s.get(field) for field in _SAMPLE_FIELDS]
+            row.append(self._GetMetadataId(cursor, s.get('metadata', {})))
+            cursor.execute(insert, row)
+            count += 1
+      except:
+        # The metadata stored by the transaction was rolled back.
+        self._metadata_ids.clear()
+        raise
+    return count
+
+  def _Select(self, columns, metric=None, test=None, unit=None, run_uri=None,
+              exclude_run_uri=None, metadata=None, start_time=None,
+              end_time=None):
+    conditions = []
+    params = []
+    for column, value in (('metric', metric), ('test', test), ('unit', unit),
+                          ('run_uri', run_uri)):
+      if value is not None:
+        conditions.append('samples.{0} = ?'.format(column))
+        params.append(value)
+    if exclude_run_uri is not None:
+      conditions.append('samples.run_uri IS NOT ?')
+      params.append(exclude_run_uri)
+    if start_time is not None:
+      conditions.append('samples.timestamp >= ?')
+      params.append(start_time)
+    if end_time is not None:
+      conditions.append('samples.timestamp < ?')
+      params.append(end_time)
+    for k, v in sorted((metadata or {}).iteritems()):
+      conditions.append('samples.metadata_id IN (SELECT metadata_id FROM '
+                        'metadata_values WHERE key = ? AND value = ?)')
+      params.extend((k, _GetMetadataValueText(v)))
+    query = ('SELECT {0} FROM samples LEFT JOIN metadata '
+             'ON metadata.id = samples.metadata_id'.format(columns))
+    if conditions:
+      query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY samples.timestamp, samples.id'
+    with self._lock:
+      return self._connection.execute(query, params).fetchall()
+
+  def GetSamples(self, **filters):
+    """Returns the stored samples that match filters.
+
+    Args:
+      **filters: Optional filters that each sample must match.
+        metric: string. The sample's metric.
+        test: string. The sample's test, i.e. the benchmark name.
+        unit: string. The sample's unit.
+        run_uri: string. The run_uri of the sample's run.
+        exclude_run_uri: string. A run_uri that the sample's run must not have.
+        metadata: dict. Metadata keys and the values they must have.
+        start_time: float. Earliest timestamp, inclusive.
+        end_time: float. Latest timestamp, exclusive.
+
+    Returns:
+      A list of sample dicts, ordered by timestamp.
+    """
+    rows = self._Select(
+        ', '.join('samples.' + field for field in _SAMPLE_FIELDS) +
+        ', metadata.json', **filters)
+    samples = []
+    for row in rows:
+      s = {field: value for field, value in zip(_SAMPLE_FIELDS, row)
+           if value is not None}
+      if 'official' in s:
+        s['official'] = bool(s['official'])
+      s['metadata'] = json.loads(row[-1]) if row[-1] else {}
+      samples.append(s)
+    return samples
+
+  def GetValues(self, **filters):
+    """Returns the values of the stored samples that match filters.
+
+    Args:
+      **filters: Filters as for GetSamples.
+
+    Returns:
+      A list of the samples' values, ordered by timestamp.
+    """
+    return [row[0] for row in self._Select('samples.value', **filters)]
+
+  def GetStatistics(self, percentiles=sample.PERCENTILES_LIST, days=None,
+                    **filters):
+    """Computes statistics of the values of the samples that match filters.
+
+    Args:
+      percentiles: Sequence of numbers. The percentiles to compute.
+      days: Optional number. Only consider samples from this many days ago or
+          later.
+      **filters: Filters as for GetSamples.
+
+    Returns:
+      None if no samples match. Otherwise, a dict as returned by
+      sample.PercentileCalculator, with the additional key 'count'.
+    """
+    if days is not None:
+      filters['start_time'] = time.time() - days * _SECONDS_PER_DAY
+    values = [v for v in self.GetValues(**filters)
+              if isinstance(v, (int, long, float))]
+    if not values:
+      return None
+    statistics = sample.PercentileCalculator(values, percentiles)
+    statistics['count'] = len(values)
+    return statistics
+
+
+def _ParseMetadataFilter(text):
+  key, sep, value = text.partition('=')
+  if not sep:
+    raise argparse.ArgumentTypeError(
+        'Expected KEY=VALUE, got: {0}'.format(text))
+  return key, value
+
+
+def _ParsePercentile(text):
+  # PercentileCalculator names percentile 99 'p99' but 99.0 'p99.0'.
+  value = float(text)
+  return int(value) if value.is_integer() else value
+
+
+def _Import(warehouse, args):
+  for path in args.files:
+    count = warehouse.AddSamples(_ReadResultsFile(path))
+    logging.info('Imported %d samples from %s', count, path)
+
+
+def _Query(warehouse, args):
+  statistics = warehouse.GetStatistics(
+      percentiles=args.percentile or sample.PERCENTILES_LIST, days=args.days,
+      metric=args.metric, test=args.test, run_uri=args.run_uri,
+      metadata=dict(args.metadata))
+  if statistics is None:
+    logging.error('No samples match.')
+    return 1
+  json.dump(statistics, sys.stdout, indent=2, sort_keys=True)
+  sys.stdout.write('\n')
+
+
+def main(argv=None):
+  logging.basicConfig(level=logging.INFO)
+  parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+  parser.add_argument('database', help='Path of the SQLite database.')
+  subparsers = parser.add_subparsers()
+  import_parser = subparsers.add_parser(
+      'import', help='Import newline delimited JSON or columnar results.')
+  import_parser.add_argument('files', nargs='+')
+  import_parser.set_defaults(func=_Import)
+  query_parser = subparsers.add_parser(
+      'query', help='Print statistics of the values of matching samples.')
+  query_parser.add_argument('--metric', required=True)
+  query_parser.add_argument('--test')
+  query_parser.add_argument('--run_uri')
+  query_parser.add_argument(
+      '--metadata', action='append', default=[], type=_ParseMetadataFilter,
+      metavar='KEY=VALUE', help='Metadata value to match. May be repeated.')
+  query_parser.add_argument(
+      '--days', type=float, help='Only consider samples of the last DAYS days.')
+  query_parser.add_argument(
+      '--percentile', action='append', type=_ParsePercentile,
+      help='Percentile to compute. May be repeated.')
+  query_parser.set_defaults(func=_Query)
+  args = parser.parse_args(argv)
+  warehouse = Warehouse(args.database)
+  try:
+    return args.func(warehouse, args)
+  finally:
+    warehouse.Close()
+
+
+if __name__ == '__main__':
+  sys.exit(main())
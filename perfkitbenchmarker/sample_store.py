@@ -0,0 +1,232 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compact in-memory storage for the samples of a SampleCollector.
+
+A run can produce tens of thousands of samples, for example the histogram
+buckets of YCSB, and all the samples of a benchmark typically share the same
+metadata of dozens of keys. Storing each sample as its own dict repeats that
+metadata for every sample.
+
+A SampleStore instead keeps each field of the samples in a column. Numbers are
+packed into arrays, strings such as the metric and unit are dictionary-encoded,
+and identical metadata dicts are stored once and shared by reference. The
+sample dicts that publishers expect are only built as the store is iterated.
+"""
+
+import array
+import uuid
+
+
+class _Missing(object):
+  """Marks a field that a sample does not have."""
+
+  def __repr__(self):
+    return '<missing>'
+
+
+_MISSING = _Missing()
+
+# Kinds of the values of a _NumberColumn.
+_FLOAT = 0
+_INT = 1
+_OTHER = 2
+
+
+class _DictionaryColumn(object):
+  """Column that stores each distinct value once.
+
+  Attributes:
+    values: list. The distinct values of the column, in order of first
+        appearance.
+    codes: array of ints. For each row, the index of its value in values.
+  """
+
+  def __init__(self, key_func=None, copy_func=None):
+    """Initializes the column.
+
+    Args:
+      key_func: Optional callable that returns a hashable key for a value.
+          Values with equal keys are stored once. Defaults to the value.
+      copy_func: Optional callable that returns the copy of a value that the
+          column stores when it sees the value for the first time.
+    """
+    self.values = []
+    self.codes = array.array('L')
+    self._key_func = key_func
+    self._copy_func = copy_func
+    self._codes_by_key = {}
+
+  def Append(self, value):
+    key = self._key_func(value) if self._key_func else value
+    code = self._codes_by_key.get(key)
+    if code is None:
+      code = len(self.values)
+      self._codes_by_key[key] = code
+      self.values.append(self._copy_func(value) if self._copy_func else value)
+    self.codes.append(code)
+
+  def Get(self, index):
+    return self.values[self.codes[index]]
+
+
+class _NumberColumn(object):
+  """Column that packs numbers into an array of doubles.
+
+  Ints are restored as ints. Values that a double cannot represent exactly are
+  kept as they are.
+  """
+
+  def __init__(self):
+    self._numbers = array.array('d')
+    self._kinds = array.array('b')
+    self._others = {}
+
+  def Append(self, value):
+    kind = _OTHER
+    if type(value) is float:
+      kind = _FLOAT
+    elif type(value) in (int, long) and float(value) == value:
+      kind = _INT
+    if kind == _OTHER:
+      self._others[len(self._kinds)] = value
+      value = 0.
+    self._numbers.append(value)
+    self._kinds.append(kind)
+
+  def Get(self, index):
+    kind = self._kinds[index]
+    if kind == _FLOAT:
+      return self._numbers[index]
+    elif kind == _INT:
+      return int(self._numbers[index])
+    return self._others[index]
+
+
+class _UuidColumn(object):
+  """Column that packs UUID strings into 16 bytes each.
+
+  Values that are not UUIDs in their canonical string form are kept as they
+  are.
+  """
+
+  def __init__(self):
+    self._bytes = bytearray()
+    self._others = {}
+
+  def Append(self, value):
+    try:
+      parsed = uuid.UUID(value)
+    except (TypeError, ValueError, AttributeError):
+      parsed = None
+    if parsed is None or str(parsed) != value:
+      self._others[len(self._bytes) // 16] = value
+      self._bytes.extend(b'\0' * 16)
+    else:
+      self._bytes.extend(parsed.bytes)
+
+  def Get(self, index):
+    if index in self._others:
+      return self._others[index]
+    return str(uuid.UUID(bytes=bytes(self._bytes[index * 16:index * 16 + 16])))
+
+
+def _GetMetadataKey(metadata):
+  """Returns a hashable key that is equal for equal metadata dicts."""
+  if metadata is _MISSING:
+    return metadata
+  try:
+    return frozenset((k, type(v), v) for k, v in metadata.iteritems())
+  except TypeError:
+    # Some values, such as lists, are not hashable.
+    return repr(sorted(metadata.iteritems()))
+
+
+def _CopyMetadata(metadata):
+  return metadata if metadata is _MISSING else dict(metadata)
+
+
+class SampleStore(object):
+  """Columnar sequence of sample dicts.
+
+  Samples are added as the dicts that SampleCollector.AddSamples builds, and
+  iterating the store yields equal dicts. Each yielded dict and its metadata
+  dict are new objects, so publishers may modify them.
+  """
+
+  def __init__(self):
+    self._columns = (
+        ('metric', _DictionaryColumn()),
+        ('value', _NumberColumn()),
+        ('unit', _DictionaryColumn()),
+        ('timestamp', _NumberColumn()),
+        # The store keeps its own copy of each distinct metadata dict, which
+        # is never modified.
+        ('metadata', _DictionaryColumn(_GetMetadataKey, _CopyMetadata)),
+        ('test', _DictionaryColumn()),
+        ('product_name', _DictionaryColumn()),
+        ('official', _DictionaryColumn()),
+        ('owner', _DictionaryColumn()),
+        ('run_uri', _DictionaryColumn()),
+        ('sample_uri', _UuidColumn()))
+    self._column_names = frozenset(name for name, _ in self._columns)
+    # Maps the index of each sample that has fields without a column to a
+    # dict of those fields.
+    self._extra_fields = {}
+    self._length = 0
+
+  def __len__(self):
+    return self._length
+
+  def __iter__(self):
+    for index in xrange(self._length):
+      yield self._Materialize(index)
+
+  def __getitem__(self, index):
+    if index < 0:
+      index += self._length
+    if not 0 <= index < self._length:
+      raise IndexError(index)
+    return self._Materialize(index)
+
+  def Append(self, sample):
+    """Adds a sample.
+
+    Args:
+      sample: dict. The sample, as built by SampleCollector.AddSamples.
+    """
+    for name, column in self._columns:
+      column.Append(sample.get(name, _MISSING))
+    extra_fields = {k: v for k, v in sample.iteritems()
+                    if k not in self._column_names}
+    if extra_fields:
+      self._extra_fields[self._length] = extra_fields
+    self._length += 1
+
+  def Extend(self, samples):
+    """Adds each of a sequence of sample dicts."""
+    for sample in samples:
+      self.Append(sample)
+
+  def _Materialize(self, index):
+    sample = {}
+    for name, column in self._columns:
+      value = column.Get(index)
+      if value is _MISSING:
+        continue
+      if name == 'metadata':
+        value = value.copy()
+      sample[name] = value
+    sample.update(self._extra_fields.get(index, ()))
+    return sample
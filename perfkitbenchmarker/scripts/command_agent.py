@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+#
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# -*- coding: utf-8 -*-
+
+"""Runs commands received on stdin, streaming their output to stdout.
+
+Lets a single long-lived connection (such as one ssh session) carry any number
+of concurrent commands. Requests and responses are JSON objects, one per line.
+
+Each request has the form:
+  {"id": <int>, "command": <string>, "timeout": <number or null>}
+
+The command is run with bash. As soon as it writes output, the agent sends
+  {"id": <int>, "stream": "stdout" or "stderr", "data": <string>}
+and once the command has exited, the agent sends
+  {"id": <int>, "exit": <int>}
+A command that is still running after its timeout is killed, along with the
+processes that it started, and reports an exit status of -9.
+
+The agent exits when stdin is closed.
+
+*Runs on the guest VM. Supports Python 2.6, 2.7, and 3.x.*
+"""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+
+# Maximum number of bytes of output forwarded in a single response.
+_READ_SIZE = 4096
+
+# Exit status reported for commands that cannot be started.
+_START_FAILURE_STATUS = 127
+
+_output_lock = threading.Lock()
+
+
+def _Send(message):
+  line = json.dumps(message) + '\n'
+  _output_lock.acquire()
+  try:
+    sys.stdout.write(line)
+    sys.stdout.flush()
+  finally:
+    _output_lock.release()
+
+
+def _ForwardOutput(request_id, stream_name, pipe):
+  """Sends the output read from pipe until it is closed."""
+  fd = pipe.fileno()
+  while True:
+    data = os.read(fd, _READ_SIZE)
+    if not data:
+      break
+    _Send({'id': request_id, 'stream': stream_name,
+           'data': data.decode('utf-8', 'replace')})
+  pipe.close()
+
+
+def _KillProcessGroup(process):
+  """Kills a command and the processes that it started."""
+  try:
+    os.killpg(process.pid, signal.SIGKILL)
+  except OSError:
+    # The processes have already exited.
+    pass
+
+
+def _RunCommand(request):
+  """Runs the command of a request and sends its output and exit status."""
+  request_id = request['id']
+  devnull = open(os.devnull)
+  try:
+    process = subprocess.Popen(request['command'], shell=True,
+                               executable='/bin/bash', stdin=devnull,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               close_fds=True,
+                               # Puts the command in its own process group,
+                               # so that a timeout can kill its children,
+                               # which may hold its output open.
+                               preexec_fn=os.setsid)
+  except OSError:
+    _Send({'id': request_id, 'stream': 'stderr',
+           'data': str(sys.exc_info()[1])})
+    _Send({'id': request_id, 'exit': _START_FAILURE_STATUS})
+    return
+  finally:
+    devnull.close()
+
+  timer = None
+  if request.get('timeout') is not None:
+    timer = threading.Timer(request['timeout'], _KillProcessGroup,
+                            args=(process,))
+    timer.start()
+  forwarders = [
+      threading.Thread(target=_ForwardOutput,
+                       args=(request_id, 'stdout', process.stdout)),
+      threading.Thread(target=_ForwardOutput,
+                       args=(request_id, 'stderr', process.stderr))]
+  for forwarder in forwarders:
+    forwarder.start()
+  for forwarder in forwarders:
+    forwarder.join()
+  status = process.wait()
+  if timer:
+    timer.cancel()
+  _Send({'id': request_id, 'exit': status})
+
+
+def main():
+  while True:
+    line = sys.stdin.readline()
+    if not line:
+      break
+    if not line.strip():
+      continue
+    thread = threading.Thread(target=_RunCommand, args=(json.loads(line),))
+    thread.daemon = True
+    thread.start()
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -22,15 +22,128 @@ Blocks until a command wrapped by "execute_command.py" completes, then mimics
 the wrapped command, copying the wrapped command's stdout/stderr to this
 process' stdout/stderr, and exiting with the wrapped command's status.
 
+If --stdout_offset and --stderr_offset are provided, instead waits at most
+--timeout seconds for the command to complete, and then writes the output that
+the command has produced beyond the given byte offsets to stdout, as JSON
+objects, one per line:
+  {"stream": "stdout" or "stderr", "data": <string>}
+While the command is running, only complete lines are written. The last line
+contains the offsets to pass to the next invocation, and the command's exit
+status, or null if the command is still running:
+  {"stdout_offset": <int>, "stderr_offset": <int>, "status": <int or null>}
+Without --delete, this form does not modify any files, so it can safely be
+retried after a connection failure. It fails if the status file still does not
+exist after --timeout seconds, which means that the command was never started
+or that its files were already deleted.
+
 *Runs on the guest VM. Supports Python 2.6, 2.7, and 3.x.*
 """
 
+import errno
 import fcntl
+import json
 import optparse
 import os
 import shutil
 import sys
 import threading
+import time
+
+# Interval, in seconds, at which the lock on the status file is checked while
+# waiting for the command to complete with a timeout.
+_LOCK_POLL_INTERVAL = 0.5
+
+_INTERRUPTED_WARNING = 'WARNING: wrapper script interrupted.\n'
+
+
+def _TryReadStatus(status_path):
+  """Returns the contents of the status file if the command has completed.
+
+  Returns None if the command is still running, or if the status file does not
+  exist.
+  """
+  try:
+    status = open(status_path, 'r')
+  except IOError:
+    if sys.exc_info()[1].errno == errno.ENOENT:
+      return None
+    raise
+  try:
+    try:
+      fcntl.lockf(status, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except IOError:
+      if sys.exc_info()[1].errno in (errno.EACCES, errno.EAGAIN):
+        return None
+      raise
+    return status.read()
+  finally:
+    status.close()
+
+
+def _ReadFrom(path, offset, complete_lines_only):
+  """Reads the contents of a file after offset.
+
+  Returns a (data, offset) tuple of the bytes read and the offset following
+  them. If complete_lines_only is True, stops after the last newline.
+  """
+  try:
+    f = open(path, 'rb')
+  except IOError:
+    if sys.exc_info()[1].errno == errno.ENOENT:
+      return b'', offset
+    raise
+  try:
+    f.seek(offset)
+    data = f.read()
+  finally:
+    f.close()
+  if complete_lines_only:
+    data = data[:data.rfind(b'\n') + 1]
+  return data, offset + len(data)
+
+
+def _StreamOutput(options):
+  """Writes the output of the command beyond the given offsets.
+
+  Returns the exit status of this script.
+  """
+  deadline = time.time() + options.timeout
+  return_code_str = _TryReadStatus(options.status)
+  while return_code_str is None and time.time() < deadline:
+    time.sleep(_LOCK_POLL_INTERVAL)
+    return_code_str = _TryReadStatus(options.status)
+  if return_code_str is None and not os.path.exists(options.status):
+    sys.stderr.write('Status file {0} does not exist. The command was never '
+                     'started, or its files were deleted.\n'.format(
+                         options.status))
+    return 1
+  complete = return_code_str is not None
+
+  offsets = {}
+  for stream, path, offset in (
+      ('stdout', options.stdout, options.stdout_offset),
+      ('stderr', options.stderr, options.stderr_offset)):
+    data, offsets[stream] = _ReadFrom(path, offset, not complete)
+    if data:
+      sys.stdout.write(json.dumps(
+          {'stream': stream, 'data': data.decode('utf-8', 'replace')}) + '\n')
+
+  status = None
+  if complete:
+    if return_code_str:
+      status = int(return_code_str)
+    else:
+      sys.stdout.write(json.dumps(
+          {'stream': 'stderr', 'data': _INTERRUPTED_WARNING}) + '\n')
+      status = 1
+  sys.stdout.write(json.dumps({'stdout_offset': offsets['stdout'],
+                               'stderr_offset': offsets['stderr'],
+                               'status': status}) + '\n')
+
+  if complete and options.delete:
+    for f in [options.stdout, options.stderr, options.status]:
+      os.unlink(f)
+  return 0
 
 
 def main():
@@ -44,6 +157,16 @@ def main():
                'Will block until a shared lock is acquired on FILE.')
   p.add_option('-d', '--delete', dest='delete', action='store_true',
                help='Delete stdout, stderr, and status files when finished.')
+  p.add_option('--stdout_offset', dest='stdout_offset', type='int',
+               help='Write the output of the command as JSON, starting at '
+               'byte OFFSET of the stdout file.', metavar='OFFSET')
+  p.add_option('--stderr_offset', dest='stderr_offset', type='int',
+               help='Write the output of the command as JSON, starting at '
+               'byte OFFSET of the stderr file.', metavar='OFFSET')
+  p.add_option('-t', '--timeout', dest='timeout', type='float', default=0,
+               help='With --stdout_offset and --stderr_offset, the maximum '
+               'number of seconds to wait for the command to complete.',
+               metavar='SECONDS')
   options, args = p.parse_args()
   if args:
     sys.stderr.write('Unexpected arguments: {0}\n'.format(args))
@@ -61,6 +184,13 @@ def main():
     sys.stderr.write(msg)
     return 1
 
+  if (options.stdout_offset is None) != (options.stderr_offset is None):
+    sys.stderr.write('--stdout_offset and --stderr_offset must be used '
+                     'together.\n')
+    return 1
+  if options.stdout_offset is not None:
+    return _StreamOutput(options)
+
   with open(options.stdout, 'r') as stdout:
     with open(options.stderr, 'r') as stderr:
       with open(options.status, 'r') as status:
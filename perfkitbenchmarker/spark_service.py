@@ -74,7 +74,14 @@ class AutoRegisterSparkServiceMeta(abc.ABCMeta):
 
 
 class BaseSparkService(resource.BaseResource):
-  """Object representing a Spark Service."""
+  """Object representing a Spark Service.
+
+  Attributes:
+    network: BaseNetwork or None. The network of the spec that the cluster is
+        placed in, which subclasses set if the cluster needs one, e.g. AwsEMR
+        for machine types that require a subnet. It is created before, and
+        deleted after, the service.
+  """
 
   __metaclass__ = AutoRegisterSparkServiceMeta
 
@@ -91,6 +98,11 @@ class BaseSparkService(resource.BaseResource):
     self.num_workers = spark_service_spec.num_workers
     self.machine_type = spark_service_spec.machine_type
     self.project = spark_service_spec.project
+    self.network = None
+
+  def GetResourceDependencies(self):
+    """Returns the resources that must be created before the service."""
+    return [self.network] if self.network else []
 
   @abc.abstractmethod
   def SubmitJob(self, job_jar, class_name, job_poll_interval=None,
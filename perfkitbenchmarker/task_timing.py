@@ -0,0 +1,219 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Reports how the tasks of parallel calls spent their time.
+
+background_tasks records when each task of a RunThreaded, RunParallelThreads
+or RunParallelProcesses call became ready to run, started and ended. When one
+task of a call takes much longer than the typical task, for example the
+PrepareVm of a single slow VM, a straggler report naming the slowest tasks is
+logged. With --parallel_task_samples, the latency percentiles, queueing times
+and achieved concurrency of each call are also reported as samples of the
+benchmark that made it.
+"""
+
+import collections
+import logging
+import threading
+
+from perfkitbenchmarker import context
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import sample
+
+flags.DEFINE_boolean(
+    'parallel_task_samples', False,
+    'Whether to report samples of the task latencies, queueing times and '
+    'concurrency of each parallel call, such as a RunThreaded over VMs.')
+flags.DEFINE_float(
+    'parallel_straggler_ratio', 2.,
+    'Log a straggler report for a parallel call when its slowest task takes '
+    'more than this many times as long as its median task.', lower_bound=1.)
+
+FLAGS = flags.FLAGS
+
+# Calls whose slowest task takes less than this many seconds more than their
+# median task are not worth a straggler report.
+_MIN_STRAGGLER_DELAY = 1.
+# Number of the slowest tasks that a straggler report lists.
+_STRAGGLER_REPORT_LENGTH = 5
+# Maximum length of the argument summaries of straggler reports.
+_MAX_ARGS_SUMMARY_LENGTH = 200
+
+_LATENCY_PERCENTILES = 50, 90, 99
+
+_lock = threading.Lock()
+# Maps the uid of each benchmark to the list of samples of its parallel calls.
+_samples = collections.defaultdict(list)
+# Counts the parallel calls made on behalf of each benchmark.
+_call_counts = collections.Counter()
+
+
+def _Repr(value):
+  """Returns repr(value), which unlike str() does not fail for unicode."""
+  try:
+    return repr(value)
+  except Exception:
+    return '<{0} object>'.format(type(value).__name__)
+
+
+class TaskTimes(object):
+  """Timestamps of one task of a parallel call.
+
+  Attributes:
+    target: Function that the task called.
+    args: tuple. Unnamed arguments of the call.
+    kwargs: dict. Keyword arguments of the call.
+    context_label: string. Log label of the thread that made the call, which
+        names the benchmark that it belongs to.
+    enqueue_time: float. When the task became ready to run.
+    start_time: float or None. When the task started running, or None if it
+        did not start.
+    end_time: float or None. When the task ended, or None if it did not end.
+  """
+
+  def __init__(self, target, args, kwargs, context_label, enqueue_time):
+    self.target = target
+    self.args = args
+    self.kwargs = kwargs
+    self.context_label = context_label
+    self.enqueue_time = enqueue_time
+    self.start_time = None
+    self.end_time = None
+
+  @property
+  def target_name(self):
+    return getattr(self.target, '__name__', _Repr(self.target))
+
+  @property
+  def args_summary(self):
+    """The arguments of the call, possibly truncated.
+
+    It is only built for reports, since the arguments, such as VMs, can be
+    costly to format.
+    """
+    arg_strings = [_Repr(a) for a in self.args]
+    arg_strings.extend(['{0}={1}'.format(k, _Repr(v))
+                        for k, v in self.kwargs.iteritems()])
+    return ', '.join(arg_strings)[:_MAX_ARGS_SUMMARY_LENGTH]
+
+  @property
+  def latency(self):
+    return self.end_time - self.start_time
+
+  @property
+  def queue_time(self):
+    return self.start_time - self.enqueue_time
+
+
+def _GetPeakConcurrency(task_times):
+  """Returns the largest number of the tasks that were running at once."""
+  # At equal timestamps, ends sort before starts, so that a task that starts
+  # as another ends does not count as concurrent with it.
+  events = sorted([(t.start_time, 1) for t in task_times] +
+                  [(t.end_time, -1) for t in task_times])
+  peak = running = 0
+  for _, change in events:
+    running += change
+    peak = max(peak, running)
+  return peak
+
+
+def _LogStragglers(task_times, median_latency):
+  slowest = sorted(task_times, key=lambda t: t.latency, reverse=True)
+  lines = ['{0:.3f}s (queued {1:.3f}s) {2}{3}({4})'.format(
+      t.latency, t.queue_time, t.context_label, t.target_name, t.args_summary)
+           for t in slowest[:_STRAGGLER_REPORT_LENGTH]]
+  logging.info(
+      'Stragglers among %s parallel calls of %s, whose median latency was '
+      '%.3fs:\n  %s', len(task_times), slowest[0].target_name, median_latency,
+      '\n  '.join(lines))
+
+
+def _GenerateSamples(task_times, max_concurrency, call_index):
+  """Returns samples of the tasks of one parallel call."""
+  latencies = [t.latency for t in task_times]
+  queue_times = [t.queue_time for t in task_times]
+  percentiles = sample.PercentileCalculator(latencies, _LATENCY_PERCENTILES)
+  metadata = {'parallel_target': task_times[0].target_name,
+              'parallel_call_index': call_index,
+              'parallel_task_count': len(task_times),
+              'parallel_max_concurrency': max_concurrency}
+  samples = [
+      sample.Sample('Parallel Task Latency p%s' % percentile,
+                    percentiles['p%s' % percentile], 'seconds', metadata)
+      for percentile in _LATENCY_PERCENTILES]
+  median_latency = percentiles['p50']
+  samples.extend([
+      sample.Sample('Parallel Task Latency max', max(latencies), 'seconds',
+                    metadata),
+      sample.Sample('Parallel Task Max/Median Latency Ratio',
+                    max(latencies) / median_latency if median_latency else 0.,
+                    'ratio', metadata),
+      sample.Sample('Parallel Task Queue Time max', max(queue_times),
+                    'seconds', metadata),
+      sample.Sample('Parallel Task Peak Concurrency',
+                    _GetPeakConcurrency(task_times), 'tasks', metadata),
+      sample.Sample(
+          'Parallel Call Runtime',
+          (max(t.end_time for t in task_times) -
+           min(t.enqueue_time for t in task_times)), 'seconds', metadata)])
+  return samples
+
+
+def Report(task_times, max_concurrency):
+  """Reports the times of the tasks of one parallel call.
+
+  Args:
+    task_times: list of TaskTimes. One per task of the call. Tasks that did
+        not run to completion are ignored.
+    max_concurrency: int. The concurrency limit of the call.
+  """
+  task_times = [t for t in task_times
+                if t.start_time is not None and t.end_time is not None]
+  if not task_times:
+    return
+  latencies = sorted(t.latency for t in task_times)
+  median_latency = latencies[len(latencies) // 2]
+  # Straggler reports are optional diagnostics, skipped if the ratio is unset.
+  if (FLAGS.parallel_straggler_ratio and len(latencies) > 1 and
+      latencies[-1] > median_latency * FLAGS.parallel_straggler_ratio and
+      latencies[-1] - median_latency >= _MIN_STRAGGLER_DELAY):
+    _LogStragglers(task_times, median_latency)
+  benchmark_spec = context.GetThreadBenchmarkSpec()
+  # Samples of calls made outside of any benchmark would never be published.
+  if not FLAGS.parallel_task_samples or benchmark_spec is None:
+    return
+  benchmark_uid = benchmark_spec.uid
+  with _lock:
+    call_index = _call_counts[benchmark_uid]
+    _call_counts[benchmark_uid] += 1
+  samples = _GenerateSamples(task_times, max_concurrency, call_index)
+  with _lock:
+    _samples[benchmark_uid].extend(samples)
+
+
+def PopSamples(benchmark_uid):
+  """Returns samples of the parallel calls made on behalf of a benchmark.
+
+  The samples of the benchmark are reset.
+
+  Args:
+    benchmark_uid: string. The uid of the benchmark's BenchmarkSpec.
+
+  Returns:
+    A list of Samples.
+  """
+  with _lock:
+    _call_counts.pop(benchmark_uid, None)
+    return _samples.pop(benchmark_uid, [])
@@ -25,6 +25,7 @@ from perfkitbenchmarker import flags
 from perfkitbenchmarker import version
 
 
+_ARTIFACTS = 'artifacts'
 _PERFKITBENCHMARKER = 'perfkitbenchmarker'
 _RUNS = 'runs'
 _VERSIONS = 'versions'
@@ -47,6 +48,11 @@ def GetVersionDirPath(version=version.VERSION):
   return os.path.join(_TEMP_DIR, _VERSIONS, version)
 
 
+def GetArtifactDirPath():
+  """Gets path to the directory containing files shared by all PKB runs."""
+  return os.path.join(_TEMP_DIR, _ARTIFACTS)
+
+
 def CreateTemporaryDirectories():
   """Creates the temporary sub-directories needed by the current run."""
   for path in (GetRunDirPath(), GetVersionDirPath()):
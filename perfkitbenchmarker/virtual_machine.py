@@ -28,6 +28,7 @@ from perfkitbenchmarker import background_workload
 from perfkitbenchmarker import data
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import event_loop
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import resource
 from perfkitbenchmarker import vm_util
@@ -192,6 +193,10 @@ class BaseVirtualMachine(resource.BaseResource):
       usage while running the benchmark.
     background_network_ip_type: Type of IP address to use for generating
       background network workload
+    pool_key: Key under which the VM is returned to the VM pool at the end of
+      a benchmark, or None if the VM is deleted instead. See vm_pool.py.
+    reused_from_pool: True if the VM was leased from the VM pool rather than
+      provisioned for the current benchmark.
   """
 
   __metaclass__ = AutoRegisterVmMeta
@@ -235,6 +240,10 @@ class BaseVirtualMachine(resource.BaseResource):
     self.network = None
     self.firewall = None
 
+    # Set when --reuse_vms is enabled. See vm_pool.py.
+    self.pool_key = None
+    self.reused_from_pool = False
+
   def __repr__(self):
     return '<BaseVirtualMachine [ip={0}, internal_ip={1}]>'.format(
         self.ip_address, self.internal_ip)
@@ -244,6 +253,10 @@ class BaseVirtualMachine(resource.BaseResource):
       return self.ip_address
     return super(BaseVirtualMachine, self).__str__()
 
+  def GetResourceDependencies(self):
+    """Returns the resources that must be created before this VM."""
+    return [self.network] if self.network else []
+
   def CreateScratchDisk(self, disk_spec):
     """Create a VM's scratch disk.
 
@@ -376,6 +389,39 @@ class BaseOsMixin(object):
     """
     raise NotImplementedError()
 
+  def RemoteCommandBatch(self, commands, should_log=False,
+                         ignore_failure=False, suppress_warning=False,
+                         timeout=None):
+    """Runs a sequence of independent commands on the VM.
+
+    Each command runs as if it were passed to its own RemoteCommand call, in
+    the order given. Derived classes may override this method to run all of
+    the commands in a single round trip.
+
+    Args:
+      commands: list of strings. The commands to run.
+      should_log: A boolean indicating whether the command results should be
+          logged at the info level.
+      ignore_failure: Ignore the failure of any of the commands if set to
+          true. Otherwise, the commands after a failed command are not run.
+      suppress_warning: Suppress the result logging when the return code of a
+          command is non-zero.
+      timeout: The time to wait in seconds for the commands before exiting.
+          None means no timeout.
+
+    Returns:
+      A list containing a tuple of stdout and stderr for each command.
+
+    Raises:
+      RemoteCommandError: If there was a problem issuing the commands, or if
+          one of them failed and ignore_failure is False.
+    """
+    return [self.RemoteCommand(command, should_log=should_log,
+                               ignore_failure=ignore_failure,
+                               suppress_warning=suppress_warning,
+                               timeout=timeout)
+            for command in commands]
+
   @abc.abstractmethod
   def RemoteCopy(self, file_path, remote_path='', copy_to=True):
     """Copies a file to or from the VM.
@@ -399,6 +445,14 @@ class BaseOsMixin(object):
     """
     raise NotImplementedError()
 
+  def WaitForBootCompletionAsync(self):
+    """Coroutine version of WaitForBootCompletion. See event_loop.
+
+    By default, WaitForBootCompletion is called in a thread. Implementations
+    that wait on the event loop instead free that thread while the VM boots.
+    """
+    yield event_loop.CallInThread(self.WaitForBootCompletion)
+
   def OnStartup(self):
     """Performs any necessary setup on the VM specific to the OS.
 
@@ -406,6 +460,13 @@ class BaseOsMixin(object):
     """
     pass
 
+  def CloseRemoteConnections(self):
+    """Closes any connections to the VM that are kept open between commands.
+
+    This will be called once before the VM is deleted.
+    """
+    pass
+
   def PrepareVMEnvironment(self):
     """Performs any necessary setup on the VM specific to the OS.
 
@@ -418,6 +479,17 @@ class BaseOsMixin(object):
     """Installs a PerfKit package on the VM."""
     raise NotImplementedError()
 
+  def InstallAll(self, package_names):
+    """Installs several PerfKit packages on the VM.
+
+    Subclasses may install the packages faster than one at a time.
+
+    Args:
+      package_names: list of strings. Names of the packages to install.
+    """
+    for package_name in package_names:
+      self.Install(package_name)
+
   @abc.abstractmethod
   def Uninstall(self, package_name):
     """Uninstalls a PerfKit package on the VM."""
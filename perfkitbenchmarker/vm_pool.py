@@ -0,0 +1,187 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Pool of provisioned VMs that can be reused by later benchmarks in a run.
+
+When --reuse_vms is set, a BenchmarkSpec does not delete its VMs during
+teardown. Instead, each VM is cleaned up (PerfKit packages are uninstalled and
+the OS packages are restored to their state before the benchmark) and returned
+to the pool. When a later benchmark in the same run constructs a VM with the
+same cloud, OS type, VM spec and disk specs, it leases the pooled VM instead of
+provisioning a new one. The networks and firewalls used by pooled VMs are kept
+until the end of the run, when DeleteAll tears everything down.
+"""
+
+import collections
+import logging
+import threading
+
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import os_types
+from perfkitbenchmarker import vm_util
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_boolean(
+    'reuse_vms', False,
+    'If true, VMs are returned to a pool at the end of each benchmark instead '
+    'of being deleted, and are reused by later benchmarks in the same run '
+    'that request an identical VM and disk configuration. Pooled VMs, along '
+    'with their networks and firewalls, are deleted at the end of the run.')
+
+# Reusing a VM requires being able to restore its packages and rerun its
+# environment setup. Containerized and Juju VMs carry additional state that
+# cannot currently be reset, so they are never pooled.
+_POOLABLE_OS_TYPES = frozenset([os_types.DEBIAN, os_types.RHEL])
+
+
+def _SpecKey(config_spec):
+  """Returns a hashable representation of a config spec's attributes."""
+  if config_spec is None:
+    return None
+  return tuple(sorted((k, repr(v)) for k, v in vars(config_spec).iteritems()))
+
+
+def GetPoolKey(cloud, os_type, vm_spec, disk_spec, disk_count):
+  """Returns the key under which a VM with the given configuration is pooled.
+
+  Args:
+    cloud: string. The cloud of the VM.
+    os_type: string. The OS type of the VM.
+    vm_spec: virtual_machine.BaseVmSpec. The spec used to construct the VM.
+    disk_spec: disk.BaseDiskSpec or None. The spec of the VM's scratch disks.
+    disk_count: int. The number of scratch disks attached to the VM.
+
+  Returns:
+    A hashable key, or None if VMs with this configuration cannot be pooled.
+  """
+  if not FLAGS.reuse_vms or os_type not in _POOLABLE_OS_TYPES:
+    return None
+  return (cloud, os_type, _SpecKey(vm_spec),
+          _SpecKey(disk_spec), disk_count if disk_spec else 0)
+
+
+class VmPool(object):
+  """Tracks idle VMs and the network resources that must outlive them.
+
+  All methods may be called concurrently from multiple threads.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._idle_vms = collections.defaultdict(collections.deque)
+    self._networks = []
+    self._firewalls = []
+
+  def LeaseVm(self, pool_key):
+    """Removes an idle VM matching pool_key from the pool.
+
+    Args:
+      pool_key: The key returned by GetPoolKey for the requested VM.
+
+    Returns:
+      A BaseVirtualMachine, or None if there is no matching idle VM.
+    """
+    if pool_key is None:
+      return None
+    with self._lock:
+      idle_vms = self._idle_vms.get(pool_key)
+      if not idle_vms:
+        return None
+      vm = idle_vms.popleft()
+    vm.reused_from_pool = True
+    logging.info('Reusing pooled VM %s.', vm.name)
+    return vm
+
+  def ReleaseVm(self, vm):
+    """Cleans up a VM and returns it to the pool.
+
+    Args:
+      vm: BaseVirtualMachine. The VM to release. Its pool_key attribute must be
+          set.
+
+    Returns:
+      True if the VM was added to the pool. False if it could not be cleaned
+      up, in which case the caller remains responsible for deleting it.
+    """
+    if not vm.created:
+      return False
+    try:
+      if vm.install_packages:
+        vm.PackageCleanup()
+    except Exception:
+      logging.exception('Could not clean up VM %s for reuse. It will be '
+                        'deleted instead.', vm.name)
+      return False
+    with self._lock:
+      self._idle_vms[vm.pool_key].append(vm)
+    logging.info('Returned VM %s to the pool.', vm.name)
+    return True
+
+  def AddNetworkResources(self, networks, firewalls):
+    """Defers deletion of networks and firewalls until DeleteAll is called.
+
+    Args:
+      networks: dict mapping key to BaseNetwork, as in BenchmarkSpec.networks.
+      firewalls: dict mapping key to BaseFirewall, as in
+          BenchmarkSpec.firewalls.
+    """
+    with self._lock:
+      self._networks.append(networks)
+      self._firewalls.append(firewalls)
+
+  def DeleteAll(self):
+    """Deletes all pooled VMs, followed by their firewalls and networks."""
+    with self._lock:
+      vms = [vm for idle_vms in self._idle_vms.itervalues() for vm in idle_vms]
+      self._idle_vms.clear()
+      firewalls, self._firewalls = self._firewalls, []
+      networks, self._networks = self._networks, []
+
+    def _DeleteVm(vm):
+      vm.CloseRemoteConnections()
+      vm.Delete()
+      vm.DeleteScratchDisks()
+
+    if vms:
+      logging.info('Deleting %d pooled VMs.', len(vms))
+      try:
+        vm_util.RunThreaded(_DeleteVm, vms)
+      except Exception:
+        logging.exception('Got an exception deleting pooled VMs. '
+                          'Attempting to continue tearing down.')
+
+    for firewall_dict in firewalls:
+      for firewall in firewall_dict.itervalues():
+        try:
+          firewall.DisallowAllPorts()
+        except Exception:
+          logging.exception('Got an exception disabling firewalls. '
+                            'Attempting to continue tearing down.')
+
+    for network_dict in networks:
+      for net in network_dict.itervalues():
+        try:
+          net.Delete()
+        except Exception:
+          logging.exception('Got an exception deleting networks. '
+                            'Attempting to continue tearing down.')
+
+
+_pool = VmPool()
+
+
+def GetVmPool():
+  """Returns the VmPool shared by all benchmarks in this run."""
+  return _pool
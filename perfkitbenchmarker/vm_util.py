@@ -19,6 +19,7 @@ import logging
 import os
 import random
 import re
+import select
 import string
 import subprocess
 import tempfile
@@ -31,6 +32,7 @@ from perfkitbenchmarker import background_tasks
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import rate_limiter
 from perfkitbenchmarker import temp_dir
 
 FLAGS = flags.FLAGS
@@ -51,6 +53,9 @@ DEFAULT_TIMEOUT = 300
 POLL_INTERVAL = 30
 TIMEOUT = 1200
 FUZZ = .5
+# Failed commands are retried after this many seconds at first. The interval
+# doubles with each retry, up to POLL_INTERVAL.
+COMMAND_RETRY_INTERVAL = 1
 MAX_RETRIES = -1
 
 WINDOWS = 'nt'
@@ -60,6 +65,15 @@ OUTPUT_STDOUT = 0
 OUTPUT_STDERR = 1
 OUTPUT_EXIT_CODE = 2
 
+# Output of streaming commands is read in chunks of at most this many bytes.
+_STREAM_READ_SIZE = 65536
+# The stderr of a streaming command is kept in memory up to this many bytes,
+# and spilled to a temporary file beyond that.
+STREAM_SPOOL_THRESHOLD = 1 << 20
+# Interval at which a streaming command whose output has been closed is polled
+# for its exit status.
+_STREAM_EXIT_POLL_INTERVAL = .1
+
 flags.DEFINE_integer('default_timeout', TIMEOUT, 'The default timeout for '
                      'retryable commands in seconds.')
 flags.DEFINE_integer('burn_cpu_seconds', 0,
@@ -164,8 +178,14 @@ def GetCertPath():
   return PrependTempDir(CERT_FILE)
 
 
-def GetSshOptions(ssh_key_filename):
-  """Return common set of SSH and SCP options."""
+def GetSshOptions(ssh_key_filename, control_path=None):
+  """Return common set of SSH and SCP options.
+
+  Args:
+    ssh_key_filename: string. Path to the private key used to authenticate.
+    control_path: string or None. Path of the socket of a master connection to
+        share. If the socket does not exist, a new connection is established.
+  """
   options = [
       '-2',
       '-o', 'UserKnownHostsFile=/dev/null',
@@ -179,6 +199,8 @@ def GetSshOptions(ssh_key_filename):
       '-o', 'ServerAliveCountMax=10',
       '-i', ssh_key_filename
   ]
+  if control_path:
+    options.extend(['-o', 'ControlPath=%s' % control_path])
   options.extend(FLAGS.ssh_options)
 
   return options
@@ -193,7 +215,8 @@ RunThreaded = background_tasks.RunThreaded
 
 def Retry(poll_interval=POLL_INTERVAL, max_retries=MAX_RETRIES,
           timeout=None, fuzz=FUZZ, log_errors=True,
-          retryable_exceptions=None):
+          retryable_exceptions=None, backoff_factor=1,
+          max_poll_interval=None):
   """A function decorator that will retry when exceptions are thrown.
 
   Args:
@@ -213,6 +236,10 @@ def Retry(poll_interval=POLL_INTERVAL, max_retries=MAX_RETRIES,
     retryable_exceptions: A tuple of exceptions that should be retried. By
         default, this is None, which indicates that all exceptions should
         be retried.
+    backoff_factor: The factor by which the poll interval grows after each
+        try. At 1, every try waits for poll_interval seconds.
+    max_poll_interval: The maximum time between tries in seconds when
+        backoff_factor is greater than 1, or None for no maximum.
 
   Returns:
     A function that wraps functions in retry logic. It can be
@@ -239,13 +266,17 @@ def Retry(poll_interval=POLL_INTERVAL, max_retries=MAX_RETRIES,
           return f(*args, **kwargs)
         except retryable_exceptions as e:
           fuzz_multiplier = 1 - fuzz + random.random() * fuzz
-          sleep_time = poll_interval * fuzz_multiplier
+          interval = poll_interval * backoff_factor ** (tries - 1)
+          if max_poll_interval is not None:
+            interval = min(interval, max_poll_interval)
+          sleep_time = interval * fuzz_multiplier
           if ((time.time() + sleep_time) >= deadline or
               (max_retries >= 0 and tries > max_retries)):
             raise e
           else:
             if log_errors:
               logging.error('Got exception running %s: %s', f.__name__, e)
+            rate_limiter.RecordRetry(f.__name__)
             time.sleep(sleep_time)
     return WrappedFunction
   return Wrap
@@ -280,6 +311,7 @@ def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
   logging.debug('Environment variables: %s' % env)
 
   full_cmd = ' '.join(cmd)
+  rate_limit = rate_limiter.Acquire(cmd)
   logging.info('Running: %s', full_cmd)
 
   shell_value = RunningOnWindows()
@@ -306,6 +338,8 @@ def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
     tf_err.seek(0)
     stderr = tf_err.read().decode('ascii', 'ignore')
 
+  if rate_limit:
+    rate_limiter.ReportResult(rate_limit, process.returncode, stderr)
   debug_text = ('Ran %s. Got return code (%s).\nSTDOUT: %s\nSTDERR: %s' %
                 (full_cmd, process.returncode, stdout, stderr))
   if force_info_log or (process.returncode and not suppress_warning):
@@ -316,6 +350,175 @@ def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
   return stdout, stderr, process.returncode
 
 
+class CommandOutputStream(object):
+  """Output of a command run by IssueStreamingCommand.
+
+  Iterating over the stream yields the lines of the command's stdout as they
+  are written, so the output never has to be held in memory all at once. The
+  stream must be used as a context manager, which kills the command if it is
+  still running when the context is exited.
+
+  Attributes:
+    returncode: The return code of the command, or None if it has not exited.
+    timed_out: Whether the command was killed because it reached its timeout.
+  """
+
+  def __init__(self, cmd, env=None, timeout=DEFAULT_TIMEOUT,
+               suppress_warning=False,
+               spool_threshold=STREAM_SPOOL_THRESHOLD):
+    self.returncode = None
+    self.timed_out = False
+    self._cmd = cmd
+    self._full_cmd = ' '.join(cmd)
+    self._env = env
+    self._timeout = timeout
+    self._suppress_warning = suppress_warning
+    self._stderr = tempfile.SpooledTemporaryFile(max_size=spool_threshold)
+    self._process = None
+    self._chunks = None
+
+  def __enter__(self):
+    logging.debug('Environment variables: %s' % self._env)
+    logging.info('Running: %s', self._full_cmd)
+    if RunningOnWindows():
+      # select does not support pipes on Windows, so the output is only
+      # available once the command has completed.
+      self._chunks = self._IssueCommand()
+    else:
+      self._process = subprocess.Popen(
+          self._cmd, env=self._env, stdin=subprocess.PIPE,
+          stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True)
+      self._process.stdin.close()
+      self._chunks = self._ReadChunks()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if self._process:
+      if self._process.poll() is None:
+        logging.debug('Stopped reading the output of "%s". Killing it.',
+                      self._full_cmd)
+        self._process.kill()
+        self.returncode = self._process.wait()
+      self._process.stdout.close()
+      self._process.stderr.close()
+    self._stderr.close()
+
+  def __iter__(self):
+    pending = []
+    for chunk in self.Chunks():
+      if '\n' not in chunk:
+        pending.append(chunk)
+        continue
+      lines = (''.join(pending) + chunk).split('\n')
+      pending = [lines.pop()]
+      for line in lines:
+        yield line + '\n'
+    if ''.join(pending):
+      yield ''.join(pending)
+
+  def Chunks(self):
+    """Returns an iterator over the chunks of stdout as they are written.
+
+    Lines may be split across chunks. Chunks that have been consumed, either
+    directly or by iterating over lines, are not returned again.
+    """
+    return self._chunks
+
+  def GetStderr(self):
+    """Returns the stderr that the command has written so far.
+
+    Must be called before the context of the stream is exited.
+    """
+    self._stderr.seek(0)
+    stderr = self._stderr.read().decode('ascii', 'ignore')
+    self._stderr.seek(0, os.SEEK_END)
+    return stderr
+
+  def _IssueCommand(self):
+    stdout, stderr, self.returncode = IssueCommand(
+        self._cmd, suppress_warning=self._suppress_warning, env=self._env,
+        timeout=self._timeout)
+    self._stderr.write(stderr.encode('ascii'))
+    if stdout:
+      yield stdout
+
+  def _ReadChunks(self):
+    """Yields decoded chunks of stdout until the command exits."""
+    deadline = None if self._timeout is None else time.time() + self._timeout
+
+    def _TimeRemaining():
+      return None if deadline is None else max(deadline - time.time(), 0)
+
+    stdout_fd = self._process.stdout.fileno()
+    stderr_fd = self._process.stderr.fileno()
+    open_fds = [stdout_fd, stderr_fd]
+    while open_fds and _TimeRemaining() != 0:
+      readable, _, _ = select.select(open_fds, [], [], _TimeRemaining())
+      for fd in readable:
+        data = os.read(fd, _STREAM_READ_SIZE)
+        if not data:
+          open_fds.remove(fd)
+        elif fd == stderr_fd:
+          self._stderr.write(data)
+        else:
+          yield data.decode('ascii', 'ignore')
+    # The command may keep running after closing its output.
+    while self._process.poll() is None and _TimeRemaining() != 0:
+      time_remaining = _TimeRemaining()
+      time.sleep(_STREAM_EXIT_POLL_INTERVAL if time_remaining is None else
+                 min(time_remaining, _STREAM_EXIT_POLL_INTERVAL))
+    if self._process.poll() is None:
+      logging.error('IssueStreamingCommand timed out after %d seconds. '
+                    'Killing command "%s".', self._timeout, self._full_cmd)
+      self._process.kill()
+      self.timed_out = True
+    self.returncode = self._process.wait()
+
+    debug_text = ('Ran %s. Got return code (%s).\nSTDERR: %s' %
+                  (self._full_cmd, self.returncode, self.GetStderr()))
+    if self.returncode and not self._suppress_warning:
+      logging.info(debug_text)
+    else:
+      logging.debug(debug_text)
+
+
+def IssueStreamingCommand(cmd, env=None, timeout=DEFAULT_TIMEOUT,
+                          suppress_warning=False,
+                          spool_threshold=STREAM_SPOOL_THRESHOLD):
+  """Runs the provided command once, streaming its output.
+
+  Unlike IssueCommand, the output can be processed while the command is
+  running, and stdout is never buffered in full. For example:
+
+    with vm_util.IssueStreamingCommand(cmd) as output:
+      for line in output:
+        ProcessLine(line)
+      if output.returncode:
+        raise errors.Error(output.GetStderr())
+
+  Args:
+    cmd: A list of strings such as is given to the subprocess.Popen()
+        constructor.
+    env: A dict of key/value strings, such as is given to the subprocess.Popen()
+        constructor, that contains environment variables to be injected.
+    timeout: Timeout for the command in seconds. The command is killed once
+        the timeout is reached, and the output ends. Set timeout to None to let
+        the command run indefinitely. The timeout is only checked while the
+        output is being read.
+    suppress_warning: A boolean indicating whether the results should
+        not be logged at the info level in the event of a non-zero
+        return code.
+    spool_threshold: int. Number of bytes of stderr kept in memory before the
+        rest is written to a temporary file.
+
+  Returns:
+    A CommandOutputStream. The command is started when its context is entered.
+  """
+  return CommandOutputStream(cmd, env=env, timeout=timeout,
+                             suppress_warning=suppress_warning,
+                             spool_threshold=spool_threshold)
+
+
 def IssueBackgroundCommand(cmd, stdout_path, stderr_path, env=None):
   """Run the provided command once in the background.
 
@@ -337,7 +540,8 @@ def IssueBackgroundCommand(cmd, stdout_path, stderr_path, env=None):
                    stdout=outfile, stderr=errfile, close_fds=True)
 
 
-@Retry()
+@Retry(poll_interval=COMMAND_RETRY_INTERVAL, fuzz=1, backoff_factor=2,
+       max_poll_interval=POLL_INTERVAL)
 def IssueRetryableCommand(cmd, env=None):
   """Tries running the provided command until it succeeds or times out.
 
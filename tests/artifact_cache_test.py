@@ -0,0 +1,102 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.artifact_cache."""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+import urllib
+import urlparse
+
+import mock
+
+from perfkitbenchmarker import artifact_cache
+from perfkitbenchmarker import errors
+from tests import mock_flags
+
+
+class ArtifactCacheTestCase(unittest.TestCase):
+
+  def setUp(self):
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    self.upstream_dir = os.path.join(temp_dir, 'upstream')
+    self.mirror_dir = os.path.join(temp_dir, 'mirror')
+    os.makedirs(self.upstream_dir)
+    os.makedirs(self.mirror_dir)
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.artifact_cache = True
+    self.mocked_flags.artifact_cache_dir = os.path.join(temp_dir, 'cache')
+    self.mocked_flags.artifact_mirror = None
+    self.url = self._WriteFile(self.upstream_dir, 'upstream')
+
+  def _WriteFile(self, directory, contents, file_name='archive.tar.gz'):
+    path = os.path.join(directory, file_name)
+    with open(path, 'w') as fp:
+      fp.write(contents)
+    return urlparse.urljoin('file:', urllib.pathname2url(path))
+
+  def _GetArtifactContents(self, *args, **kwargs):
+    with open(artifact_cache.GetArtifact(*args, **kwargs)) as fp:
+      return fp.read()
+
+  def testDownloadedOnce(self):
+    path = artifact_cache.GetArtifact(self.url)
+    self.assertEqual(os.path.basename(path), 'archive.tar.gz')
+    self._WriteFile(self.upstream_dir, 'changed')
+    self.assertEqual(artifact_cache.GetArtifact(self.url), path)
+    self.assertEqual(self._GetArtifactContents(self.url), 'upstream')
+
+  def testChecksum(self):
+    self.assertEqual(
+        self._GetArtifactContents(
+            self.url, sha256=hashlib.sha256('upstream').hexdigest()),
+        'upstream')
+    with self.assertRaises(errors.Setup.ArtifactDownloadError):
+      artifact_cache.GetArtifact(self.url, sha256='0' * 64)
+
+  def testMirror(self):
+    self.mocked_flags.artifact_mirror = self.mirror_dir
+    self._WriteFile(self.mirror_dir, 'mirror')
+    self.assertEqual(self._GetArtifactContents(self.url), 'mirror')
+
+  def testMirrorFallsBackToUpstream(self):
+    self.mocked_flags.artifact_mirror = self.mirror_dir
+    self.assertEqual(self._GetArtifactContents(self.url), 'upstream')
+
+  def testDownloadFailure(self):
+    with self.assertRaises(errors.Setup.ArtifactDownloadError):
+      artifact_cache.GetArtifact(self.url + '.missing')
+
+  def testDownloadToVm(self):
+    vm = mock.Mock()
+    artifact_cache.DownloadToVm(vm, self.url, '/tmp/archive.tar.gz')
+    vm.PushFile.assert_called_once_with(artifact_cache.GetArtifact(self.url),
+                                        '/tmp/archive.tar.gz')
+    self.assertFalse(vm.RemoteCommand.called)
+
+  def testDownloadToVmWithoutCache(self):
+    self.mocked_flags.artifact_cache = False
+    vm = mock.Mock()
+    artifact_cache.DownloadToVm(vm, self.url, '/tmp/archive.tar.gz')
+    vm.RemoteCommand.assert_called_once_with(
+        'curl -fsSL -o /tmp/archive.tar.gz ' + self.url)
+    self.assertFalse(vm.PushFile.called)
+
+
+if __name__ == '__main__':
+  unittest.main()
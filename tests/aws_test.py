@@ -22,6 +22,7 @@ import mock
 
 from perfkitbenchmarker import benchmark_spec
 from perfkitbenchmarker import context
+from perfkitbenchmarker import errors
 from perfkitbenchmarker import os_types
 from perfkitbenchmarker import providers
 from perfkitbenchmarker import virtual_machine
@@ -112,7 +113,7 @@ class AwsVirtualMachineExistsTestCase(unittest.TestCase):
     self.vm = aws_virtual_machine.AwsVirtualMachine(
         virtual_machine.BaseVmSpec('test_vm_spec.AWS', zone='us-east-1a',
                                    machine_type='c3.large'))
-    self.vm.id = 'i-foo'
+    self.vm.id = 'i-8ed83d71'
     path = os.path.join(os.path.dirname(__file__),
                         'data', 'aws-describe-instance.json')
     with open(path) as f:
@@ -129,6 +130,18 @@ class AwsVirtualMachineExistsTestCase(unittest.TestCase):
     util.IssueRetryableCommand.side_effect = [(json.dumps(response), None)]
     self.assertFalse(self.vm._Exists())
 
+  def testInstancePending(self):
+    util.IssueRetryableCommand.side_effect = [(self.response, None)]
+    self.assertFalse(self.vm._IsReady())
+
+  def testInstanceTerminatedWhileStarting(self):
+    response = json.loads(self.response)
+    state = response['Reservations'][0]['Instances'][0]['State']
+    state['Name'] = 'terminated'
+    util.IssueRetryableCommand.side_effect = [(json.dumps(response), None)]
+    with self.assertRaises(errors.Resource.CreationError):
+      self.vm._IsReady()
+
 
 class AwsIsRegionTestCase(unittest.TestCase):
 
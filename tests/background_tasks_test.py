@@ -125,6 +125,44 @@ class RunParallelThreadsTestCase(unittest.TestCase):
       background_tasks.RunParallelThreads(calls, max_concurrency=2)
     self.assertEqual(int_list, [1])
 
+  def testInterruptDoesNotAffectConcurrentCall(self):
+    thread_context = background_tasks._BackgroundTaskThreadContext()
+    interrupted_call = background_tasks._BackgroundThreadTaskManager(1)
+    interrupted_call.StartTask(_ReturnArgs, ('a',), {}, thread_context)
+    # The task completes, but the call is interrupted before awaiting it.
+    self.assertTrue(background_tasks._WaitForCondition(
+        lambda: interrupted_call._response_queue._deque, timeout=10))
+    event = threading.Event()
+    int_list = []
+    other_call = background_tasks._BackgroundThreadTaskManager(1)
+    other_call.StartTask(_WaitAndAppendInt, (int_list, 1, event, 10), {},
+                         thread_context)
+    interrupted_call.HandleKeyboardInterrupt()
+    event.set()
+    self.assertTrue(background_tasks._WaitForCondition(lambda: int_list,
+                                                       timeout=10))
+    self.assertEqual(other_call.AwaitAnyTask(), 0)
+    self.assertEqual(int_list, [1])
+
+  def testThreadsReusedAcrossCalls(self):
+    calls = [(_ReturnArgs, ('a',), {'b': i}) for i in range(4)]
+    background_tasks.RunParallelThreads(calls, max_concurrency=4)
+    thread_count = threading.active_count()
+    result = background_tasks.RunParallelThreads(calls, max_concurrency=4)
+    self.assertEqual(result, [(i, 'a') for i in range(4)])
+    self.assertEqual(threading.active_count(), thread_count)
+
+  def testNestedCalls(self):
+    # Each outer call waits for an inner call while holding its thread, so the
+    # inner calls need threads of their own.
+    def _RunInner(i):
+      inner_calls = [(_ReturnArgs, (i,), {'b': j}) for j in range(3)]
+      return background_tasks.RunParallelThreads(inner_calls,
+                                                 max_concurrency=3)
+    calls = [(_RunInner, (i,), {}) for i in range(4)]
+    result = background_tasks.RunParallelThreads(calls, max_concurrency=4)
+    self.assertEqual(result, [[(j, i) for j in range(3)] for i in range(4)])
+
 
 class RunThreadedTestCase(unittest.TestCase):
 
@@ -150,6 +188,65 @@ class RunThreadedTestCase(unittest.TestCase):
     self.assertEqual(result, [(None, 'red'), ('blue', 'green')])
 
 
+class RunThreadedInDependencyOrderTestCase(unittest.TestCase):
+
+  def setUp(self):
+    # Item i depends on the items in self.dependencies[i]. Item 7 is not run.
+    self.dependencies = {0: [], 1: [0], 2: [0], 3: [1, 2], 4: [], 5: [7]}
+    self.lock = threading.Lock()
+    self.order = []
+
+  def _Append(self, item):
+    with self.lock:
+      self.order.append(item)
+    return item * 2
+
+  def _AssertOrdered(self, before, after):
+    self.assertLess(self.order.index(before), self.order.index(after))
+
+  def testNoItems(self):
+    self.assertEqual(background_tasks.RunThreadedInDependencyOrder(
+        self._Append, [], self.dependencies.get), [])
+
+  def testDependencyOrder(self):
+    result = background_tasks.RunThreadedInDependencyOrder(
+        self._Append, range(6), self.dependencies.get,
+        max_concurrent_threads=2)
+    self.assertEqual(result, [0, 2, 4, 6, 8, 10])
+    self.assertItemsEqual(self.order, range(6))
+    self._AssertOrdered(0, 1)
+    self._AssertOrdered(0, 2)
+    self._AssertOrdered(1, 3)
+    self._AssertOrdered(2, 3)
+
+  def testReverseDependencyOrder(self):
+    background_tasks.RunThreadedInDependencyOrder(
+        self._Append, range(6), self.dependencies.get, reverse=True)
+    self.assertItemsEqual(self.order, range(6))
+    self._AssertOrdered(1, 0)
+    self._AssertOrdered(2, 0)
+    self._AssertOrdered(3, 1)
+    self._AssertOrdered(3, 2)
+
+  def testExceptionSkipsDependents(self):
+    def _AppendOrRaise(item):
+      if item == 1:
+        raise ValueError()
+      self._Append(item)
+
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      background_tasks.RunThreadedInDependencyOrder(
+          _AppendOrRaise, range(6), self.dependencies.get)
+    self.assertItemsEqual(self.order, [0, 2, 4, 5])
+
+  def testCycle(self):
+    self.dependencies[0] = [3]
+    with self.assertRaises(ValueError):
+      background_tasks.RunThreadedInDependencyOrder(
+          self._Append, range(6), self.dependencies.get)
+    self.assertEqual(self.order, [])
+
+
 class RunParallelProcessesTestCase(unittest.TestCase):
 
   def testFewerThreadsThanConcurrencyLimit(self):
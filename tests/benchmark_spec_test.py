@@ -13,12 +13,21 @@
 # limitations under the License.
 """Tests for perfkitbenchmarker.benchmark_spec."""
 
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
 import unittest
 
+import mock
+
 from perfkitbenchmarker import benchmark_spec
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import context
+from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import network
 from perfkitbenchmarker import os_types
 from perfkitbenchmarker import providers
 from perfkitbenchmarker import static_virtual_machine as static_vm
@@ -233,5 +242,122 @@ class RedirectGlobalFlagsTestCase(_BenchmarkSpecTestCase):
     self.assertEqual(FLAGS.benchmark_spec_test_flag, 0)
 
 
+class ResourceOrderTestCase(_BenchmarkSpecTestCase):
+
+  def setUp(self):
+    super(ResourceOrderTestCase, self).setUp()
+    self.spec = self._CreateBenchmarkSpecFromYaml(SIMPLE_CONFIG)
+    self.spec.ConstructVirtualMachines()
+    self.vm = self.spec.vms[0]
+    self.network = self.vm.network
+    self.firewall = mock.Mock(spec=network.BaseFirewall)
+    self.spec.firewalls['firewall'] = self.firewall
+    self.lock = threading.Lock()
+    self.calls = []
+    for obj, method_name, call in (
+        (self.spec, 'PrepareVmAsync', 'create_vm'),
+        (self.spec, 'DeleteVm', 'delete_vm'),
+        (self.network, 'Create', 'create_network'),
+        (self.network, 'Delete', 'delete_network'),
+        (self.firewall, 'DisallowAllPorts', 'delete_firewall')):
+      p = mock.patch.object(obj, method_name,
+                            side_effect=self._RecordCall(call))
+      p.start()
+      self.addCleanup(p.stop)
+
+  def _RecordCall(self, call):
+    def _Record(*unused_args):
+      with self.lock:
+        self.calls.append(call)
+      # Mocked coroutines, such as PrepareVmAsync, complete immediately.
+      return (_ for _ in ())
+    return _Record
+
+  def testProvision(self):
+    with mock.patch.object(benchmark_spec.vm_util, 'GenerateSSHConfig'):
+      self.spec.Provision()
+    self.assertEqual(self.calls, ['create_network', 'create_vm'])
+
+  def testDelete(self):
+    self.spec.Delete()
+    self.assertEqual(self.calls,
+                     ['delete_vm', 'delete_firewall', 'delete_network'])
+    self.assertTrue(self.spec.deleted)
+
+
+class BroadcastFileTestCase(_BenchmarkSpecTestCase):
+
+  def setUp(self):
+    super(BroadcastFileTestCase, self).setUp()
+    self.spec = self._CreateBenchmarkSpecFromYaml(SIMPLE_CONFIG)
+    mock_flags.PatchTestCaseFlags(self).broadcast_seed_vms = 1
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    self.source_path = os.path.join(temp_dir, 'file')
+    with open(self.source_path, 'w') as fp:
+      fp.write('contents')
+    self.checksum = hashlib.md5('contents').hexdigest()
+    self.lock = threading.Lock()
+    self.files = {}
+    self.pushes = []
+    self.copies = []
+    self.failing_copies = set()
+
+  def _CreateVm(self, index, os_type=os_types.DEBIAN):
+    vm = mock.Mock(OS_TYPE=os_type)
+    vm.name = 'vm%d' % index
+
+    def _PushFile(source_path, remote_path):
+      with self.lock:
+        self.pushes.append(vm)
+        self.files[vm] = self.checksum
+
+    def _MoveFile(target, source_path, remote_path):
+      with self.lock:
+        self.assertIn(vm, self.files)
+        self.copies.append(target)
+        if target in self.failing_copies:
+          raise errors.VirtualMachine.RemoteCommandError()
+        self.files[target] = self.files[vm]
+
+    def _RemoteCommand(command, **unused_kwargs):
+      self.assertEqual(command, 'md5sum /tmp/file')
+      with self.lock:
+        return '%s  /tmp/file\n' % self.files.get(vm, ''), ''
+
+    vm.PushFile.side_effect = _PushFile
+    vm.MoveFile.side_effect = _MoveFile
+    vm.RemoteCommand.side_effect = _RemoteCommand
+    return vm
+
+  def testTreeBroadcast(self):
+    self.spec.vms = [self._CreateVm(i) for i in range(7)]
+    self.spec.BroadcastFile(self.source_path, '/tmp/file')
+    self.assertEqual(self.pushes, self.spec.vms[:1])
+    self.assertItemsEqual(self.copies, self.spec.vms[1:])
+    self.assertItemsEqual(self.files, self.spec.vms)
+
+  def testNonLinuxVmsArePushedDirectly(self):
+    vms = [self._CreateVm(0), self._CreateVm(1, os_types.WINDOWS),
+           self._CreateVm(2)]
+    self.spec.BroadcastFile(self.source_path, '/tmp/file', vms)
+    self.assertItemsEqual(self.pushes, vms[:2])
+    self.assertEqual(self.copies, vms[2:])
+    self.assertFalse(vms[1].RemoteCommand.called)
+
+  def testFailedCopyIsPushedAgain(self):
+    self.spec.vms = [self._CreateVm(i) for i in range(3)]
+    self.failing_copies.add(self.spec.vms[2])
+    self.spec.BroadcastFile(self.source_path, '/tmp/file')
+    self.assertEqual(self.pushes, [self.spec.vms[0], self.spec.vms[2]])
+    self.assertItemsEqual(self.files, self.spec.vms)
+
+  def testChecksumMismatch(self):
+    self.spec.vms = [self._CreateVm(i) for i in range(2)]
+    self.checksum = 'corrupt'
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      self.spec.BroadcastFile(self.source_path, '/tmp/file')
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,126 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.build_cache."""
+
+import shutil
+import tempfile
+import threading
+import unittest
+
+import mock
+
+from perfkitbenchmarker import build_cache
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import os_types
+from tests import mock_flags
+
+
+class CachedBuildTestCase(unittest.TestCase):
+
+  def setUp(self):
+    cache_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, cache_dir)
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.build_cache = True
+    self.mocked_flags.build_cache_dir = cache_dir
+    self.built_on = []
+
+    @build_cache.CachedBuild('package', '1.0', ['/tmp/pkb/package'])
+    def _Build(vm):
+      self.built_on.append(vm)
+
+    self.build = _Build
+
+  def _CreateVm(self, arch='x86_64', cpu_flags='sse avx', fail_unpack=False):
+    vm = mock.Mock(OS_TYPE=os_types.DEBIAN)
+
+    def _RemoteCommand(command, **unused_kwargs):
+      if command == build_cache._PLATFORM_COMMAND:
+        return ('debian 8\n%s\nmodel name\t: CPU\nflags\t\t: %s\n' %
+                (arch, cpu_flags)), ''
+      if fail_unpack and '-xzf' in command:
+        raise errors.VirtualMachine.RemoteCommandError()
+      return '', ''
+
+    def _PullFile(local_path, remote_path):
+      with open(local_path, 'w') as fp:
+        fp.write('build')
+
+    vm.RemoteCommand.side_effect = _RemoteCommand
+    vm.PullFile.side_effect = _PullFile
+    return vm
+
+  def testBuiltOnce(self):
+    vms = [self._CreateVm(), self._CreateVm()]
+    for vm in vms:
+      self.build(vm)
+    self.assertEqual(self.built_on, vms[:1])
+    self.assertTrue(vms[0].PullFile.called)
+    self.assertFalse(vms[0].PushFile.called)
+    self.assertTrue(vms[1].PushFile.called)
+
+  def testConcurrentUnpacks(self):
+    self.build(self._CreateVm())
+    vms = [self._CreateVm(), self._CreateVm()]
+    pushing_vms = []
+    all_pushing = threading.Event()
+    waited = []
+
+    def _PushFile(local_path, remote_path):
+      pushing_vms.append(local_path)
+      if len(pushing_vms) == len(vms):
+        all_pushing.set()
+      # Times out if the VMs cannot push at the same time.
+      waited.append(all_pushing.wait(5))
+
+    for vm in vms:
+      vm.PushFile.side_effect = _PushFile
+    threads = [threading.Thread(target=self.build, args=(vm,)) for vm in vms]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(len(self.built_on), 1)
+    self.assertEqual(waited, [True, True])
+
+  def testDifferentArchitectures(self):
+    vms = [self._CreateVm(), self._CreateVm('aarch64')]
+    for vm in vms:
+      self.build(vm)
+    self.assertEqual(self.built_on, vms)
+
+  def testDifferentCpuFlags(self):
+    vms = [self._CreateVm(), self._CreateVm(cpu_flags='sse avx avx2')]
+    for vm in vms:
+      self.build(vm)
+    self.assertEqual(self.built_on, vms)
+
+  def testUnpackFailure(self):
+    vms = [self._CreateVm(), self._CreateVm(fail_unpack=True)]
+    for vm in vms:
+      self.build(vm)
+    self.assertEqual(self.built_on, vms)
+
+  def testDisabled(self):
+    self.mocked_flags.build_cache = False
+    vms = [self._CreateVm(), self._CreateVm()]
+    for vm in vms:
+      self.build(vm)
+    self.assertEqual(self.built_on, vms)
+    self.assertFalse(vms[0].RemoteCommand.called)
+
+
+if __name__ == '__main__':
+  unittest.main()
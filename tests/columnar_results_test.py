@@ -0,0 +1,98 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.columnar_results."""
+
+import json
+import os
+import tempfile
+import unittest
+
+import mock
+
+from perfkitbenchmarker import columnar_results
+from tests import sample_dicts
+
+
+class ColumnarResultsTestCase(unittest.TestCase):
+
+  def setUp(self):
+    fd, self.path = tempfile.mkstemp(prefix='perfkit-test-', suffix='.pkbcol')
+    os.close(fd)
+    self.addCleanup(os.unlink, self.path)
+
+  def _Write(self, *row_groups):
+    with open(self.path, 'ab') as fp:
+      for samples in row_groups:
+        columnar_results.WriteRowGroup(fp, samples)
+
+  def testRoundTrip(self):
+    samples = [sample_dicts.MakeSample(1.5, {'zone': 'a'}),
+               sample_dicts.MakeSample(7, {'zone': 'b'}),
+               sample_dicts.MakeSample(2 ** 70, {'zone': 'a', 'sizes': [1, 2]}),
+               sample_dicts.MakeSample('n/a', labels='x')]
+    self._Write(samples[:2], samples[2:])
+    self.assertEqual(list(columnar_results.ReadSamples(self.path)), samples)
+
+  def testEmptyFile(self):
+    self._Write([])
+    self.assertEqual(os.path.getsize(self.path), 0)
+
+  def testNotColumnar(self):
+    with open(self.path, 'wb') as fp:
+      fp.write(b'{"metric": "Latency"}\n')
+    with self.assertRaises(ValueError):
+      list(columnar_results.ReadSamples(self.path))
+
+  def testTruncated(self):
+    self._Write([sample_dicts.MakeSample(1.)])
+    with open(self.path, 'rb+') as fp:
+      fp.truncate(os.path.getsize(self.path) - 1)
+    with self.assertRaises(ValueError):
+      list(columnar_results.ReadSamples(self.path))
+
+  def testReadColumns(self):
+    self._Write([sample_dicts.MakeSample(1., {'machine_type': 'n1'}),
+                 sample_dicts.MakeSample(2.)],
+                [sample_dicts.MakeSample(3., {'machine_type': 'n2'},
+                                         labels='x')])
+    self.assertEqual(
+        columnar_results.ReadColumns(
+            self.path, ['value', 'metadata.machine_type', 'labels']),
+        {'value': [1., 2., 3.], 'metadata.machine_type': ['n1', None, 'n2'],
+         'labels': [None, None, 'x']})
+    self.assertEqual(sorted(columnar_results.ReadColumns(self.path)),
+                     ['labels', 'metadata', 'metric', 'official', 'owner',
+                      'product_name', 'run_uri', 'sample_uri', 'test',
+                      'timestamp', 'unit', 'value'])
+
+  def testSkipsUnselectedColumns(self):
+    self._Write([sample_dicts.MakeSample(1., {'zone': 'a'})])
+    with mock.patch.object(columnar_results, '_DecodeColumn',
+                           wraps=columnar_results._DecodeColumn) as decode:
+      list(columnar_results.ReadSamples(self.path, ['value']))
+    self.assertEqual(decode.call_count, 1)
+
+  def testMetadataStoredOnce(self):
+    metadata = {'key%s' % i: 'value%s' % i for i in range(50)}
+    # The samples share a sample_uri, so that only the metadata is large.
+    self._Write([sample_dicts.MakeSample(float(i), dict(metadata),
+                                         sample_uri='uri')
+                 for i in range(10000)])
+    # Repeating the metadata for each sample would take 10000 copies of it.
+    self.assertLess(os.path.getsize(self.path),
+                    100 * len(json.dumps(metadata)))
+
+if __name__ == '__main__':
+  unittest.main()
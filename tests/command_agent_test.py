@@ -0,0 +1,72 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.command_agent and its agent script."""
+
+import pickle
+import sys
+import time
+import unittest
+
+from perfkitbenchmarker import background_tasks
+from perfkitbenchmarker import command_agent
+from perfkitbenchmarker import data
+from perfkitbenchmarker import errors
+
+
+class CommandAgentClientTestCase(unittest.TestCase):
+
+  def setUp(self):
+    agent_path = data.ResourcePath('command_agent.py')
+    self.client = command_agent.CommandAgentClient([sys.executable,
+                                                    agent_path])
+    self.addCleanup(self.client.Close)
+
+  def testOutputAndStatus(self):
+    stdout, stderr, status = self.client.RunCommand(
+        'echo out; echo err >&2; exit 3')
+    self.assertEqual((stdout, stderr, status), ('out\n', 'err\n', 3))
+    self.assertIs(type(stdout), str)
+    self.assertIs(type(stderr), str)
+
+  def testConcurrentCommands(self):
+    commands = ['sleep 0.%d; echo %d' % (5 - i, i) for i in range(5)]
+    results = background_tasks.RunThreaded(self.client.RunCommand, commands)
+    self.assertEqual(results, [('%d\n' % i, '', 0) for i in range(5)])
+
+  def testTimeout(self):
+    _, _, status = self.client.RunCommand('sleep 10', timeout=0.1)
+    self.assertEqual(status, -9)
+
+  def testTimeoutKillsChildren(self):
+    start_time = time.time()
+    # The background sleep keeps the output open after bash is killed.
+    _, _, status = self.client.RunCommand('sleep 10 & sleep 10', timeout=0.1)
+    self.assertEqual(status, -9)
+    self.assertLess(time.time() - start_time, 5)
+
+  def testReconnectsAfterAgentExits(self):
+    with self.assertRaises(errors.VirtualMachine.CommandAgentError):
+      self.client.RunCommand('kill $PPID; sleep 10')
+    self.assertEqual(self.client.RunCommand('echo ok'), ('ok\n', '', 0))
+
+  def testPickle(self):
+    self.client.RunCommand('true')
+    client = pickle.loads(pickle.dumps(self.client))
+    self.addCleanup(client.Close)
+    self.assertEqual(client.RunCommand('echo ok'), ('ok\n', '', 0))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,199 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.event_loop."""
+
+import threading
+import time
+import unittest
+
+from perfkitbenchmarker import background_tasks
+from perfkitbenchmarker import context
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import event_loop
+
+
+def _Echo(text):
+  stdout, _, retcode = yield event_loop.Command(['echo', text])
+  raise event_loop.Return((stdout, retcode))
+
+
+def _GetReturnCode(cmd, timeout=event_loop.DEFAULT_TIMEOUT):
+  _, _, retcode = yield event_loop.Command(cmd, timeout=timeout)
+  raise event_loop.Return(retcode)
+
+
+def _EchoTwice(text):
+  first = yield _Echo(text)
+  second = yield _Echo(text)
+  raise event_loop.Return([first, second])
+
+
+def _Fail():
+  yield event_loop.Sleep(0)
+  raise ValueError('failure')
+
+
+def _CatchFailure():
+  try:
+    yield _Fail()
+  except ValueError as e:
+    raise event_loop.Return(str(e))
+
+
+def _GetBenchmarkSpecInThread():
+  spec = yield event_loop.CallInThread(context.GetThreadBenchmarkSpec)
+  raise event_loop.Return((context.GetThreadBenchmarkSpec(), spec))
+
+
+def _YieldInvalidValue():
+  yield 1
+
+
+def _SleepAndReturn(seconds, value):
+  yield event_loop.Sleep(seconds)
+  raise event_loop.Return(value)
+
+
+class _FakeThreadContext(object):
+
+  def __init__(self, benchmark_spec=None):
+    self.benchmark_spec = benchmark_spec
+
+  def CopyToCurrentThread(self):
+    context.SetThreadBenchmarkSpec(self.benchmark_spec)
+
+
+@unittest.skipUnless(event_loop.IsSupported(),
+                     'The event loop requires select.poll.')
+class EventLoopTestCase(unittest.TestCase):
+
+  def _Run(self, coroutine, thread_context=None):
+    done = threading.Event()
+    results = []
+
+    def _Callback(value, exc_info):
+      results.append((value, exc_info))
+      done.set()
+
+    task = event_loop.GetEventLoop().Start(
+        coroutine, thread_context or _FakeThreadContext(), _Callback)
+    self.assertTrue(done.wait(10))
+    self.assertTrue(task.done)
+    return results[0]
+
+  def testCommand(self):
+    self.assertEqual(self._Run(_Echo('hello')), (('hello\n', 0), None))
+
+  def testSubtasks(self):
+    value, exc_info = self._Run(_EchoTwice('a'))
+    self.assertEqual(value, [('a\n', 0), ('a\n', 0)])
+    self.assertIsNone(exc_info)
+
+  def testException(self):
+    value, exc_info = self._Run(_Fail())
+    self.assertIsNone(value)
+    self.assertIs(exc_info[0], ValueError)
+
+  def testExceptionPropagatesToParent(self):
+    self.assertEqual(self._Run(_CatchFailure()), ('failure', None))
+
+  def testMissingExecutable(self):
+    _, exc_info = self._Run(_GetReturnCode(['/nonexistent']))
+    self.assertIs(exc_info[0], OSError)
+
+  def testInvalidYield(self):
+    _, exc_info = self._Run(_YieldInvalidValue())
+    self.assertIs(exc_info[0], TypeError)
+
+  def testCommandTimeout(self):
+    start_time = time.time()
+    retcode, _ = self._Run(_GetReturnCode(['sleep', '10'], timeout=.1))
+    self.assertLess(time.time() - start_time, 5)
+    self.assertTrue(retcode)
+
+  def testThreadContext(self):
+    value, _ = self._Run(_GetBenchmarkSpecInThread(),
+                         _FakeThreadContext('spec'))
+    self.assertEqual(value, ('spec', 'spec'))
+
+  def testCancel(self):
+    done = threading.Event()
+    results = []
+
+    def _Callback(value, exc_info):
+      results.append(exc_info)
+      done.set()
+
+    task = event_loop.GetEventLoop().Start(
+        _SleepAndReturn(100, 'value'), _FakeThreadContext(), _Callback)
+    task.Cancel()
+    self.assertTrue(done.wait(10))
+    self.assertIs(results[0][0], KeyboardInterrupt)
+
+  def testCancelDuringCallInThread(self):
+    called = threading.Event()
+    release = threading.Event()
+    done = threading.Event()
+
+    def _Block():
+      called.set()
+      release.wait(10)
+
+    def _CallBlock():
+      yield event_loop.CallInThread(_Block)
+
+    task = event_loop.GetEventLoop().Start(
+        _CallBlock(), _FakeThreadContext(), lambda *unused_args: done.set())
+    self.assertTrue(called.wait(10))
+    task.Cancel()
+    self.assertTrue(done.wait(10))
+    # The task is not done while the function that it called is running.
+    self.assertFalse(task.done)
+    release.set()
+    self.assertTrue(background_tasks._WaitForCondition(lambda: task.done,
+                                                       timeout=10))
+
+  def testRunThreaded(self):
+    start_time = time.time()
+    results = background_tasks.RunThreaded(
+        _SleepAndReturn, [((.5, i), {}) for i in range(500)])
+    # The calls wait concurrently although there are more of them than there
+    # are threads for RunThreaded's blocking calls.
+    self.assertLess(time.time() - start_time, 5)
+    self.assertEqual(results, range(500))
+
+  def testRunThreadedException(self):
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      background_tasks.RunThreaded(_SleepAndReturn, [((0, 1), {}), ((), {})])
+
+
+class RunSynchronouslyTestCase(unittest.TestCase):
+
+  def testCommand(self):
+    self.assertEqual(event_loop.RunSynchronously(_EchoTwice('a')),
+                     [('a\n', 0), ('a\n', 0)])
+
+  def testException(self):
+    self.assertEqual(event_loop.RunSynchronously(_CatchFailure()), 'failure')
+    with self.assertRaises(ValueError):
+      event_loop.RunSynchronously(_Fail())
+
+  def testCallInThread(self):
+    spec = event_loop.RunSynchronously(_GetBenchmarkSpecInThread())
+    self.assertEqual(spec, (None, None))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -17,6 +17,7 @@
 import copy
 import unittest
 
+from perfkitbenchmarker import background_tasks
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import units
@@ -133,6 +134,26 @@ class FlagDictSubstitutionTestCase(unittest.TestCase):
     self.assertFlagState(flag_values, 3, False)
     self.assertFlagState(flag_values_copy, 2, True)
 
+  def testPerThreadSubstitution(self):
+    flag_values = flags.FlagValues()
+    flags.DEFINE_integer('test_flag', 0, 'Test flag.', flag_values=flag_values)
+    flag_values([])
+    flag_values_copies = [copy.deepcopy(flag_values) for _ in range(4)]
+    for i, flag_values_copy in enumerate(flag_values_copies):
+      flag_values_copy.test_flag = i + 1
+
+    def _ReadFlagWithSubstitution(flag_values_copy):
+      with flag_util.FlagDictSubstitution(flag_values,
+                                          flag_values_copy.FlagDict):
+        # Child threads inherit the substitution of their parent.
+        return background_tasks.RunThreaded(
+            lambda _: flag_values.test_flag, [None])[0]
+
+    result = background_tasks.RunThreaded(_ReadFlagWithSubstitution,
+                                          flag_values_copies)
+    self.assertEqual(result, [1, 2, 3, 4])
+    self.assertFlagState(flag_values, 0, False)
+
 
 class TestUnitsParser(unittest.TestCase):
 
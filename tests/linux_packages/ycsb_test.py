@@ -38,6 +38,10 @@ class SimpleResultParserTestCase(unittest.TestCase):
   def testClientSet(self):
     self.assertEqual('YCSB Client 0.1', self.results['client'])
 
+  def testParseLines(self):
+    lines = iter(self.contents.splitlines(True))
+    self.assertEqual(ycsb.ParseResults(lines, 'histogram'), self.results)
+
   def testUpdateStatisticsParsed(self):
     self.assertDictEqual(
         {
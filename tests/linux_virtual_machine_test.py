@@ -0,0 +1,405 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.linux_virtual_machine."""
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import mock
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import event_loop
+from perfkitbenchmarker import linux_virtual_machine
+from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.static_virtual_machine import StaticVmSpec
+from perfkitbenchmarker.static_virtual_machine import (
+    DebianBasedStaticVirtualMachine)
+from tests import mock_flags
+
+_CONTROL_PATH = '/tmp/pkb/ssh-vm'
+
+
+class _LinuxVmTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.ssh_options = []
+    self.mocked_flags.ssh_reuse_connections = True
+    self.sockets = set()
+    self.issue_command = self._Patch(vm_util.__name__ + '.IssueCommand',
+                                     side_effect=self._IssueCommand)
+    self._Patch(vm_util.__name__ + '.PrependTempDir',
+                return_value=_CONTROL_PATH)
+    self._Patch(vm_util.__name__ + '.RunningOnWindows', return_value=False)
+    self._Patch(linux_virtual_machine.__name__ + '.os.path.exists',
+                side_effect=self.sockets.__contains__)
+    self.vm = DebianBasedStaticVirtualMachine(
+        StaticVmSpec('test_component', ip_address='1.1.1.1',
+                     user_name='perfkit', ssh_private_key='/key'))
+
+  def _Patch(self, target, **kwargs):
+    p = mock.patch(target, **kwargs)
+    self.addCleanup(p.stop)
+    return p.start()
+
+  def _IssueCommand(self, cmd, **unused_kwargs):
+    if '-M' in cmd:
+      self.sockets.add(_CONTROL_PATH)
+    elif '-O' in cmd:
+      self.sockets.discard(_CONTROL_PATH)
+    return '', '', 0
+
+  def _GetCommands(self):
+    return [call[0][0] for call in self.issue_command.call_args_list]
+
+
+class SshConnectionSharingTestCase(_LinuxVmTestCase):
+
+  def testCommandsShareConnection(self):
+    self.vm.RemoteCommand('echo 1')
+    self.vm.RemoteCommand('echo 2')
+    first, master, second = self._GetCommands()
+    self.assertNotIn('ControlPath=' + _CONTROL_PATH, first)
+    self.assertIn('-M', master)
+    self.assertIn('ControlPath=' + _CONTROL_PATH, master)
+    self.assertIn('ControlPath=' + _CONTROL_PATH, second)
+
+  def testExpiredConnectionIsReopened(self):
+    self.vm.RemoteCommand('echo 1')
+    self.sockets.clear()
+    self.vm.RemoteCommand('echo 2')
+    commands = self._GetCommands()
+    self.assertEqual(len(commands), 4)
+    self.assertNotIn('ControlPath=' + _CONTROL_PATH, commands[2])
+    self.assertIn('-M', commands[3])
+
+  def testDisabled(self):
+    self.mocked_flags.ssh_reuse_connections = False
+    self.vm.RemoteCommand('echo 1')
+    self.vm.RemoteCommand('echo 2')
+    commands = self._GetCommands()
+    self.assertEqual(len(commands), 2)
+    for command in commands:
+      self.assertNotIn('ControlPath=' + _CONTROL_PATH, command)
+
+  def testCloseRemoteConnections(self):
+    self.vm.RemoteCommand('echo 1')
+    self.vm.CloseRemoteConnections()
+    self.assertIn('-O', self._GetCommands()[-1])
+    self.assertFalse(self.sockets)
+    self.vm.CloseRemoteConnections()
+    self.assertEqual(len(self._GetCommands()), 3)
+
+
+class CommandAgentTransportTestCase(_LinuxVmTestCase):
+
+  def setUp(self):
+    super(CommandAgentTransportTestCase, self).setUp()
+    self.mocked_flags.ssh_reuse_connections = False
+    self.agent = mock.Mock()
+    self.vm._command_agent = self.agent
+
+  def testCommandUsesAgent(self):
+    self.agent.RunCommand.return_value = 'out', 'err', 0
+    self.assertEqual(self.vm.RemoteCommand('echo out'), ('out', 'err'))
+    self.agent.RunCommand.assert_called_once_with('echo out', timeout=None)
+    self.assertFalse(self.issue_command.called)
+
+  def testCommandFailure(self):
+    self.agent.RunCommand.return_value = '', '', 1
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      self.vm.RemoteCommand('false')
+    self.assertEqual(self.vm.RemoteCommand('false', ignore_failure=True),
+                     ('', ''))
+
+  def testLoginShellUsesSsh(self):
+    self.vm.RemoteCommand('echo 1', login_shell=True)
+    self.assertFalse(self.agent.RunCommand.called)
+    self.assertEqual(len(self._GetCommands()), 1)
+
+  def testFallBackToSsh(self):
+    self.agent.RunCommand.side_effect = (
+        errors.VirtualMachine.CommandAgentSendError)
+    self.vm.RemoteCommand('echo 1')
+    self.vm.RemoteCommand('echo 2')
+    self.agent.RunCommand.assert_called_once_with('echo 1', timeout=None)
+    self.agent.Close.assert_called_once_with()
+    self.assertEqual(len(self._GetCommands()), 2)
+
+  def testConnectionLostWhileRunning(self):
+    self.agent.RunCommand.side_effect = errors.VirtualMachine.CommandAgentError
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      self.vm.RemoteCommand('echo 1')
+    # The command is not run again over ssh, but later commands use ssh.
+    self.assertFalse(self.issue_command.called)
+    self.agent.Close.assert_called_once_with()
+    self.vm.RemoteCommand('echo 2')
+    self.assertEqual(self.agent.RunCommand.call_count, 1)
+    self.assertEqual(len(self._GetCommands()), 1)
+
+
+class RemoteCommandBatchTestCase(_LinuxVmTestCase):
+
+  def setUp(self):
+    super(RemoteCommandBatchTestCase, self).setUp()
+    self.mocked_flags.ssh_reuse_connections = False
+
+  def _IssueCommand(self, cmd, **unused_kwargs):
+    # Runs the remote command locally.
+    process = subprocess.Popen(['bash', '-c', cmd[-1]], stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    stdout, stderr = process.communicate()
+    return stdout, stderr, process.returncode
+
+  def testSingleCommand(self):
+    self.assertEqual(self.vm.RemoteCommandBatch(['echo 1']), [('1\n', '')])
+    self.assertEqual(self._GetCommands()[0][-1], 'echo 1')
+
+  def testBatch(self):
+    commands = ['echo 1', 'printf 2; printf 3 >&2', 'cd /; echo {} # comment',
+                'cat <<EOF\n4\nEOF']
+    self.assertEqual(self.vm.RemoteCommandBatch(commands),
+                     [('1\n', ''), ('2', '3'), ('{}\n', ''), ('4\n', '')])
+    self.assertEqual(len(self._GetCommands()), 1)
+
+  def testFailure(self):
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    path = os.path.join(temp_dir, 'file')
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      self.vm.RemoteCommandBatch(['echo 1', 'false', 'touch ' + path])
+    # os.path.exists is patched, so check the directory listing instead.
+    self.assertEqual(os.listdir(temp_dir), [])
+
+  def testIgnoreFailure(self):
+    self.assertEqual(
+        self.vm.RemoteCommandBatch(['echo 1 >&2; false', 'echo 2'],
+                                   ignore_failure=True),
+        [('', '1\n'), ('2\n', '')])
+
+
+class RobustRemoteCommandTestCase(_LinuxVmTestCase):
+
+  def setUp(self):
+    super(RobustRemoteCommandTestCase, self).setUp()
+    self._Patch(linux_virtual_machine.__name__ +
+                '.BaseLinuxMixin._PushRobustCommandScripts')
+    self.wait_responses = []
+    self.remote_command = self._Patch(
+        linux_virtual_machine.__name__ + '.BaseLinuxMixin.RemoteCommand',
+        side_effect=self._RemoteCommand)
+
+  def _RemoteCommand(self, command, **unused_kwargs):
+    if 'wait_for_command.py' not in command:
+      return '', ''
+    return '\n'.join(json.dumps(message)
+                     for message in self.wait_responses.pop(0)), ''
+
+  def _GetWaitCommands(self):
+    return [call[0][0] for call in self.remote_command.call_args_list
+            if 'wait_for_command.py' in call[0][0]]
+
+  def testStreaming(self):
+    self.wait_responses = [
+        [{'stream': 'stdout', 'data': 'a\nb\n'},
+         {'stdout_offset': 4, 'stderr_offset': 0, 'status': None}],
+        [{'stdout_offset': 4, 'stderr_offset': 0, 'status': None}],
+        [{'stream': 'stdout', 'data': 'c'}, {'stream': 'stderr', 'data': 'e'},
+         {'stdout_offset': 5, 'stderr_offset': 1, 'status': 0}]]
+    lines = []
+    self.assertEqual(
+        self.vm.RobustRemoteCommand('cmd', stdout_callback=lines.append),
+        ('a\nb\nc', 'e'))
+    self.assertEqual(lines, ['a\n', 'b\n', 'c'])
+    wait_commands = self._GetWaitCommands()
+    self.assertEqual(len(wait_commands), 3)
+    self.assertIn('--stdout_offset 0 --stderr_offset 0', wait_commands[0])
+    self.assertIn('--stdout_offset 4 --stderr_offset 0', wait_commands[1])
+    self.assertIn('--stdout_offset 4 --stderr_offset 0', wait_commands[2])
+    # The files are deleted after the last poll, not by any poll, so that
+    # retried polls still find them.
+    for wait_command in wait_commands:
+      self.assertNotIn('--delete', wait_command)
+    self.assertTrue(self.remote_command.call_args_list[-1][0][0].startswith(
+        'rm -f '))
+
+  def testFailure(self):
+    self.wait_responses = [
+        [{'stream': 'stderr', 'data': 'error'},
+         {'stdout_offset': 0, 'stderr_offset': 5, 'status': 2}]]
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      self.vm.RobustRemoteCommand('cmd')
+
+
+class WaitForBootCompletionAsyncTestCase(_LinuxVmTestCase):
+
+  def setUp(self):
+    super(WaitForBootCompletionAsyncTestCase, self).setUp()
+    self.mocked_flags.default_timeout = 10
+    self.sleep = self._Patch(event_loop.__name__ + '.time.sleep')
+    self.command_results = [('', 'refused', 255), ('', 'refused', 255),
+                            ('host\n', '', 0)]
+    self.command = self._Patch(
+        event_loop.__name__ + '.Command.RunBlocking',
+        side_effect=lambda: self.command_results.pop(0))
+
+  def testWaitsForSsh(self):
+    event_loop.RunSynchronously(self.vm.WaitForBootCompletionAsync())
+    self.assertEqual(self.command.call_count, 3)
+    self.assertEqual(self.sleep.call_count, 2)
+    self.assertEqual(self.vm.hostname, 'host')
+    self.assertIsNotNone(self.vm.bootable_time)
+    self.assertIn('-M', self._GetCommands()[-1])
+
+  def testTimeout(self):
+    self.mocked_flags.default_timeout = 0
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      event_loop.RunSynchronously(self.vm.WaitForBootCompletionAsync())
+    self.assertEqual(self.command.call_count, 1)
+
+
+class _FakePackage(object):
+
+  def __init__(self, apt_packages, dependencies=()):
+    self.APT_PACKAGES = apt_packages
+    self.DEPENDENCIES = dependencies
+    self.installed_before = None
+
+  def AptInstall(self, vm):
+    self.installed_before = set(vm._installed_packages)
+    for dependency in self.DEPENDENCIES:
+      vm.Install(dependency)
+    vm.InstallPackages(self.APT_PACKAGES)
+
+
+class InstallAllTestCase(_LinuxVmTestCase):
+
+  def setUp(self):
+    super(InstallAllTestCase, self).setUp()
+    self.packages = {
+        'a': _FakePackage('liba libcommon', dependencies=('b', 'c')),
+        'b': _FakePackage('libb libcommon', dependencies=('c',)),
+        'c': _FakePackage('libc')}
+    self._Patch(linux_virtual_machine.__name__ + '.linux_packages.PACKAGES',
+                new=self.packages)
+    self.remote_command = self._Patch(
+        linux_virtual_machine.__name__ + '.BaseLinuxMixin.RemoteCommand',
+        return_value=('', ''))
+
+  def _GetInstalledOsPackages(self):
+    return [call[0][0].split('install ', 1)[1]
+            for call in self.remote_command.call_args_list
+            if 'apt-get -y install' in call[0][0]]
+
+  def testInstallAll(self):
+    self.vm.InstallAll(['a'])
+    self.assertEqual(self._GetInstalledOsPackages(),
+                     ['liba libb libc libcommon'])
+    self.assertEqual(self.vm._installed_packages, {'a', 'b', 'c'})
+    self.assertEqual(self.packages['a'].installed_before, {'b', 'c'})
+    self.assertEqual(self.packages['b'].installed_before, {'c'})
+
+  def testInstalledOsPackagesAreSkipped(self):
+    self.vm.InstallPackages('liba libb')
+    self.vm.InstallPackages('libb libc')
+    self.vm.InstallPackages('liba')
+    self.vm.InstallPackages('--reinstall liba')
+    self.assertEqual(self._GetInstalledOsPackages(),
+                     ['liba libb', 'libc', '--reinstall liba'])
+
+  def testPackageCleanup(self):
+    self.vm.InstallPackages('liba')
+    self.vm.PackageCleanup()
+    self.vm.InstallPackages('liba')
+    self.assertEqual(self._GetInstalledOsPackages(), ['liba', 'liba'])
+
+
+class ReuseInstalledPackagesTestCase(_LinuxVmTestCase):
+
+  def setUp(self):
+    super(ReuseInstalledPackagesTestCase, self).setUp()
+    self.mocked_flags.reuse_installed_packages = True
+    self.packages = {
+        'a': _FakePackage('liba', dependencies=('b',)),
+        'b': _FakePackage('libb')}
+    self._Patch(linux_virtual_machine.__name__ + '.linux_packages.PACKAGES',
+                new=self.packages)
+    self._Patch(linux_virtual_machine.__name__ + '._GetPackageFingerprint',
+                side_effect=lambda package_name: package_name + '-v2')
+    self.manifest = ''
+    self.remote_command = self._Patch(
+        linux_virtual_machine.__name__ + '.BaseLinuxMixin.RemoteCommand',
+        side_effect=self._RemoteCommand)
+
+  def _RemoteCommand(self, command, **unused_kwargs):
+    if command == 'cat ' + linux_virtual_machine.INSTALL_MANIFEST:
+      return self.manifest, ''
+    return '', ''
+
+  def _GetCommands(self):
+    return [call[0][0] for call in self.remote_command.call_args_list]
+
+  def testInstalledPackagesAreSkipped(self):
+    self.manifest = 'a a-v2\nb b-v2\n'
+    self.vm.InstallAll(['a'])
+    self.vm.Install('b')
+    self.assertEqual(self._GetCommands(),
+                     ['cat ' + linux_virtual_machine.INSTALL_MANIFEST])
+    self.assertIsNone(self.packages['a'].installed_before)
+    self.assertEqual(self.vm._installed_packages, {'a', 'b'})
+
+  def testChangedPackageIsReinstalled(self):
+    self.manifest = 'a a-v1\nb b-v2\n'
+    self.vm.Install('a')
+    self.assertEqual(self.packages['a'].installed_before, set())
+    self.assertIsNone(self.packages['b'].installed_before)
+    self.assertIn("'a a-v2\nb b-v2\n' > " +
+                  linux_virtual_machine.INSTALL_MANIFEST,
+                  self._GetCommands()[-1])
+
+  def testPackageCleanupKeepsPackages(self):
+    self.vm.Install('b')
+    del self.remote_command.call_args_list[:]
+    self.vm.PackageCleanup()
+    self.assertEqual(self._GetCommands(), [])
+    self.assertEqual(self.vm._installed_packages, {'b'})
+
+  def testPackageCleanupOfCloudVm(self):
+    self.vm.is_static = False
+    self.manifest = 'a a-v2\nb b-v2\n'
+    self.vm.Install('a')
+    del self.remote_command.call_args_list[:]
+    self.vm.PackageCleanup()
+    commands = self._GetCommands()
+    self.assertIn("'b b-v2\n' > " + linux_virtual_machine.INSTALL_MANIFEST,
+                  commands[0])
+    self.assertEqual(commands[-1], 'rm -rf ' + vm_util.VM_TMP_DIR)
+    self.assertEqual(self.vm._installed_packages, set())
+
+  def testDisabled(self):
+    self.mocked_flags.reuse_installed_packages = False
+    self.manifest = 'b b-v2\n'
+    self.vm.Install('b')
+    self.assertEqual(self.packages['b'].installed_before, set())
+    for command in self._GetCommands():
+      self.assertNotIn(linux_virtual_machine.INSTALL_MANIFEST, command)
+
+
+if __name__ == '__main__':
+  unittest.main()
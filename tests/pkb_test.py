@@ -0,0 +1,50 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.pkb."""
+
+import threading
+import unittest
+
+from perfkitbenchmarker import background_tasks
+from perfkitbenchmarker import pkb
+
+
+class RunPhaseTurnsTestCase(unittest.TestCase):
+
+  def testTurnsAreTakenInOrder(self):
+    turns = pkb._RunPhaseTurns([3, 1, 2])
+    lock = threading.Lock()
+    order = []
+
+    def _TakeTurn(sequence_number):
+      with turns.Take(sequence_number):
+        with lock:
+          order.append(sequence_number)
+
+    background_tasks.RunThreaded(_TakeTurn, [2, 3, 1])
+    self.assertEqual(order, [1, 2, 3])
+
+  def testFinishGivesUpTurn(self):
+    turns = pkb._RunPhaseTurns([1, 2, 3])
+    turns.Finish(2)
+    turns.Finish(1)
+    taken = []
+    with turns.Take(3):
+      taken.append(3)
+    self.assertEqual(taken, [3])
+
+
+if __name__ == '__main__':
+  unittest.main()
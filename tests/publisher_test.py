@@ -17,17 +17,27 @@ import collections
 import csv
 import io
 import json
+import os
 import re
+import shutil
 import tempfile
+import threading
 import uuid
 import unittest
 
 import mock
 
+from perfkitbenchmarker import columnar_results
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import events
 from perfkitbenchmarker import publisher
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 
+_UPLOAD_STAND_IN = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools',
+    'upload_stand_in', 'upload_stand_in.py')
+
 
 class PrettyPrintStreamPublisherTestCase(unittest.TestCase):
 
@@ -57,6 +67,18 @@ class PrettyPrintStreamPublisherTestCase(unittest.TestCase):
     value = stream.getvalue()
     self.assertRegexpMatches(value, re.compile(r'TESTA.*TESTB', re.DOTALL))
 
+  def testIncrementalPublishingPrintsEachBatch(self):
+    stream = io.BytesIO()
+    instance = publisher.PrettyPrintStreamPublisher(stream)
+    instance.Open()
+    instance.AppendSamples([{'test': 'testa', 'metric': '1', 'value': 1.0,
+                             'unit': 'MB', 'metadata': {}}])
+    self.assertIn('TESTA', stream.getvalue())
+    instance.AppendSamples([{'test': 'testb', 'metric': '2', 'value': 2.0,
+                             'unit': 'MB', 'metadata': {}}])
+    instance.Close()
+    self.assertEqual(stream.getvalue().count('Results Summary'), 2)
+
 
 class LogPublisherTestCase(unittest.TestCase):
 
@@ -69,6 +91,17 @@ class LogPublisherTestCase(unittest.TestCase):
     instance.PublishSamples([{'test': 'testa'}, {'test': 'testb'}])
     logger.log.assert_called_once_with(level, mock.ANY)
 
+  def testIncrementalPublishingLogsEachBatch(self):
+    logger = mock.MagicMock()
+    instance = publisher.LogPublisher(logger=logger)
+    instance.Open()
+    instance.AppendSamples([{'test': 'testa'}])
+    self.assertIn('testa', logger.log.call_args[0][1])
+    instance.AppendSamples([{'test': 'testb'}])
+    self.assertIn('testb', logger.log.call_args[0][1])
+    instance.Close()
+    self.assertEqual(logger.log.call_count, 2)
+
 
 class NewlineDelimitedJSONPublisherTestCase(unittest.TestCase):
 
@@ -102,6 +135,49 @@ class NewlineDelimitedJSONPublisherTestCase(unittest.TestCase):
                           {u'test': u'testb', u'labels': u'|key2:val2|'}],
                          result)
 
+  def testIncrementalPublishing(self):
+    self.instance.Open()
+    self.instance.AppendSamples([{'test': 'testa', 'metadata': {}}])
+    self.assertEqual([{u'test': u'testa', u'labels': u''}],
+                     [json.loads(i) for i in self.fp])
+    self.instance.AppendSamples([{'test': 'testb', 'metadata': {}}])
+    self.instance.Close()
+    self.fp.seek(0)
+    self.assertEqual(['testa', 'testb'],
+                     [json.loads(i)['test'] for i in self.fp])
+
+
+class ColumnarPublisherTestCase(unittest.TestCase):
+
+  def setUp(self):
+    fd, self.path = tempfile.mkstemp(prefix='perfkit-test-', suffix='.pkbcol')
+    os.close(fd)
+    self.addCleanup(os.unlink, self.path)
+    self.instance = publisher.ColumnarPublisher(self.path)
+
+  def testPublishSamples(self):
+    samples = [{'test': 'testa', 'value': 1., 'metadata': {'key': 'val'}},
+               {'test': 'testb', 'value': 2., 'metadata': {'key': 'val'}}]
+    self.instance.PublishSamples(samples)
+    self.assertEqual(list(columnar_results.ReadSamples(self.path)), samples)
+
+  def testIncrementalPublishing(self):
+    with mock.patch.object(publisher, '_COLUMNAR_ROW_GROUP_SIZE', 2):
+      self.instance.Open()
+      self.instance.AppendSamples([{'test': 'testa'}])
+      self.instance.Flush()
+      self.assertEqual(
+          columnar_results.ReadColumns(self.path, ['test']),
+          {'test': ['testa']})
+      self.instance.AppendSamples([{'test': 'testb'}, {'test': 'testc'}])
+      self.instance.AppendSamples([{'test': 'testd'}])
+      self.assertEqual(
+          columnar_results.ReadColumns(self.path, ['test']),
+          {'test': ['testa', 'testb', 'testc']})
+      self.instance.Close()
+    self.assertEqual(columnar_results.ReadColumns(self.path, ['test']),
+                     {'test': ['testa', 'testb', 'testc', 'testd']})
+
 
 class BigQueryPublisherTestCase(unittest.TestCase):
 
@@ -151,6 +227,65 @@ class BigQueryPublisherTestCase(unittest.TestCase):
     instance.PublishSamples(self.samples)  # No error
     self.mock_vm_util.IssueRetryableCommand.assert_called_once_with(mock.ANY)
 
+  def testIncrementalPublishingUploadsChunks(self):
+    uploaded = []
+    def _ReadUpload(cmd):
+      with open(cmd[-1]) as fp:
+        uploaded.append([json.loads(line)['test'] for line in fp])
+    self.mock_vm_util.IssueRetryableCommand.side_effect = _ReadUpload
+    # Each sample fills a chunk of its own.
+    instance = publisher.BigQueryPublisher(self.table, max_chunk_bytes=1)
+    with mock.patch.object(publisher, '_MAX_PENDING_UPLOAD_CHUNKS', 2):
+      instance.Open()
+      instance.AppendSamples(self.samples * 2)
+      self.assertEqual(len(uploaded), 4)
+      instance.AppendSamples(self.samples[:1])
+      self.assertEqual(len(uploaded), 4)
+      instance.Flush()
+      instance.Flush()
+      instance.Close()
+    # Chunks are uploaded concurrently, so their order is not fixed.
+    self.assertEqual(sorted(uploaded),
+                     [['testa'], ['testa'], ['testa'], ['testb'], ['testb']])
+
+  def testFailedChunkIsKept(self):
+    self.mock_vm_util.IssueRetryableCommand.side_effect = (
+        errors.VmUtil.CalledProcessException())
+    instance = publisher.BigQueryPublisher(self.table)
+    with self.assertRaises(Exception):
+      instance.PublishSamples(self.samples)
+    path = self.mock_vm_util.IssueRetryableCommand.call_args[0][0][-1]
+    self.addCleanup(os.unlink, path)
+    with open(path) as fp:
+      self.assertEqual(['testa', 'testb'],
+                       [json.loads(line)['test'] for line in fp])
+
+
+class UploadStandInTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.output_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.output_dir)
+    p = mock.patch.dict(os.environ, {'UPLOAD_STAND_IN_DIR': self.output_dir})
+    p.start()
+    self.addCleanup(p.stop)
+    p = mock.patch.object(vm_util, 'GetTempDir',
+                          return_value=tempfile.gettempdir())
+    p.start()
+    self.addCleanup(p.stop)
+
+  def testBigQueryPublisher(self):
+    instance = publisher.BigQueryPublisher(
+        'samples_mart.results', bq_path=_UPLOAD_STAND_IN, max_chunk_bytes=1)
+    instance.PublishSamples([{'test': 'test%s' % i, 'metadata': {}}
+                             for i in range(3)])
+    table_dir = os.path.join(self.output_dir, 'samples_mart.results')
+    tests = []
+    for name in os.listdir(table_dir):
+      with open(os.path.join(table_dir, name)) as fp:
+        tests.extend(json.loads(line)['test'] for line in fp)
+    self.assertEqual(sorted(tests), ['test0', 'test1', 'test2'])
+
 
 class CloudStoragePublisherTestCase(unittest.TestCase):
 
@@ -196,6 +331,7 @@ class SampleCollectorTestCase(unittest.TestCase):
     self.addCleanup(p.stop)
 
     self.mock_flags.product_name = 'PerfKitBenchmarker'
+    self.mock_flags.stream_samples = False
 
   def _VerifyResult(self, contains_metadata=True):
     self.assertEqual(1, len(self.instance.samples))
@@ -230,6 +366,69 @@ class SampleCollectorTestCase(unittest.TestCase):
         },
         self.instance.samples[0])
 
+  def testAddSamples_SamplesCreated(self):
+    def AnnotateSamples(unused_sender, benchmark_spec, samples):
+      self.assertEqual(len(samples), 2)
+      for s in samples:
+        s['metadata']['batch'] = True
+    events.samples_created.connect(AnnotateSamples, weak=False)
+    self.addCleanup(events.samples_created.disconnect, AnnotateSamples)
+    self.instance.AddSamples([self.sample, self.sample], self.benchmark,
+                             self.benchmark_spec)
+    self.assertEqual([s['metadata']['batch'] for s in self.instance.samples],
+                     [True, True])
+
+  def testStreamSamples(self):
+    self.mock_flags.stream_samples = True
+    self.mock_flags.stream_samples_queue_size = 1
+    mock_publisher = mock.MagicMock()
+    published_metrics = []
+    mock_publisher.AppendSamples.side_effect = lambda samples: (
+        published_metrics.extend(s['metric'] for s in samples))
+    self.instance.publishers = [mock_publisher]
+    self.instance.AddSamples([self.sample] * 3, self.benchmark,
+                             self.benchmark_spec)
+    self.assertEqual(0, len(self.instance.samples))
+    self.instance.PublishSamples()
+    self.assertEqual(published_metrics, ['widgets'] * 3)
+    mock_publisher.Flush.assert_called_once_with()
+    self.instance.Close()
+    self.assertEqual(
+        [c[0] for c in mock_publisher.method_calls],
+        ['Open', 'AppendSamples', 'Flush', 'Close'])
+
+  def testStreamSamplesFailure(self):
+    self.mock_flags.stream_samples = True
+    self.mock_flags.stream_samples_queue_size = 1
+    mock_publisher = mock.MagicMock()
+    mock_publisher.AppendSamples.side_effect = ValueError('upload failed')
+    self.instance.publishers = [mock_publisher]
+    self.instance.AddSamples([self.sample], self.benchmark,
+                             self.benchmark_spec)
+    with self.assertRaisesRegexp(errors.VmUtil.ThreadException,
+                                 'upload failed'):
+      self.instance.PublishSamples()
+    mock_publisher.Close.side_effect = ValueError('close failed')
+    with self.assertRaisesRegexp(errors.VmUtil.ThreadException,
+                                 'close failed'):
+      self.instance.Close()
+
+  def testPublishersRunConcurrently(self):
+    # Each publisher waits for the other, which only completes if they run at
+    # the same time.
+    events = [threading.Event(), threading.Event()]
+    def _MakePublisher(own_event, other_event):
+      def _PublishSamples(samples):
+        own_event.set()
+        if not other_event.wait(10):
+          raise AssertionError('Publishers ran sequentially.')
+      return mock.MagicMock(PublishSamples=_PublishSamples)
+    self.instance.publishers = [_MakePublisher(*events),
+                                _MakePublisher(*reversed(events))]
+    self.instance.AddSamples([self.sample], self.benchmark,
+                             self.benchmark_spec)
+    self.instance.PublishSamples()
+
 
 class DefaultMetadataProviderTestCase(unittest.TestCase):
 
@@ -393,3 +592,18 @@ class CSVPublisherTestCase(unittest.TestCase):
     rows = list(reader)
     self.assertEqual(['key1', 'key3'], reader.fieldnames[-2:])
     self.assertEqual(3, len(rows))
+
+  def testIncrementalPublishingRewritesHeader(self):
+    instance = publisher.CSVPublisher(self.tf.name)
+    instance.Open()
+    instance.AppendSamples([{'test': 'testa', 'metric': '1', 'value': 1.0,
+                             'unit': 'MB', 'metadata': {'key1': 'value1'}}])
+    instance.Flush()
+    instance.AppendSamples([{'test': 'testb', 'metric': '2', 'value': 2.0,
+                             'unit': 'MB', 'metadata': {'key2': 'value2'}}])
+    instance.Close()
+    with open(self.tf.name) as fp:
+      reader = csv.DictReader(fp)
+      rows = list(reader)
+    self.assertEqual(['key1', 'key2'], reader.fieldnames[-2:])
+    self.assertEqual(['1', '2'], [row['metric'] for row in rows])
@@ -0,0 +1,128 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.rate_limiter."""
+
+import collections
+import unittest
+
+import mock
+
+from perfkitbenchmarker import context
+from perfkitbenchmarker import flags_validators
+from perfkitbenchmarker import rate_limiter
+from tests import mock_flags
+
+
+class _TestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.now = 100.
+    self.sleeps = []
+    self._Patch(rate_limiter.__name__ + '.time.time',
+                side_effect=lambda: self.now)
+    self._Patch(rate_limiter.__name__ + '.time.sleep',
+                side_effect=self.sleeps.append)
+
+  def _Patch(self, target, **kwargs):
+    p = mock.patch(target, **kwargs)
+    self.addCleanup(p.stop)
+    return p.start()
+
+
+class TokenBucketTestCase(_TestCase):
+
+  def testBurst(self):
+    bucket = rate_limiter.TokenBucket(2, burst=3)
+    self.assertEqual([bucket.Acquire() for _ in range(5)],
+                     [0, 0, 0, .5, 1.])
+    self.assertEqual(self.sleeps, [.5, 1.])
+
+  def testRefill(self):
+    bucket = rate_limiter.TokenBucket(2, burst=3)
+    for _ in range(3):
+      bucket.Acquire()
+    self.now += 1
+    self.assertEqual([bucket.Acquire() for _ in range(3)], [0, 0, .5])
+
+  def testAdaptiveRate(self):
+    bucket = rate_limiter.TokenBucket(10)
+    bucket.ReportThrottled()
+    bucket.ReportThrottled()
+    self.assertEqual(bucket.rate, 2.5)
+    for _ in range(3):
+      bucket.ReportSuccess()
+    self.assertEqual(bucket.rate, 5.5)
+    for _ in range(10):
+      bucket.ReportSuccess()
+    self.assertEqual(bucket.rate, 10)
+    for _ in range(10):
+      bucket.ReportThrottled()
+    self.assertEqual(bucket.rate, .5)
+
+
+class RateLimitsTestCase(_TestCase):
+
+  def setUp(self):
+    super(RateLimitsTestCase, self).setUp()
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.cloud_api_rate_limits = [
+        'gcloud=10', 'gcloud compute instances=1', 'aws ec2=5/10']
+    self._Patch(rate_limiter.__name__ + '._buckets', new={})
+    self._Patch(rate_limiter.__name__ + '._stats',
+                new=collections.defaultdict(rate_limiter._BenchmarkStats))
+    context.SetThreadBenchmarkSpec(mock.Mock(uid='uid'))
+    self.addCleanup(context.SetThreadBenchmarkSpec, None)
+
+  def testGetRateLimit(self):
+    self.assertEqual(
+        rate_limiter.Acquire(['/usr/bin/gcloud', 'compute', 'instances',
+                              'create', 'vm']),
+        'gcloud compute instances=1')
+    self.assertEqual(rate_limiter.Acquire(['gcloud', 'compute', 'disks']),
+                     'gcloud=10')
+    self.assertEqual(
+        rate_limiter.Acquire(['aws', '--output', 'json', 'ec2', 'describe']),
+        'aws ec2=5/10')
+    self.assertIsNone(rate_limiter.Acquire(['aws', 's3', 'ls']))
+    self.assertIsNone(rate_limiter.Acquire(['ssh', 'gcloud']))
+
+  def testSamples(self):
+    cmd = ['gcloud', 'compute', 'instances', 'create']
+    for _ in range(3):
+      rate_limit = rate_limiter.Acquire(cmd)
+    rate_limiter.ReportResult(rate_limit, 1, 'ERROR: Rate Limit Exceeded')
+    rate_limiter.ReportResult(rate_limit, 1, 'ERROR: Not found')
+    rate_limiter.RecordRetry('IssueRetryableCommand')
+    samples = rate_limiter.PopSamples('uid')
+    self.assertEqual(
+        [(s.metric, s.value, s.metadata) for s in samples],
+        [('Cloud API Calls', 3, {'cloud_api_rate_limit': rate_limit}),
+         ('Cloud API Delayed Calls', 2, {'cloud_api_rate_limit': rate_limit}),
+         ('Cloud API Delay', 3., {'cloud_api_rate_limit': rate_limit}),
+         ('Cloud API Throttled Calls', 1,
+          {'cloud_api_rate_limit': rate_limit}),
+         ('Retries', 1, {'function': 'IssueRetryableCommand'})])
+    self.assertEqual(rate_limiter.PopSamples('uid'), [])
+
+  def testValidateRateLimitsFlag(self):
+    self.assertTrue(rate_limiter.ValidateRateLimitsFlag(
+        ['gcloud=10', 'aws ec2=.5/2']))
+    for rate_limit in ('gcloud', '=1', 'gcloud=0', 'gcloud=1/0', 'gcloud=a'):
+      with self.assertRaises(flags_validators.Error):
+        rate_limiter.ValidateRateLimitsFlag([rate_limit])
+
+
+if __name__ == '__main__':
+  unittest.main()
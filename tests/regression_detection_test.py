@@ -0,0 +1,240 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.regression_detection."""
+
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+
+import mock
+
+from perfkitbenchmarker import regression_detection
+from perfkitbenchmarker import results_warehouse
+from tests import mock_flags
+from tests import sample_dicts
+
+
+def _Noisy(center, count, seed=0):
+  rng = random.Random(seed)
+  return [center + rng.uniform(-1., 1.) for _ in range(count)]
+
+
+class StatisticsTestCase(unittest.TestCase):
+
+  def testGetDirection(self):
+    for metric, unit, direction in (
+        ('Throughput', 'Mbits/sec', regression_detection.HIGHER_IS_BETTER),
+        ('Latency', 'ms', regression_detection.LOWER_IS_BETTER),
+        ('Read', 'ms/op', regression_detection.LOWER_IS_BETTER),
+        ('End to End Runtime', 'seconds',
+         regression_detection.LOWER_IS_BETTER),
+        ('Overall IOPS', 'count', regression_detection.HIGHER_IS_BETTER),
+        ('Packet drops', 'count', None)):
+      self.assertEqual(regression_detection.GetDirection(metric, unit),
+                       direction, metric)
+
+  def testMannWhitneyU(self):
+    low = _Noisy(10., 20)
+    high = _Noisy(12., 20, seed=1)
+    self.assertLess(regression_detection.MannWhitneyU(high, low), .001)
+    self.assertGreater(regression_detection.MannWhitneyU(low, high), .999)
+    self.assertGreater(regression_detection.MannWhitneyU(low, low), .4)
+    self.assertEqual(regression_detection.MannWhitneyU([1.] * 3, [1.] * 3), 1.)
+
+  def testFindLastChangePoint(self):
+    values = _Noisy(10., 30) + _Noisy(20., 15, seed=1)
+    self.assertEqual(
+        regression_detection.FindLastChangePoint(values, .01, 10), 30)
+    self.assertEqual(
+        regression_detection.FindLastChangePoint(values[:30], .01, 10), 0)
+
+  def testStudentTTail(self):
+    for t, df, probability in ((0., 7, .5), (1., 1, .25), (2., 2, .09175),
+                               (3., 5, .01505), (2., 10, .03669),
+                               (-1., 3, .80450)):
+      self.assertAlmostEqual(regression_detection._StudentTTail(t, df),
+                             probability, places=5)
+
+  def testAdjustPValues(self):
+    adjusted = regression_detection.AdjustPValues([.01, .04, .03, .5])
+    for value, expected in zip(adjusted, [.04, .16 / 3, .16 / 3, .5]):
+      self.assertAlmostEqual(value, expected)
+
+  def testBootstrapMedianDifference(self):
+    low, high = regression_detection.BootstrapMedianDifference(
+        _Noisy(10., 30), [15.])
+    self.assertTrue(4. < low <= high < 6., (low, high))
+
+
+class CompareTestCase(unittest.TestCase):
+
+  def _Compare(self, baseline, head, direction):
+    return regression_detection.Compare(baseline, head, direction, alpha=.01,
+                                        min_change_percent=5.,
+                                        min_baseline_size=10)
+
+  def testRegression(self):
+    comparison = self._Compare(_Noisy(100., 30), [120.],
+                               regression_detection.LOWER_IS_BETTER)
+    self.assertEqual(comparison.status, regression_detection.REGRESSION)
+    self.assertLess(comparison.p_value, .01)
+    self.assertAlmostEqual(comparison.change_percent, 20., delta=1.)
+    self.assertEqual(comparison.baseline_size, 30)
+
+  def testImprovement(self):
+    comparison = self._Compare(_Noisy(100., 30), [120.],
+                               regression_detection.HIGHER_IS_BETTER)
+    self.assertEqual(comparison.status, regression_detection.IMPROVEMENT)
+
+  def testUnknownDirection(self):
+    comparison = self._Compare(_Noisy(100., 30), [80.] * 5, None)
+    self.assertEqual(comparison.status, regression_detection.CHANGE)
+
+  def testNoise(self):
+    comparison = self._Compare(_Noisy(100., 30), [100.5],
+                               regression_detection.LOWER_IS_BETTER)
+    self.assertEqual(comparison.status, regression_detection.NO_CHANGE)
+
+  def testSmallChange(self):
+    # Significant, but smaller than min_change_percent.
+    comparison = self._Compare(_Noisy(100., 30), [103.],
+                               regression_detection.LOWER_IS_BETTER)
+    self.assertEqual(comparison.status, regression_detection.NO_CHANGE)
+
+  def testBaselineAfterChangePoint(self):
+    # The metric moved to 120 a while ago, which is its new baseline.
+    comparison = self._Compare(_Noisy(100., 30) + _Noisy(120., 15, seed=1),
+                               [120.], regression_detection.LOWER_IS_BETTER)
+    self.assertEqual(comparison.status, regression_detection.NO_CHANGE)
+    self.assertEqual(comparison.baseline_size, 15)
+
+  def testSmallBaseline(self):
+    # Under the normal distribution, a value 2.6 scaled median absolute
+    # deviations from the baseline median would be significant.
+    baseline = [90., 95., 97., 99., 100., 100., 101., 103., 105., 110.]
+    comparison = self._Compare(baseline, [111.5],
+                               regression_detection.LOWER_IS_BETTER)
+    self.assertEqual(comparison.status, regression_detection.NO_CHANGE)
+
+  def testMultipleComparisons(self):
+    rng = random.Random(0)
+    groups = [([rng.gauss(100., 3.) for _ in range(20)],
+               [rng.gauss(100., 3.)], regression_detection.LOWER_IS_BETTER)
+              for _ in range(500)]
+    comparisons = regression_detection.CompareAll(
+        groups, alpha=.01, min_change_percent=5., min_baseline_size=10)
+    self.assertLessEqual(
+        sum(c.status != regression_detection.NO_CHANGE for c in comparisons),
+        2)
+
+  def testInsufficientBaseline(self):
+    comparison = self._Compare(_Noisy(100., 5), [120.],
+                               regression_detection.LOWER_IS_BETTER)
+    self.assertEqual(comparison.status,
+                     regression_detection.INSUFFICIENT_BASELINE)
+
+
+class RegressionDetectorTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.regression_metadata_keys = ['machine_type']
+    self.mocked_flags.regression_baseline_days = 30.
+    self.mocked_flags.regression_alpha = .01
+    self.mocked_flags.regression_min_change_percent = 5.
+    self.mocked_flags.regression_min_baseline_samples = 10
+    tempdir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, tempdir)
+    self.warehouse = results_warehouse.Warehouse(
+        os.path.join(tempdir, 'warehouse.db'))
+    now = time.time()
+    self.warehouse.AddSamples(
+        [self._Sample(value, now - 3600 * (i + 1), run_uri='past%s' % i)
+         for i, value in enumerate(_Noisy(100., 30))] +
+        [self._Sample(200., now - 60, machine_type='n1-highcpu-2',
+                      run_uri='other'),
+         self._Sample(200., now - 60, run_uri='current')])
+    self.detector = regression_detection.RegressionDetector(self.warehouse)
+    self.addCleanup(self.detector.Close)
+
+  def _Sample(self, value, timestamp, machine_type='n1-standard-1',
+              run_uri='current'):
+    return sample_dicts.MakeSample(
+        value, {'machine_type': machine_type, 'zone': 'us-east1-b'},
+        test='ping', metric='Average Latency', timestamp=timestamp,
+        run_uri=run_uri)
+
+  def testRegression(self):
+    sample = self._Sample(120., time.time())
+    self.detector.AnnotateSamples(None, benchmark_spec=None,
+                                  samples=[sample])
+    self.assertEqual(sample['metadata']['regression_status'],
+                     regression_detection.REGRESSION)
+    self.assertNotIn('regression_p_value', sample['metadata'])
+    # Samples of other machine types and of the current run are excluded.
+    self.assertEqual(self.detector.regressions[0][1].baseline_size, 30)
+    self.assertEqual(self.detector.regressions[0][0], [sample])
+    self.assertIn('ping Average Latency', self.detector.CreateSummary())
+
+  def testNoRegression(self):
+    sample = self._Sample(100., time.time())
+    self.detector.AnnotateSamples(None, benchmark_spec=None,
+                                  samples=[sample])
+    self.assertEqual(sample['metadata']['regression_status'],
+                     regression_detection.NO_CHANGE)
+    self.assertEqual(self.detector.regressions, [])
+
+  def testInsufficientBaseline(self):
+    sample = self._Sample(100., time.time(), machine_type='n1-highcpu-2')
+    self.detector.AnnotateSamples(None, benchmark_spec=None,
+                                  samples=[sample])
+    self.assertEqual(sample['metadata'], {
+        'machine_type': 'n1-highcpu-2', 'zone': 'us-east1-b',
+        'regression_status': regression_detection.INSUFFICIENT_BASELINE})
+
+  def testRepeatedSamples(self):
+    # Each value alone is within the noise, but together they are not.
+    samples = [self._Sample(value, time.time())
+               for value in (106., 106.5, 107., 107.5, 108.)]
+    self.detector.AnnotateSamples(None, benchmark_spec=None, samples=samples)
+    for sample in samples:
+      self.assertEqual(sample['metadata']['regression_status'],
+                       regression_detection.REGRESSION)
+    self.assertEqual(self.detector.regressions[0][0], samples)
+
+  def testFailure(self):
+    sample = self._Sample(120., time.time())
+    with mock.patch.object(self.warehouse, 'GetValues',
+                           side_effect=sqlite3.OperationalError('locked')):
+      self.detector.AnnotateSamples(None, benchmark_spec=None,
+                                    samples=[sample])
+    self.assertNotIn('regression_status', sample['metadata'])
+    self.assertEqual(self.detector.failed_batch_count, 1)
+    self.assertIn('Could not compare 1 batches',
+                  self.detector.CreateSummary())
+
+  def testNonNumericValue(self):
+    sample = self._Sample('n/a', time.time())
+    self.detector.AnnotateSamples(None, benchmark_spec=None,
+                                  samples=[sample])
+    self.assertNotIn('regression_status', sample['metadata'])
+
+
+if __name__ == '__main__':
+  unittest.main()
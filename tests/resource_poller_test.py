@@ -0,0 +1,139 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.resource_poller."""
+
+import collections
+import threading
+import time
+import unittest
+
+import mock
+
+from perfkitbenchmarker import resource
+from perfkitbenchmarker import resource_poller
+from tests import mock_flags
+
+
+class BatchPollerTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.resource_polling_window = .2
+    self.list_calls = []
+    self.poller = resource_poller.BatchPoller(self._ListStates)
+
+  def _ListStates(self, scope, keys):
+    self.list_calls.append((scope, keys))
+    if scope == 'bad-zone':
+      raise ValueError(scope)
+    return {key: scope + '/' + key for key in keys if key != 'missing'}
+
+  def _GetStates(self, requests):
+    states = {}
+    errors = []
+
+    def GetState(scope, key):
+      try:
+        states[scope, key] = self.poller.GetState(scope, key)
+      except ValueError as e:
+        errors.append(e)
+
+    threads = [threading.Thread(target=GetState, args=request)
+               for request in requests]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    return states, errors
+
+  def testBatching(self):
+    states, _ = self._GetStates([('zone-a', 'vm1'), ('zone-a', 'vm2'),
+                                 ('zone-b', 'vm3'), ('zone-a', 'missing')])
+    self.assertEqual(states, {('zone-a', 'vm1'): 'zone-a/vm1',
+                              ('zone-a', 'vm2'): 'zone-a/vm2',
+                              ('zone-b', 'vm3'): 'zone-b/vm3',
+                              ('zone-a', 'missing'): None})
+    self.assertEqual(sorted(self.list_calls),
+                     [('zone-a', ['missing', 'vm1', 'vm2']),
+                      ('zone-b', ['vm3'])])
+
+  def testErrorIsRaisedInEveryThread(self):
+    _, errors = self._GetStates([('bad-zone', 'vm1'), ('bad-zone', 'vm2')])
+    self.assertEqual(len(errors), 2)
+    self.assertEqual(len(self.list_calls), 1)
+
+  def testLaterChecksStartANewBatch(self):
+    self.assertEqual(self.poller.GetState('zone-a', 'vm1'), 'zone-a/vm1')
+    self.assertEqual(self.poller.GetState('zone-a', 'vm1'), 'zone-a/vm1')
+    self.assertEqual(len(self.list_calls), 2)
+
+  def testLeaderInterruptedDuringWindow(self):
+    follower_errors = []
+
+    def Follow():
+      try:
+        self.poller.GetState('zone-a', 'vm2')
+      except KeyboardInterrupt as e:
+        follower_errors.append(e)
+
+    follower = threading.Thread(target=Follow)
+
+    def Sleep(unused_seconds):
+      follower.start()
+      while len(self.poller._pending_batches['zone-a'].keys) < 2:
+        time.sleep(.01)
+      raise KeyboardInterrupt()
+
+    with mock.patch(resource_poller.__name__ + '.time') as mock_time:
+      mock_time.sleep.side_effect = Sleep
+      with self.assertRaises(KeyboardInterrupt):
+        self.poller.GetState('zone-a', 'vm1')
+    follower.join()
+    self.assertEqual(len(follower_errors), 1)
+    self.assertEqual(self.list_calls, [])
+    self.assertEqual(self.poller.GetState('zone-a', 'vm1'), 'zone-a/vm1')
+
+  @mock.patch(resource_poller.__name__ + '.time.sleep')
+  def testDisabled(self, sleep):
+    self.mocked_flags.resource_polling_window = 0
+    self.assertEqual(self.poller.GetState('zone-a', 'vm1'), 'zone-a/vm1')
+    self.assertEqual(self.list_calls, [('zone-a', ['vm1'])])
+    self.assertFalse(sleep.called)
+
+
+class ReadyPollIntervalTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch(resource.__name__ + '._ready_times',
+                   new=collections.defaultdict(list))
+    p.start()
+    self.addCleanup(p.stop)
+
+  def testInterval(self):
+    self.assertEqual(resource._GetReadyPollInterval(str),
+                     resource.DEFAULT_READY_POLL_INTERVAL)
+    for ready_time in (20., 40., 300.):
+      resource._RecordReadyTime(str, ready_time)
+    self.assertEqual(resource._GetReadyPollInterval(str), 4.)
+    resource._RecordReadyTime(int, 1.)
+    self.assertEqual(resource._GetReadyPollInterval(int),
+                     resource.MIN_READY_POLL_INTERVAL)
+    resource._RecordReadyTime(float, 1000.)
+    self.assertEqual(resource._GetReadyPollInterval(float),
+                     resource.MAX_READY_POLL_INTERVAL)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,117 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.results_warehouse."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from perfkitbenchmarker import columnar_results
+from perfkitbenchmarker import publisher
+from perfkitbenchmarker import results_warehouse
+from tests import sample_dicts
+
+_NOW = 100 * 24 * 60 * 60.
+
+
+def _Sample(value, timestamp, machine_type='n1-standard-1', **kwargs):
+  kwargs.setdefault('metric', 'Throughput')
+  return sample_dicts.MakeSample(
+      value, {'machine_type': machine_type, 'num_vms': 2},
+      timestamp=timestamp, **kwargs)
+
+
+class WarehouseTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.tempdir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.tempdir)
+    self.path = os.path.join(self.tempdir, 'warehouse.db')
+    self.warehouse = results_warehouse.Warehouse(self.path)
+    self.addCleanup(self.warehouse.Close)
+    p = mock.patch.object(results_warehouse.time, 'time', return_value=_NOW)
+    p.start()
+    self.addCleanup(p.stop)
+
+  def testRoundTrip(self):
+    samples = [_Sample(1., _NOW), _Sample(2., _NOW + 1, run_uri='def')]
+    self.assertEqual(self.warehouse.AddSamples(samples), 2)
+    self.warehouse.Close()
+    self.warehouse = results_warehouse.Warehouse(self.path)
+    self.assertEqual(self.warehouse.GetSamples(), samples)
+    self.assertEqual(self.warehouse.GetSamples(run_uri='def'), samples[1:])
+
+  def testMetadataStoredOnce(self):
+    self.warehouse.AddSamples([_Sample(1., _NOW)] * 3)
+    self.warehouse.AddSamples([_Sample(1., _NOW, machine_type='n1-highcpu-2')])
+    self.warehouse.Close()
+    self.warehouse = results_warehouse.Warehouse(self.path)
+    self.warehouse.AddSamples([_Sample(1., _NOW)])
+    self.assertEqual(
+        self.warehouse._connection.execute(
+            'SELECT COUNT(*) FROM metadata').fetchone()[0], 2)
+
+  def testGetStatistics(self):
+    day = 24 * 60 * 60
+    self.warehouse.AddSamples(
+        [_Sample(float(i), _NOW - i * day / 10) for i in range(1, 101)] +
+        [_Sample(1000., _NOW, machine_type='n1-highcpu-2'),
+         _Sample(1000., _NOW, metric='Latency')])
+    statistics = self.warehouse.GetStatistics(
+        percentiles=[50, 99], days=5, metric='Throughput',
+        metadata={'machine_type': 'n1-standard-1', 'num_vms': '2'})
+    self.assertEqual(statistics['count'], 50)
+    self.assertEqual(statistics['p50'], 26.)
+    self.assertEqual(statistics['p99'], 50.)
+    self.assertIsNone(self.warehouse.GetStatistics(metric='Unknown'))
+
+  def testImportAndQueryCommands(self):
+    json_path = os.path.join(self.tempdir, 'results.json')
+    with open(json_path, 'wb') as fp:
+      publisher.NewlineDelimitedJSONPublisher(fp.name).PublishSamples(
+          [_Sample(1., _NOW), _Sample(3., _NOW)])
+    columnar_path = os.path.join(self.tempdir, 'results.pkbcol')
+    publisher.ColumnarPublisher(columnar_path).PublishSamples(
+        [_Sample(5., _NOW)])
+    self.assertFalse(results_warehouse.main(
+        [self.path, 'import', json_path, columnar_path]))
+    stdout = io.BytesIO()
+    with mock.patch.object(results_warehouse.sys, 'stdout', stdout):
+      self.assertFalse(results_warehouse.main(
+          [self.path, 'query', '--metric', 'Throughput', '--days', '30',
+           '--metadata', 'machine_type=n1-standard-1', '--percentile', '50',
+           '--percentile', '99.9']))
+    statistics = json.loads(stdout.getvalue())
+    self.assertEqual(statistics['count'], 3)
+    self.assertEqual(statistics['p50'], 3.)
+    self.assertEqual(statistics['p99.9'], 5.)
+
+  def testPublisher(self):
+    instance = publisher.WarehousePublisher(self.path)
+    instance.Open()
+    instance.AppendSamples([_Sample(1., _NOW)])
+    self.assertEqual(self.warehouse.GetValues(), [1.])
+    instance.AppendSamples([_Sample(2., _NOW + 1)])
+    instance.Close()
+    self.assertEqual(self.warehouse.GetValues(), [1., 2.])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,33 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Builds sample dicts like the ones that a SampleCollector publishes."""
+
+import uuid
+
+
+def MakeSample(value, metadata=None, **kwargs):
+  """Returns a sample dict.
+
+  Args:
+    value: The sample's value.
+    metadata: dict. The sample's metadata. Defaults to an empty dict.
+    **kwargs: Fields of the sample that replace or add to the defaults.
+  """
+  sample = {'test': 'ycsb', 'metric': 'Latency', 'value': value, 'unit': 'ms',
+            'timestamp': 1000.5, 'metadata': metadata or {},
+            'product_name': 'PerfKitBenchmarker', 'official': False,
+            'owner': 'tester', 'run_uri': 'abc123',
+            'sample_uri': str(uuid.uuid4())}
+  sample.update(kwargs)
+  return sample
@@ -0,0 +1,68 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.sample_store."""
+
+import unittest
+
+from perfkitbenchmarker import sample_store
+from tests import sample_dicts
+
+
+class SampleStoreTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.store = sample_store.SampleStore()
+
+  def testEmpty(self):
+    self.assertEqual(len(self.store), 0)
+    self.assertFalse(self.store)
+    self.assertEqual(list(self.store), [])
+    with self.assertRaises(IndexError):
+      self.store[0]
+
+  def testRoundTrip(self):
+    samples = [
+        sample_dicts.MakeSample(1.5, {'zone': 'a'}),
+        sample_dicts.MakeSample(7, {'zone': 'b'}),
+        sample_dicts.MakeSample(2 ** 70, {'zone': 'a'},
+                                sample_uri='not-a-uuid'),
+        sample_dicts.MakeSample('n/a', {'zone': 'a', 'sizes': [1, 2]},
+                                labels='x'),
+               {'test': 'testa', 'metadata': {}}]
+    self.store.Extend(samples)
+    self.assertEqual(len(self.store), 5)
+    self.assertEqual(list(self.store), samples)
+    self.assertEqual(self.store[-1], samples[-1])
+    self.assertIs(type(self.store[1]['value']), int)
+    self.assertIs(type(self.store[0]['value']), float)
+
+  def testMetadataShared(self):
+    metadata = {'key%s' % i: i for i in range(50)}
+    for i in range(1000):
+      self.store.Append(sample_dicts.MakeSample(float(i), dict(metadata)))
+    self.store.Append(sample_dicts.MakeSample(0., {'other': 1}))
+    self.assertEqual(self.store._columns[4][1].values,
+                     [metadata, {'other': 1}])
+
+  def testMaterializedSamplesAreCopies(self):
+    metadata = {'zone': 'a'}
+    self.store.Append(sample_dicts.MakeSample(1., metadata))
+    metadata['zone'] = 'b'
+    self.store[0]['metadata']['zone'] = 'c'
+    self.assertEqual(self.store[0]['metadata'], {'zone': 'a'})
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -116,6 +116,18 @@ class ConstructSparkServiceTestCase(_BenchmarkSpecTestCase):
       self.assertTrue(isinstance(spec.spark_service,
                                  aws_emr.AwsEMR))
 
+  def testEMRNetworkIsDependency(self):
+    self._mocked_flags.cloud = providers.AWS
+    self._mocked_flags.zones = ['us-west-2a']
+    with mock_flags.PatchFlags(self._mocked_flags):
+      spec = self._CreateBenchmarkSpecFromYaml(EMR_CONFIG.replace(
+          'm1.large', 'm4.large\n    zone: us-west-2a'))
+      spec.ConstructVirtualMachines()
+      spec.ConstructSparkService()
+    network = spec.spark_service.network
+    self.assertIn(network, spec.networks.values())
+    self.assertEqual(spec.spark_service.GetResourceDependencies(), [network])
+
   def testPkbManaged(self):
     spec = self._CreateBenchmarkSpecFromYaml(PKB_MANAGED_CONFIG)
     self.assertEqual(spec.config.spark_service.num_workers, 5,
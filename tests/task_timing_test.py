@@ -0,0 +1,130 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.task_timing."""
+
+import collections
+import unittest
+
+import mock
+
+from perfkitbenchmarker import background_tasks
+from perfkitbenchmarker import context
+from perfkitbenchmarker import task_timing
+from tests import mock_flags
+
+
+def PrepareVm(vm):
+  return vm
+
+
+def _TaskTimes(enqueue_time, start_time, end_time, vm='vm'):
+  times = task_timing.TaskTimes(PrepareVm, (vm,), {}, 'label ', enqueue_time)
+  times.start_time = start_time
+  times.end_time = end_time
+  return times
+
+
+class TaskTimingTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.parallel_task_samples = True
+    self.mocked_flags.parallel_straggler_ratio = 2.
+    for name, new in (('_samples', collections.defaultdict(list)),
+                      ('_call_counts', collections.Counter())):
+      p = mock.patch.object(task_timing, name, new=new)
+      p.start()
+      self.addCleanup(p.stop)
+    context.SetThreadBenchmarkSpec(mock.Mock(uid='uid'))
+    self.addCleanup(context.SetThreadBenchmarkSpec, None)
+
+  def testSamples(self):
+    task_times = [_TaskTimes(0., 0., 1.), _TaskTimes(0., 0., 2.),
+                  _TaskTimes(0., 1., 5.), _TaskTimes(0., 2., 3.),
+                  _TaskTimes(0., None, None)]
+    task_timing.Report(task_times, 2)
+    samples = task_timing.PopSamples('uid')
+    self.assertEqual(
+        [(s.metric, s.value) for s in samples],
+        [('Parallel Task Latency p50', 2.),
+         ('Parallel Task Latency p90', 4.),
+         ('Parallel Task Latency p99', 4.),
+         ('Parallel Task Latency max', 4.),
+         ('Parallel Task Max/Median Latency Ratio', 2.),
+         ('Parallel Task Queue Time max', 2.),
+         ('Parallel Task Peak Concurrency', 2),
+         ('Parallel Call Runtime', 5.)])
+    self.assertEqual(samples[0].metadata, {
+        'parallel_target': 'PrepareVm', 'parallel_call_index': 0,
+        'parallel_task_count': 4, 'parallel_max_concurrency': 2})
+    self.assertEqual(task_timing.PopSamples('uid'), [])
+
+  def testSamplesDisabled(self):
+    self.mocked_flags.parallel_task_samples = False
+    task_timing.Report([_TaskTimes(0., 0., 1.)], 1)
+    self.assertEqual(task_timing.PopSamples('uid'), [])
+
+  def testNoSamplesOutsideBenchmark(self):
+    context.SetThreadBenchmarkSpec(None)
+    task_timing.Report([_TaskTimes(0., 0., 1.)], 1)
+    self.assertEqual(task_timing._samples, {})
+    self.assertEqual(task_timing._call_counts, {})
+
+  def testStragglerReport(self):
+    task_times = [_TaskTimes(0., 0., 1., 'vm%s' % i) for i in range(3)]
+    task_times.append(_TaskTimes(0., 0., 10., 'slow_vm'))
+    with mock.patch.object(task_timing.logging, 'info') as info:
+      task_timing.Report(task_times, 4)
+    self.assertEqual(info.call_count, 1)
+    self.assertIn("PrepareVm('slow_vm')", info.call_args[0][-1])
+
+  def testStragglerReportOfUnicodeArgs(self):
+    task_times = [_TaskTimes(0., 0., 1.), _TaskTimes(0., 0., 1.),
+                  _TaskTimes(0., 0., 10., u'caf\xe9')]
+    with mock.patch.object(task_timing.logging, 'info') as info:
+      task_timing.Report(task_times, 3)
+    self.assertIn("PrepareVm(u'caf\\xe9')", info.call_args[0][-1])
+
+  def testNoStragglerReport(self):
+    task_times = [_TaskTimes(0., 0., .1), _TaskTimes(0., 0., .5)]
+    with mock.patch.object(task_timing.logging, 'info') as info:
+      task_timing.Report(task_times, 2)
+    self.assertFalse(info.called)
+
+  def testStragglerRatioUnset(self):
+    self.mocked_flags.parallel_straggler_ratio = None
+    task_times = [_TaskTimes(0., 0., 1.), _TaskTimes(0., 0., 10.)]
+    with mock.patch.object(task_timing.logging, 'info') as info:
+      task_timing.Report(task_times, 2)
+    self.assertFalse(info.called)
+    self.assertTrue(task_timing.PopSamples('uid'))
+
+  def testReportFailureDoesNotAffectRunThreaded(self):
+    with mock.patch.object(task_timing, 'Report', side_effect=ValueError):
+      self.assertEqual(background_tasks.RunThreaded(lambda x: x, [1, 2]),
+                       [1, 2])
+
+  def testUnicodeArgs(self):
+    self.assertEqual(background_tasks.RunThreaded(len, [u'caf\xe9']), [4])
+
+  def testRecordedByRunThreaded(self):
+    background_tasks.RunThreaded(lambda x: x, [1, 2, 3])
+    samples = task_timing.PopSamples('uid')
+    self.assertEqual(samples[0].metadata['parallel_task_count'], 3)
+    self.assertEqual(samples[0].metadata['parallel_target'], '<lambda>')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,178 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.vm_pool."""
+
+import unittest
+
+import mock
+
+from perfkitbenchmarker import benchmark_spec
+from perfkitbenchmarker import configs
+from perfkitbenchmarker import context
+from perfkitbenchmarker import os_types
+from perfkitbenchmarker import providers
+from perfkitbenchmarker import vm_pool
+from perfkitbenchmarker.configs import benchmark_config_spec
+from tests import mock_flags
+
+
+CONFIG = """
+name:
+  vm_groups:
+    default:
+      vm_count: 2
+      vm_spec:
+        GCP:
+          machine_type: {machine_type}
+          zone: us-central1-c
+          project: my-project
+"""
+
+
+class _VmPoolTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.pool = vm_pool.VmPool()
+    p = mock.patch.object(vm_pool, '_pool', self.pool)
+    p.start()
+    self.addCleanup(p.stop)
+    p = mock.patch(vm_pool.__name__ + '.FLAGS')
+    self.mock_flags = p.start()
+    self.addCleanup(p.stop)
+    self.mock_flags.reuse_vms = True
+
+
+class GetPoolKeyTestCase(_VmPoolTestCase):
+
+  def _CreateVmSpec(self, machine_type):
+    vm_spec = mock.Mock(spec=[])
+    vm_spec.machine_type = machine_type
+    vm_spec.zone = 'us-central1-c'
+    return vm_spec
+
+  def testDisabled(self):
+    self.mock_flags.reuse_vms = False
+    self.assertIsNone(vm_pool.GetPoolKey(
+        providers.GCP, os_types.DEBIAN, self._CreateVmSpec('n1-standard-1'),
+        None, 0))
+
+  def testUnpoolableOsType(self):
+    self.assertIsNone(vm_pool.GetPoolKey(
+        providers.GCP, os_types.UBUNTU_CONTAINER,
+        self._CreateVmSpec('n1-standard-1'), None, 0))
+
+  def testIdenticalSpecs(self):
+    self.assertEqual(
+        vm_pool.GetPoolKey(providers.GCP, os_types.DEBIAN,
+                           self._CreateVmSpec('n1-standard-1'), None, 0),
+        vm_pool.GetPoolKey(providers.GCP, os_types.DEBIAN,
+                           self._CreateVmSpec('n1-standard-1'), None, 0))
+
+  def testDifferentSpecs(self):
+    self.assertNotEqual(
+        vm_pool.GetPoolKey(providers.GCP, os_types.DEBIAN,
+                           self._CreateVmSpec('n1-standard-1'), None, 0),
+        vm_pool.GetPoolKey(providers.GCP, os_types.DEBIAN,
+                           self._CreateVmSpec('n1-standard-2'), None, 0))
+
+
+class VmPoolTestCase(_VmPoolTestCase):
+
+  def _CreateVm(self, pool_key='key'):
+    vm = mock.Mock(created=True, install_packages=True, pool_key=pool_key,
+                   reused_from_pool=False)
+    vm.name = 'vm'
+    return vm
+
+  def testLeaseFromEmptyPool(self):
+    self.assertIsNone(self.pool.LeaseVm('key'))
+    self.assertIsNone(self.pool.LeaseVm(None))
+
+  def testReleaseAndLease(self):
+    vm = self._CreateVm()
+    self.assertTrue(self.pool.ReleaseVm(vm))
+    vm.PackageCleanup.assert_called_once_with()
+    self.assertIsNone(self.pool.LeaseVm('other_key'))
+    self.assertIs(self.pool.LeaseVm('key'), vm)
+    self.assertTrue(vm.reused_from_pool)
+    self.assertIsNone(self.pool.LeaseVm('key'))
+
+  def testReleaseUncreatedVm(self):
+    vm = self._CreateVm()
+    vm.created = False
+    self.assertFalse(self.pool.ReleaseVm(vm))
+    self.assertIsNone(self.pool.LeaseVm('key'))
+
+  def testReleaseCleanupFailure(self):
+    vm = self._CreateVm()
+    vm.PackageCleanup.side_effect = Exception
+    self.assertFalse(self.pool.ReleaseVm(vm))
+    self.assertIsNone(self.pool.LeaseVm('key'))
+
+  def testDeleteAll(self):
+    vm = self._CreateVm()
+    network = mock.Mock()
+    firewall = mock.Mock()
+    self.pool.ReleaseVm(vm)
+    self.pool.AddNetworkResources({'net': network}, {'fw': firewall})
+    self.pool.DeleteAll()
+    vm.Delete.assert_called_once_with()
+    vm.DeleteScratchDisks.assert_called_once_with()
+    firewall.DisallowAllPorts.assert_called_once_with()
+    network.Delete.assert_called_once_with()
+    self.assertIsNone(self.pool.LeaseVm('key'))
+
+
+class BenchmarkSpecReuseTestCase(_VmPoolTestCase):
+
+  def setUp(self):
+    super(BenchmarkSpecReuseTestCase, self).setUp()
+    self.addCleanup(context.SetThreadBenchmarkSpec, None)
+    self._mocked_flags = mock_flags.MockFlags()
+    self._mocked_flags.cloud = providers.GCP
+    self._mocked_flags.os_type = os_types.DEBIAN
+
+  def _CreateSpec(self, machine_type):
+    config = configs.LoadConfig(CONFIG.format(machine_type=machine_type), {},
+                                'name')
+    config_spec = benchmark_config_spec.BenchmarkConfigSpec(
+        'name', flag_values=self._mocked_flags, **config)
+    spec = benchmark_spec.BenchmarkSpec(config_spec, 'name', 'name0')
+    spec.ConstructVirtualMachines()
+    return spec
+
+  def _ReleaseVms(self, spec):
+    for vm in spec.vms:
+      vm.created = True
+      vm.PackageCleanup = mock.Mock()
+      spec.DeleteVm(vm)
+
+  def testMatchingSpecReusesVms(self):
+    spec = self._CreateSpec('n1-standard-1')
+    self._ReleaseVms(spec)
+    next_spec = self._CreateSpec('n1-standard-1')
+    self.assertItemsEqual(next_spec.vms, spec.vms)
+    self.assertTrue(all(vm.reused_from_pool for vm in next_spec.vms))
+
+  def testDifferentSpecCreatesVms(self):
+    spec = self._CreateSpec('n1-standard-1')
+    self._ReleaseVms(spec)
+    next_spec = self._CreateSpec('n1-standard-2')
+    self.assertFalse(set(next_spec.vms) & set(spec.vms))
+    self.assertFalse(any(vm.reused_from_pool for vm in next_spec.vms))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -120,6 +120,21 @@ class WaitUntilSleepTimer(threading.Thread):
     self.finished.set()
 
 
+class RetryTestCase(unittest.TestCase):
+
+  @mock.patch(vm_util.__name__ + '.time.sleep')
+  def testBackoff(self, sleep):
+    function = mock.Mock(__name__='Function', side_effect=ValueError)
+    retryable_function = vm_util.Retry(
+        poll_interval=1, max_retries=4, timeout=-1, fuzz=0, backoff_factor=2,
+        max_poll_interval=5)(function)
+    with self.assertRaises(ValueError):
+      retryable_function()
+    self.assertEqual(function.call_count, 5)
+    self.assertEqual([call[0][0] for call in sleep.call_args_list],
+                     [1, 2, 4, 5])
+
+
 class IssueCommandTestCase(unittest.TestCase):
 
   def testTimeoutNotReached(self):
@@ -144,5 +159,50 @@ class IssueCommandTestCase(unittest.TestCase):
     self.assertFalse(HaveSleepSubprocess())
 
 
+class IssueStreamingCommandTestCase(unittest.TestCase):
+
+  def testLines(self):
+    script = 'echo a; printf "b\\nc" >&2; printf "d\\n\\ne"'
+    with vm_util.IssueStreamingCommand(['bash', '-c', script]) as output:
+      self.assertEqual(list(output), ['a\n', 'd\n', '\n', 'e'])
+      self.assertEqual(output.GetStderr(), 'b\nc')
+    self.assertEqual(output.returncode, 0)
+    self.assertFalse(output.timed_out)
+
+  def testLinesSpanChunks(self):
+    with vm_util.IssueStreamingCommand(['echo', 'abc']) as output:
+      with mock.patch.object(output, 'Chunks',
+                             return_value=iter(['a', 'b', 'c\nd', 'e'])):
+        self.assertEqual(list(output), ['abc\n', 'de'])
+
+  def testStderrSpillsToDisk(self):
+    with vm_util.IssueStreamingCommand(
+        ['bash', '-c', 'head -c 100 /dev/zero >&2; exit 3'],
+        spool_threshold=10) as output:
+      self.assertEqual(list(output), [])
+      self.assertEqual(output.GetStderr(), '\0' * 100)
+    self.assertEqual(output.returncode, 3)
+
+  def testTimeoutReached(self):
+    with vm_util.IssueStreamingCommand(['bash', '-c', 'echo a; sleep 5'],
+                                       timeout=.5) as output:
+      self.assertEqual(list(output), ['a\n'])
+    self.assertEqual(output.returncode, -9)
+    self.assertTrue(output.timed_out)
+
+  def testExitsAfterClosingOutputWithoutTimeout(self):
+    with vm_util.IssueStreamingCommand(
+        ['bash', '-c', 'exec >&- 2>&-; sleep .3'], timeout=None) as output:
+      self.assertEqual(list(output), [])
+    self.assertEqual(output.returncode, 0)
+    self.assertFalse(output.timed_out)
+
+  def testStopReading(self):
+    with vm_util.IssueStreamingCommand(['yes']) as output:
+      self.assertEqual(next(iter(output)), 'y\n')
+    self.assertEqual(output.returncode, -9)
+    self.assertFalse(output.timed_out)
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,76 @@
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker/scripts/wait_for_command.py."""
+
+import fcntl
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from perfkitbenchmarker import data
+
+
+class WaitForCommandStreamingTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+    self.paths = {name: os.path.join(self.temp_dir, name)
+                  for name in ('stdout', 'stderr', 'status')}
+
+  def _Write(self, name, contents, mode='a'):
+    with open(self.paths[name], mode) as f:
+      f.write(contents)
+
+  def _Wait(self, stdout_offset=0, stderr_offset=0):
+    cmd = [sys.executable, data.ResourcePath('wait_for_command.py'),
+           '--stdout', self.paths['stdout'], '--stderr', self.paths['stderr'],
+           '--status', self.paths['status'],
+           '--stdout_offset', str(stdout_offset),
+           '--stderr_offset', str(stderr_offset), '--delete']
+    output = subprocess.check_output(cmd)
+    return [json.loads(line) for line in output.splitlines()]
+
+  def testMissingStatusFile(self):
+    with self.assertRaises(subprocess.CalledProcessError):
+      self._Wait()
+
+  def testRunning(self):
+    self._Write('stdout', 'line 1\nline 2\npartial')
+    self._Write('stderr', '')
+    with open(self.paths['status'], 'w') as status:
+      fcntl.lockf(status, fcntl.LOCK_EX)
+      self.assertEqual(self._Wait(stdout_offset=7), [
+          {'stream': 'stdout', 'data': 'line 2\n'},
+          {'stdout_offset': 14, 'stderr_offset': 0, 'status': None}])
+    self.assertTrue(os.path.exists(self.paths['stdout']))
+
+  def testComplete(self):
+    self._Write('stdout', 'line 1\npartial')
+    self._Write('stderr', 'error')
+    self._Write('status', '3')
+    self.assertEqual(self._Wait(stdout_offset=7), [
+        {'stream': 'stdout', 'data': 'partial'},
+        {'stream': 'stderr', 'data': 'error'},
+        {'stdout_offset': 14, 'stderr_offset': 5, 'status': 3}])
+    self.assertEqual(os.listdir(self.temp_dir), [])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+# Copyright 2016 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Local stand-in for the bq and gsutil commands run by PKB's publishers.
+
+Copies the file that "bq load" or "gsutil cp" would upload into a local
+directory, so that publishing can be exercised without cloud credentials.
+"""
+
+import os
+import random
+import re
+import shutil
+import sys
+import uuid
+
+# Directory that receives the uploaded files.
+OUTPUT_DIR_VARIABLE = 'UPLOAD_STAND_IN_DIR'
+# Optional fraction of the calls, between 0 and 1, that fail, to exercise
+# retries.
+FAILURE_RATE_VARIABLE = 'UPLOAD_STAND_IN_FAILURE_RATE'
+
+
+def main(argv):
+  args = [arg for arg in argv[1:] if not arg.startswith('-')]
+  if len(args) == 3 and args[0] in ('load', 'cp'):
+    if args[0] == 'load':
+      _, destination, source = args
+    else:
+      _, source, destination = args
+  else:
+    sys.exit('Usage: %s load [options] <table> <file>\n'
+             '       %s cp <file> <uri>' % (argv[0], argv[0]))
+  output_dir = os.environ.get(OUTPUT_DIR_VARIABLE)
+  if not output_dir:
+    sys.exit('%s is not set.' % OUTPUT_DIR_VARIABLE)
+  if random.random() < float(os.environ.get(FAILURE_RATE_VARIABLE, 0)):
+    sys.exit('Injected failure.')
+  destination_dir = os.path.join(
+      output_dir, re.sub(r'[^\w.-]+', '_', destination).strip('_'))
+  try:
+    os.makedirs(destination_dir)
+  except OSError:
+    # Concurrent uploads to the same destination may have created it.
+    if not os.path.isdir(destination_dir):
+      raise
+  shutil.copy(source, os.path.join(destination_dir, str(uuid.uuid4())))
+
+
+if __name__ == '__main__':
+  main(sys.argv)